@@ -11,6 +11,7 @@ import re
 import traceback
 import unicodedata
 from collections import deque
+from itertools import repeat
 from os.path import basename
 from typing import TYPE_CHECKING, Any, AnyStr, Callable, Deque, Dict, List, Optional, Sequence, Set, Tuple, Union
 
@@ -29,6 +30,7 @@ from ..types import (
     ProxySettings,
     ServiceCheckStatus,
 )
+from ..utils.agent.common import METRIC_NAMESPACE_METRICS
 from ..utils.agent.utils import should_profile_memory
 from ..utils.common import ensure_bytes, to_native_string
 from ..utils.http import RequestsWrapper
@@ -72,8 +74,19 @@ if not PY2:
 if TYPE_CHECKING:
     import ssl
 
+    from ..utils.http_async import AsyncRequestsWrapper
+
 # Metric types for which it's only useful to submit once per set of tags
 ONE_PER_CONTEXT_METRIC_TYPES = [aggregator.GAUGE, aggregator.RATE, aggregator.MONOTONIC_COUNT]
+# Submission methods to metric types, used by `AgentCheck.submit_metrics_batch`
+BATCH_METRIC_TYPES = {
+    'gauge': aggregator.GAUGE,
+    'count': aggregator.COUNT,
+    'monotonic_count': aggregator.MONOTONIC_COUNT,
+    'rate': aggregator.RATE,
+    'histogram': aggregator.HISTOGRAM,
+    'historate': aggregator.HISTORATE,
+}
 TYPO_SIMILARITY_THRESHOLD = 0.95
 
 
@@ -147,6 +160,10 @@ class AgentCheck(object):
     # See https://github.com/DataDog/integrations-core/pull/2093 for more information.
     DEFAULT_METRIC_LIMIT = 0
 
+    # The maximum number of metric names for which the result of the namespace and `metric_patterns`
+    # resolution is remembered, the cache is reset once this is reached.
+    METRIC_NAME_CACHE_SIZE = 10000
+
     # Allow tracing for classic integrations
     def __init_subclass__(cls, *args, **kwargs):
         try:
@@ -212,6 +229,11 @@ class AgentCheck(object):
         logger = logging.getLogger('{}.{}'.format(__name__, self.name))
         self.log = CheckLoggingAdapter(logger, self)
 
+        # Maps the namespace, `raw` and metric name to the name to submit or `None` if the metric is filtered out
+        self._metric_name_cache = {}  # type: Dict[Tuple[str, bool, Union[str, bytes]], Optional[str]]
+        self._metric_name_cache_hits = 0
+        self._metric_name_cache_misses = 0
+
         metric_patterns = self.instance.get('metric_patterns', {}) if instance else {}
         if not isinstance(metric_patterns, dict):
             raise ConfigurationError('Setting `metric_patterns` must be a mapping')
@@ -286,6 +308,28 @@ class AgentCheck(object):
         if not PY2:
             self.check_initializations.append(self.load_configuration_models)
 
+    @property
+    def exclude_metrics_pattern(self):
+        # type: () -> Optional[re.Pattern]
+        return self._exclude_metrics_pattern
+
+    @exclude_metrics_pattern.setter
+    def exclude_metrics_pattern(self, pattern):
+        # type: (Optional[re.Pattern]) -> None
+        self._exclude_metrics_pattern = pattern
+        self._metric_name_cache.clear()
+
+    @property
+    def include_metrics_pattern(self):
+        # type: () -> Optional[re.Pattern]
+        return self._include_metrics_pattern
+
+    @include_metrics_pattern.setter
+    def include_metrics_pattern(self, pattern):
+        # type: (Optional[re.Pattern]) -> None
+        self._include_metrics_pattern = pattern
+        self._metric_name_cache.clear()
+
     def _create_metrics_pattern(self, metric_patterns, option_name):
         all_patterns = metric_patterns.get(option_name, [])
 
@@ -375,6 +419,21 @@ class AgentCheck(object):
 
         return self._http
 
+    @property
+    def async_http(self):
+        # type: () -> AsyncRequestsWrapper
+        """
+        Provides logic to send many HTTP requests concurrently with the same behavior as `http`.
+
+        Only available on Python 3.
+        """
+        if not hasattr(self, '_async_http'):
+            from ..utils import http_async
+
+            self._async_http = http_async.AsyncRequestsWrapper(http=self.http)
+
+        return self._async_http
+
     def get_tls_context(self, refresh=False, overrides=None):
         # type: (bool, Dict[AnyStr, Any]) -> ssl.SSLContext
         """
@@ -650,6 +709,31 @@ class AgentCheck(object):
 
         return self.exclude_metrics_pattern.search(metric_name) is not None
 
+    def _resolve_metric_name(self, name, raw=False):
+        # type: (Union[str, bytes], bool) -> Optional[str]
+        """
+        Return the namespaced metric name, or `None` if the metric must not be sent. The result is cached
+        as checks send the same metric names on every run.
+        """
+        cache_key = (self.__NAMESPACE__, raw, name)
+        try:
+            metric_name = self._metric_name_cache[cache_key]
+        except KeyError:
+            self._metric_name_cache_misses += 1
+
+            metric_name = self._format_namespace(name, raw)
+            if not self.should_send_metric(metric_name):
+                metric_name = None
+
+            if len(self._metric_name_cache) >= self.METRIC_NAME_CACHE_SIZE:
+                self._metric_name_cache.clear()
+
+            self._metric_name_cache[cache_key] = metric_name
+        else:
+            self._metric_name_cache_hits += 1
+
+        return metric_name
+
     def _submit_metric(
         self, mtype, name, value, tags=None, hostname=None, device_name=None, raw=False, flush_first_value=False
     ):
@@ -658,8 +742,8 @@ class AgentCheck(object):
             # ignore metric sample
             return
 
-        name = self._format_namespace(name, raw)
-        if not self.should_send_metric(name):
+        name = self._resolve_metric_name(name, raw)
+        if name is None:
             return
 
         tags = self._normalize_tags_type(tags or [], device_name, name)
@@ -690,6 +774,91 @@ class AgentCheck(object):
 
         aggregator.submit_metric(self, self.check_id, mtype, name, value, tags, hostname, flush_first_value)
 
+    def submit_metrics_batch(
+        self, mtype, names, values, tags_list=None, hostnames=None, raw=False, flush_first_value=False
+    ):
+        # type: (str, Any, Sequence[Optional[float]], Optional[Sequence[Sequence[str]]], Any, bool, bool) -> None
+        """Sample many metrics of the same type at once.
+
+        This is equivalent to calling the submission method `mtype` for every value, except that the
+        namespace and `metric_patterns` decisions are made once per distinct name, and tag lists that are
+        shared by several values (i.e. the very same object) are only normalized once.
+
+        - **mtype** (_str_) - the submission method, one of `gauge`, `count`, `monotonic_count`, `rate`,
+            `histogram` or `historate`
+        - **names** (_Union[str, List[str]]_) - the name of every metric, or a single name for all of them
+        - **values** (_List[float]_) - the value of every metric
+        - **tags_list** (_List[List[str]]_) - a list of tags for every metric
+        - **hostnames** (_Union[str, List[str]]_) - the hostname of every metric, or a single hostname for
+            all of them. Defaults to the current host.
+        - **raw** (_bool_) - whether to ignore any defined namespace prefix
+        - **flush_first_value** (_bool_) - whether to sample the first value of monotonic counts
+        """
+        metric_type = BATCH_METRIC_TYPES.get(mtype)
+        if metric_type is None:
+            raise ValueError('Unknown submission method `{}` for batch submission'.format(mtype))
+
+        if isinstance(names, (text_type, binary_type)):
+            names = repeat(names)
+        if tags_list is None:
+            tags_list = repeat(None)
+        if hostnames is None or isinstance(hostnames, (text_type, binary_type)):
+            hostnames = repeat(hostnames or '')
+
+        formatted_names = {}  # type: Dict[Union[str, bytes], Optional[str]]
+        normalized_tags = {}  # type: Dict[int, Tuple[Any, List[str]]]
+        metric_limiter = self.metric_limiter
+        one_per_context = metric_type in ONE_PER_CONTEXT_METRIC_TYPES
+        check_id = self.check_id
+        submit_metric = aggregator.submit_metric
+
+        for name, value, tags, hostname in zip(names, values, tags_list, hostnames):
+            if value is None:
+                # ignore metric sample
+                continue
+
+            try:
+                formatted_name = formatted_names[name]
+            except KeyError:
+                formatted_name = formatted_names[name] = self._resolve_metric_name(name, raw)
+
+            if formatted_name is None:
+                continue
+
+            # Tag lists are often shared by many metrics. The source list is kept along with its normalized tags,
+            # so that its identity cannot be reused by another list while the batch is submitted.
+            entry = normalized_tags.get(id(tags))
+            if entry is not None and entry[0] is tags:
+                metric_tags = entry[1]
+            else:
+                metric_tags = self._normalize_tags_type(tags or [], metric_name=formatted_name)
+                normalized_tags[id(tags)] = (tags, metric_tags)
+
+            if hostname is None:
+                hostname = ''
+
+            if metric_limiter:
+                if one_per_context:
+                    if metric_limiter.is_reached():
+                        continue
+                else:
+                    context = self._context_uid(metric_type, formatted_name, metric_tags, hostname)
+                    if metric_limiter.is_reached(context):
+                        continue
+
+            try:
+                value = float(value)
+            except ValueError:
+                err_msg = 'Metric: {} has non float value: {}. Only float values can be submitted as metrics.'.format(
+                    repr(formatted_name), repr(value)
+                )
+                if using_stub_aggregator:
+                    raise ValueError(err_msg)
+                self.warning(err_msg)
+                continue
+
+            submit_metric(self, check_id, metric_type, formatted_name, value, metric_tags, hostname, flush_first_value)
+
     def gauge(self, name, value, tags=None, hostname=None, device_name=None, raw=False):
         # type: (str, float, Sequence[str], str, str, bool) -> None
         """Sample a gauge metric.
@@ -1140,6 +1309,25 @@ class AgentCheck(object):
 
                 self.metric_limiter.reset()
 
+            if is_affirmative(self.debug_metrics.get('metric_name_cache', False)):
+                hits = self._metric_name_cache_hits
+                lookups = hits + self._metric_name_cache_misses
+                size = len(self._metric_name_cache)
+
+                tags = self.get_debug_metric_tags()
+                self.gauge('{}.name_cache.hits'.format(METRIC_NAMESPACE_METRICS), hits, tags=tags, raw=True)
+                self.gauge('{}.name_cache.lookups'.format(METRIC_NAMESPACE_METRICS), lookups, tags=tags, raw=True)
+                self.gauge(
+                    '{}.name_cache.hit_ratio'.format(METRIC_NAMESPACE_METRICS),
+                    float(hits) / lookups if lookups else 0,
+                    tags=tags,
+                    raw=True,
+                )
+                self.gauge('{}.name_cache.size'.format(METRIC_NAMESPACE_METRICS), size, tags=tags, raw=True)
+
+            self._metric_name_cache_hits = 0
+            self._metric_name_cache_misses = 0
+
         return error_report
 
     def event(self, event):
@@ -56,15 +56,24 @@ class OpenMetricsBaseCheckV2(AgentCheck):
     def check(self, _):
         self.refresh_scrapers()
 
-        for endpoint, scraper in self.scrapers.items():
-            self.log.info('Scraping OpenMetrics endpoint: %s', endpoint)
-
-            with self.adopt_namespace(scraper.namespace):
-                try:
-                    scraper.scrape()
-                except (ConnectionError, RequestException) as e:
-                    self.log.error("There was an error scraping endpoint %s: %s", endpoint, str(e))
-                    raise_from(type(e)("There was an error scraping endpoint {}: {}".format(endpoint, e)), None)
+        # Scrapers offloaded to a process pool all start at once
+        try:
+            for scraper in self.scrapers.values():
+                scraper.schedule_scrape()
+
+            for endpoint, scraper in self.scrapers.items():
+                self.log.info('Scraping OpenMetrics endpoint: %s', endpoint)
+
+                with self.adopt_namespace(scraper.namespace):
+                    try:
+                        scraper.scrape()
+                    except (ConnectionError, RequestException) as e:
+                        self.log.error("There was an error scraping endpoint %s: %s", endpoint, str(e))
+                        raise_from(type(e)("There was an error scraping endpoint {}: {}".format(endpoint, e)), None)
+        finally:
+            # Scrapes of the endpoints left after a failure are not collected
+            for scraper in self.scrapers.values():
+                scraper.cancel_scheduled_scrape()
 
     def configure_scrapers(self):
         """
@@ -1,11 +1,17 @@
 # (C) Datadog, Inc. 2020-present
 # All rights reserved
 # Licensed under a 3-clause BSD style license (see LICENSE)
+from heapq import merge
+from operator import itemgetter
+
 from ....utils.functions import no_op
 
 
 class LabelAggregator:
     def __init__(self, check, config):
+        # Identifies the shared labels collected so far, changing whenever any of their source samples change
+        self.state = None
+
         share_labels = config.get('share_labels', {})
         if not isinstance(share_labels, dict):
             raise TypeError('Setting `share_labels` must be a mapping')
@@ -68,16 +74,26 @@ class LabelAggregator:
 
         self.logger = check.log
 
-        self.label_sets = []
+        # Label sets collected from the `match` labels of shared metrics, indexed first by the sorted label names
+        # then by their values so that each sample needs a single lookup per distinct set of label names:
+        # label names -> (values getter, {values -> [(collection order, shared labels), ...]})
+        self.label_set_index = {}
+        self.label_set_count = 0
 
         self.unconditional_labels = {}
 
+        # Join cost, reset by the scraper after every scrape
+        self.label_set_lookups = 0
+        self.label_set_matches = 0
+
     def __call__(self, metrics):
         if self.cache_shared_labels:
             if self.shared_labels_cached:
                 yield from metrics
             else:
                 metric_config = self.metric_config.copy()
+                self.label_set_count = 0
+                self.state = None
 
                 for metric in metrics:
                     if metric_config and metric.name in metric_config:
@@ -89,6 +105,8 @@ class LabelAggregator:
         else:
             try:
                 metric_config = self.metric_config.copy()
+                self.label_set_count = 0
+                self.state = None
 
                 # Cache every encountered metric until the desired labels have been collected
                 cached_metrics = []
@@ -105,40 +123,31 @@ class LabelAggregator:
                 yield from cached_metrics
                 yield from metrics
             finally:
-                self.label_sets.clear()
+                self.label_set_index.clear()
                 self.unconditional_labels.clear()
 
     def collect(self, metric, config):
+        self.state = hash(
+            (self.state, metric.name, tuple((tuple(sample.labels.items()), sample.value) for sample in metric.samples))
+        )
+
         allowed_values = config.get('values')
 
         if 'match' in config:
             matching_labels = config['match']
-            if 'labels' in config:
-                labels = config['labels']
-                for sample in self.allowed_samples(metric, allowed_values):
-                    label_set = set()
-                    shared_labels = {}
-
-                    for label, value in sample.labels.items():
-                        if label in matching_labels:
-                            label_set.add((label, value))
-
-                        if label in labels:
-                            shared_labels[label] = value
-
-                    self.label_sets.append((label_set, shared_labels))
-            else:
-                for sample in self.allowed_samples(metric, allowed_values):
-                    label_set = set()
-                    shared_labels = {}
+            labels = config.get('labels')
+            for sample in self.allowed_samples(metric, allowed_values):
+                label_set = {}
+                shared_labels = {}
 
-                    for label, value in sample.labels.items():
-                        if label in matching_labels:
-                            label_set.add((label, value))
+                for label, value in sample.labels.items():
+                    if label in matching_labels:
+                        label_set[label] = value
 
+                    if labels is None or label in labels:
                         shared_labels[label] = value
 
-                    self.label_sets.append((label_set, shared_labels))
+                self.index_label_set(label_set, shared_labels)
         else:
             if 'labels' in config:
                 labels = config['labels']
@@ -151,14 +160,44 @@ class LabelAggregator:
                     for label, value in sample.labels.items():
                         self.unconditional_labels[label] = value
 
+    def index_label_set(self, label_set, shared_labels):
+        label_names = tuple(sorted(label_set))
+        try:
+            get_values, entries = self.label_set_index[label_names]
+        except KeyError:
+            get_values = get_label_values_getter(label_names)
+            entries = {}
+            self.label_set_index[label_names] = (get_values, entries)
+
+        entries.setdefault(get_values(label_set), []).append((self.label_set_count, shared_labels))
+        self.label_set_count += 1
+
     def populate(self, labels):
-        label_set = frozenset(labels.items())
+        # A label set matches when all of its labels are present with the same values, so the sample's labels
+        # are projected onto the label names of every indexed set and the resulting values looked up directly
+        matches = []
+        for get_values, entries in self.label_set_index.values():
+            self.label_set_lookups += 1
+            try:
+                values = get_values(labels)
+            except KeyError:
+                continue
+
+            shared_label_sets = entries.get(values)
+            if shared_label_sets is not None:
+                matches.append(shared_label_sets)
+
         labels.update(self.unconditional_labels)
 
-        for matching_label_set, shared_labels in self.label_sets:
-            # Check for subset without incurring the cost of a `.issubset` lookup and call
-            if matching_label_set <= label_set:
-                labels.update(shared_labels)
+        if not matches:
+            return
+        elif len(matches) > 1:
+            # Apply shared labels in the order they were collected, as later ones take precedence
+            matches = [merge(*matches)]
+
+        for _, shared_labels in matches[0]:
+            self.label_set_matches += 1
+            labels.update(shared_labels)
 
     @staticmethod
     def allowed_samples(metric, allowed_values):
@@ -175,6 +214,13 @@ class LabelAggregator:
         return self.populate is not no_op
 
 
+def get_label_values_getter(label_names):
+    if not label_names:
+        return lambda labels: ()
+
+    return itemgetter(*label_names)
+
+
 def canonicalize_numeric_label(label):
     # Prevent 0.0, see:
     # https://github.com/OpenObservability/OpenMetrics/blob/master/specification/OpenMetrics.md#considerations-canonical-numbers
@@ -0,0 +1,289 @@
+# (C) Datadog, Inc. 2023-present
+# All rights reserved
+# Licensed under a 3-clause BSD style license (see LICENSE)
+from hashlib import blake2b
+
+from prometheus_client.metrics_core import Metric
+from prometheus_client.parser import _parse_sample, _replace_help_escaping
+from prometheus_client.samples import Sample
+
+from ....utils.functions import no_op, return_true
+
+# https://github.com/prometheus/client_python/blob/v0.15.0/prometheus_client/parser.py#L193-L198
+ALLOWED_SAMPLE_SUFFIXES = {
+    'counter': ('',),
+    'gauge': ('',),
+    'summary': ('_count', '_sum', ''),
+    'histogram': ('_count', '_sum', '_bucket'),
+}
+
+
+class MetricFamilyCache:
+    """
+    The metric families of the previous payload in the order they were scraped, along with a digest of their lines.
+    Several families may have the same name, e.g. untyped samples that are not adjacent.
+
+    Scrapers record the entity tag of every response with `set_response`, and whether the endpoint reported
+    that it has not changed since `etag`, in which case the previous families are replayed.
+    """
+
+    def __init__(self):
+        self.previous = []
+        self.current = []
+        # The previous families by name
+        self.previous_by_name = {}
+
+        # The entity tag of the payload the previous families were parsed from
+        self.etag = None
+        self.pending_etag = None
+        self.not_modified = False
+
+        self.hits = 0
+        self.misses = 0
+
+    def set_response(self, etag, not_modified):
+        self.pending_etag = etag
+        self.not_modified = not_modified
+
+    def start(self):
+        self.current = []
+
+    def finish(self):
+        if self.not_modified:
+            self.current = self.previous
+        else:
+            self.etag = self.pending_etag
+
+        self.previous = self.current
+        self.previous_by_name = {}
+        for entry in self.previous:
+            self.previous_by_name.setdefault(entry[1], []).append(entry)
+
+        self.current = []
+        self.pending_etag = None
+        self.not_modified = False
+
+    def get_metric(self, name, digest):
+        """
+        Return a new metric sharing the samples of a previous family with the same content, if any.
+        """
+
+        for entry in self.previous_by_name.get(name, ()):
+            if entry[0] == digest:
+                self.hits += 1
+                self.current.append(entry)
+                return build_cached_metric(entry)
+
+        self.misses += 1
+
+    def set_metric(self, name, digest, metric):
+        self.current.append((digest, name, metric.name, metric.documentation, metric.type, metric.samples))
+
+    def set_skipped(self, name, metric_name, skipped_samples):
+        self.current.append((None, name, metric_name, None, skipped_samples, None))
+
+    def replay(self, skipped_family_handler):
+        """
+        Yield the families of the previous payload, used when the endpoint reports that it has not changed.
+        """
+
+        for entry in self.previous:
+            self.hits += 1
+            if entry[5] is None:
+                # Families that were skipped only keep the number of samples
+                skipped_family_handler(entry[2], entry[4])
+            else:
+                yield build_cached_metric(entry)
+
+
+def build_cached_metric(entry):
+    _, _, name, documentation, typ, samples = entry
+
+    metric = Metric(name, documentation, typ)
+    # Counter samples were already munged when the entry was created
+    metric.samples = samples
+    return metric
+
+
+def text_fd_to_filtered_metric_families(fd, family_filter=return_true, skipped_family_handler=no_op, family_cache=None):
+    """
+    Parse the Prometheus text format exactly like `prometheus_client.parser.text_fd_to_metric_families`,
+    except that the name of every metric family is resolved from the raw lines before any sample is parsed.
+
+    `family_filter` receives the name of the metric as it would be yielded (i.e. counters without the
+    `_total` suffix) and decides whether the family should be parsed at all. Rejected families never
+    have their labels parsed nor any `Sample` allocated, instead `skipped_family_handler` is called with
+    the metric name and the number of sample lines that were skipped.
+
+    With a `MetricFamilyCache`, the lines of every family are hashed and only parsed if they differ from the
+    previous payload. Otherwise, the metric shares the very same list of samples as the previous one.
+    """
+    name = ''
+    documentation = ''
+    typ = 'untyped'
+    samples = []
+    allowed_names = ()
+
+    # Raw lines of the current family, only hashed when caching
+    lines = []
+    if family_cache is not None:
+        family_cache.start()
+
+    # Whether or not the current family is parsed, `None` meaning not yet decided
+    parse_family = None
+    skipped_samples = 0
+
+    def get_metric_name(name, typ):
+        if typ == 'counter' and name.endswith('_total'):
+            return name[:-6]
+
+        return name
+
+    def build_metric(name, documentation, typ, samples):
+        # Munge counters into OpenMetrics representation
+        # used internally.
+        if typ == 'counter':
+            if name.endswith('_total'):
+                name = name[:-6]
+            else:
+                samples = [Sample(s[0] + '_total', *s[1:]) for s in samples]
+
+        metric = Metric(name, documentation, typ)
+        metric.samples = samples
+        return metric
+
+    def finish_family():
+        if parse_family is False:
+            metric_name = get_metric_name(name, typ)
+            skipped_family_handler(metric_name, skipped_samples)
+            if family_cache is not None:
+                family_cache.set_skipped(name, metric_name, skipped_samples)
+        elif family_cache is None:
+            return build_metric(name, documentation, typ, samples)
+        else:
+            return build_family_from_lines(name, documentation, typ, lines)
+
+    def build_family_from_lines(name, documentation, typ, lines):
+        digest = blake2b(digest_size=16)
+        digest.update(f'{typ}\n{documentation}\n'.encode('utf-8'))
+        for line in lines:
+            digest.update(line.encode('utf-8'))
+            digest.update(b'\n')
+        digest = digest.digest()
+
+        metric = family_cache.get_metric(name, digest)
+        if metric is None:
+            metric = build_metric(name, documentation, typ, [_parse_sample(line) for line in lines])
+            family_cache.set_metric(name, digest, metric)
+
+        return metric
+
+    for line in fd:
+        line = line.strip()
+
+        if line.startswith('#'):
+            parts = line.split(None, 3)
+            if len(parts) < 2:
+                continue
+
+            if parts[1] == 'HELP':
+                if parts[2] != name:
+                    if name != '':
+                        metric = finish_family()
+                        if metric is not None:
+                            yield metric
+
+                    # New metric
+                    name = parts[2]
+                    typ = 'untyped'
+                    samples = []
+                    lines = []
+                    allowed_names = (parts[2],)
+                    parse_family = None
+                    skipped_samples = 0
+
+                if len(parts) == 4:
+                    documentation = _replace_help_escaping(parts[3])
+                else:
+                    documentation = ''
+            elif parts[1] == 'TYPE':
+                if parts[2] != name:
+                    if name != '':
+                        metric = finish_family()
+                        if metric is not None:
+                            yield metric
+
+                    # New metric
+                    name = parts[2]
+                    documentation = ''
+                    samples = []
+                    lines = []
+                    parse_family = None
+                    skipped_samples = 0
+
+                typ = parts[3]
+                allowed_names = tuple(name + suffix for suffix in ALLOWED_SAMPLE_SUFFIXES.get(typ, ('',)))
+        elif line == '':
+            # Ignore blank lines
+            pass
+        else:
+            sample_name = get_sample_name(line)
+            if sample_name not in allowed_names:
+                if name != '':
+                    metric = finish_family()
+                    if metric is not None:
+                        yield metric
+
+                # New metric, yield immediately as untyped singleton
+                name = ''
+                documentation = ''
+                typ = 'untyped'
+                samples = []
+                lines = []
+                allowed_names = ()
+                parse_family = None
+                skipped_samples = 0
+
+                if not family_filter(sample_name):
+                    skipped_family_handler(sample_name, 1)
+                    if family_cache is not None:
+                        family_cache.set_skipped(sample_name, sample_name, 1)
+                elif family_cache is None:
+                    yield build_metric(sample_name, documentation, typ, [_parse_sample(line)])
+                else:
+                    yield build_family_from_lines(sample_name, documentation, typ, [line])
+            else:
+                if parse_family is None:
+                    parse_family = bool(family_filter(get_metric_name(name, typ)))
+
+                if not parse_family:
+                    skipped_samples += 1
+                elif family_cache is None:
+                    samples.append(_parse_sample(line))
+                else:
+                    lines.append(line)
+
+    if name != '':
+        metric = finish_family()
+        if metric is not None:
+            yield metric
+
+    if family_cache is not None:
+        if family_cache.not_modified:
+            yield from family_cache.replay(skipped_family_handler)
+
+        family_cache.finish()
+
+
+def get_sample_name(line):
+    """
+    Extract the name of a sample the same way that `prometheus_client.parser._parse_sample` does for
+    well-formed lines, without parsing the labels or the value.
+    """
+    label_start = line.find('{')
+    if label_start != -1 and '}' in line:
+        return line[:label_start].strip()
+
+    separator = ' ' if ' ' in line else '\t'
+    name_end = line.find(separator)
+    return line if name_end == -1 else line[:name_end]
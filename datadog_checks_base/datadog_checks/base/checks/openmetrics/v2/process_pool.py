@@ -0,0 +1,166 @@
+# (C) Datadog, Inc. 2023-present
+# All rights reserved
+# Licensed under a 3-clause BSD style license (see LICENSE)
+"""
+Offload the parsing, filtering and label processing of OpenMetrics scrapers to worker processes.
+
+Workers rebuild an equivalent scraper from its configuration, with a check of the same class as the one of the
+parent process, scrape the endpoint and send back every metric that has a transformer along with its already
+tagged samples. The parent process then runs the transformers,
+which are the only part that submits data, and replays whatever the worker scraper itself submitted
+such as telemetry and the health service check.
+"""
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from cachetools import LRUCache
+
+from ....utils.functions import no_op
+
+# Maximum number of scrapers kept by every worker process
+WORKER_SCRAPER_CACHE_SIZE = 128
+
+# Methods of the worker check whose calls are sent back to the parent process
+RECORDED_METHODS = (
+    'gauge',
+    'count',
+    'monotonic_count',
+    'rate',
+    'histogram',
+    'historate',
+    'service_check',
+    'set_metadata',
+)
+
+_process_pools = {}
+_process_pools_lock = threading.Lock()
+
+# Check classes of the current worker process, keyed by the check class they extend
+_worker_check_classes = {}
+
+# Scrapers of the current worker process, keyed by the identifier of the scraper in the parent process
+_worker_scrapers = LRUCache(maxsize=WORKER_SCRAPER_CACHE_SIZE)
+
+
+def get_process_pool(max_workers=None):
+    """
+    Return the process pool with `max_workers` worker processes, shared by all scrapers of the runtime.
+    """
+    if not max_workers:
+        max_workers = os.cpu_count() or 1
+
+    with _process_pools_lock:
+        pool = _process_pools.get(max_workers)
+        if pool is None:
+            # Never fork the embedding process, only its Python interpreter can safely run in the workers
+            pool = _process_pools[max_workers] = ProcessPoolExecutor(
+                max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')
+            )
+
+        return pool
+
+
+def discard_process_pool(max_workers, pool):
+    """
+    Stop using a pool, e.g. after one of its workers died, so that a new one is started next time.
+    """
+    if not max_workers:
+        max_workers = os.cpu_count() or 1
+
+    with _process_pools_lock:
+        if _process_pools.get(max_workers) is pool:
+            del _process_pools[max_workers]
+
+    pool.shutdown(wait=False)
+
+
+@atexit.register
+def shutdown_process_pools():
+    """
+    Stop the worker processes of every pool, which are otherwise left to the garbage collector.
+    """
+    with _process_pools_lock:
+        pools = list(_process_pools.values())
+        _process_pools.clear()
+
+    for pool in pools:
+        pool.shutdown(wait=False)
+
+
+class ScrapeWorkerCheck(object):
+    """
+    Mixed into the check class of scrapers in worker processes, recording submissions instead of sending them.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.submissions = []
+
+        super().__init__(*args, **kwargs)
+
+    def record(self, method, *args, **kwargs):
+        self.submissions.append((method, args, kwargs))
+
+
+for _method in RECORDED_METHODS:
+    setattr(
+        ScrapeWorkerCheck,
+        _method,
+        lambda self, *args, __method=_method, **kwargs: self.record(__method, *args, **kwargs),
+    )
+
+
+def get_worker_check_class(check_class):
+    """
+    Return the class of the checks owning scrapers in worker processes, so that the hooks of `check_class`
+    are run there as well.
+    """
+    worker_check_class = _worker_check_classes.get(check_class)
+    if worker_check_class is None:
+        worker_check_class = _worker_check_classes[check_class] = type(
+            check_class.__name__, (ScrapeWorkerCheck, check_class), {}
+        )
+
+    return worker_check_class
+
+
+def get_worker_scraper(request):
+    scraper = _worker_scrapers.get(request['scraper_id'])
+    if scraper is None:
+        check_class = get_worker_check_class(request['check_class'])
+        check = check_class(request['check_name'], request['init_config'], [request['instance']])
+        check.__NAMESPACE__ = request['check_namespace']
+        check.HTTP_CONFIG_REMAPPER = request['http_config_remapper']
+
+        scraper = request['scraper_class'](check, request['config'])
+        scraper.custom_transformer_patterns = set()
+
+        _worker_scrapers[request['scraper_id']] = scraper
+
+    # Transformers added by the parent's check cannot be sent, but their metrics must be kept
+    for pattern in request['custom_transformer_patterns']:
+        if pattern not in scraper.custom_transformer_patterns:
+            scraper.metric_transformer.add_custom_transformer(pattern, no_op, pattern=True)
+            scraper.custom_transformer_patterns.add(pattern)
+
+    return scraper
+
+
+def process_metrics(request):
+    """
+    Entry point of worker processes, returning the metrics of a scrape and every submission made along the way.
+    """
+    scraper = get_worker_scraper(request)
+    scraper.check.submissions = []
+    scraper.tags = request['tags']
+    scraper.flush_first_value = request['runtime_data']['flush_first_value']
+    scraper.get_process_start_time = lambda: request['process_start_time']
+
+    try:
+        metrics = scraper.process_metrics(request['runtime_data'])
+    except Exception as e:
+        return None, scraper.check.submissions, e
+
+    return metrics, scraper.check.submissions, None
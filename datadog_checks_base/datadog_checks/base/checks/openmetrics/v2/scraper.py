@@ -4,13 +4,18 @@
 import fnmatch
 import inspect
 import re
+from concurrent.futures.process import BrokenProcessPool
 from copy import copy, deepcopy
+from functools import partial
 from itertools import chain
 from math import isinf, isnan
 from typing import List
+from uuid import uuid4
 
+from cachetools import LRUCache
 from prometheus_client.openmetrics.parser import text_fd_to_metric_families as parse_metric_families_strict
 from prometheus_client.parser import text_fd_to_metric_families as parse_metric_families
+from urllib3.util.request import ACCEPT_ENCODING
 
 from ....config import is_affirmative
 from ....constants import ServiceCheck
@@ -19,6 +24,7 @@ from ....utils.functions import no_op, return_true
 from ....utils.http import RequestsWrapper
 from .first_scrape_handler import first_scrape_handler
 from .labels import LabelAggregator, get_label_normalizer
+from .parser import MetricFamilyCache, text_fd_to_filtered_metric_families
 from .transform import MetricTransformer
 
 try:
@@ -175,6 +181,19 @@ class OpenMetricsScraper:
                         f'Label `{label}` of setting `exclude_metrics_by_labels` must be an array or set to `true`'
                     )
 
+        # Label processing is compiled per label name and then per set of label names
+        self.label_plans = {}
+        self.label_set_plans = {}
+
+        tag_cache_size = config.get('tag_cache_size', 0)
+        if not isinstance(tag_cache_size, int) or isinstance(tag_cache_size, bool) or tag_cache_size < 0:
+            raise ConfigurationError('Setting `tag_cache_size` must be a non-negative integer')
+
+        # Maps label names and values to the resulting tags, `None` meaning the sample is excluded
+        self.tag_cache = LRUCache(maxsize=tag_cache_size) if tag_cache_size else None
+        self.tag_cache_hits = 0
+        self.tag_cache_misses = 0
+
         custom_tags = config.get('tags', [])  # type: List[str]
         if not isinstance(custom_tags, list):
             raise ConfigurationError('Setting `tags` must be an array')
@@ -215,38 +234,223 @@ class OpenMetricsScraper:
 
         self.http = RequestsWrapper(config, self.check.init_config, self.check.HTTP_CONFIG_REMAPPER, self.check.log)
 
+        self.use_fast_parser = is_affirmative(config.get('use_fast_parser', False))
+
+        # Families whose lines did not change since the previous scrape are neither parsed nor have their labels
+        # processed again, and endpoints supporting entity tags may skip sending the payload altogether
+        self.family_cache = MetricFamilyCache() if is_affirmative(config.get('cache_metric_families', False)) else None
+        # id(samples) -> (samples, label state, [(sample, labels, label tags, hostname), ...])
+        self.sample_data_cache = {}
+        self.next_sample_data_cache = {}
+        self.sample_data_cache_hits = 0
+        self.sample_data_cache_misses = 0
+        self.not_modified_responses = 0
+
         # Decide how strictly we will adhere to the latest version of the specification
         if is_affirmative(config.get('use_latest_spec', False)):
+            if self.use_fast_parser:
+                raise ConfigurationError('Setting `use_fast_parser` cannot be used with `use_latest_spec`')
+            elif self.family_cache is not None:
+                raise ConfigurationError('Setting `cache_metric_families` cannot be used with `use_latest_spec`')
+
             self.parse_metric_families = parse_metric_families_strict
             # https://github.com/prometheus/client_python/blob/v0.9.0/prometheus_client/openmetrics/exposition.py#L7
             accept_header = 'application/openmetrics-text; version=0.0.1; charset=utf-8'
         else:
-            self.parse_metric_families = parse_metric_families
+            if self.use_fast_parser:
+                self.parse_metric_families = partial(
+                    text_fd_to_filtered_metric_families,
+                    family_filter=self.should_parse_metric_family,
+                    skipped_family_handler=self.submit_telemetry_number_of_skipped_metric_samples,
+                    family_cache=self.family_cache,
+                )
+            elif self.family_cache is not None:
+                self.parse_metric_families = partial(
+                    text_fd_to_filtered_metric_families, family_cache=self.family_cache
+                )
+            else:
+                self.parse_metric_families = parse_metric_families
             accept_header = 'text/plain'
 
         # Request the appropriate exposition format
         if self.http.options['headers'].get('Accept') == '*/*':
             self.http.options['headers']['Accept'] = accept_header
 
+        # Negotiate every content encoding that can be decoded, e.g. zstd or brotli when available
+        if self.family_cache is not None and self.http.options['headers'].get('Accept-Encoding') == 'gzip, deflate':
+            self.http.options['headers']['Accept-Encoding'] = ACCEPT_ENCODING
+
         self.use_process_start_time = is_affirmative(config.get('use_process_start_time'))
 
         # Used for monotonic counts
         self.flush_first_value = False
 
+        self.use_process_pool = is_affirmative(config.get('use_process_pool', False))
+        self.process_pool_size = config.get('process_pool_size', 0)
+        if (
+            not isinstance(self.process_pool_size, int)
+            or isinstance(self.process_pool_size, bool)
+            or self.process_pool_size < 0
+        ):
+            raise ConfigurationError('Setting `process_pool_size` must be a non-negative integer')
+
+        # Identifies this scraper in the worker processes, which keep their own copy of it between scrapes
+        self.process_pool_id = uuid4().hex
+        self.scheduled_scrape = None
+
     def scrape(self):
         """
         Execute a scrape, and for each metric collected, transform the metric.
         """
         runtime_data = {'flush_first_value': self.flush_first_value, 'static_tags': self.static_tags}
 
+        if self.use_process_pool:
+            for metric, flush_first_value, sample_data in self.get_process_pool_metrics(runtime_data):
+                transformer = self.metric_transformer.get(metric)
+                if transformer is None:
+                    continue
+
+                runtime_data['flush_first_value'] = flush_first_value
+                transformer(metric, sample_data, runtime_data)
+        else:
+            for metric in self.consume_metrics(runtime_data):
+                transformer = self.metric_transformer.get(metric)
+                if transformer is None:
+                    continue
+
+                transformer(metric, self.generate_sample_data(metric), runtime_data)
+
+            self.finish_scrape()
+
+        self.flush_first_value = True
+
+    def process_metrics(self, runtime_data):
+        """
+        Return every metric that has a transformer along with whether to flush its first value and its sample data.
+
+        This is what worker processes run when `use_process_pool` is enabled.
+        """
+
+        metrics = []
         for metric in self.consume_metrics(runtime_data):
-            transformer = self.metric_transformer.get(metric)
-            if transformer is None:
+            if self.metric_transformer.get(metric) is None:
                 continue
 
-            transformer(metric, self.generate_sample_data(metric), runtime_data)
+            metrics.append((metric, runtime_data['flush_first_value'], list(self.generate_sample_data(metric))))
 
-        self.flush_first_value = True
+        self.finish_scrape()
+
+        return metrics
+
+    def schedule_scrape(self):
+        """
+        Start the next scrape in the process pool, if enabled, so that multiple endpoints are processed in parallel.
+        """
+
+        if not self.use_process_pool:
+            return
+
+        # A scrape left over by a previous failed run would be outdated
+        self.cancel_scheduled_scrape()
+
+        from .process_pool import get_process_pool, process_metrics
+
+        runtime_data = {'flush_first_value': self.flush_first_value, 'static_tags': self.static_tags}
+        pool = get_process_pool(self.process_pool_size)
+        self.scheduled_scrape = (pool, pool.submit(process_metrics, self.get_process_pool_request(runtime_data)))
+
+    def cancel_scheduled_scrape(self):
+        """
+        Drop the scrape started by `schedule_scrape` that has not been consumed yet, if any.
+        """
+
+        if self.scheduled_scrape is not None:
+            _, future = self.scheduled_scrape
+            self.scheduled_scrape = None
+            future.cancel()
+
+    def get_process_pool_metrics(self, runtime_data):
+        """
+        Wait for the worker process to scrape the endpoint, then replay what its scraper submitted.
+        """
+
+        from .process_pool import discard_process_pool
+
+        if self.scheduled_scrape is None:
+            self.schedule_scrape()
+
+        (pool, future), self.scheduled_scrape = self.scheduled_scrape, None
+        try:
+            metrics, submissions, error = future.result()
+        except BrokenProcessPool:
+            discard_process_pool(self.process_pool_size, pool)
+            raise
+
+        for method, args, kwargs in submissions:
+            getattr(self, method)(*args, **kwargs)
+
+        if error is not None:
+            raise error
+
+        return metrics
+
+    def get_process_pool_request(self, runtime_data):
+        """
+        Everything worker processes need to build an equivalent scraper and to scrape.
+        """
+
+        return {
+            'scraper_id': self.process_pool_id,
+            'scraper_class': type(self),
+            'check_class': type(self.check),
+            'check_name': self.check.name,
+            'check_namespace': self.namespace,
+            'init_config': self.check.init_config,
+            'instance': self.check.instance,
+            'http_config_remapper': self.check.HTTP_CONFIG_REMAPPER,
+            'config': self.config,
+            'custom_transformer_patterns': [
+                pattern.pattern
+                for pattern, config in self.metric_transformer.metric_patterns
+                if '__transformer__' in config
+            ],
+            'tags': self.tags,
+            'runtime_data': runtime_data,
+            'process_start_time': self.get_process_start_time(),
+        }
+
+    def get_process_start_time(self):
+        return datadog_agent.get_process_start_time()
+
+    def finish_scrape(self):
+        """
+        Submit the telemetry accumulated during a scrape, then reset it along with any other per-scrape state.
+        """
+
+        if self.tag_cache is not None:
+            self.submit_telemetry_tag_cache_usage()
+            self.tag_cache_hits = 0
+            self.tag_cache_misses = 0
+
+        if self.label_aggregator.configured:
+            self.submit_telemetry_shared_labels_join()
+            self.label_aggregator.label_set_lookups = 0
+            self.label_aggregator.label_set_matches = 0
+
+        if self.family_cache is not None:
+            self.submit_telemetry_family_cache_usage()
+            self.family_cache.hits = 0
+            self.family_cache.misses = 0
+            self.sample_data_cache_hits = 0
+            self.sample_data_cache_misses = 0
+            self.not_modified_responses = 0
+
+            # Only the sample data of the metrics of this scrape may be reused by the next one
+            self.sample_data_cache = self.next_sample_data_cache
+            self.next_sample_data_cache = {}
+
+        if self.http.shared_session_key is not None:
+            self.submit_telemetry_connection_pool_usage()
 
     def consume_metrics(self, runtime_data):
         """
@@ -255,24 +459,57 @@ class OpenMetricsScraper:
 
         metric_parser = self.parse_metrics()
         if not self.flush_first_value and self.use_process_start_time:
-            metric_parser = first_scrape_handler(metric_parser, runtime_data, datadog_agent.get_process_start_time())
+            metric_parser = first_scrape_handler(metric_parser, runtime_data, self.get_process_start_time())
         if self.label_aggregator.configured:
             metric_parser = self.label_aggregator(metric_parser)
 
         for metric in metric_parser:
-            if metric.name in self.exclude_metrics or (
-                self.exclude_metrics_pattern is not None and self.exclude_metrics_pattern.search(metric.name)
-            ):
+            if self.is_metric_excluded(metric.name):
                 self.submit_telemetry_number_of_ignored_metric_samples(metric)
                 continue
 
             yield metric
 
+    def is_metric_excluded(self, metric_name):
+        """
+        Whether or not the metric is excluded by the `exclude_metrics` setting.
+        """
+
+        return metric_name in self.exclude_metrics or (
+            self.exclude_metrics_pattern is not None and self.exclude_metrics_pattern.search(metric_name) is not None
+        )
+
+    def should_parse_metric_family(self, metric_name):
+        """
+        Used by the fast parser to decide, before any sample is parsed, whether a metric family is of any use.
+        """
+
+        metric_name = self.remove_raw_metric_prefix(metric_name)
+
+        # Shared labels are collected even from excluded metrics
+        if self.label_aggregator.configured and metric_name in self.label_aggregator.metric_config:
+            return True
+        elif self.use_process_start_time and metric_name == 'process_start_time_seconds':
+            return True
+        elif self.is_metric_excluded(metric_name):
+            return False
+
+        return self.metric_transformer.has_transformer(metric_name)
+
+    def remove_raw_metric_prefix(self, metric_name):
+        if self.raw_metric_prefix and metric_name.startswith(self.raw_metric_prefix):
+            return metric_name[len(self.raw_metric_prefix) :]
+
+        return metric_name
+
     def parse_metrics(self):
         """
         Get the line streamer and yield processed metrics.
         """
 
+        if self.family_cache is not None:
+            self.next_sample_data_cache = {}
+
         line_streamer = self.stream_connection_lines()
         if self.raw_line_filter is not None:
             line_streamer = self.filter_connection_lines(line_streamer)
@@ -282,8 +519,7 @@ class OpenMetricsScraper:
 
             # It is critical that the prefix is removed immediately so that
             # all other configuration may reference the trimmed metric name
-            if self.raw_metric_prefix and metric.name.startswith(self.raw_metric_prefix):
-                metric.name = metric.name[len(self.raw_metric_prefix) :]
+            metric.name = self.remove_raw_metric_prefix(metric.name)
 
             yield metric
 
@@ -292,7 +528,50 @@ class OpenMetricsScraper:
         Yield a sample of processed data.
         """
 
+        if self.family_cache is not None:
+            yield from self.generate_cached_sample_data(metric)
+            return
+
+        for sample, _, label_tags, hostname in self.process_samples(metric):
+            self.submit_telemetry_number_of_processed_metric_samples()
+            # Always return a new list as transformers are free to modify it
+            yield sample, [*label_tags, *self.tags], hostname
+
+    def generate_cached_sample_data(self, metric):
+        """
+        Like `generate_sample_data`, but reuse the processed data of samples that did not change since the
+        previous scrape as long as the shared labels did not change either.
+
+        The labels of cached samples are never modified, transformers receive copies instead.
+        """
+
+        samples = metric.samples
+        cache_key = id(samples)
+        label_state = self.label_aggregator.state
+
+        entry = self.sample_data_cache.get(cache_key)
+        if entry is not None and entry[0] is samples and entry[1] == label_state:
+            self.sample_data_cache_hits += 1
+        else:
+            self.sample_data_cache_misses += 1
+            entry = (samples, label_state, list(self.process_samples(metric, copy_labels=True)))
+
+        self.next_sample_data_cache[cache_key] = entry
+
+        for sample, labels, label_tags, hostname in entry[2]:
+            self.submit_telemetry_number_of_processed_metric_samples()
+            yield sample._replace(labels=dict(labels)), [*label_tags, *self.tags], hostname
+
+    def process_samples(self, metric, copy_labels=False):
+        """
+        Yield every sample that is not excluded along with its processed labels, the tags derived from them
+        and its hostname.
+
+        The labels of the samples are processed in-place unless `copy_labels` is set.
+        """
+
         label_normalizer = get_label_normalizer(metric.type)
+        tag_cache = self.tag_cache
 
         for sample in metric.samples:
             value = sample.value
@@ -300,38 +579,71 @@ class OpenMetricsScraper:
                 self.log.debug('Ignoring sample for metric `%s` as it has an invalid value: %s', metric.name, value)
                 continue
 
-            tags = []
-            skip_sample = False
-            labels = sample.labels
+            labels = dict(sample.labels) if copy_labels else sample.labels
             self.label_aggregator.populate(labels)
             label_normalizer(labels)
 
-            for label_name, label_value in labels.items():
-                sample_excluder = self.exclude_metrics_by_labels.get(label_name)
-                if sample_excluder is not None and sample_excluder(label_value):
-                    skip_sample = True
-                    break
-                elif label_name in self.exclude_labels:
-                    continue
-                elif self.include_labels and label_name not in self.include_labels:
-                    continue
-
-                label_name = self.rename_labels.get(label_name, label_name)
-                tags.append(f'{label_name}:{label_value}')
+            label_names = tuple(labels)
+            label_values = tuple(labels.values())
+            if tag_cache is None:
+                label_tags = self.get_label_tags(label_names, label_values)
+            else:
+                cache_key = (label_names, label_values)
+                try:
+                    label_tags = tag_cache[cache_key]
+                except KeyError:
+                    self.tag_cache_misses += 1
+                    label_tags = tag_cache[cache_key] = self.get_label_tags(label_names, label_values)
+                else:
+                    self.tag_cache_hits += 1
 
-            if skip_sample:
+            if label_tags is None:
                 continue
 
-            tags.extend(self.tags)
-
             hostname = ""
             if self.hostname_label and self.hostname_label in labels:
                 hostname = labels[self.hostname_label]
                 if self.hostname_formatter is not None:
                     hostname = self.hostname_formatter(hostname)
 
-            self.submit_telemetry_number_of_processed_metric_samples()
-            yield sample, tags, hostname
+            yield sample, labels, label_tags, hostname
+
+    def get_label_tags(self, label_names, label_values):
+        """
+        Return the tags derived from a sample's labels or `None` if the sample is excluded.
+        """
+
+        label_set_plan = self.label_set_plans.get(label_names)
+        if label_set_plan is None:
+            label_set_plan = self.label_set_plans[label_names] = tuple(
+                self.compile_label_plan(label_name) for label_name in label_names
+            )
+
+        tags = []
+        for (sample_excluder, tag_prefix), label_value in zip(label_set_plan, label_values):
+            if sample_excluder is not None and sample_excluder(label_value):
+                return
+            elif tag_prefix is not None:
+                tags.append(f'{tag_prefix}{label_value}')
+
+        return tuple(tags)
+
+    def compile_label_plan(self, label_name):
+        """
+        Return the sample excluder of a label and the prefix of its tag, or `None` if the label is not a tag.
+        """
+
+        label_plan = self.label_plans.get(label_name)
+        if label_plan is None:
+            sample_excluder = self.exclude_metrics_by_labels.get(label_name)
+            if label_name in self.exclude_labels or (self.include_labels and label_name not in self.include_labels):
+                tag_prefix = None
+            else:
+                tag_prefix = f'{self.rename_labels.get(label_name, label_name)}:'
+
+            label_plan = self.label_plans[label_name] = (sample_excluder, tag_prefix)
+
+        return label_plan
 
     def stream_connection_lines(self):
         """
@@ -373,6 +685,13 @@ class OpenMetricsScraper:
             else:
                 self.submit_health_check(ServiceCheck.OK)
 
+                if self.family_cache is not None:
+                    not_modified = response.status_code == 304
+                    if not_modified:
+                        self.not_modified_responses += 1
+
+                    self.family_cache.set_response(response.headers.get('ETag'), not_modified)
+
                 # Never derive the encoding from the locale
                 if response.encoding is None:
                     response.encoding = 'utf-8'
@@ -386,6 +705,11 @@ class OpenMetricsScraper:
         """
 
         kwargs['stream'] = True
+
+        # Let the endpoint skip sending the payload if it did not change since the previous scrape
+        if self.family_cache is not None and self.family_cache.etag is not None:
+            kwargs.setdefault('extra_headers', {})['If-None-Match'] = self.family_cache.etag
+
         return self.http.get(self.endpoint, **kwargs)
 
     def set_dynamic_tags(self, *tags):
@@ -409,12 +733,41 @@ class OpenMetricsScraper:
     def submit_telemetry_number_of_ignored_metric_samples(self, metric):
         self.count('telemetry.metrics.ignored.count', len(metric.samples), tags=self.tags)
 
+    def submit_telemetry_number_of_skipped_metric_samples(self, metric_name, num_samples):
+        self.count('telemetry.metrics.input.count', num_samples, tags=self.tags)
+        if self.is_metric_excluded(self.remove_raw_metric_prefix(metric_name)):
+            self.count('telemetry.metrics.ignored.count', num_samples, tags=self.tags)
+
     def submit_telemetry_number_of_processed_metric_samples(self):
         self.count('telemetry.metrics.processed.count', 1, tags=self.tags)
 
     def submit_telemetry_number_of_ignored_lines(self):
         self.count('telemetry.metrics.blacklist.count', 1, tags=self.tags)
 
+    def submit_telemetry_tag_cache_usage(self):
+        self.count('telemetry.tag_cache.hits', self.tag_cache_hits, tags=self.tags)
+        self.count('telemetry.tag_cache.misses', self.tag_cache_misses, tags=self.tags)
+        self.gauge('telemetry.tag_cache.size', self.tag_cache.currsize, tags=self.tags)
+
+    def submit_telemetry_shared_labels_join(self):
+        self.count('telemetry.shared_labels.lookups', self.label_aggregator.label_set_lookups, tags=self.tags)
+        self.count('telemetry.shared_labels.matches', self.label_aggregator.label_set_matches, tags=self.tags)
+        self.gauge('telemetry.shared_labels.index.size', self.label_aggregator.label_set_count, tags=self.tags)
+
+    def submit_telemetry_family_cache_usage(self):
+        self.count('telemetry.family_cache.hits', self.family_cache.hits, tags=self.tags)
+        self.count('telemetry.family_cache.misses', self.family_cache.misses, tags=self.tags)
+        self.count('telemetry.family_cache.sample_data.hits', self.sample_data_cache_hits, tags=self.tags)
+        self.count('telemetry.family_cache.sample_data.misses', self.sample_data_cache_misses, tags=self.tags)
+        self.count('telemetry.family_cache.not_modified', self.not_modified_responses, tags=self.tags)
+
+    def submit_telemetry_connection_pool_usage(self):
+        stats = self.http.connection_pool_stats
+        self.monotonic_count('telemetry.connection_pool.requests', stats['requests'], tags=self.tags)
+        self.monotonic_count('telemetry.connection_pool.handshakes', stats['connections'], tags=self.tags)
+        self.gauge('telemetry.connection_pool.reuse_ratio', stats['reuse_ratio'], tags=self.tags)
+        self.gauge('telemetry.connection_pool.idle_connections', stats['idle_connections'], tags=self.tags)
+
     def submit_telemetry_endpoint_response_size(self, response):
         content_length = response.headers.get('Content-Length')
         if content_length is not None:
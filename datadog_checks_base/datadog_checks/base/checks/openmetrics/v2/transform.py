@@ -79,6 +79,16 @@ class MetricTransformer:
 
         self.logger.debug('Skipping metric `%s` as it is not defined in `metrics`', metric_name)
 
+    def has_transformer(self, metric_name):
+        if metric_name in self.transformer_data:
+            return True
+
+        for metric_pattern, _ in self.metric_patterns:
+            if metric_pattern.search(metric_name):
+                return True
+
+        return False
+
     def add_custom_transformer(self, name, transformer, pattern=False):
         if not pattern:
             name = '^{}$'.format(name)
@@ -1,6 +1,7 @@
 # (C) Datadog, Inc. 2020-present
 # All rights reserved
 # Licensed under a 3-clause BSD style license (see LICENSE)
+from ..utils import unzip_sample_data
 
 
 def get_counter(check, metric_name, modifiers, global_options):
@@ -8,21 +9,16 @@ def get_counter(check, metric_name, modifiers, global_options):
     https://prometheus.io/docs/concepts/metric_types/#counter
     https://github.com/OpenObservability/OpenMetrics/blob/master/specification/OpenMetrics.md#counter-1
     """
-    monotonic_count_method = check.monotonic_count
+    submit_metrics_batch = check.submit_metrics_batch
     metric_name = f'{metric_name}.count'
 
     def counter(metric, sample_data, runtime_data):
-        flush_first_value = runtime_data['flush_first_value']
-
-        for sample, tags, hostname in sample_data:
-            if sample.name.endswith('_total'):
-                monotonic_count_method(
-                    metric_name,
-                    sample.value,
-                    tags=tags,
-                    hostname=hostname,
-                    flush_first_value=flush_first_value,
-                )
+        submit_metrics_batch(
+            'monotonic_count',
+            metric_name,
+            *unzip_sample_data(sample for sample in sample_data if sample[0].name.endswith('_total')),
+            flush_first_value=runtime_data['flush_first_value'],
+        )
 
     del check
     del modifiers
@@ -1,6 +1,7 @@
 # (C) Datadog, Inc. 2020-present
 # All rights reserved
 # Licensed under a 3-clause BSD style license (see LICENSE)
+from ..utils import unzip_sample_data
 
 
 def get_gauge(check, metric_name, modifiers, global_options):
@@ -8,11 +9,10 @@ def get_gauge(check, metric_name, modifiers, global_options):
     https://prometheus.io/docs/concepts/metric_types/#gauge
     https://github.com/OpenObservability/OpenMetrics/blob/master/specification/OpenMetrics.md#gauge-1
     """
-    gauge_method = check.gauge
+    submit_metrics_batch = check.submit_metrics_batch
 
     def gauge(metric, sample_data, runtime_data):
-        for sample, tags, hostname in sample_data:
-            gauge_method(metric_name, sample.value, tags=tags, hostname=hostname)
+        submit_metrics_batch('gauge', metric_name, *unzip_sample_data(sample_data))
 
     del check
     del modifiers
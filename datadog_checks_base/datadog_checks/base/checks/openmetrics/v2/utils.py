@@ -80,3 +80,18 @@ def compute_bucket_hash(labels):
     # we need the unique context for all the buckets
     # hence we remove the `upper_bound` label
     return hash(frozenset(sorted((k, v) for k, v in labels.items() if k != 'upper_bound')))
+
+
+def unzip_sample_data(sample_data):
+    """
+    Split sample data into the values, tags and hostnames expected by `AgentCheck.submit_metrics_batch`
+    """
+    values = []
+    tags_list = []
+    hostnames = []
+    for sample, tags, hostname in sample_data:
+        values.append(sample.value)
+        tags_list.append(tags)
+        hostnames.append(hostname)
+
+    return values, tags_list, hostnames
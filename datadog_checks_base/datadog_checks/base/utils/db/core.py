@@ -2,18 +2,31 @@
 # All rights reserved
 # Licensed under a 3-clause BSD style license (see LICENSE)
 import logging
+import threading
+from concurrent.futures.thread import ThreadPoolExecutor
+from functools import partial
 from itertools import chain
 from typing import Any, Callable, Dict, List, Tuple
 
+from six.moves import queue
+
 from datadog_checks.base import AgentCheck
 from datadog_checks.base.utils.db.types import QueriesExecutor, QueriesSubmitter, Transformer
 
+from ...checks.base import BATCH_METRIC_TYPES
 from ...config import is_affirmative
 from ..containers import iter_unique
 from .query import Query
 from .transform import COLUMN_TRANSFORMERS, EXTRA_TRANSFORMERS
 from .utils import SUBMISSION_METHODS, create_submission_transformer
 
+# Rows of queries run concurrently are handed over in chunks of `fetch_size` rows, or this many when unset
+PARALLEL_CHUNK_SIZE = 1000
+# The maximum number of chunks of a query buffered while waiting to be processed
+PARALLEL_MAX_CHUNKS = 2
+# The number of seconds between checks of whether the rows of a query are still awaited
+PARALLEL_PUT_TIMEOUT = 0.1
+
 
 class QueryExecutor(object):
     """
@@ -31,6 +44,9 @@ class QueryExecutor(object):
         error_handler=None,  # type: Callable[[str], str]
         hostname=None,  # type: str
         logger=None,
+        batch_submissions=False,  # type: bool
+        fetch_size=None,  # type: int
+        parallel_executors=None,  # type: List[QueriesExecutor]
     ):  # type: (...) -> QueryExecutor
         self.executor = executor  # type: QueriesExecutor
         self.submitter = submitter  # type: QueriesSubmitter
@@ -40,6 +56,24 @@ class QueryExecutor(object):
                     'QueryExecutor submitter is missing required submission method `{}`'.format(submission_method)
                 )
 
+        # Metrics of every query are queued and sent through `submit_metrics_batch` once the query is processed
+        self.batch_submissions = batch_submissions  # type: bool
+        if self.batch_submissions and not hasattr(self.submitter, 'submit_metrics_batch'):
+            raise ValueError('QueryExecutor submitter is missing required submission method `submit_metrics_batch`')
+
+        self.submission_batches = {}  # type: Dict[Tuple[str, bool, bool], Tuple[List, List, List, List]]
+
+        # Executors returning a cursor have their rows fetched in batches of this size rather than all at once
+        self.fetch_size = fetch_size  # type: int
+
+        # Executors bound to separate connections, when there are any queries run concurrently on them
+        self.parallel_executors = list(parallel_executors or [])  # type: List[QueriesExecutor]
+        self._executor_pool = None  # type: queue.Queue
+        self._thread_pool = None  # type: ThreadPoolExecutor
+
+        # The indices of the columns of every query by use, see `get_row_plan`
+        self.row_plans = {}  # type: Dict[Query, Tuple[Any, Tuple]]
+
         self.tags = tags or []
         self.error_handler = error_handler
         self.queries = [Query(payload) for payload in queries or []]  # type: List[Query]
@@ -51,13 +85,58 @@ class QueryExecutor(object):
         column_transformers = COLUMN_TRANSFORMERS.copy()  # type: Dict[str, Transformer]
 
         for submission_method, transformer_name in SUBMISSION_METHODS.items():
-            method = getattr(self.submitter, submission_method)
+            if self.batch_submissions and submission_method in BATCH_METRIC_TYPES:
+                method = partial(self.queue_submission, submission_method)
+            else:
+                method = getattr(self.submitter, submission_method)
             # Save each method in the initializer -> callable format
             column_transformers[transformer_name] = create_submission_transformer(method)
 
         for query in self.queries:
             query.compile(column_transformers, EXTRA_TRANSFORMERS.copy())
 
+        self.row_plans.clear()
+
+    def get_row_plan(self, query):
+        # type: (Query) -> Tuple
+        """
+        Return the plan used to process every row of a compiled query: the names of the columns that are
+        collected as sources (or `None` if every column is), their indices, the tag columns and the columns
+        submitted by a transformer, with their index and transformer, in the order of the columns.
+        """
+        cached = self.row_plans.get(query)
+        if cached is not None and cached[0] is query.column_transformers:
+            return cached[1]
+
+        source_names = []
+        source_indices = []
+        tag_columns = []
+        submission_columns = []
+        for index, (column_name, type_transformer) in enumerate(query.column_transformers):
+            # Columns can be ignored via configuration
+            if not column_name:
+                continue
+
+            source_names.append(column_name)
+            column_type, transformer = type_transformer
+            source_indices.append(index)
+
+            # The transformer can be None for `source` types. Those such columns do not submit
+            # anything but are collected into the row values for other columns to reference.
+            if transformer is None:
+                continue
+            elif column_type in ('tag', 'tag_list'):
+                tag_columns.append((index, column_type == 'tag_list', transformer))
+            else:
+                submission_columns.append((index, transformer))
+
+        if len(source_indices) == len(query.column_transformers):
+            source_indices = None
+
+        plan = (tuple(source_names), source_indices, tuple(tag_columns), tuple(submission_columns))
+        self.row_plans[query] = (query.column_transformers, plan)
+        return plan
+
     def execute(self, extra_tags=None):
         """This method executes all of the compiled queries."""
 
@@ -65,53 +144,30 @@ class QueryExecutor(object):
         if extra_tags:
             global_tags.extend(list(extra_tags))
 
-        for query in self.queries:
-            query_name = query.name
-            query_columns = query.column_transformers
+        for query, rows in self._iter_query_results():
             extra_transformers = query.extra_transformers
-            query_tags = query.base_tags
-
-            try:
-                rows = self.execute_query(query.query)
-            except Exception as e:
-                if self.error_handler:
-                    self.logger.error('Error querying %s: %s', query_name, self.error_handler(str(e)))
-                else:
-                    self.logger.error('Error querying %s: %s', query_name, e)
-
-                continue
+            query_tags = global_tags + query.base_tags
+            source_names, source_indices, tag_columns, submission_columns = self.get_row_plan(query)
 
             for row in rows:
                 if not self._is_row_valid(query, row):
                     continue
 
                 # It holds the query results
-                sources = {}  # type: Dict[str, str]
-                # It holds the transformers defined in query_columns along with the column value
-                submission_queue = []  # type: List[Tuple[Transformer, Any]]
-                tags = global_tags + query_tags
-
-                for (column_name, type_transformer), column_value in zip(query_columns, row):
-                    # Columns can be ignored via configuration
-                    if not column_name:
-                        continue
-
-                    sources[column_name] = column_value
-                    column_type, transformer = type_transformer
+                if source_indices is None:
+                    sources = dict(zip(source_names, row))  # type: Dict[str, str]
+                else:
+                    sources = {name: row[index] for name, index in zip(source_names, source_indices)}
 
-                    # The transformer can be None for `source` types. Those such columns do not submit
-                    # anything but are collected into the row values for other columns to reference.
-                    if transformer is None:
-                        continue
-                    elif column_type == 'tag':
-                        tags.append(transformer(None, column_value))  # get_tag transformer
-                    elif column_type == 'tag_list':
-                        tags.extend(transformer(None, column_value))  # get_tag_list transformer
+                tags = list(query_tags)
+                for index, is_tag_list, transformer in tag_columns:
+                    if is_tag_list:
+                        tags.extend(transformer(None, row[index]))  # get_tag_list transformer
                     else:
-                        submission_queue.append((transformer, column_value))
+                        tags.append(transformer(None, row[index]))  # get_tag transformer
 
-                for transformer, value in submission_queue:
-                    transformer(sources, value, tags=tags, hostname=self.hostname)
+                for index, transformer in submission_columns:
+                    transformer(sources, row[index], tags=tags, hostname=self.hostname)
 
                 for name, transformer in extra_transformers:
                     try:
@@ -123,6 +179,123 @@ class QueryExecutor(object):
                         if result is not None:
                             sources[name] = result
 
+            if self.submission_batches:
+                self.submit_batches()
+
+    def _iter_query_results(self):
+        if self.parallel_executors:
+            results = self._execute_queries_concurrently()
+        else:
+            results = ((query, partial(self.execute_query, query.query)) for query in self.queries)
+
+        for query, get_rows in results:
+            try:
+                rows = get_rows()
+            except Exception as e:
+                if self.error_handler:
+                    self.logger.error('Error querying %s: %s', query.name, self.error_handler(str(e)))
+                else:
+                    self.logger.error('Error querying %s: %s', query.name, e)
+
+                continue
+
+            yield query, rows
+
+    def _execute_queries_concurrently(self):
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(len(self.parallel_executors))
+            self._executor_pool = queue.Queue()
+            for executor in self.parallel_executors:
+                self._executor_pool.put(executor)
+
+        # The pools are released by `shutdown`, possibly while the queries run
+        thread_pool, executor_pool = self._thread_pool, self._executor_pool
+
+        # Rows are streamed through bounded queues so that at most a few chunks of every query are held in memory
+        stopped = threading.Event()
+        rows_queues = [queue.Queue(PARALLEL_MAX_CHUNKS) for _ in self.queries]
+        for query, rows_queue in zip(self.queries, rows_queues):
+            thread_pool.submit(self._stream_query_rows, query, executor_pool, rows_queue, stopped)
+
+        # Rows are processed in the order of the queries as soon as they are available
+        try:
+            for query, rows_queue in zip(self.queries, rows_queues):
+                yield query, partial(_get_streamed_rows, rows_queue)
+        finally:
+            # Stop the queries whose rows are no longer awaited
+            stopped.set()
+
+    def _stream_query_rows(self, query, executor_pool, rows_queue, stopped):
+        # type: (Query, queue.Queue, queue.Queue, threading.Event) -> None
+        def put(item):
+            while not stopped.is_set():
+                try:
+                    rows_queue.put(item, timeout=PARALLEL_PUT_TIMEOUT)
+                except queue.Full:
+                    continue
+                else:
+                    return True
+
+            return False
+
+        chunk_size = self.fetch_size or PARALLEL_CHUNK_SIZE
+        executor = executor_pool.get()
+        try:
+            if stopped.is_set():
+                return
+
+            chunk = []
+            try:
+                for row in self.execute_query(query.query, executor):
+                    chunk.append(row)
+                    if len(chunk) >= chunk_size:
+                        if not put((chunk, None)):
+                            return
+                        chunk = []
+            except Exception as e:
+                put((chunk, e))
+                return
+
+            if put((chunk, None)):
+                put((None, None))
+        finally:
+            executor_pool.put(executor)
+
+    def shutdown(self):
+        """
+        Release the threads running queries concurrently on `parallel_executors`, e.g. when the check is cancelled.
+        They are started again by the next execution.
+        """
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=False)
+            self._thread_pool = None
+            self._executor_pool = None
+
+    def queue_submission(self, submission_method, name, value, tags=None, hostname=None, **kwargs):
+        """Queue a metric until `submit_batches` is called, used when `batch_submissions` is enabled."""
+        if any(option not in ('raw', 'flush_first_value') for option in kwargs):
+            # Options that batches do not support are submitted right away
+            getattr(self.submitter, submission_method)(name, value, tags=tags, hostname=hostname, **kwargs)
+            return
+
+        batch_key = (submission_method, kwargs.get('raw', False), kwargs.get('flush_first_value', False))
+        batch = self.submission_batches.get(batch_key)
+        if batch is None:
+            batch = self.submission_batches[batch_key] = ([], [], [], [])
+
+        names, values, tags_list, hostnames = batch
+        names.append(name)
+        values.append(value)
+        tags_list.append(tags)
+        hostnames.append(hostname)
+
+    def submit_batches(self):
+        """Send every queued metric through the submitter's `submit_metrics_batch` method."""
+        for (submission_method, raw, flush_first_value), batch in self.submission_batches.items():
+            self.submitter.submit_metrics_batch(submission_method, *batch, raw=raw, flush_first_value=flush_first_value)
+
+        self.submission_batches.clear()
+
     def _is_row_valid(self, query, row):
         # type: (Query, List) -> bool
         if not row:
@@ -141,14 +314,19 @@ class QueryExecutor(object):
             return False
         return True
 
-    def execute_query(self, query):
+    def execute_query(self, query, executor=None):
         """
         Called by `execute`, this triggers query execution to check for errors immediately in a way that is compatible
         with any library. If there are no errors, this is guaranteed to return an iterator over the result set.
+
+        When `fetch_size` is set and the executor returns a DB-API cursor, e.g. a server-side cursor, rows
+        are fetched `fetch_size` at a time with `fetchmany`.
         """
-        rows = self.executor(query)
+        rows = (executor or self.executor)(query)
         if rows is None:
             return iter([])
+        elif self.fetch_size and hasattr(rows, 'fetchmany'):
+            rows = _iter_fetchmany(rows, self.fetch_size)
         else:
             rows = iter(rows)
 
@@ -161,6 +339,41 @@ class QueryExecutor(object):
         return chain((first_row,), rows)
 
 
+def _get_streamed_rows(rows_queue):
+    """
+    Return an iterator over the rows of a query streamed by `QueryExecutor._stream_query_rows`. An error raised
+    by the query before any row is returned is raised right away, like `QueryExecutor.execute_query` does.
+    """
+    chunk, error = rows_queue.get()
+    if error is not None and not chunk:
+        raise error
+
+    return _iter_streamed_rows(rows_queue, chunk, error)
+
+
+def _iter_streamed_rows(rows_queue, chunk, error):
+    while True:
+        for row in chunk:
+            yield row
+
+        if error is not None:
+            raise error
+
+        chunk, error = rows_queue.get()
+        if chunk is None:
+            return
+
+
+def _iter_fetchmany(cursor, fetch_size):
+    while True:
+        rows = cursor.fetchmany(fetch_size)
+        if not rows:
+            return
+
+        for row in rows:
+            yield row
+
+
 class QueryManager(QueryExecutor):
     """
     This class is in charge of running any number of `Query` instances for a single Check instance.
@@ -195,6 +408,9 @@ class QueryManager(QueryExecutor):
         tags=None,  # type: List[str]
         error_handler=None,  # type: Callable[[str], str]
         hostname=None,  # type: str
+        batch_submissions=False,  # type: bool
+        fetch_size=None,  # type: int
+        parallel_executors=None,  # type: List[QueriesExecutor]
     ):  # type: (...) -> QueryManager
         """
         - **check** (_AgentCheck_) - an instance of a Check
@@ -204,6 +420,14 @@ class QueryManager(QueryExecutor):
         - **tags** (_List[str]_) - a list of tags to associate with every submission
         - **error_handler** (_callable_) - a callable accepting a `str` error as its sole argument and returning
           a sanitized string, useful for scrubbing potentially sensitive information libraries emit
+        - **batch_submissions** (_bool_) - whether to send the metrics of every query at once with
+          `AgentCheck.submit_metrics_batch` rather than one at a time
+        - **fetch_size** (_int_) - when the executor returns a cursor, the number of rows to fetch at a time
+          instead of loading the whole result set in memory
+        - **parallel_executors** (_List[callable]_) - executors like `executor` but each bound to its own
+          connection, queries then run concurrently on them and their rows are processed in order. Rows are
+          streamed in chunks of `fetch_size` rows and only a couple of chunks per query are buffered. Call
+          `shutdown` when the check is cancelled to release the threads
         """
         super(QueryManager, self).__init__(
             executor=executor,
@@ -213,6 +437,9 @@ class QueryManager(QueryExecutor):
             error_handler=error_handler,
             hostname=hostname,
             logger=check.log,
+            batch_submissions=batch_submissions,
+            fetch_size=fetch_size,
+            parallel_executors=parallel_executors,
         )
         self.check = check  # type: AgentCheck
 
@@ -4,21 +4,24 @@
 import datetime
 import decimal
 import functools
+import heapq
 import logging
 import os
 import socket
 import threading
 import time
+from collections import defaultdict, deque
 from concurrent.futures.thread import ThreadPoolExecutor
-from itertools import chain
+from itertools import chain, count
 from typing import Any, Callable, Dict, List, Tuple
 
 from cachetools import TTLCache
 
 from datadog_checks.base import is_affirmative
 from datadog_checks.base.log import get_check_logger
+from datadog_checks.base.utils.db.sql import compute_sql_signature
 from datadog_checks.base.utils.db.types import Transformer
-from datadog_checks.base.utils.serialization import json
+from datadog_checks.base.utils.serialization import dumps_chunked, json
 from datadog_checks.base.utils.tracing import INTEGRATION_TRACING_SERVICE_NAME, tracing_enabled
 
 from ..common import to_native_string
@@ -212,12 +215,281 @@ def obfuscate_sql_with_metadata(query, options=None):
     return statement_with_metadata
 
 
+class ObfuscationCache(object):
+    """
+    Thread-safe cache of obfuscated queries keyed by raw query text and obfuscator options. Query texts rarely
+    change between collections so only new ones have to go through the obfuscator and the signature computation.
+
+    Cache misses are obfuscated in batches of `batch_size` queries, in parallel on a pool of `max_workers`
+    threads when there is more than one batch. The pool is shared by all the caches with the same `max_workers`
+    so that the number of threads does not grow with the number of check instances. Entries expire after `ttl`
+    seconds and at most `maxsize` of them are kept.
+    """
+
+    # max_workers -> pool shared by the caches
+    _executors = {}
+    _executors_lock = threading.Lock()
+
+    def __init__(self, maxsize=10000, ttl=60 * 60, max_workers=4, batch_size=500):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._batch_size = batch_size
+        self._executor = self._get_executor(max_workers) if max_workers > 1 else None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def _get_executor(cls, max_workers):
+        with cls._executors_lock:
+            executor = cls._executors.get(max_workers)
+            if executor is None:
+                # Threads are created lazily, only once batches are obfuscated in parallel
+                executor = cls._executors[max_workers] = ThreadPoolExecutor(max_workers)
+
+            return executor
+
+    def __len__(self):
+        return len(self._cache)
+
+    def obfuscate_queries(self, queries, options=None):
+        """
+        Obfuscate every raw query text of `queries` with the given obfuscator `options`.
+
+        Returns a tuple of two dictionaries. The first maps every query text that was successfully obfuscated
+        to a dictionary with the `query`, `query_signature` and `metadata` of the obfuscated statement, which
+        is shared with the cache and must not be modified. The second maps every query text that could not be
+        obfuscated to the error.
+        """
+        statements = {}
+        errors = {}
+        misses = []
+
+        with self._lock:
+            for query in set(queries):
+                try:
+                    statements[query] = self._cache[(options, query)]
+                except KeyError:
+                    misses.append(query)
+
+            self.hits += len(statements)
+            self.misses += len(misses)
+
+        if not misses:
+            return statements, errors
+
+        batches = [misses[i : i + self._batch_size] for i in range(0, len(misses), self._batch_size)]
+        if self._executor is None or len(batches) == 1:
+            obfuscated_batches = [_obfuscate_batch(batch, options) for batch in batches]
+        else:
+            obfuscated_batches = list(self._executor.map(_obfuscate_batch, batches, [options] * len(batches)))
+
+        with self._lock:
+            size = len(self._cache)
+            added = 0
+            for batch_statements, batch_errors in obfuscated_batches:
+                errors.update(batch_errors)
+                for query, statement in batch_statements.items():
+                    statements[query] = statement
+
+                    key = (options, query)
+                    if key not in self._cache:
+                        added += 1
+                    self._cache[key] = statement
+
+            # Entries that expired are dropped lazily whenever the cache is modified
+            self.evictions += max(size + added - len(self._cache), 0)
+
+        return statements, errors
+
+    def pop_stats(self):
+        """
+        Return the number of hits, misses and evictions since the last call.
+        """
+        with self._lock:
+            stats = self.hits, self.misses, self.evictions
+            self.hits = self.misses = self.evictions = 0
+
+        return stats
+
+    def submit_metrics(self, check, prefix, **kwargs):
+        """
+        Submit the number of hits, misses and evictions since the last call and the size of the cache with `check`,
+        as `<prefix>.obfuscation_cache.*` metrics. Other arguments, such as the `tags`, are passed to every submission.
+        """
+        hits, misses, evictions = self.pop_stats()
+        for name, value in (('hits', hits), ('misses', misses), ('evictions', evictions)):
+            check.count('{}.obfuscation_cache.{}'.format(prefix, name), value, **kwargs)
+        check.gauge('{}.obfuscation_cache.size'.format(prefix), len(self), **kwargs)
+
+
+def _obfuscate_batch(queries, options):
+    statements = {}
+    errors = {}
+    for query in queries:
+        try:
+            statement = obfuscate_sql_with_metadata(query, options)
+        except Exception as e:
+            errors[query] = e
+        else:
+            statements[query] = {
+                'query': statement['query'],
+                'query_signature': compute_sql_signature(statement['query']),
+                'metadata': statement['metadata'],
+            }
+
+    return statements, errors
+
+
+class DBMJobScheduler(object):
+    """
+    Runs `DBMAsyncJob`s on a bounded pool of `max_workers` threads instead of dedicating a sleeping thread to
+    every job. Jobs are kept in a heap ordered by the time of their next run, which is due one rate limit
+    period after the previous one was due.
+
+    - At most `max_jobs_per_host` jobs of the same database host run at once, the others wait for a slot in
+      the order they became due. A value of 0 means no limit.
+    - A job is never run concurrently with itself. When a run takes longer than the job's period, the next run
+      is due as soon as the current one finishes instead of queueing every missed run.
+
+    Due times are measured with `time_func`, which returns the current time in seconds.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, max_workers=4, max_jobs_per_host=0, time_func=time.time):
+        self._time = time_func
+        self._executor = ThreadPoolExecutor(max_workers)
+        self._max_jobs_per_host = max_jobs_per_host
+        self._condition = threading.Condition()
+        self._timer = None
+
+        # Heap of (due time, sequence number, job), an entry is stale if its sequence number is not
+        # the current one of the job
+        self._heap = []
+        self._sequence = count()
+        self._jobs = {}
+        self._running = set()
+        self._running_per_host = defaultdict(int)
+        self._waiting_per_host = defaultdict(deque)
+
+    @classmethod
+    def shared(cls):
+        """
+        Return the scheduler used by jobs when the `DBM_ASYNC_JOB_SCHEDULER_WORKERS` environment variable is set,
+        `DBM_ASYNC_JOB_SCHEDULER_MAX_JOBS_PER_HOST` limits the number of concurrent jobs per database host.
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(
+                    max_workers=int(os.environ.get('DBM_ASYNC_JOB_SCHEDULER_WORKERS', 4)),
+                    max_jobs_per_host=int(os.environ.get('DBM_ASYNC_JOB_SCHEDULER_MAX_JOBS_PER_HOST', 0)),
+                )
+
+            return cls._shared
+
+    def schedule(self, job):
+        """
+        Register the job so that it runs immediately then every rate limit period until it stops,
+        returns False if it was already registered.
+        """
+        with self._condition:
+            if job in self._jobs:
+                return False
+
+            self._push(job, self._time())
+            if self._timer is None:
+                self._timer = threading.Thread(target=self._timer_loop, name='dbm-job-scheduler')
+                self._timer.daemon = True
+                self._timer.start()
+
+            return True
+
+    def wake(self, job):
+        """
+        Make a registered job due now, e.g. so that it notices it was cancelled.
+        """
+        with self._condition:
+            if job in self._jobs and job not in self._running:
+                self._push(job, self._time())
+
+    def is_scheduled(self, job):
+        with self._condition:
+            return job in self._jobs
+
+    def _push(self, job, due):
+        # Must be called with the condition held
+        sequence = next(self._sequence)
+        self._jobs[job] = sequence
+        heapq.heappush(self._heap, (due, sequence, job))
+        self._condition.notify()
+
+    def _timer_loop(self):
+        with self._condition:
+            while True:
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+
+                due, sequence, job = self._heap[0]
+                delay = due - self._time()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+
+                heapq.heappop(self._heap)
+                if self._jobs.get(job) != sequence:
+                    continue
+
+                host = job._db_hostname
+                if self._max_jobs_per_host and self._running_per_host[host] >= self._max_jobs_per_host:
+                    self._waiting_per_host[host].append((job, due, sequence))
+                else:
+                    self._start(job, due)
+
+    def _start(self, job, due):
+        # Must be called with the condition held
+        self._running.add(job)
+        self._running_per_host[job._db_hostname] += 1
+        self._executor.submit(self._run, job, due)
+
+    def _run(self, job, due):
+        keep_running = False
+        try:
+            keep_running = job._run_scheduled(self._time() - due)
+        finally:
+            finished = self._time()
+            with self._condition:
+                host = job._db_hostname
+                self._running.discard(job)
+                self._running_per_host[host] -= 1
+
+                waiting = self._waiting_per_host[host]
+                while waiting:
+                    waiting_job, waiting_due, waiting_sequence = waiting.popleft()
+                    if self._jobs.get(waiting_job) == waiting_sequence:
+                        self._start(waiting_job, waiting_due)
+                        break
+
+                if not keep_running:
+                    del self._jobs[job]
+                elif job._cancel_event.is_set():
+                    self._push(job, finished)
+                else:
+                    self._push(job, max(due + job._rate_limiter.period_s, finished))
+
+
 class DBMAsyncJob(object):
     # Set an arbitrary high limit so that dbm async jobs (which aren't CPU bound) don't
     # get artificially limited by the default max_workers count. Note that since threads are
     # created lazily, it's safe to set a high maximum
     executor = ThreadPoolExecutor(100000)
 
+    # Payloads serialized with `_serialize_payloads` are split so that none exceeds this size
+    max_payload_size = 5 * 1000 * 1000
+
     """
     Runs Async Jobs
     """
@@ -234,6 +506,7 @@ class DBMAsyncJob(object):
         expected_db_exceptions=(),
         shutdown_callback=None,
         job_name=None,
+        scheduler=None,
     ):
         self._check = check
         self._config_host = config_host
@@ -255,8 +528,23 @@ class DBMAsyncJob(object):
         self._expected_db_exceptions = expected_db_exceptions
         self._job_name = job_name
 
+        if scheduler is None and int(os.environ.get('DBM_ASYNC_JOB_SCHEDULER_WORKERS', 0)) > 0:
+            scheduler = DBMJobScheduler.shared()
+        self._scheduler = scheduler
+
+    def _serialize_payloads(self, payload, rows_key, rows):
+        """
+        Serialize `payload` with `rows` under `rows_key` one row at a time, as several payloads if needed
+        to stay under `max_payload_size`.
+        """
+        return dumps_chunked(
+            payload, rows_key, rows, max_size=self.max_payload_size, default=default_json_event_encoding
+        )
+
     def cancel(self):
         self._cancel_event.set()
+        if self._scheduler is not None:
+            self._scheduler.wake(self)
 
     def run_job_loop(self, tags):
         """
@@ -276,6 +564,11 @@ class DBMAsyncJob(object):
         if self._run_sync or is_affirmative(os.environ.get('DBM_THREADED_JOB_RUN_SYNC', "false")):
             self._log.debug("Running threaded job synchronously. job=%s", self._job_name)
             self._run_job_rate_limited()
+        elif self._scheduler is not None:
+            if self._scheduler.schedule(self):
+                self._log.info("[%s] Scheduling job", self._job_tags_str)
+            else:
+                self._log.debug("Job already scheduled. job=%s", self._job_name)
         elif self._job_loop_future is None or not self._job_loop_future.running():
             self._job_loop_future = DBMAsyncJob.executor.submit(self._job_loop)
         else:
@@ -285,49 +578,81 @@ class DBMAsyncJob(object):
         try:
             self._log.info("[%s] Starting job loop", self._job_tags_str)
             while True:
-                if self._cancel_event.isSet():
-                    self._log.info("[%s] Job loop cancelled", self._job_tags_str)
-                    self._check.count("dd.{}.async_job.cancel".format(self._dbms), 1, tags=self._job_tags, raw=True)
-                    break
-                if time.time() - self._last_check_run > self._min_collection_interval * 2:
-                    self._log.info("[%s] Job loop stopping due to check inactivity", self._job_tags_str)
-                    self._check.count(
-                        "dd.{}.async_job.inactive_stop".format(self._dbms), 1, tags=self._job_tags, raw=True
-                    )
+                if self._should_stop():
                     break
                 self._run_job_rate_limited()
         except Exception as e:
-            if self._cancel_event.isSet():
-                # canceling can cause exceptions if the connection is closed the middle of the check run
-                # in this case we still want to report it as a cancellation instead of a crash
-                self._log.debug("[%s] Job loop error after cancel: %s", self._job_tags_str, e)
-                self._log.info("[%s] Job loop cancelled", self._job_tags_str)
-                self._check.count("dd.{}.async_job.cancel".format(self._dbms), 1, tags=self._job_tags, raw=True)
-            elif isinstance(e, self._expected_db_exceptions):
-                self._log.warning(
-                    "[%s] Job loop database error: %s",
-                    self._job_tags_str,
-                    e,
-                    exc_info=self._log.getEffectiveLevel() == logging.DEBUG,
-                )
-                self._check.count(
-                    "dd.{}.async_job.error".format(self._dbms),
-                    1,
-                    tags=self._job_tags + ["error:database-{}".format(type(e))],
-                    raw=True,
-                )
-            else:
-                self._log.exception("[%s] Job loop crash", self._job_tags_str)
-                self._check.count(
-                    "dd.{}.async_job.error".format(self._dbms),
-                    1,
-                    tags=self._job_tags + ["error:crash-{}".format(type(e))],
-                    raw=True,
-                )
+            self._handle_job_error(e)
         finally:
-            self._log.info("[%s] Shutting down job loop", self._job_tags_str)
-            if self._shutdown_callback:
-                self._shutdown_callback()
+            self._shutdown()
+
+    def _run_scheduled(self, queue_delay):
+        """
+        Run the job once on behalf of a `DBMJobScheduler`, returns whether it should run again.
+        """
+        self._check.histogram(
+            "dd.{}.async_job.queue_delay".format(self._dbms), queue_delay * 1000, tags=self._job_tags, raw=True
+        )
+        try:
+            if self._should_stop():
+                self._shutdown()
+                return False
+
+            start = time.time()
+            self._run_job_traced()
+            if time.time() - start > self._rate_limiter.period_s:
+                self._check.count("dd.{}.async_job.overrun".format(self._dbms), 1, tags=self._job_tags, raw=True)
+        except Exception as e:
+            self._handle_job_error(e)
+            self._shutdown()
+            return False
+
+        return True
+
+    def _should_stop(self):
+        if self._cancel_event.isSet():
+            self._log.info("[%s] Job loop cancelled", self._job_tags_str)
+            self._check.count("dd.{}.async_job.cancel".format(self._dbms), 1, tags=self._job_tags, raw=True)
+            return True
+        if time.time() - self._last_check_run > self._min_collection_interval * 2:
+            self._log.info("[%s] Job loop stopping due to check inactivity", self._job_tags_str)
+            self._check.count("dd.{}.async_job.inactive_stop".format(self._dbms), 1, tags=self._job_tags, raw=True)
+            return True
+        return False
+
+    def _handle_job_error(self, e):
+        if self._cancel_event.isSet():
+            # canceling can cause exceptions if the connection is closed the middle of the check run
+            # in this case we still want to report it as a cancellation instead of a crash
+            self._log.debug("[%s] Job loop error after cancel: %s", self._job_tags_str, e)
+            self._log.info("[%s] Job loop cancelled", self._job_tags_str)
+            self._check.count("dd.{}.async_job.cancel".format(self._dbms), 1, tags=self._job_tags, raw=True)
+        elif isinstance(e, self._expected_db_exceptions):
+            self._log.warning(
+                "[%s] Job loop database error: %s",
+                self._job_tags_str,
+                e,
+                exc_info=self._log.getEffectiveLevel() == logging.DEBUG,
+            )
+            self._check.count(
+                "dd.{}.async_job.error".format(self._dbms),
+                1,
+                tags=self._job_tags + ["error:database-{}".format(type(e))],
+                raw=True,
+            )
+        else:
+            self._log.exception("[%s] Job loop crash", self._job_tags_str)
+            self._check.count(
+                "dd.{}.async_job.error".format(self._dbms),
+                1,
+                tags=self._job_tags + ["error:crash-{}".format(type(e))],
+                raw=True,
+            )
+
+    def _shutdown(self):
+        self._log.info("[%s] Shutting down job loop", self._job_tags_str)
+        if self._shutdown_callback:
+            self._shutdown_callback()
 
     def _set_rate_limit(self, rate_limit):
         if self._rate_limiter.rate_limit_s != rate_limit:
@@ -5,8 +5,10 @@ import logging
 import os
 import re
 import ssl
+import threading
 from contextlib import contextmanager
 from copy import deepcopy
+from functools import partial
 from io import open
 from ipaddress import ip_address, ip_network
 
@@ -17,17 +19,22 @@ from cryptography.x509 import load_der_x509_certificate
 from cryptography.x509.extensions import ExtensionNotFound
 from cryptography.x509.oid import AuthorityInformationAccessOID, ExtensionOID
 from requests import auth as requests_auth
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
 from requests.exceptions import SSLError
 from requests_toolbelt.adapters import host_header_ssl
 from six import PY2, iteritems, string_types
+from six.moves.http_cookiejar import DefaultCookiePolicy
 from six.moves.urllib.parse import quote, urlparse, urlunparse
+from urllib3.util.request import ACCEPT_ENCODING
 from wrapt import ObjectProxy
 
 from ..config import is_affirmative
 from ..errors import ConfigurationError
 from .common import ensure_bytes, ensure_unicode
+from .containers import freeze
 from .headers import get_default_headers, update_headers
 from .network import CertAdapter, closing, create_socket_connection
+from .serialization import iter_json_items
 from .time import get_timestamp
 
 try:
@@ -71,7 +78,10 @@ STANDARD_FIELDS = {
     'aws_host': None,
     'aws_region': None,
     'aws_service': None,
+    'compression': None,
     'connect_timeout': None,
+    'connection_pool_idle_timeout': 300,
+    'connection_pool_size': DEFAULT_POOLSIZE,
     'extra_headers': None,
     'headers': None,
     'kerberos_auth': None,
@@ -88,6 +98,7 @@ STANDARD_FIELDS = {
     'proxy': None,
     'read_timeout': None,
     'request_size': DEFAULT_CHUNK_SIZE,
+    'shared_connection_pool': False,
     'skip_proxy': False,
     'tls_ca_cert': None,
     'tls_cert': None,
@@ -119,6 +130,32 @@ KERBEROS_STRATEGIES = {}
 
 UDS_SCHEME = 'unix'
 
+# Options that, along with the resulting TLS and proxy settings, decide which instances may share connections
+SHARED_SESSION_KEY_FIELDS = (
+    'auth_token',
+    'auth_type',
+    'aws_host',
+    'aws_region',
+    'aws_service',
+    'kerberos_auth',
+    'kerberos_cache',
+    'kerberos_delegate',
+    'kerberos_force_initiate',
+    'kerberos_hostname',
+    'kerberos_keytab',
+    'kerberos_principal',
+    'ntlm_domain',
+    'password',
+    'use_legacy_auth_encoding',
+    'username',
+)
+
+# The number of distinct hosts for which a shared session keeps connections
+SHARED_SESSION_MAX_HOSTS = 100
+
+# The content encodings that responses can be decoded from, depending on the installed packages
+SUPPORTED_CONTENT_ENCODINGS = tuple(encoding.strip() for encoding in ACCEPT_ENCODING.split(','))
+
 
 class ResponseWrapper(ObjectProxy):
     def __init__(self, response, default_chunk_size):
@@ -126,12 +163,17 @@ class ResponseWrapper(ObjectProxy):
 
         # See https://github.com/psf/requests/pull/5942
         self.__default_chunk_size = default_chunk_size
+        self.__streamed_bytes = 0
 
     def iter_content(self, chunk_size=None, decode_unicode=False):
         if chunk_size is None:
             chunk_size = self.__default_chunk_size
 
-        return self.__wrapped__.iter_content(chunk_size=chunk_size, decode_unicode=decode_unicode)
+        chunks = self.__wrapped__.iter_content(chunk_size=chunk_size, decode_unicode=decode_unicode)
+        if decode_unicode:
+            return chunks
+
+        return self.__count_bytes(chunks)
 
     def iter_lines(self, chunk_size=None, decode_unicode=False, delimiter=None):
         if chunk_size is None:
@@ -139,6 +181,50 @@ class ResponseWrapper(ObjectProxy):
 
         return self.__wrapped__.iter_lines(chunk_size=chunk_size, decode_unicode=decode_unicode, delimiter=delimiter)
 
+    def iter_json(self, path=(), chunk_size=None):
+        """
+        Yield the elements of the JSON array at `path` as soon as each of them has been received, or the
+        `(key, value)` pairs of an object. See `datadog_checks.base.utils.serialization.iter_json_items`.
+
+        Requests should be made with `stream=True` so that the whole body is never held in memory.
+        """
+        return iter_json_items(self.iter_content(chunk_size=chunk_size), path)
+
+    @property
+    def decoded_bytes(self):
+        """
+        The number of bytes of the body read so far after decompression, either through `content` or
+        as `bytes` chunks from `iter_content` and `iter_json`.
+        """
+        content = self.__wrapped__._content
+        if self.__wrapped__._content_consumed and isinstance(content, bytes):
+            return len(content)
+
+        return self.__streamed_bytes
+
+    @property
+    def encoded_bytes(self):
+        """
+        The number of bytes of the body received so far, before decompression.
+        """
+        raw = self.__wrapped__.raw
+        if raw is None or not hasattr(raw, 'tell'):
+            return None
+
+        return raw.tell()
+
+    @property
+    def time_to_first_byte(self):
+        """
+        The number of seconds elapsed between sending the request and receiving the headers of the response.
+        """
+        return self.__wrapped__.elapsed.total_seconds()
+
+    def __count_bytes(self, chunks):
+        for chunk in chunks:
+            self.__streamed_bytes += len(chunk)
+            yield chunk
+
     def __enter__(self):
         return self
 
@@ -157,6 +243,9 @@ class RequestsWrapper(object):
         'auth_token_handler',
         'request_size',
         'tls_protocols_allowed',
+        'shared_session_key',
+        'connection_pool_size',
+        'connection_pool_idle_timeout',
     )
 
     def __init__(self, instance, init_config, remapper=None, logger=None):
@@ -231,6 +320,11 @@ class RequestsWrapper(object):
         if config['extra_headers']:
             update_headers(headers, config['extra_headers'])
 
+        if config['compression'] is not None:
+            accept_encoding = get_accept_encoding(config['compression'], self.logger)
+            if accept_encoding:
+                headers['Accept-Encoding'] = accept_encoding
+
         # https://toolbelt.readthedocs.io/en/latest/adapters.html#hostheaderssladapter
         self.tls_use_host_header = is_affirmative(config['tls_use_host_header']) and 'Host' in headers
 
@@ -334,6 +428,33 @@ class RequestsWrapper(object):
         self.persist_connections = self.tls_use_host_header or is_affirmative(config['persist_connections'])
         self._session = None
 
+        # Instances connecting with the same settings may share the same connections, see `SessionPool`
+        self.shared_session_key = None
+        self.connection_pool_size = config['connection_pool_size']
+        self.connection_pool_idle_timeout = config['connection_pool_idle_timeout']
+        if is_affirmative(config['shared_connection_pool']):
+            if (
+                not isinstance(self.connection_pool_size, int)
+                or isinstance(self.connection_pool_size, bool)
+                or self.connection_pool_size < 1
+            ):
+                raise ConfigurationError('Setting `connection_pool_size` must be a positive integer')
+
+            try:
+                self.connection_pool_idle_timeout = float(self.connection_pool_idle_timeout)
+            except (TypeError, ValueError):
+                raise ConfigurationError('Setting `connection_pool_idle_timeout` must be a number')
+
+            self.persist_connections = True
+            self.shared_session_key = (
+                freeze({field: config[field] for field in SHARED_SESSION_KEY_FIELDS}),
+                cert,
+                verify,
+                freeze(proxies),
+                self.tls_use_host_header,
+                self.connection_pool_size,
+            )
+
         # Whether or not to log request information like method and url
         self.log_requests = is_affirmative(config['log_requests'])
 
@@ -432,7 +553,8 @@ class RequestsWrapper(object):
                 raise e
             # retry the connection via session object
             certadapter = CertAdapter(certs=certs)
-            if not persist:
+            # The adapter must not be mounted on a session shared with other instances
+            if not persist or self.shared_session_key is not None:
                 session = requests.Session()
                 for option, value in iteritems(self.options):
                     setattr(session, option, value)
@@ -525,6 +647,11 @@ class RequestsWrapper(object):
 
     @property
     def session(self):
+        if self.shared_session_key is not None:
+            return SHARED_SESSIONS.get(
+                self.shared_session_key, self.create_shared_session, self.connection_pool_idle_timeout
+            )
+
         if self._session is None:
             self._session = requests.Session()
 
@@ -542,6 +669,37 @@ class RequestsWrapper(object):
 
         return self._session
 
+    def create_shared_session(self):
+        session = requests.Session()
+
+        # Hosts are reached by many instances, so more of them and of their connections are kept
+        adapter_class = host_header_ssl.HostHeaderSSLAdapter if self.tls_use_host_header else HTTPAdapter
+        session.mount(
+            'https://',
+            adapter_class(pool_connections=SHARED_SESSION_MAX_HOSTS, pool_maxsize=self.connection_pool_size),
+        )
+        session.mount(
+            'http://', HTTPAdapter(pool_connections=SHARED_SESSION_MAX_HOSTS, pool_maxsize=self.connection_pool_size)
+        )
+        session.mount('{}://'.format(UDS_SCHEME), requests_unixsocket.UnixAdapter())
+
+        # Cookies set by the responses to an instance are not sent along with the requests of the others
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+
+        # Options are always sent along with every request rather than set on the session,
+        # so that no instance depends on the settings of the instance that created it
+        return session
+
+    @property
+    def connection_pool_stats(self):
+        """
+        The usage of the shared connection pool of this wrapper, or `None` if `shared_connection_pool` is disabled.
+        """
+        if self.shared_session_key is None:
+            return None
+
+        return SHARED_SESSIONS.get_stats(self.shared_session_key)
+
     def handle_auth_token(self, **request):
         if self.auth_token_handler is not None:
             self.auth_token_handler.poll(**request)
@@ -555,6 +713,110 @@ class RequestsWrapper(object):
             pass
 
 
+class SessionPool(object):
+    """
+    The sessions shared by the `RequestsWrapper` of every instance that enables `shared_connection_pool`,
+    keyed by the settings that decide whether connections may be reused, e.g. TLS, authentication and proxies.
+
+    Sessions that are not used for longer than their idle timeout are closed along with their connections.
+    """
+
+    # The minimum number of seconds between two searches for idle sessions
+    EVICTION_INTERVAL = 1
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key -> [session, idle timeout, last use, requests and connections of discarded host pools]
+        self.sessions = {}
+        self.last_eviction = 0
+
+    def get(self, key, create_session, idle_timeout):
+        now = get_timestamp()
+
+        with self.lock:
+            if now - self.last_eviction >= self.EVICTION_INTERVAL:
+                self.evict(now)
+
+            entry = self.sessions.get(key)
+            if entry is None:
+                entry = self.sessions[key] = [create_session(), idle_timeout, now, [0, 0]]
+                self.track_discarded_pools(entry)
+
+            entry[2] = now
+            return entry[0]
+
+    def evict(self, now):
+        self.last_eviction = now
+        for key, (session, idle_timeout, last_use, _) in list(iteritems(self.sessions)):
+            if now - last_use > idle_timeout:
+                del self.sessions[key]
+                session.close()
+
+    def get_stats(self, key):
+        """
+        Return the number of requests and of new connections (i.e. handshakes) since the session was created,
+        the ratio of requests that reused a connection and the number of idle connections.
+        """
+        with self.lock:
+            entry = self.sessions.get(key)
+            if entry is None:
+                return {'requests': 0, 'connections': 0, 'reuse_ratio': 0.0, 'idle_connections': 0}
+
+            requests_count, connections = entry[3]
+            idle_connections = 0
+            for pool in iter_connection_pools(entry[0]):
+                requests_count += pool.num_requests
+                connections += pool.num_connections
+                # The queue is filled with `None` until connections are actually created
+                if pool.pool is not None:
+                    idle_connections += sum(1 for connection in list(pool.pool.queue) if connection is not None)
+
+        return {
+            'requests': requests_count,
+            'connections': connections,
+            'reuse_ratio': 1 - connections / float(requests_count) if requests_count else 0.0,
+            'idle_connections': idle_connections,
+        }
+
+    @staticmethod
+    def track_discarded_pools(entry):
+        # Host pools are discarded when the session reaches too many hosts, keep their counts
+        def dispose(pool, dispose_func):
+            entry[3][0] += pool.num_requests
+            entry[3][1] += pool.num_connections
+            if dispose_func is not None:
+                dispose_func(pool)
+
+        for adapter in entry[0].adapters.values():
+            pool_manager = getattr(adapter, 'poolmanager', None)
+            if pool_manager is not None:
+                pool_manager.pools.dispose_func = partial(dispose, dispose_func=pool_manager.pools.dispose_func)
+
+    def clear(self):
+        with self.lock:
+            for session, _, _, _ in self.sessions.values():
+                session.close()
+
+            self.sessions.clear()
+
+
+def iter_connection_pools(session):
+    for adapter in session.adapters.values():
+        pool_managers = list(getattr(adapter, 'proxy_manager', {}).values())
+        pool_manager = getattr(adapter, 'poolmanager', None)
+        if pool_manager is not None:
+            pool_managers.append(pool_manager)
+
+        for pool_manager in pool_managers:
+            for pool_key in pool_manager.pools.keys():
+                pool = pool_manager.pools.get(pool_key)
+                if pool is not None:
+                    yield pool
+
+
+SHARED_SESSIONS = SessionPool()
+
+
 @contextmanager
 def handle_kerberos_keytab(keytab_file):
     # There are no keytab options in any wrapper libs. The env var will be
@@ -590,6 +852,36 @@ def handle_kerberos_cache(cache_file_path):
         os.environ['KRB5CCNAME'] = old_cache_path
 
 
+def get_accept_encoding(compression, logger):
+    """
+    Return the value of the `Accept-Encoding` header for the `compression` option, which is either
+    `auto` or `true` to negotiate every supported encoding, `false` to disable compression or a list of encodings.
+    """
+    if compression is True:
+        return ', '.join(SUPPORTED_CONTENT_ENCODINGS)
+    elif isinstance(compression, string_types):
+        if compression.lower() == 'auto':
+            return ', '.join(SUPPORTED_CONTENT_ENCODINGS)
+        elif compression.lower() in ('false', 'none'):
+            return 'identity'
+
+        compression = compression.split(',')
+    elif compression is False:
+        return 'identity'
+    elif not isinstance(compression, (list, tuple)):
+        raise ConfigurationError('Setting `compression` must be `auto`, `false` or an array of content encodings')
+
+    encodings = []
+    for encoding in compression:
+        encoding = str(encoding).strip().lower()
+        if encoding in SUPPORTED_CONTENT_ENCODINGS:
+            encodings.append(encoding)
+        else:
+            logger.warning('Unsupported content encoding `%s` configured, ignoring it.', encoding)
+
+    return ', '.join(encodings)
+
+
 def should_bypass_proxy(url, no_proxy_uris):
     # Accepts a URL and a list of no_proxy URIs
     # Returns True if URL should bypass the proxy.
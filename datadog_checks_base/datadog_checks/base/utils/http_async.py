@@ -0,0 +1,152 @@
+# (C) Datadog, Inc. 2023-present
+# All rights reserved
+# Licensed under a 3-clause BSD style license (see LICENSE)
+"""
+Run many HTTP requests concurrently with asyncio, from asynchronous code or from a synchronous `check` method.
+
+Requests are sent by a `RequestsWrapper` in a pool of threads, so every option such as authentication, TLS,
+proxies and timeouts behaves exactly the same as for sequential requests.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from .http import RequestsWrapper
+
+# The default maximum number of requests that are in flight at any time
+DEFAULT_CONCURRENCY = 16
+
+
+class AsyncRequestsWrapper:
+    """
+    The asyncio counterpart of `RequestsWrapper`, accepting the same configuration.
+
+    Connections are only reused when `persist_connections` or `shared_connection_pool` is enabled, in which case
+    `connection_pool_size` should be at least the concurrency.
+
+    Example usage from a check:
+
+    ```python
+    responses = self.async_http.gather(
+        [f'{self.base_url}/v1/health/service/{service}' for service in services], concurrency=32
+    )
+    for service, response in zip(services, responses):
+        if isinstance(response, Exception):
+            self.log.warning('Unable to get the health of service %s: %s', service, response)
+            continue
+        ...
+    ```
+    """
+
+    def __init__(self, instance=None, init_config=None, remapper=None, logger=None, http=None, concurrency=None):
+        if http is None:
+            http = RequestsWrapper(instance or {}, init_config or {}, remapper, logger)
+
+        if concurrency is None:
+            concurrency = DEFAULT_CONCURRENCY
+        elif not isinstance(concurrency, int) or isinstance(concurrency, bool) or concurrency < 1:
+            raise ValueError('The concurrency must be a positive integer')
+
+        self.http = http
+        self.concurrency = concurrency
+
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    @property
+    def executor(self):
+        # Threads are only started once needed and kept between runs
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.concurrency, thread_name_prefix='AsyncRequestsWrapper'
+                    )
+
+        return self._executor
+
+    async def request(self, method, url, **options):
+        """
+        Send a request without blocking the event loop, taking the same options as the methods of `RequestsWrapper`.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(getattr(self.http, method), url, **options))
+
+    async def get(self, url, **options):
+        return await self.request('get', url, **options)
+
+    async def post(self, url, **options):
+        return await self.request('post', url, **options)
+
+    async def head(self, url, **options):
+        return await self.request('head', url, **options)
+
+    async def put(self, url, **options):
+        return await self.request('put', url, **options)
+
+    async def patch(self, url, **options):
+        return await self.request('patch', url, **options)
+
+    async def delete(self, url, **options):
+        return await self.request('delete', url, **options)
+
+    async def options_method(self, url, **options):
+        return await self.request('options_method', url, **options)
+
+    async def gather_async(self, requests, concurrency=None, return_exceptions=True):
+        """
+        Send all `requests` with at most `concurrency` of them in flight at any time, defaulting to the
+        concurrency of this wrapper, and return their responses in the same order.
+
+        Every request is either a URL to GET or a tuple of the method, the URL and optionally a mapping of options.
+        With `return_exceptions`, failed requests return their exception rather than cancelling all others.
+        """
+        if concurrency is None or concurrency > self.concurrency:
+            concurrency = self.concurrency
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send(request):
+            method, url, options = parse_request(request)
+            async with semaphore:
+                return await self.request(method, url, **options)
+
+        return await asyncio.gather(*(send(request) for request in requests), return_exceptions=return_exceptions)
+
+    def gather(self, requests, concurrency=None, return_exceptions=True):
+        """
+        The synchronous version of `gather_async`, to be called from code that is not running in an event loop
+        such as the `check` method.
+        """
+        coroutine = self.gather_async(requests, concurrency=concurrency, return_exceptions=return_exceptions)
+
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coroutine)
+
+        # An event loop cannot be nested, so wait for another one in a separate thread
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, coroutine).result()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def __del__(self):  # no cov
+        try:
+            self.close()
+        except AttributeError:
+            # An error occurred during instantiation
+            pass
+
+
+def parse_request(request):
+    if isinstance(request, str):
+        return 'get', request, {}
+
+    method, url, *rest = request
+    options = dict(rest[0]) if rest else {}
+    return 'options_method' if method.lower() == 'options' else method.lower(), url, options
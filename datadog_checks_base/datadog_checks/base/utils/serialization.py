@@ -1,7 +1,12 @@
 # (C) Datadog, Inc. 2020-present
 # All rights reserved
 # Licensed under a 3-clause BSD style license (see LICENSE)
+import codecs
 import logging
+import re
+from json import JSONDecoder
+
+from six import string_types
 
 try:
     import orjson as json
@@ -17,4 +22,245 @@ except ImportError:
 logger = logging.getLogger(__name__)
 logger.debug('Using JSON implementation from %s', impl)
 
-__all__ = ['json']
+__all__ = ['dumps_chunked', 'iter_json_items', 'json']
+
+
+def dumps_chunked(payload, key, items, max_size=0, default=None):
+    """
+    Serialize the `payload` mapping to JSON with the list `items` under `key`, encoding one item at a time
+    rather than the whole structure at once.
+
+    When `max_size` is set, the items are spread over as many documents as needed for each one to be at most
+    `max_size` long, every document carrying all the other fields of `payload`. Items are never split, so a
+    single item that is larger than `max_size` still produces a document of its own. At least one document
+    is always generated.
+
+    Documents are `bytes` with orjson and `str` with the standard library, like `json.dumps`.
+    """
+    header = json.dumps(payload, default=default)
+    if isinstance(header, bytes):
+        separator, prefix_end, suffix = b',', b':[', b']}'
+    else:
+        separator, prefix_end, suffix = ',', ':[', ']}'
+
+    prefix = header[:-1] + (separator if payload else header[:0]) + json.dumps(key) + prefix_end
+    empty_size = len(prefix) + len(suffix)
+
+    chunk = []
+    size = empty_size
+    for item in items:
+        encoded_item = json.dumps(item, default=default)
+        if chunk and max_size and size + len(encoded_item) > max_size:
+            yield prefix + separator.join(chunk) + suffix
+            chunk = []
+            size = empty_size
+
+        chunk.append(encoded_item)
+        size += len(encoded_item) + len(separator)
+
+    yield prefix + separator.join(chunk) + suffix
+
+
+def iter_json_items(chunks, path=()):
+    """
+    Decode a JSON document from an iterable of `bytes` or `str` chunks, yielding the elements of the array
+    found at `path` as soon as each of them is complete rather than decoding the whole document at once.
+
+    `path` is a sequence of object keys leading to the array, the top-level value by default. If the value
+    at `path` is an object, its `(key, value)` pairs are yielded instead. Nothing is yielded when any of the keys
+    is missing, and the rest of the document is never read once the last element has been yielded.
+    """
+    if isinstance(path, string_types):
+        path = (path,)
+
+    reader = _JSONStreamReader(chunks)
+    for key in path:
+        reader.consume('{')
+        if reader.peek() == '}':
+            return
+
+        while True:
+            current_key = reader.decode_value()
+            reader.consume(':')
+            if current_key == key:
+                break
+
+            reader.decode_value()
+            if reader.consume(',}') == '}':
+                return
+
+    delimiter = reader.consume('[{')
+    end = ']' if delimiter == '[' else '}'
+    if reader.peek() == end:
+        return
+
+    while True:
+        if end == ']':
+            yield reader.decode_value()
+        else:
+            key = reader.decode_value()
+            reader.consume(':')
+            yield key, reader.decode_value()
+
+        if reader.consume(',' + end) == end:
+            return
+
+
+class _JSONStreamReader(object):
+    """
+    Read JSON values one at a time from an iterable of chunks. The end of every value is found by scanning each
+    chunk once, keeping the nesting depth and whether the scan is within a string across chunks, so that every
+    value is decoded once it is complete, in time linear in its size.
+    """
+
+    WHITESPACE = ' \t\n\r'
+    # The characters that change the nesting depth or start a string, outside of strings
+    STRUCTURE = re.compile(r'["\[\]{}]')
+    # The characters that end a string or escape the next character, within strings
+    STRING_SPECIAL = re.compile(r'["\\]')
+    # The first character after a number, `true`, `false` or `null`
+    SCALAR_END = re.compile(r'[^0-9A-Za-z.+\-]')
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = JSONDecoder()
+        self.unicode_decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = u''
+        self.position = 0
+        self.exhausted = False
+
+    def read(self):
+        """
+        Replace the buffer with what is left of it followed by the next chunk, returning whether there was any.
+        """
+        if self.exhausted:
+            return False
+
+        try:
+            chunk = next(self.chunks)
+        except StopIteration:
+            self.exhausted = True
+            data = self.unicode_decoder.decode(b'', True)
+        else:
+            data = self.unicode_decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+
+        # Drop what was already decoded
+        self.buffer = self.buffer[self.position :] + data
+        self.position = 0
+        return True
+
+    def peek(self):
+        """
+        Return the next character that is not whitespace without consuming it, or an empty string at the end.
+        """
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in self.WHITESPACE:
+                self.position += 1
+
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            elif not self.read():
+                return ''
+
+    def consume(self, expected):
+        character = self.peek()
+        if not character or character not in expected:
+            raise ValueError(
+                'Expecting one of `{}` at character {}, found: {!r}'.format(expected, self.position, character)
+            )
+
+        self.position += 1
+        return character
+
+    def decode_value(self):
+        character = self.peek()
+        if not character:
+            raise ValueError('Expecting value at character {}, found the end of the document'.format(self.position))
+
+        # The parts of the value found in previous chunks
+        parts = []
+        is_scalar = character not in '"[{'
+        state = [0, False, False]
+        while True:
+            end = self.scan_scalar() if is_scalar else self.scan_container(state)
+            if end is not None:
+                break
+
+            # The value continues in the next chunk, only its new part is scanned
+            parts.append(self.buffer[self.position :])
+            self.position = len(self.buffer)
+            if not self.read():
+                if not is_scalar:
+                    raise ValueError('Unterminated value at the end of the document')
+
+                end = self.position
+                break
+
+        parts.append(self.buffer[self.position : end])
+        text = u''.join(parts)
+        value, value_end = self.decoder.raw_decode(text)
+        if value_end != len(text):
+            raise ValueError('Extra data after value: {!r}'.format(text[value_end : value_end + 20]))
+
+        self.position = end
+        return value
+
+    def scan_scalar(self):
+        """
+        Return the end of the number, `true`, `false` or `null` starting at or continuing from the current
+        position, or `None` if it may continue in the next chunk.
+        """
+        match = self.SCALAR_END.search(self.buffer, self.position)
+        return match.start() if match else None
+
+    def scan_container(self, state):
+        """
+        Return the end of the string, array or object starting at or continuing from the current position,
+        or `None` if it continues in the next chunk. `state` holds the depth, and whether the scan is within
+        a string and right after an escape character.
+        """
+        depth, in_string, escaped = state
+        buffer = self.buffer
+        position = self.position
+        end = None
+        while True:
+            if in_string:
+                if escaped:
+                    if position >= len(buffer):
+                        break
+
+                    escaped = False
+                    position += 1
+                    continue
+
+                match = self.STRING_SPECIAL.search(buffer, position)
+                if match is None:
+                    break
+
+                position = match.end()
+                if match.group() == '\\':
+                    escaped = True
+                else:
+                    in_string = False
+                    if depth == 0:
+                        end = position
+                        break
+            else:
+                match = self.STRUCTURE.search(buffer, position)
+                if match is None:
+                    break
+
+                position = match.end()
+                character = match.group()
+                if character == '"':
+                    in_string = True
+                elif character in '[{':
+                    depth += 1
+                else:
+                    depth -= 1
+                    if depth <= 0:
+                        end = position
+                        break
+
+        state[:] = [depth, in_string, escaped]
+        return end
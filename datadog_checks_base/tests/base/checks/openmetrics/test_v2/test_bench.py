@@ -10,12 +10,16 @@ from datadog_checks.dev import get_here
 from datadog_checks.dev.testing import requires_py3
 
 from ..bench_utils import AMAZON_MSK_JMX_METRICS_MAP, AMAZON_MSK_JMX_METRICS_OVERRIDES
+from .utils import serve_payload
 
 pytestmark = [requires_py3]
 
 HERE = get_here()
 FIXTURE_PATH = os.path.abspath(os.path.join(os.path.dirname(HERE), '..', '..', '..', 'fixtures', 'prometheus'))
 
+# Number of endpoints scraped by a single check run in the process pool benchmark
+PROCESS_POOL_ENDPOINTS = 4
+
 
 @pytest.fixture
 def fixture_ksm():
@@ -82,3 +86,28 @@ def test_label_joins_new(benchmark, dd_run_check, mock_http_response, fixture_ks
     dd_run_check(c)
 
     benchmark(c.check, None)
+
+
+@pytest.mark.parametrize(
+    'process_pool_size',
+    [pytest.param(None, id='in-process')]
+    + [pytest.param(size, id=f'{size}-workers') for size in sorted({1, 2, 4, os.cpu_count() or 1})],
+)
+def test_process_pool_new(benchmark, dd_run_check, fixture_ksm, process_pool_size):
+    with open(fixture_ksm) as f:
+        payload = f.read()
+
+    with serve_payload(payload) as endpoint:
+        instance = {'openmetrics_endpoint': endpoint, 'namespace': 'bar', 'metrics': ['.+']}
+        if process_pool_size is not None:
+            instance.update(use_process_pool=True, process_pool_size=process_pool_size)
+
+        c = OpenMetricsBaseCheckV2('test', {}, [instance])
+        c.scraper_configs = [
+            dict(instance, openmetrics_endpoint=f'{endpoint}?scraper={i}') for i in range(PROCESS_POOL_ENDPOINTS)
+        ]
+
+        # Run once to get initialization steps, including starting the worker processes, out of the way.
+        dd_run_check(c)
+
+        benchmark(c.check, None)
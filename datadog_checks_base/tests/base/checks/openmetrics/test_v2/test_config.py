@@ -428,3 +428,20 @@ class TestUseLatestSpec:
         check.configure_scrapers()
         scraper = check.scrapers['test']
         assert scraper.http.options['headers']['Accept'] == 'text/plain'
+
+
+class TestTagCacheSize:
+    @pytest.mark.parametrize('value', ['10', -1, True])
+    def test_not_non_negative_integer(self, dd_run_check, value):
+        check = get_check({'tag_cache_size': value})
+
+        with pytest.raises(Exception, match='^Setting `tag_cache_size` must be a non-negative integer$'):
+            dd_run_check(check, extract_message=True)
+
+
+class TestUseFastParser:
+    def test_latest_spec(self, dd_run_check):
+        check = get_check({'use_fast_parser': True, 'use_latest_spec': True})
+
+        with pytest.raises(Exception, match='^Setting `use_fast_parser` cannot be used with `use_latest_spec`$'):
+            dd_run_check(check, extract_message=True)
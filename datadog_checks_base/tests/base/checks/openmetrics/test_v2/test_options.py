@@ -3,11 +3,15 @@
 # Licensed under a 3-clause BSD style license (see LICENSE)
 import pytest
 from mock import Mock
+from prometheus_client.parser import _parse_sample
 
+from datadog_checks.base import OpenMetricsBaseCheckV2
+from datadog_checks.base.checks.openmetrics.v2.scraper import OpenMetricsScraper
 from datadog_checks.base.constants import ServiceCheck
+from datadog_checks.base.utils.http import SHARED_SESSIONS
 from datadog_checks.dev.testing import requires_py3
 
-from .utils import get_check
+from .utils import get_check, serve_payload
 
 pytestmark = [requires_py3]
 
@@ -320,6 +324,100 @@ class TestRawLineFilters:
         aggregator.assert_all_metrics_covered()
 
 
+class TestUseFastParser:
+    def test_same_output(self, aggregator, dd_run_check, mock_http_response):
+        payload = """
+            # HELP go_memstats_alloc_bytes Number of bytes allocated and still in use.
+            # TYPE go_memstats_alloc_bytes gauge
+            go_memstats_alloc_bytes{foo="bar"} 6.396288e+06
+            # HELP go_memstats_gc_sys_bytes Number of bytes used for garbage collection system metadata.
+            # TYPE go_memstats_gc_sys_bytes gauge
+            go_memstats_gc_sys_bytes{bar="foo"} 901120
+            go_memstats_gc_sys_bytes{bar="baz"} 901121
+            # HELP go_memstats_free_bytes Number of bytes free and available for use.
+            # TYPE go_memstats_free_bytes gauge
+            go_memstats_free_bytes{foo="bar"} 6.396288e+06
+            # HELP go_gc_duration_seconds_total A summary of the GC invocation durations.
+            # TYPE go_gc_duration_seconds_total counter
+            go_gc_duration_seconds_total 7
+            go_goroutines 30
+            """
+        instance = {
+            'metrics': ['go_memstats_.+', 'go_gc_duration_seconds'],
+            'exclude_metrics': ['^go_memstats_(alloc|free)_bytes$'],
+            'telemetry': True,
+        }
+
+        mock_http_response(payload)
+        dd_run_check(get_check(instance))
+        expected_metrics = {name: aggregator.metrics(name) for name in aggregator.metric_names}
+
+        aggregator.reset()
+        mock_http_response(payload)
+        dd_run_check(get_check(dict(instance, use_fast_parser=True)))
+
+        for name, metrics in expected_metrics.items():
+            assert sorted(aggregator.metrics(name)) == sorted(metrics), name
+
+        aggregator.assert_metric('test.go_memstats_gc_sys_bytes', 901120, tags=['endpoint:test', 'bar:foo'])
+        aggregator.assert_metric('test.go_memstats_gc_sys_bytes', 901121, tags=['endpoint:test', 'bar:baz'])
+        aggregator.assert_metric('test.go_gc_duration_seconds.count', 7, tags=['endpoint:test'])
+        aggregator.assert_metric('test.telemetry.metrics.input.count', 6, tags=['endpoint:test'])
+        aggregator.assert_metric('test.telemetry.metrics.ignored.count', 2, tags=['endpoint:test'])
+        aggregator.assert_metric('test.telemetry.metrics.processed.count', tags=['endpoint:test'])
+        aggregator.assert_metric('test.telemetry.payload.size', tags=['endpoint:test'])
+        aggregator.assert_all_metrics_covered()
+
+    def test_skips_parsing(self, dd_run_check, mock_http_response, mocker):
+        mock_http_response(
+            """
+            # HELP go_memstats_alloc_bytes Number of bytes allocated and still in use.
+            # TYPE go_memstats_alloc_bytes gauge
+            go_memstats_alloc_bytes{foo="bar"} 6.396288e+06
+            # HELP go_memstats_gc_sys_bytes Number of bytes used for garbage collection system metadata.
+            # TYPE go_memstats_gc_sys_bytes gauge
+            go_memstats_gc_sys_bytes{bar="foo"} 901120
+            """
+        )
+        parse_sample = mocker.patch(
+            'datadog_checks.base.checks.openmetrics.v2.parser._parse_sample', side_effect=_parse_sample
+        )
+        dd_run_check(get_check({'metrics': ['go_memstats_gc_sys_bytes'], 'use_fast_parser': True}))
+
+        assert parse_sample.call_count == 1
+        assert parse_sample.call_args[0][0] == 'go_memstats_gc_sys_bytes{bar="foo"} 901120'
+
+    def test_share_labels_from_excluded_metric(self, aggregator, dd_run_check, mock_http_response):
+        mock_http_response(
+            """
+            # HELP go_memstats_alloc_bytes Number of bytes allocated and still in use.
+            # TYPE go_memstats_alloc_bytes gauge
+            go_memstats_alloc_bytes{foo="bar",baz="foo"} 6.396288e+06
+            # HELP go_memstats_gc_sys_bytes Number of bytes used for garbage collection system metadata.
+            # TYPE go_memstats_gc_sys_bytes gauge
+            go_memstats_gc_sys_bytes{bar="foo"} 901120
+            """
+        )
+        check = get_check(
+            {
+                'metrics': ['.+'],
+                'exclude_metrics': ['go_memstats_alloc_bytes'],
+                'share_labels': {'go_memstats_alloc_bytes': {'labels': ['baz']}},
+                'use_fast_parser': True,
+            }
+        )
+        dd_run_check(check)
+
+        aggregator.assert_metric(
+            'test.go_memstats_gc_sys_bytes',
+            901120,
+            metric_type=aggregator.GAUGE,
+            tags=['endpoint:test', 'bar:foo', 'baz:foo'],
+        )
+
+        aggregator.assert_all_metrics_covered()
+
+
 class TestMetrics:
     def test_unknown_type_override(self, aggregator, dd_run_check, mock_http_response):
         mock_http_response(
@@ -684,6 +782,494 @@ class TestShareLabels:
 
         aggregator.assert_all_metrics_covered()
 
+    @pytest.mark.parametrize('cache_shared_labels', [True, False])
+    def test_match_multiple_label_sets(self, aggregator, dd_run_check, mock_http_response, cache_shared_labels):
+        mock_http_response(
+            """
+            # HELP kube_pod_labels Kubernetes labels converted to Prometheus labels.
+            # TYPE kube_pod_labels gauge
+            kube_pod_labels{namespace="default",pod="web-1",label_app="web"} 1
+            kube_pod_labels{namespace="default",pod="db-1",label_app="db"} 1
+            kube_pod_labels{namespace="kube-system",pod="web-1",label_app="dns"} 1
+            # HELP kube_namespace_labels Kubernetes labels converted to Prometheus labels.
+            # TYPE kube_namespace_labels gauge
+            kube_namespace_labels{namespace="default",label_team="core",label_app="default"} 1
+            kube_namespace_labels{label_env="prod"} 1
+            # HELP kube_pod_status_ready Describes whether the pod is ready to serve requests.
+            # TYPE kube_pod_status_ready gauge
+            kube_pod_status_ready{namespace="default",pod="web-1"} 1
+            kube_pod_status_ready{namespace="kube-system",pod="web-1"} 0
+            kube_pod_status_ready{namespace="default",pod="api-1"} 1
+            """
+        )
+        check = get_check(
+            {
+                'metrics': ['kube_pod_status_ready'],
+                'share_labels': {
+                    'kube_pod_labels': {'match': ['namespace', 'pod'], 'labels': ['label_app']},
+                    'kube_namespace_labels': {'match': ['namespace']},
+                },
+                'cache_shared_labels': cache_shared_labels,
+            }
+        )
+        dd_run_check(check)
+
+        # Shared labels of later matching label sets take precedence
+        aggregator.assert_metric(
+            'test.kube_pod_status_ready',
+            1,
+            tags=[
+                'endpoint:test',
+                'namespace:default',
+                'pod:web-1',
+                'label_app:default',
+                'label_team:core',
+                'label_env:prod',
+            ],
+        )
+        aggregator.assert_metric(
+            'test.kube_pod_status_ready',
+            0,
+            tags=['endpoint:test', 'namespace:kube-system', 'pod:web-1', 'label_app:dns', 'label_env:prod'],
+        )
+        aggregator.assert_metric(
+            'test.kube_pod_status_ready',
+            1,
+            tags=[
+                'endpoint:test',
+                'namespace:default',
+                'pod:api-1',
+                'label_app:default',
+                'label_team:core',
+                'label_env:prod',
+            ],
+        )
+        aggregator.assert_all_metrics_covered()
+
+    @pytest.mark.parametrize('cache_shared_labels', [True, False])
+    def test_telemetry(self, aggregator, dd_run_check, mock_http_response, cache_shared_labels):
+        mock_http_response(
+            """
+            # HELP kube_pod_labels Kubernetes labels converted to Prometheus labels.
+            # TYPE kube_pod_labels gauge
+            kube_pod_labels{pod="web-1",label_app="web"} 1
+            kube_pod_labels{pod="db-1",label_app="db"} 1
+            # HELP kube_pod_status_ready Describes whether the pod is ready to serve requests.
+            # TYPE kube_pod_status_ready gauge
+            kube_pod_status_ready{pod="web-1"} 1
+            kube_pod_status_ready{pod="api-1"} 1
+            """
+        )
+        check = get_check(
+            {
+                'metrics': ['kube_pod_status_ready'],
+                'share_labels': {'kube_pod_labels': {'match': ['pod']}},
+                'cache_shared_labels': cache_shared_labels,
+                'telemetry': True,
+            }
+        )
+        for _ in range(2):
+            aggregator.reset()
+            dd_run_check(check)
+
+            aggregator.assert_metric('test.telemetry.shared_labels.lookups', 2, tags=['endpoint:test'])
+            aggregator.assert_metric('test.telemetry.shared_labels.matches', 1, tags=['endpoint:test'])
+            aggregator.assert_metric('test.telemetry.shared_labels.index.size', 2, tags=['endpoint:test'])
+
+
+class TestTagCache:
+    def test_same_output(self, aggregator, dd_run_check, mock_http_response):
+        payload = """
+            # HELP go_memstats_alloc_bytes Number of bytes allocated and still in use.
+            # TYPE go_memstats_alloc_bytes gauge
+            go_memstats_alloc_bytes{foo="bar",baz="bat",node="foo"} 6.396288e+06
+            go_memstats_alloc_bytes{foo="bat",baz="bat",node="bar"} 6.396288e+06
+            # HELP etcd_request_duration_seconds The latency distributions of requests.
+            # TYPE etcd_request_duration_seconds histogram
+            etcd_request_duration_seconds_bucket{foo="bar",le="0.5"} 2
+            etcd_request_duration_seconds_bucket{foo="bar",le="+Inf"} 4
+            etcd_request_duration_seconds_sum{foo="bar"} 1.5
+            etcd_request_duration_seconds_count{foo="bar"} 4
+            """
+        instance = {
+            'metrics': ['.+'],
+            'exclude_labels': ['baz'],
+            'rename_labels': {'foo': 'qux'},
+            'exclude_metrics_by_labels': {'foo': ['bat']},
+            'hostname_label': 'node',
+            'histogram_buckets_as_distributions': True,
+        }
+
+        def collect(check):
+            runs = []
+            for _ in range(2):
+                aggregator.reset()
+                mock_http_response(payload)
+                dd_run_check(check)
+                runs.append(
+                    (
+                        {name: aggregator.metrics(name) for name in aggregator.metric_names},
+                        dict(aggregator._histogram_buckets),
+                    )
+                )
+
+            return runs
+
+        assert collect(get_check(dict(instance, tag_cache_size=10))) == collect(get_check(instance))
+
+    def test_telemetry(self, aggregator, dd_run_check, mock_http_response):
+        mock_http_response(
+            """
+            # HELP go_memstats_alloc_bytes Number of bytes allocated and still in use.
+            # TYPE go_memstats_alloc_bytes gauge
+            go_memstats_alloc_bytes{foo="bar"} 6.396288e+06
+            go_memstats_alloc_bytes{foo="baz"} 6.396288e+06
+            go_memstats_alloc_bytes{foo="bat"} 6.396288e+06
+            """
+        )
+        check = get_check({'metrics': ['.+'], 'tag_cache_size': 2, 'telemetry': True})
+        dd_run_check(check)
+
+        aggregator.assert_metric('test.telemetry.tag_cache.hits', 0, tags=['endpoint:test'])
+        aggregator.assert_metric('test.telemetry.tag_cache.misses', 3, tags=['endpoint:test'])
+        aggregator.assert_metric('test.telemetry.tag_cache.size', 2, tags=['endpoint:test'])
+
+        aggregator.reset()
+        dd_run_check(check)
+
+        # Least recently used entries are evicted first
+        aggregator.assert_metric('test.telemetry.tag_cache.hits', 0, tags=['endpoint:test'])
+        aggregator.assert_metric('test.telemetry.tag_cache.misses', 3, tags=['endpoint:test'])
+
+    def test_hits(self, aggregator, dd_run_check, mock_http_response):
+        mock_http_response(
+            """
+            # HELP go_memstats_alloc_bytes Number of bytes allocated and still in use.
+            # TYPE go_memstats_alloc_bytes gauge
+            go_memstats_alloc_bytes{foo="bar"} 6.396288e+06
+            go_memstats_alloc_bytes{foo="baz"} 6.396288e+06
+            go_memstats_alloc_bytes{foo="bar"} 6.396288e+06
+            """
+        )
+        check = get_check({'metrics': ['.+'], 'tag_cache_size': 2, 'telemetry': True})
+        dd_run_check(check)
+
+        aggregator.assert_metric('test.telemetry.tag_cache.hits', 1, tags=['endpoint:test'])
+        aggregator.assert_metric('test.telemetry.tag_cache.misses', 2, tags=['endpoint:test'])
+
+        aggregator.reset()
+        dd_run_check(check)
+
+        aggregator.assert_metric('test.telemetry.tag_cache.hits', 3, tags=['endpoint:test'])
+        aggregator.assert_metric('test.telemetry.tag_cache.misses', 0, tags=['endpoint:test'])
+        aggregator.assert_metric('test.go_memstats_alloc_bytes', 6396288, tags=['endpoint:test', 'foo:bar'], count=2)
+        aggregator.assert_metric('test.go_memstats_alloc_bytes', 6396288, tags=['endpoint:test', 'foo:baz'], count=1)
+
+
+class TestCacheMetricFamilies:
+    PAYLOAD = """
+        # HELP go_memstats_alloc_bytes Number of bytes allocated and still in use.
+        # TYPE go_memstats_alloc_bytes gauge
+        go_memstats_alloc_bytes{foo="bar",node="host1"} 6.396288e+06
+        go_memstats_alloc_bytes{foo="baz",node="host2"} 6.396288e+06
+        # HELP go_gc_count_total Number of garbage collections.
+        # TYPE go_gc_count_total counter
+        go_gc_count_total{foo="bar"} 42
+        # HELP etcd_request_duration_seconds The latency distributions of requests.
+        # TYPE etcd_request_duration_seconds histogram
+        etcd_request_duration_seconds_bucket{foo="bar",le="0.5"} 2
+        etcd_request_duration_seconds_bucket{foo="bar",le="1.0"} 3
+        etcd_request_duration_seconds_bucket{foo="bar",le="+Inf"} 4
+        etcd_request_duration_seconds_sum{foo="bar"} 1.5
+        etcd_request_duration_seconds_count{foo="bar"} 4
+        # HELP info_labels Labels to share.
+        # TYPE info_labels gauge
+        info_labels{foo="bar",team="core"} 1
+        """
+
+    @pytest.mark.parametrize('use_fast_parser', [False, True])
+    def test_same_output(self, aggregator, dd_run_check, mock_http_response, use_fast_parser):
+        payloads = [
+            self.PAYLOAD,
+            self.PAYLOAD,
+            self.PAYLOAD.replace('go_gc_count_total{foo="bar"} 42', 'go_gc_count_total{foo="bar"} 50'),
+            self.PAYLOAD.replace('team="core"', 'team="agent"'),
+        ]
+        instance = {
+            'metrics': ['.+'],
+            'exclude_metrics': ['info_labels'],
+            'rename_labels': {'foo': 'qux'},
+            'hostname_label': 'node',
+            'share_labels': {'info_labels': {'match': ['foo'], 'labels': ['team']}},
+            'histogram_buckets_as_distributions': True,
+            'use_fast_parser': use_fast_parser,
+        }
+
+        def collect(check):
+            runs = []
+            for payload in payloads:
+                aggregator.reset()
+                mock_http_response(payload)
+                dd_run_check(check)
+                runs.append(
+                    (
+                        {name: aggregator.metrics(name) for name in aggregator.metric_names},
+                        dict(aggregator._histogram_buckets),
+                    )
+                )
+
+            return runs
+
+        assert collect(get_check(dict(instance, cache_metric_families=True))) == collect(get_check(instance))
+
+        instance['cache_shared_labels'] = False
+        assert collect(get_check(dict(instance, cache_metric_families=True))) == collect(get_check(instance))
+
+    def test_telemetry(self, aggregator, dd_run_check, mock_http_response):
+        check = get_check({'metrics': ['.+'], 'cache_metric_families': True, 'telemetry': True})
+        mock_http_response(self.PAYLOAD)
+        dd_run_check(check)
+
+        aggregator.assert_metric('test.telemetry.family_cache.hits', 0, tags=['endpoint:test'])
+        aggregator.assert_metric('test.telemetry.family_cache.misses', 4, tags=['endpoint:test'])
+        aggregator.assert_metric('test.telemetry.family_cache.sample_data.hits', 0, tags=['endpoint:test'])
+        aggregator.assert_metric('test.telemetry.family_cache.sample_data.misses', 4, tags=['endpoint:test'])
+
+        aggregator.reset()
+        mock_http_response(self.PAYLOAD.replace('go_gc_count_total{foo="bar"} 42', 'go_gc_count_total{foo="bar"} 50'))
+        dd_run_check(check)
+
+        aggregator.assert_metric('test.telemetry.family_cache.hits', 3, tags=['endpoint:test'])
+        aggregator.assert_metric('test.telemetry.family_cache.misses', 1, tags=['endpoint:test'])
+        aggregator.assert_metric('test.telemetry.family_cache.sample_data.hits', 3, tags=['endpoint:test'])
+        aggregator.assert_metric('test.telemetry.family_cache.sample_data.misses', 1, tags=['endpoint:test'])
+        aggregator.assert_metric('test.telemetry.family_cache.not_modified', 0, tags=['endpoint:test'])
+        aggregator.assert_metric('test.go_gc_count.count', 50, tags=['endpoint:test', 'foo:bar'])
+
+    def test_not_modified(self, aggregator, dd_run_check, mock_http_response):
+        check = get_check({'metrics': ['.+'], 'cache_metric_families': True, 'telemetry': True})
+        mock_http_response(self.PAYLOAD, headers={'ETag': '"v1"'})
+        dd_run_check(check)
+
+        aggregator.reset()
+        mock_request = mock_http_response('', status_code=304, headers={'ETag': '"v1"'})
+        dd_run_check(check)
+
+        assert mock_request.call_args.kwargs['headers']['If-None-Match'] == '"v1"'
+        aggregator.assert_metric('test.telemetry.family_cache.not_modified', 1, tags=['endpoint:test'])
+        aggregator.assert_metric('test.telemetry.family_cache.hits', 4, tags=['endpoint:test'])
+        aggregator.assert_metric(
+            'test.go_memstats_alloc_bytes', 6396288, tags=['endpoint:test', 'foo:bar', 'node:host1']
+        )
+        aggregator.assert_metric('test.etcd_request_duration_seconds.count', 4, tags=['endpoint:test', 'foo:bar'])
+        aggregator.assert_service_check('test.openmetrics.health', ServiceCheck.OK, tags=['endpoint:test'])
+
+    @pytest.mark.parametrize('use_fast_parser', [False, True])
+    def test_not_modified_untyped_families_with_same_name(
+        self, aggregator, dd_run_check, mock_http_response, use_fast_parser
+    ):
+        check = get_check(
+            {
+                'metrics': [{'foo': {'type': 'gauge'}, 'bar': {'type': 'gauge'}}],
+                'cache_metric_families': True,
+                'use_fast_parser': use_fast_parser,
+            }
+        )
+        mock_http_response('foo{a="1"} 1\nfoo{a="2"} 2\nbar 3\n', headers={'ETag': '"v1"'})
+        dd_run_check(check)
+
+        for _ in range(2):
+            aggregator.reset()
+            mock_http_response('', status_code=304, headers={'ETag': '"v1"'})
+            dd_run_check(check)
+
+            aggregator.assert_metric('test.foo', 1, tags=['endpoint:test', 'a:1'])
+            aggregator.assert_metric('test.foo', 2, tags=['endpoint:test', 'a:2'])
+            aggregator.assert_metric('test.bar', 3, tags=['endpoint:test'])
+            aggregator.assert_all_metrics_covered()
+
+    def test_use_latest_spec(self, dd_run_check):
+        check = get_check({'metrics': ['.+'], 'cache_metric_families': True, 'use_latest_spec': True})
+
+        with pytest.raises(Exception, match='^Setting `cache_metric_families` cannot be used with `use_latest_spec`$'):
+            dd_run_check(check, extract_message=True)
+
+
+class TestSharedConnectionPool:
+    def test_telemetry(self, aggregator, dd_run_check):
+        payload = """
+            # HELP go_memstats_alloc_bytes Number of bytes allocated and still in use.
+            # TYPE go_memstats_alloc_bytes gauge
+            go_memstats_alloc_bytes{foo="bar"} 6.396288e+06
+            """
+
+        with serve_payload(payload) as endpoint:
+            checks = [
+                get_check(
+                    {
+                        'openmetrics_endpoint': endpoint,
+                        'metrics': ['.+'],
+                        'shared_connection_pool': True,
+                        'skip_proxy': True,
+                        'telemetry': True,
+                    }
+                )
+                for _ in range(2)
+            ]
+            try:
+                for check in checks:
+                    dd_run_check(check)
+            finally:
+                SHARED_SESSIONS.clear()
+
+        tags = [f'endpoint:{endpoint}']
+        aggregator.assert_metric('test.go_memstats_alloc_bytes', 6396288, tags=[*tags, 'foo:bar'], count=2)
+        aggregator.assert_metric('test.telemetry.connection_pool.requests', 1, tags=tags)
+        aggregator.assert_metric('test.telemetry.connection_pool.requests', 2, tags=tags)
+        aggregator.assert_metric('test.telemetry.connection_pool.handshakes', tags=tags, count=2)
+        aggregator.assert_metric('test.telemetry.connection_pool.reuse_ratio', tags=tags, count=2)
+        aggregator.assert_metric('test.telemetry.connection_pool.idle_connections', tags=tags, count=2)
+
+
+class HookScraper(OpenMetricsScraper):
+    def generate_sample_data(self, metric):
+        for sample, tags, hostname in super().generate_sample_data(metric):
+            yield sample, tags + self.check.get_hook_tags(), hostname
+
+
+class HookCheck(OpenMetricsBaseCheckV2):
+    def create_scraper(self, config):
+        return HookScraper(self, self.get_config_with_defaults(config))
+
+    def get_hook_tags(self):
+        return ['hook:check']
+
+
+class TestUseProcessPool:
+    PAYLOAD = """
+        # HELP go_memstats_alloc_bytes Number of bytes allocated and still in use.
+        # TYPE go_memstats_alloc_bytes gauge
+        go_memstats_alloc_bytes{foo="bar",node="host1"} 6.396288e+06
+        go_memstats_alloc_bytes{foo="baz",node="host2"} 6.396288e+06
+        # HELP go_gc_count_total Number of garbage collections.
+        # TYPE go_gc_count_total counter
+        go_gc_count_total{foo="bar"} 42
+        # HELP etcd_request_duration_seconds The latency distributions of requests.
+        # TYPE etcd_request_duration_seconds histogram
+        etcd_request_duration_seconds_bucket{foo="bar",le="0.5"} 2
+        etcd_request_duration_seconds_bucket{foo="bar",le="+Inf"} 4
+        etcd_request_duration_seconds_sum{foo="bar"} 1.5
+        etcd_request_duration_seconds_count{foo="bar"} 4
+        # HELP info_labels Labels to share.
+        # TYPE info_labels gauge
+        info_labels{foo="bar",team="core"} 1
+        """
+
+    def test_same_output(self, aggregator, dd_run_check):
+        instance = {
+            'metrics': ['.+'],
+            'exclude_metrics': ['info_labels'],
+            'rename_labels': {'foo': 'qux'},
+            'hostname_label': 'node',
+            'share_labels': {'info_labels': {'match': ['foo'], 'labels': ['team']}},
+            'telemetry': True,
+            'tags': ['static:tag'],
+        }
+
+        def collect(check):
+            runs = []
+            for _ in range(2):
+                aggregator.reset()
+                dd_run_check(check)
+                runs.append(
+                    (
+                        {name: aggregator.metrics(name) for name in aggregator.metric_names},
+                        {name: aggregator.service_checks(name) for name in aggregator.service_check_names},
+                    )
+                )
+
+            return runs
+
+        with serve_payload(self.PAYLOAD) as endpoint:
+            expected = collect(get_check(dict(instance, openmetrics_endpoint=endpoint)))
+            actual = collect(
+                get_check(dict(instance, openmetrics_endpoint=endpoint, use_process_pool=True, process_pool_size=1))
+            )
+
+        assert actual == expected
+        aggregator.assert_metric(
+            'test.go_memstats_alloc_bytes',
+            tags=[f'endpoint:{endpoint}', 'static:tag', 'qux:bar', 'node:host1', 'team:core'],
+        )
+
+    def test_custom_transformer(self, aggregator, dd_run_check):
+        with serve_payload(self.PAYLOAD) as endpoint:
+            check = get_check(
+                {'openmetrics_endpoint': endpoint, 'metrics': [], 'use_process_pool': True, 'process_pool_size': 1}
+            )
+            dd_run_check(check)
+
+            def transformer(metric, sample_data, runtime_data):
+                for sample, tags, hostname in sample_data:
+                    check.gauge('custom', sample.value, tags=tags, hostname=hostname)
+
+            check.scrapers[endpoint].metric_transformer.add_custom_transformer('go_gc_count', transformer)
+            aggregator.reset()
+            dd_run_check(check)
+
+        aggregator.assert_metric('test.custom', 42, tags=[f'endpoint:{endpoint}', 'foo:bar'])
+        aggregator.assert_all_metrics_covered()
+
+    def test_check_subclass(self, aggregator, dd_run_check):
+        with serve_payload(self.PAYLOAD) as endpoint:
+            instance = {'openmetrics_endpoint': endpoint, 'metrics': ['go_gc_count'], 'use_process_pool': True}
+            check = HookCheck('test', {}, [instance])
+            check.__NAMESPACE__ = 'test'
+            dd_run_check(check)
+
+        aggregator.assert_metric('test.go_gc_count.count', 42, tags=[f'endpoint:{endpoint}', 'foo:bar', 'hook:check'])
+        aggregator.assert_all_metrics_covered()
+
+    def test_error(self, aggregator, dd_run_check):
+        with serve_payload(self.PAYLOAD) as endpoint:
+            pass
+
+        check = get_check({'openmetrics_endpoint': endpoint, 'metrics': ['.+'], 'use_process_pool': True})
+        with pytest.raises(Exception, match='There was an error scraping endpoint'):
+            dd_run_check(check)
+
+        aggregator.assert_service_check('test.openmetrics.health', ServiceCheck.CRITICAL, tags=[f'endpoint:{endpoint}'])
+
+    def test_error_multiple_endpoints(self, aggregator, dd_run_check):
+        with serve_payload(self.PAYLOAD) as unavailable_endpoint:
+            pass
+
+        with serve_payload(self.PAYLOAD) as endpoint:
+            instance = {'openmetrics_endpoint': endpoint, 'metrics': ['.+'], 'use_process_pool': True}
+            check = get_check(instance)
+            check.scraper_configs = [dict(instance, openmetrics_endpoint=unavailable_endpoint), instance]
+
+            # The scrape scheduled for the second endpoint must not break the next runs
+            for _ in range(2):
+                with pytest.raises(Exception, match='There was an error scraping endpoint'):
+                    dd_run_check(check)
+
+                assert all(scraper.scheduled_scrape is None for scraper in check.scrapers.values())
+
+            check.scraper_configs = [instance]
+            check.configure_scrapers()
+            aggregator.reset()
+            dd_run_check(check)
+
+        aggregator.assert_metric('test.go_gc_count.count', 42, tags=[f'endpoint:{endpoint}', 'foo:bar'])
+
+    @pytest.mark.parametrize('process_pool_size', [-1, True, '2'])
+    def test_invalid_process_pool_size(self, dd_run_check, process_pool_size):
+        check = get_check({'metrics': ['.+'], 'use_process_pool': True, 'process_pool_size': process_pool_size})
+
+        with pytest.raises(Exception, match='^Setting `process_pool_size` must be a non-negative integer$'):
+            dd_run_check(check, extract_message=True)
+
 
 class TestIgnoreTags:
     def test_simple_match(self, aggregator, dd_run_check, mock_http_response):
@@ -1,6 +1,10 @@
 # (C) Datadog, Inc. 2020-present
 # All rights reserved
 # Licensed under a 3-clause BSD style license (see LICENSE)
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
 from datadog_checks.base import OpenMetricsBaseCheckV2
 
 
@@ -19,3 +23,32 @@ def _get_check(cls, instance, init_config):
     check.__NAMESPACE__ = 'test'
 
     return check
+
+
+@contextmanager
+def serve_payload(payload):
+    """
+    Serve a payload over HTTP for code running in other processes, where requests cannot be mocked.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            content = payload.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    try:
+        yield f'http://127.0.0.1:{server.server_port}/metrics'
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -5,6 +5,7 @@
 # Licensed under a 3-clause BSD style license (see LICENSE)
 import json
 import logging
+import re
 from typing import Any
 
 import mock
@@ -457,6 +458,91 @@ class TestMetrics:
         aggregator.assert_metric(metric_name, count=0)
 
 
+class TestMetricsBatch:
+    def test_same_as_individual_submissions(self, aggregator):
+        check = AgentCheck('test', {}, [{'metric_patterns': {'exclude': ['bar$']}}])
+        check.__NAMESPACE__ = 'test'
+        shared_tags = ['foo:bar', b'baz:bat']
+
+        check.submit_metrics_batch(
+            'monotonic_count',
+            ['foo', 'bar', 'foo', 'baz'],
+            [1, 2, None, '4'],
+            [shared_tags, shared_tags, shared_tags, None],
+            ['host1', 'host2', 'host3', None],
+            flush_first_value=True,
+        )
+
+        aggregator.assert_metric(
+            'test.foo',
+            1,
+            metric_type=aggregator.MONOTONIC_COUNT,
+            tags=['foo:bar', 'baz:bat'],
+            hostname='host1',
+            flush_first_value=True,
+            count=1,
+        )
+        aggregator.assert_metric(
+            'test.baz', 4, metric_type=aggregator.MONOTONIC_COUNT, tags=[], hostname='', flush_first_value=True
+        )
+        aggregator.assert_all_metrics_covered()
+
+    def test_shared_name_and_hostname(self, aggregator):
+        check = AgentCheck()
+
+        check.submit_metrics_batch('gauge', 'metric', [1, 2], [['a:b'], ['c:d']], 'host', raw=True)
+
+        aggregator.assert_metric('metric', 1, metric_type=aggregator.GAUGE, tags=['a:b'], hostname='host')
+        aggregator.assert_metric('metric', 2, metric_type=aggregator.GAUGE, tags=['c:d'], hostname='host')
+        aggregator.assert_all_metrics_covered()
+
+    def test_tags_normalized_once(self, mocker):
+        check = AgentCheck()
+        normalize_tags_type = mocker.spy(check, '_normalize_tags_type')
+        shared_tags = ['foo:bar']
+
+        check.submit_metrics_batch('rate', ['foo', 'bar', 'baz'], [1, 2, 3], [shared_tags, shared_tags, ['a:b']])
+
+        assert normalize_tags_type.call_count == 2
+
+    def test_tags_generator(self, aggregator):
+        check = AgentCheck()
+        shared_tags = ['shared:true']
+
+        def tags_list():
+            # Fresh lists are freed right after their metric is submitted, so their identities get reused
+            for i in range(200):
+                yield shared_tags if i % 2 else ['i:{}'.format(i)]
+
+        check.submit_metrics_batch('gauge', 'metric', range(200), tags_list())
+
+        for i in range(200):
+            aggregator.assert_metric('metric', i, tags=shared_tags if i % 2 else ['i:{}'.format(i)], count=1)
+        aggregator.assert_all_metrics_covered()
+
+    def test_unknown_type(self):
+        check = AgentCheck()
+
+        with pytest.raises(ValueError, match='^Unknown submission method `foo` for batch submission$'):
+            check.submit_metrics_batch('foo', 'metric', [1])
+
+    def test_non_float_metric(self, aggregator):
+        check = AgentCheck()
+
+        with pytest.raises(ValueError):
+            check.submit_metrics_batch('gauge', 'metric', ['85k'])
+
+        aggregator.assert_metric('metric', count=0)
+
+    def test_metric_limit(self, aggregator):
+        check = LimitedCheck()
+
+        check.submit_metrics_batch('gauge', 'metric', [0] * 20)
+
+        assert len(check.get_warnings()) == 1
+        assert len(aggregator.metrics('metric')) == 10
+
+
 class TestEvents:
     def test_valid_event(self, aggregator):
         check = AgentCheck()
@@ -773,6 +859,77 @@ class TestTags:
         AgentCheck('myintegration', {}, [instance])
         assert expected_log in caplog.text
 
+    def test_metric_name_cache(self, aggregator, mocker):
+        check = AgentCheck('myintegration', {}, [{'metric_patterns': {'exclude': ['bar$']}}])
+        check.__NAMESPACE__ = 'ns'
+        should_send_metric = mocker.spy(check, 'should_send_metric')
+
+        for _ in range(3):
+            check.gauge('foo', 0)
+            check.gauge('bar', 0)
+
+        assert should_send_metric.call_count == 2
+        aggregator.assert_metric('ns.foo', count=3)
+        aggregator.assert_metric('ns.bar', count=0)
+
+    def test_metric_name_cache_namespace_change(self, aggregator):
+        check = AgentCheck('myintegration', {}, [{}])
+        check.gauge('foo', 0)
+
+        check.__NAMESPACE__ = 'ns'
+        check.gauge('foo', 0)
+        check.gauge('foo', 0, raw=True)
+
+        aggregator.assert_metric('foo', count=2)
+        aggregator.assert_metric('ns.foo', count=1)
+
+    def test_metric_name_cache_pattern_change(self, aggregator):
+        check = AgentCheck('myintegration', {}, [{}])
+        check.gauge('foo', 0)
+
+        check.exclude_metrics_pattern = re.compile('foo')
+        check.gauge('foo', 0)
+        assert len(aggregator.metrics('foo')) == 1
+
+        check.exclude_metrics_pattern = None
+        check.include_metrics_pattern = re.compile('bar')
+        check.gauge('foo', 0)
+        check.gauge('bar', 0)
+        assert len(aggregator.metrics('foo')) == 1
+        assert len(aggregator.metrics('bar')) == 1
+
+    def test_metric_name_cache_bounded(self, aggregator):
+        check = AgentCheck('myintegration', {}, [{}])
+        check.METRIC_NAME_CACHE_SIZE = 5
+
+        for i in range(12):
+            check.gauge('metric{}'.format(i), 0)
+
+        assert len(check._metric_name_cache) == 2
+        for i in range(12):
+            aggregator.assert_metric('metric{}'.format(i), count=1)
+
+    def test_metric_name_cache_debug_metrics(self, aggregator, dd_run_check):
+        class NameCacheCheck(AgentCheck):
+            def check(self, _):
+                for _ in range(4):
+                    self.gauge('foo', 0)
+
+        check = NameCacheCheck('test', {}, [{'debug_metrics': {'metric_name_cache': True}}])
+        dd_run_check(check)
+
+        aggregator.assert_metric('datadog.agent.metrics.name_cache.hits', 3)
+        aggregator.assert_metric('datadog.agent.metrics.name_cache.lookups', 4)
+        aggregator.assert_metric('datadog.agent.metrics.name_cache.hit_ratio', 0.75)
+        aggregator.assert_metric('datadog.agent.metrics.name_cache.size', 1)
+
+        aggregator.reset()
+        dd_run_check(check)
+
+        aggregator.assert_metric('datadog.agent.metrics.name_cache.hits', 4)
+        aggregator.assert_metric('datadog.agent.metrics.name_cache.lookups', 4)
+        aggregator.assert_metric('datadog.agent.metrics.name_cache.hit_ratio', 1)
+
 
 class LimitedCheck(AgentCheck):
     DEFAULT_METRIC_LIMIT = 10
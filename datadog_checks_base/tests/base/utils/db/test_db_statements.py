@@ -16,6 +16,7 @@ def add_to_dict(a, b):
     return a
 
 
+@pytest.mark.parametrize('columnar', [False, True])
 class TestStatementMetrics:
     @pytest.mark.parametrize(
         'fn_args',
@@ -25,13 +26,13 @@ class TestStatementMetrics:
             ([{}, {}, {}], [], lambda x: x.get('key')),
         ],
     )
-    def test_compute_derivative_rows_boundary_cases(self, fn_args):
-        sm = StatementMetrics()
+    def test_compute_derivative_rows_boundary_cases(self, fn_args, columnar):
+        sm = StatementMetrics(columnar=columnar)
         sm.compute_derivative_rows(*fn_args)
         sm.compute_derivative_rows(*fn_args)
 
-    def test_compute_derivative_rows_happy_path(self):
-        sm = StatementMetrics()
+    def test_compute_derivative_rows_happy_path(self, columnar):
+        sm = StatementMetrics(columnar=columnar)
 
         rows1 = [
             {'count': 13, 'time': 2005, 'errors': 1, 'query': 'COMMIT', 'db': 'puppies', 'user': 'dog'},
@@ -83,8 +84,8 @@ class TestStatementMetrics:
         # No changes should produce no rows
         assert [] == sm.compute_derivative_rows(rows2, metrics, key=key)
 
-    def test_compute_derivative_rows_stats_reset(self):
-        sm = StatementMetrics()
+    def test_compute_derivative_rows_stats_reset(self, columnar):
+        sm = StatementMetrics(columnar=columnar)
 
         def key(row):
             return (row['query'], row['db'], row['user'])
@@ -113,8 +114,8 @@ class TestStatementMetrics:
         assert 1 == len(sm.compute_derivative_rows(rows3, metrics, key=key))  # only 1 row computed
         assert 2 == len(sm.compute_derivative_rows(rows4, metrics, key=key))  # both rows computed
 
-    def test_compute_derivative_rows_with_duplicates(self):
-        sm = StatementMetrics()
+    def test_compute_derivative_rows_with_duplicates(self, columnar):
+        sm = StatementMetrics(columnar=columnar)
 
         def key(row):
             return (row['query_signature'], row['db'], row['user'])
@@ -181,3 +182,36 @@ class TestStatementMetrics:
         ]
 
         assert expected_merged_metrics == metrics
+
+    def test_compute_derivative_rows_same_as_row_mode(self, columnar):
+        sm = StatementMetrics(columnar=columnar)
+        row_sm = StatementMetrics()
+
+        def key(row):
+            return row['query'], row['db']
+
+        metrics = ['count', 'time', 'rows']
+
+        runs = [
+            [
+                {'count': 1, 'time': 1.5, 'rows': 10, 'query': 'SELECT 1', 'db': 'a'},
+                {'count': 5, 'time': 100, 'query': 'SELECT 2', 'db': 'a'},
+                {'count': 3, 'time': 20, 'rows': 1, 'query': 'SELECT 3', 'db': 'b'},
+            ],
+            [
+                {'count': 2, 'time': 3.0, 'rows': 10, 'query': 'SELECT 1', 'db': 'a'},
+                {'count': 6, 'time': 90, 'query': 'SELECT 2', 'db': 'a'},
+                {'count': 3, 'time': 20, 'rows': 1, 'query': 'SELECT 3', 'db': 'b'},
+                {'count': 1, 'time': 1, 'rows': 1, 'query': 'SELECT 4', 'db': 'b'},
+            ],
+            [
+                {'count': 4, 'time': 3.0, 'rows': 12, 'query': 'SELECT 1', 'db': 'a'},
+                {'count': 8, 'time': 95, 'query': 'SELECT 2', 'db': 'a'},
+                {'count': 2, 'time': 5, 'rows': 1, 'query': 'SELECT 4', 'db': 'b'},
+            ],
+        ]
+
+        for rows in runs:
+            assert sm.compute_derivative_rows(rows, metrics, key=key) == row_sm.compute_derivative_rows(
+                rows, metrics, key=key
+            )
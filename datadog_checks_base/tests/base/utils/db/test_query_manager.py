@@ -978,6 +978,179 @@ class TestSubmission:
         aggregator.assert_metric('test.baz', 2, metric_type=aggregator.GAUGE, tags=['test:foo', 'test:bar'])
         aggregator.assert_all_metrics_covered()
 
+    def test_batch_submissions(self, aggregator, mocker):
+        class MyCheck(AgentCheck):
+            __NAMESPACE__ = 'test_check'
+
+        check = MyCheck('test', {}, [{}])
+        submit_metrics_batch = mocker.spy(check, 'submit_metrics_batch')
+        query_manager = create_query_manager(
+            {
+                'name': 'test query',
+                'query': 'foo',
+                'columns': [
+                    {'name': 'test.foo', 'type': 'gauge'},
+                    {'name': 'test.bar', 'type': 'monotonic_gauge'},
+                    {'name': 'test.baz', 'type': 'gauge', 'raw': True},
+                    {'name': 'tag', 'type': 'tag'},
+                ],
+                'tags': ['test:bar'],
+            },
+            check=check,
+            executor=mock_executor([[1, 2, 3, 'tag1'], [4, 5, 6, 'tag2']]),
+            tags=['test:foo'],
+            batch_submissions=True,
+        )
+        query_manager.compile_queries()
+        query_manager.execute()
+
+        assert submit_metrics_batch.call_count == 3
+        assert not query_manager.submission_batches
+        for value, tag in ((1, 'tag1'), (4, 'tag2')):
+            tags = ['test:foo', 'test:bar', 'tag:{}'.format(tag)]
+            aggregator.assert_metric('test_check.test.foo', value, metric_type=aggregator.GAUGE, tags=tags)
+            aggregator.assert_metric('test_check.test.bar.total', value + 1, metric_type=aggregator.GAUGE, tags=tags)
+            aggregator.assert_metric(
+                'test_check.test.bar.count', value + 1, metric_type=aggregator.MONOTONIC_COUNT, tags=tags
+            )
+            aggregator.assert_metric('test.baz', value + 2, metric_type=aggregator.GAUGE, tags=tags)
+        aggregator.assert_all_metrics_covered()
+
+    def test_fetch_size(self, aggregator):
+        class Cursor(object):
+            def __init__(self, rows):
+                self.rows = rows
+                self.fetch_sizes = []
+
+            def fetchmany(self, size):
+                self.fetch_sizes.append(size)
+                rows, self.rows = self.rows[:size], self.rows[size:]
+                return rows
+
+        cursor = Cursor([['tag{}'.format(i), i] for i in range(5)])
+        query_manager = create_query_manager(
+            {
+                'name': 'test query',
+                'query': 'foo',
+                'columns': [{'name': 'test', 'type': 'tag'}, {'name': 'test.foo', 'type': 'gauge'}],
+            },
+            executor=lambda _: cursor,
+            fetch_size=2,
+        )
+        query_manager.compile_queries()
+        query_manager.execute()
+
+        assert cursor.fetch_sizes == [2, 2, 2, 2]
+        for i in range(5):
+            aggregator.assert_metric('test.foo', i, tags=['test:tag{}'.format(i)])
+        aggregator.assert_all_metrics_covered()
+
+    def test_parallel_executors(self, caplog, aggregator):
+        results = {'foo': [['foo', 1]], 'bar': [['bar', 2]], 'baz': [['baz', 3]]}
+        executed = []
+
+        def create_executor(connection):
+            def executor(query):
+                executed.append((connection, query))
+                if query == 'error':
+                    raise ValueError('no result set')
+                return results[query]
+
+            return executor
+
+        queries = [
+            {
+                'name': 'test query {}'.format(query),
+                'query': query,
+                'columns': [{'name': 'test', 'type': 'tag'}, {'name': 'test.foo', 'type': 'gauge'}],
+            }
+            for query in ('foo', 'error', 'bar', 'baz')
+        ]
+        query_manager = create_query_manager(
+            *queries, executor=mock_executor(), parallel_executors=[create_executor(1), create_executor(2)]
+        )
+        query_manager.compile_queries()
+        query_manager.execute()
+        query_manager.execute()
+
+        assert sorted(query for _, query in executed) == ['bar', 'bar', 'baz', 'baz', 'error', 'error', 'foo', 'foo']
+        assert {connection for connection, _ in executed} <= {1, 2}
+        assert [message for _, _, message in caplog.record_tuples].count(
+            'Error querying test query error: no result set'
+        ) == 2
+
+        aggregator.assert_metric('test.foo', 1, tags=['test:foo'], count=2)
+        aggregator.assert_metric('test.foo', 2, tags=['test:bar'], count=2)
+        aggregator.assert_metric('test.foo', 3, tags=['test:baz'], count=2)
+        aggregator.assert_all_metrics_covered()
+
+    def test_parallel_executors_stream_rows(self, aggregator):
+        produced = []
+        produced_at_submission = []
+
+        def executor(query):
+            for i in range(100):
+                produced.append(i)
+                yield ['tag{}'.format(i), i]
+
+        check = AgentCheck('test', {}, [{}])
+        gauge = check.gauge
+
+        def record_gauge(*args, **kwargs):
+            produced_at_submission.append(len(produced))
+            gauge(*args, **kwargs)
+
+        check.gauge = record_gauge
+        query_manager = create_query_manager(
+            {
+                'name': 'test query',
+                'query': 'foo',
+                'columns': [{'name': 'test', 'type': 'tag'}, {'name': 'test.foo', 'type': 'gauge'}],
+            },
+            check=check,
+            fetch_size=2,
+            parallel_executors=[executor],
+        )
+        query_manager.compile_queries()
+        query_manager.execute()
+
+        # Only a few chunks of rows are buffered ahead of the ones being processed
+        assert len(produced_at_submission) == 100
+        assert max(count - i for i, count in enumerate(produced_at_submission)) <= 10
+        for i in range(100):
+            aggregator.assert_metric('test.foo', i, tags=['test:tag{}'.format(i)])
+        aggregator.assert_all_metrics_covered()
+
+        query_manager.shutdown()
+        assert query_manager._thread_pool is None
+
+        # Threads are started again by the next execution
+        query_manager.execute()
+        assert len(produced_at_submission) == 200
+
+    def test_parallel_executors_error_while_streaming(self, aggregator):
+        def executor(query):
+            yield ['foo', 1]
+            raise ValueError('connection lost')
+
+        query_manager = create_query_manager(
+            {
+                'name': 'test query',
+                'query': 'foo',
+                'columns': [{'name': 'test', 'type': 'tag'}, {'name': 'test.foo', 'type': 'gauge'}],
+            },
+            parallel_executors=[executor],
+        )
+        query_manager.compile_queries()
+
+        # Like when queries run sequentially, errors while iterating over the rows are raised
+        with pytest.raises(ValueError, match='connection lost'):
+            query_manager.execute()
+
+        aggregator.assert_metric('test.foo', 1, tags=['test:foo'])
+        aggregator.assert_all_metrics_covered()
+        query_manager.shutdown()
+
     def test_queries_are_copied(self):
         class MyCheck(AgentCheck):
             pass
@@ -2,6 +2,7 @@
 # (C) Datadog, Inc. 2020-present
 # All rights reserved
 # Licensed under a 3-clause BSD style license (see LICENSE)
+import threading
 import time
 from concurrent.futures.thread import ThreadPoolExecutor
 
@@ -10,9 +11,12 @@ import pytest
 
 from datadog_checks.base import AgentCheck
 from datadog_checks.base.stubs.datadog_agent import datadog_agent
+from datadog_checks.base.utils.db.sql import compute_sql_signature
 from datadog_checks.base.utils.db.utils import (
     ConstantRateLimiter,
     DBMAsyncJob,
+    DBMJobScheduler,
+    ObfuscationCache,
     RateLimitingTTLCache,
     obfuscate_sql_with_metadata,
     resolve_db_host,
@@ -164,8 +168,108 @@ def test_obfuscate_sql_with_metadata(obfuscator_return_value, expected_value):
     assert statement['metadata'] == {}
 
 
+def test_obfuscation_cache():
+    cache = ObfuscationCache()
+
+    statements, errors = cache.obfuscate_queries(['SELECT  1', 'SELECT 2', 'SELECT  1'])
+    assert errors == {}
+    assert statements == {
+        'SELECT  1': {'query': 'SELECT 1', 'query_signature': compute_sql_signature('SELECT 1'), 'metadata': {}},
+        'SELECT 2': {'query': 'SELECT 2', 'query_signature': compute_sql_signature('SELECT 2'), 'metadata': {}},
+    }
+    assert cache.pop_stats() == (0, 2, 0)
+
+    with mock.patch.object(datadog_agent, 'obfuscate_sql', passthrough=True) as mock_agent:
+        assert cache.obfuscate_queries(['SELECT 2', 'SELECT  1']) == (statements, {})
+        assert mock_agent.call_count == 0
+
+    assert cache.pop_stats() == (2, 0, 0)
+    assert cache.pop_stats() == (0, 0, 0)
+    assert len(cache) == 2
+
+
+def test_obfuscation_cache_submit_metrics(aggregator):
+    cache = ObfuscationCache()
+    check = AgentCheck('test', {}, [{}])
+    cache.obfuscate_queries(['SELECT 1', 'SELECT 2'])
+    cache.obfuscate_queries(['SELECT 1'])
+
+    cache.submit_metrics(check, 'dd.test', tags=['foo:bar'])
+
+    for name, value in (('hits', 1), ('misses', 2), ('evictions', 0)):
+        aggregator.assert_metric('dd.test.obfuscation_cache.' + name, value, tags=['foo:bar'], count=1)
+    aggregator.assert_metric('dd.test.obfuscation_cache.size', 2, tags=['foo:bar'], count=1)
+    assert cache.pop_stats() == (0, 0, 0)
+
+
+def test_obfuscation_cache_options():
+    cache = ObfuscationCache()
+    options = json.dumps({'return_json_metadata': True})
+
+    cache.obfuscate_queries(['SELECT 1'])
+    statements, _ = cache.obfuscate_queries(['SELECT 1'], options)
+
+    assert statements['SELECT 1']['metadata'] == {'tables': None}
+    assert cache.pop_stats() == (0, 2, 0)
+
+
+def test_obfuscation_cache_errors():
+    cache = ObfuscationCache()
+
+    def _mock_obfuscate_sql(query, options=None):
+        if query == 'bad':
+            raise Exception('cannot obfuscate')
+        return query
+
+    with mock.patch.object(datadog_agent, 'obfuscate_sql', passthrough=True) as mock_agent:
+        mock_agent.side_effect = _mock_obfuscate_sql
+        statements, errors = cache.obfuscate_queries(['good', 'bad'])
+
+    assert list(statements) == ['good']
+    assert str(errors['bad']) == 'cannot obfuscate'
+
+    # Failures are not cached
+    assert len(cache) == 1
+    statements, errors = cache.obfuscate_queries(['bad'])
+    assert statements['bad']['query'] == 'bad'
+    assert errors == {}
+
+
+def test_obfuscation_cache_evictions():
+    cache = ObfuscationCache(maxsize=3)
+
+    cache.obfuscate_queries(['SELECT {}'.format(i) for i in range(5)])
+
+    assert len(cache) == 3
+    assert cache.pop_stats() == (0, 5, 2)
+
+
+def test_obfuscation_cache_batches():
+    queries = ['SELECT {}'.format(i) for i in range(10)]
+    cache = ObfuscationCache(max_workers=3, batch_size=3)
+
+    with mock.patch.object(datadog_agent, 'obfuscate_sql', passthrough=True) as mock_agent:
+        mock_agent.side_effect = lambda query, options=None: query
+        statements, errors = cache.obfuscate_queries(queries)
+        assert mock_agent.call_count == 10
+
+    assert errors == {}
+    assert sorted(statements) == sorted(queries)
+    assert all(statements[query]['query'] == query for query in queries)
+
+
+def test_obfuscation_cache_shared_executor():
+    caches = [ObfuscationCache(max_workers=3) for _ in range(3)]
+
+    # The caches of all instances share the same threads
+    assert caches[0]._executor is not None
+    assert all(cache._executor is caches[0]._executor for cache in caches)
+    assert ObfuscationCache(max_workers=2)._executor is not caches[0]._executor
+    assert ObfuscationCache(max_workers=1)._executor is None
+
+
 class TestJob(DBMAsyncJob):
-    def __init__(self, check, run_sync=False, enabled=True, rate_limit=10, min_collection_interval=15):
+    def __init__(self, check, run_sync=False, enabled=True, rate_limit=10, min_collection_interval=15, scheduler=None):
         super(TestJob, self).__init__(
             check,
             run_sync=run_sync,
@@ -177,6 +281,7 @@ class TestJob(DBMAsyncJob):
             rate_limit=rate_limit,
             job_name="test-job",
             shutdown_callback=self.test_shutdown,
+            scheduler=scheduler,
         )
 
     def test_shutdown(self):
@@ -254,3 +359,150 @@ def test_dbm_async_job_inactive_stop(aggregator):
     job.run_job_loop([])
     job._job_loop_future.result()
     aggregator.assert_metric("dd.test-dbms.async_job.inactive_stop", tags=['job:test-job'])
+
+
+class SlowTestJob(TestJob):
+    running = 0
+    max_running = 0
+    lock = threading.Lock()
+
+    def run_job(self):
+        with self.lock:
+            SlowTestJob.running += 1
+            SlowTestJob.max_running = max(SlowTestJob.max_running, SlowTestJob.running)
+
+        time.sleep(0.2)
+        super(SlowTestJob, self).run_job()
+
+        with self.lock:
+            SlowTestJob.running -= 1
+
+
+class FakeClock(object):
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def advance(scheduler, clock, seconds):
+    clock.now += seconds
+    # Wake the timer up so that it notices the jobs that became due
+    with scheduler._condition:
+        scheduler._condition.notify()
+
+
+def next_due(scheduler, job):
+    with scheduler._condition:
+        for due, sequence, heap_job in scheduler._heap:
+            if heap_job is job and scheduler._jobs.get(job) == sequence:
+                return due
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline, "condition was not met in time"
+        time.sleep(0.01)
+
+
+def wait_until_unscheduled(scheduler, job, timeout=5):
+    wait_until(lambda: not scheduler.is_scheduled(job), timeout=timeout)
+
+
+def test_dbm_job_scheduler(aggregator):
+    clock = FakeClock()
+    scheduler = DBMJobScheduler(max_workers=2, time_func=clock)
+    job = TestJob(AgentCheck(), rate_limit=10, scheduler=scheduler)
+    job.run_job_loop(["hello:there"])
+    assert job._job_loop_future is None
+    assert scheduler.is_scheduled(job)
+
+    # The job runs immediately, then one period after it was due
+    wait_until(lambda: next_due(scheduler, job) == pytest.approx(1000.1))
+    advance(scheduler, clock, 0.1)
+    wait_until(lambda: next_due(scheduler, job) == pytest.approx(1000.2))
+
+    # Missed runs are not queued up, the late run is followed by a single run right away
+    advance(scheduler, clock, 0.35)
+    wait_until(lambda: next_due(scheduler, job) == pytest.approx(1000.55))
+
+    job.cancel()
+    wait_until_unscheduled(scheduler, job)
+
+    assert len(aggregator.metrics("dbm.async_job_test.run_job")) == 4
+    queue_delays = [m.value for m in aggregator.metrics("dd.test-dbms.async_job.queue_delay")]
+    assert queue_delays[:4] == [0, 0, pytest.approx(250), 0]
+    aggregator.assert_metric("dd.test-dbms.async_job.queue_delay", tags=["hello:there", "job:test-job"])
+    aggregator.assert_metric("dd.test-dbms.async_job.cancel", tags=["hello:there", "job:test-job"])
+    aggregator.assert_metric("dbm.async_job_test.shutdown", count=1)
+    aggregator.assert_metric("dd.test-dbms.async_job.overrun", count=0)
+
+
+def test_dbm_job_scheduler_already_scheduled(aggregator):
+    clock = FakeClock()
+    scheduler = DBMJobScheduler(max_workers=2, time_func=clock)
+    job = TestJob(AgentCheck(), rate_limit=1, scheduler=scheduler)
+    job.run_job_loop([])
+    wait_until(lambda: next_due(scheduler, job) == 1001)
+    job.run_job_loop([])
+    assert next_due(scheduler, job) == 1001
+
+    job.cancel()
+    wait_until_unscheduled(scheduler, job)
+    assert len(aggregator.metrics("dbm.async_job_test.run_job")) == 1
+
+
+def test_dbm_job_scheduler_inactive_stop(aggregator):
+    scheduler = DBMJobScheduler(max_workers=2)
+    job = TestJob(AgentCheck(), rate_limit=10, min_collection_interval=0.1, scheduler=scheduler)
+    job.run_job_loop([])
+    wait_until_unscheduled(scheduler, job)
+
+    aggregator.assert_metric("dd.test-dbms.async_job.inactive_stop", tags=['job:test-job'])
+    aggregator.assert_metric("dbm.async_job_test.shutdown", count=1)
+
+
+def test_dbm_job_scheduler_max_jobs_per_host(aggregator):
+    SlowTestJob.max_running = 0
+    clock = FakeClock()
+    scheduler = DBMJobScheduler(max_workers=4, max_jobs_per_host=1, time_func=clock)
+    jobs = [SlowTestJob(AgentCheck(), rate_limit=100, scheduler=scheduler) for _ in range(3)]
+    for job in jobs:
+        job.run_job_loop([])
+
+    # The jobs were all due at once but ran one after the other
+    wait_until(lambda: all(next_due(scheduler, job) == pytest.approx(1000.01) for job in jobs))
+    for job in jobs:
+        job.cancel()
+    for job in jobs:
+        wait_until_unscheduled(scheduler, job)
+
+    assert SlowTestJob.max_running == 1
+    assert len(aggregator.metrics("dbm.async_job_test.run_job")) == 3
+    # Every run takes longer than the 10ms period
+    aggregator.assert_metric("dd.test-dbms.async_job.overrun", count=3)
+
+
+def test_dbm_job_scheduler_overrun_backpressure(aggregator):
+    clock = FakeClock()
+    scheduler = DBMJobScheduler(max_workers=2, time_func=clock)
+    job = TestJob(AgentCheck(), rate_limit=100, scheduler=scheduler)
+    runs = []
+
+    def run_job():
+        runs.append(clock.now)
+        # The first run takes 50ms according to the clock of the scheduler, longer than the 10ms period
+        if len(runs) == 1:
+            clock.now += 0.05
+
+    job.run_job = run_job
+    job.run_job_loop([])
+
+    # Missed runs are not queued up, the job runs again as soon as the previous run finished
+    wait_until(lambda: next_due(scheduler, job) == pytest.approx(1000.06))
+    assert runs == [1000, pytest.approx(1000.05)]
+
+    job.cancel()
+    wait_until_unscheduled(scheduler, job)
@@ -7,8 +7,9 @@ import mock
 import pytest
 from six import iteritems
 
+from datadog_checks.base.errors import ConfigurationError
 from datadog_checks.base.utils.headers import headers as agent_headers
-from datadog_checks.base.utils.http import RequestsWrapper
+from datadog_checks.base.utils.http import SUPPORTED_CONTENT_ENCODINGS, RequestsWrapper
 
 from .common import DEFAULT_OPTIONS
 
@@ -69,6 +70,27 @@ def test_config_extra_headers_string_values():
     assert http.options['headers'] == complete_headers
 
 
+@pytest.mark.parametrize(
+    'compression, expected',
+    [
+        pytest.param(False, 'identity', id='disabled'),
+        pytest.param('none', 'identity', id='none'),
+        pytest.param(['gzip', 'unknown'], 'gzip', id='array'),
+        pytest.param('deflate, gzip', 'deflate, gzip', id='string'),
+        pytest.param('auto', ', '.join(SUPPORTED_CONTENT_ENCODINGS), id='auto'),
+    ],
+)
+def test_config_compression(compression, expected):
+    http = RequestsWrapper({'compression': compression}, {})
+
+    assert http.options['headers']['Accept-Encoding'] == expected
+
+
+def test_config_compression_invalid():
+    with pytest.raises(ConfigurationError, match='^Setting `compression` must be'):
+        RequestsWrapper({'compression': 5}, {})
+
+
 def test_extra_headers_on_http_method_call():
     instance = {'extra_headers': {'answer': 42}}
     init_config = {}
@@ -11,7 +11,8 @@ from flaky import flaky
 from six import PY2, iteritems
 
 from datadog_checks.base import AgentCheck
-from datadog_checks.base.utils.http import RequestsWrapper, is_uds_url, quote_uds_url
+from datadog_checks.base.errors import ConfigurationError
+from datadog_checks.base.utils.http import SHARED_SESSIONS, RequestsWrapper, SessionPool, is_uds_url, quote_uds_url
 from datadog_checks.dev.utils import ON_WINDOWS
 
 
@@ -46,6 +47,234 @@ class TestRequestSize:
         assert len(chunks[1]) == payload_size - chunk_size
 
 
+class TestStreamingJSON:
+    def test_top_level_array(self, mock_http_response):
+        http = RequestsWrapper({'request_size': 0.01}, {})
+        items = [{'name': 'queue{}'.format(i), 'messages': i} for i in range(100)]
+        mock_http_response(json_data=items)
+
+        with http.get('https://www.google.com', stream=True) as response:
+            assert list(response.iter_json()) == items
+
+    def test_path(self, mock_http_response):
+        http = RequestsWrapper({'request_size': 0.01}, {})
+        nodes = {'node{}'.format(i): {'jvm': {'uptime_in_millis': i}} for i in range(10)}
+        mock_http_response(json_data={'_nodes': {'total': 10}, 'cluster_name': 'foo', 'nodes': nodes})
+
+        with http.get('https://www.google.com', stream=True) as response:
+            assert dict(response.iter_json('nodes')) == nodes
+
+    def test_stops_reading(self, mock_http_response):
+        http = RequestsWrapper({'request_size': 0.01}, {})
+        mock_http_response(json_data={'items': [{'id': 1}, {'id': 2}], 'rest': 'x' * 10000})
+
+        with http.get('https://www.google.com', stream=True) as response:
+            assert [item['id'] for item in response.iter_json(['items'])] == [1, 2]
+            assert response.decoded_bytes < 1000
+
+
+class TestTransferStats:
+    def test_streamed(self, mock_http_response):
+        http = RequestsWrapper({'request_size': 0.5}, {})
+        mock_http_response('a' * 1000)
+
+        with http.get('https://www.google.com', stream=True) as response:
+            assert response.decoded_bytes == 0
+            assert len(list(response.iter_content())) == 2
+            assert response.decoded_bytes == 1000
+            assert response.encoded_bytes == 1000
+            assert response.time_to_first_byte >= 0
+
+    def test_not_streamed(self, mock_http_response):
+        http = RequestsWrapper({}, {})
+        mock_http_response('a' * 1000)
+
+        response = http.get('https://www.google.com')
+
+        assert len(response.content) == 1000
+        assert response.decoded_bytes == 1000
+
+    @pytest.mark.skipif(PY2, reason='Uses the Python 3 HTTP server')
+    def test_compressed(self):
+        import gzip
+        import threading
+        from http.server import BaseHTTPRequestHandler, HTTPServer
+
+        content = gzip.compress(b'[' + b','.join([b'{"name": "queue", "messages": 0}'] * 1000) + b']')
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=server.handle_request)
+        thread.start()
+
+        try:
+            http = RequestsWrapper({'compression': 'auto', 'skip_proxy': True}, {})
+            with http.get('http://127.0.0.1:{}'.format(server.server_port), stream=True) as response:
+                assert len(list(response.iter_json())) == 1000
+                assert response.encoded_bytes == len(content)
+                assert response.decoded_bytes > response.encoded_bytes
+        finally:
+            thread.join()
+            server.server_close()
+
+
+@pytest.fixture
+def shared_sessions():
+    yield SHARED_SESSIONS
+    SHARED_SESSIONS.clear()
+
+
+class TestSharedConnectionPool:
+    def test_same_settings(self, shared_sessions):
+        http1 = RequestsWrapper({'shared_connection_pool': True, 'username': 'foo', 'password': 'bar'}, {})
+        http2 = RequestsWrapper({'shared_connection_pool': True, 'username': 'foo', 'password': 'bar'}, {})
+        http3 = RequestsWrapper({'shared_connection_pool': True, 'username': 'foo', 'password': 'baz'}, {})
+        http4 = RequestsWrapper(
+            {'shared_connection_pool': True, 'username': 'foo', 'password': 'bar', 'tls_verify': False}, {}
+        )
+
+        assert http1.persist_connections
+        assert http1.session is http2.session
+        assert http1.session is not http3.session
+        assert http1.session is not http4.session
+        assert http1._session is None
+
+    def test_disabled(self):
+        http = RequestsWrapper({}, {})
+
+        assert http.shared_session_key is None
+        assert http.connection_pool_stats is None
+
+    @pytest.mark.skipif(PY2, reason='Uses the Python 3 HTTP server')
+    def test_stats(self, shared_sessions):
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'ok')
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+
+        try:
+            url = 'http://127.0.0.1:{}'.format(server.server_port)
+            for _ in range(2):
+                http = RequestsWrapper({'shared_connection_pool': True, 'skip_proxy': True}, {})
+                for _ in range(2):
+                    assert http.get(url).content == b'ok'
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        assert http.connection_pool_stats == {
+            'requests': 4,
+            'connections': 1,
+            'reuse_ratio': 0.75,
+            'idle_connections': 1,
+        }
+
+    @pytest.mark.skipif(PY2, reason='Uses the Python 3 HTTP server')
+    def test_no_cookies(self, shared_sessions):
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        received_cookies = []
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                received_cookies.append(self.headers.get('Cookie'))
+                self.send_response(200)
+                self.send_header('Set-Cookie', 'session=foo')
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'ok')
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+
+        try:
+            url = 'http://127.0.0.1:{}'.format(server.server_port)
+            http1 = RequestsWrapper({'shared_connection_pool': True, 'skip_proxy': True}, {})
+            http2 = RequestsWrapper({'shared_connection_pool': True, 'skip_proxy': True}, {})
+            assert http1.get(url).content == b'ok'
+            assert http2.get(url).content == b'ok'
+            # Cookies passed explicitly are still sent
+            assert http2.get(url, cookies={'user': 'bar'}).content == b'ok'
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        assert http1.session is http2.session
+        assert received_cookies == [None, None, 'user=bar']
+
+    def test_aia_chasing_private_session(self, shared_sessions):
+        http = RequestsWrapper({'shared_connection_pool': True}, {})
+        shared_session = http.session
+        response = mock.MagicMock()
+
+        def request(url, **options):
+            raise requests.exceptions.SSLError('certificate verify failed')
+
+        with mock.patch.object(RequestsWrapper, 'fetch_intermediate_certs', return_value=[b'cert']), mock.patch(
+            'datadog_checks.base.utils.http.CertAdapter'
+        ) as cert_adapter, mock.patch.object(requests.Session, 'get', return_value=response) as session_get:
+            assert http.make_request_aia_chasing(request, 'get', 'https://foo', {}, True) is response
+
+        # The intermediate certificates are only used by the instance that fetched them
+        assert session_get.call_count == 1
+        assert all(adapter is not cert_adapter.return_value for adapter in shared_session.adapters.values())
+
+    def test_idle_eviction(self):
+        pool = SessionPool()
+        sessions = []
+
+        with mock.patch('datadog_checks.base.utils.http.get_timestamp', side_effect=[0, 10, 100]):
+            for _ in range(3):
+                sessions.append(pool.get('key', requests.Session, 60))
+
+        assert sessions[0] is sessions[1]
+        assert sessions[1] is not sessions[2]
+
+    @pytest.mark.parametrize(
+        'instance, message',
+        [
+            pytest.param({'connection_pool_size': 0}, '^Setting `connection_pool_size` must be a positive integer$'),
+            pytest.param(
+                {'connection_pool_idle_timeout': 'foo'}, '^Setting `connection_pool_idle_timeout` must be a number$'
+            ),
+        ],
+    )
+    def test_invalid_settings(self, instance, message):
+        with pytest.raises(ConfigurationError, match=message):
+            RequestsWrapper(dict(instance, shared_connection_pool=True), {})
+
+
 class TestUnixDomainSocket:
     @pytest.mark.parametrize(
         'value, expected',
@@ -0,0 +1,122 @@
+# (C) Datadog, Inc. 2023-present
+# All rights reserved
+# Licensed under a 3-clause BSD style license (see LICENSE)
+import threading
+import time
+
+import pytest
+
+from datadog_checks.base import AgentCheck
+from datadog_checks.dev.testing import requires_py3
+
+pytestmark = [requires_py3]
+
+DELAY = 0.2
+
+
+@pytest.fixture(scope='module')
+def endpoint():
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(DELAY)
+
+            if self.path == '/error':
+                self.send_response(500)
+                self.end_headers()
+                return
+
+            content = self.path.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def do_POST(self):
+            content = self.rfile.read(int(self.headers['Content-Length']))
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    try:
+        yield 'http://127.0.0.1:{}'.format(server.server_port)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def get_wrapper(**kwargs):
+    from datadog_checks.base.utils.http_async import AsyncRequestsWrapper
+
+    return AsyncRequestsWrapper({'skip_proxy': True}, {}, **kwargs)
+
+
+class TestGather:
+    def test_order(self, endpoint):
+        http = get_wrapper()
+        responses = http.gather(
+            ['{}/{}'.format(endpoint, i) for i in range(5)] + [('POST', endpoint, {'data': b'foo'})]
+        )
+
+        assert [response.text for response in responses] == ['/0', '/1', '/2', '/3', '/4', 'foo']
+
+    def test_concurrent(self, endpoint):
+        http = get_wrapper(concurrency=10)
+
+        start = time.time()
+        responses = http.gather(['{}/{}'.format(endpoint, i) for i in range(10)])
+        elapsed = time.time() - start
+
+        assert all(response.status_code == 200 for response in responses)
+        assert elapsed < DELAY * 5
+
+    def test_concurrency_limit(self, endpoint):
+        http = get_wrapper(concurrency=10)
+
+        start = time.time()
+        http.gather(['{}/{}'.format(endpoint, i) for i in range(4)], concurrency=2)
+        elapsed = time.time() - start
+
+        assert elapsed >= DELAY * 2
+
+    def test_exceptions(self, endpoint):
+        http = get_wrapper()
+
+        def raise_for_status(response):
+            response.raise_for_status()
+            return response
+
+        responses = http.gather(['{}/ok'.format(endpoint), 'http://127.0.0.1:0/unreachable'])
+
+        assert raise_for_status(responses[0]).text == '/ok'
+        assert isinstance(responses[1], Exception)
+
+    @pytest.mark.asyncio
+    async def test_running_event_loop(self, endpoint):
+        http = get_wrapper()
+
+        assert [response.text for response in http.gather(['{}/sync'.format(endpoint)])] == ['/sync']
+        assert (await http.get('{}/async'.format(endpoint))).text == '/async'
+        assert [response.text for response in await http.gather_async(['{}/gather'.format(endpoint)])] == ['/gather']
+
+    @pytest.mark.parametrize('concurrency', [0, True, '2'])
+    def test_invalid_concurrency(self, concurrency):
+        with pytest.raises(ValueError, match='^The concurrency must be a positive integer$'):
+            get_wrapper(concurrency=concurrency)
+
+
+def test_agent_check(endpoint):
+    check = AgentCheck('test', {}, [{'skip_proxy': True, 'timeout': 5}])
+
+    assert check.async_http is check.async_http
+    assert check.async_http.http is check.http
+    assert [response.text for response in check.async_http.gather(['{}/check'.format(endpoint)])] == ['/check']
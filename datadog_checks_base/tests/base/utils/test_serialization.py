@@ -0,0 +1,138 @@
+# (C) Datadog, Inc. 2023-present
+# All rights reserved
+# Licensed under a 3-clause BSD style license (see LICENSE)
+import decimal
+from json import JSONDecoder
+
+import mock
+import pytest
+
+from datadog_checks.base.utils.db.utils import default_json_event_encoding
+from datadog_checks.base.utils.serialization import dumps_chunked, iter_json_items, json
+
+
+class TestDumpsChunked:
+    def test_single_document(self):
+        payload = {'host': 'foo', 'tags': ['bar:baz']}
+        rows = [{'query': 'SELECT {}'.format(i), 'calls': i} for i in range(10)]
+
+        documents = list(dumps_chunked(payload, 'rows', rows))
+
+        assert len(documents) == 1
+        assert json.loads(documents[0]) == {'host': 'foo', 'tags': ['bar:baz'], 'rows': rows}
+
+    @pytest.mark.parametrize('payload', [pytest.param({}, id='empty payload'), pytest.param({'a': 1}, id='payload')])
+    def test_no_items(self, payload):
+        documents = list(dumps_chunked(payload, 'rows', []))
+
+        assert len(documents) == 1
+        assert json.loads(documents[0]) == dict(payload, rows=[])
+
+    def test_max_size(self):
+        payload = {'host': 'foo'}
+        rows = [{'query': 'SELECT {}'.format(i), 'calls': i} for i in range(100)]
+        max_size = 200
+
+        documents = list(dumps_chunked(payload, 'rows', rows, max_size=max_size))
+
+        assert len(documents) > 1
+        decoded_rows = []
+        for document in documents:
+            assert len(document) <= max_size
+
+            decoded = json.loads(document)
+            assert decoded['host'] == 'foo'
+            assert decoded['rows']
+            decoded_rows.extend(decoded['rows'])
+
+        assert decoded_rows == rows
+
+    def test_item_larger_than_max_size(self):
+        rows = [{'query': 'a' * 100}, {'query': 'b'}]
+
+        documents = list(dumps_chunked({}, 'rows', rows, max_size=50))
+
+        assert [json.loads(document)['rows'] for document in documents] == [[rows[0]], [rows[1]]]
+
+    def test_default(self):
+        documents = list(
+            dumps_chunked({}, 'rows', [{'time': decimal.Decimal('1.5')}], default=default_json_event_encoding)
+        )
+
+        assert json.loads(documents[0]) == {'rows': [{'time': 1.5}]}
+
+
+class TestIterJSONItems:
+    DOCUMENT = {
+        'page': 1,
+        'nodes': {'foo': {'uptime': 1.5, 'roles': ['master']}, 'bar': {'uptime': 20, 'roles': []}},
+        'items': [{'name': u'queue-\u00e9', 'messages': i, 'durable': True, 'policy': None} for i in range(50)],
+    }
+
+    @staticmethod
+    def split(data, size):
+        return [data[i : i + size] for i in range(0, len(data), size)]
+
+    @pytest.mark.parametrize('chunk_size', [1, 3, 64, 100000])
+    def test_array(self, chunk_size):
+        data = json.dumps(self.DOCUMENT['items'])
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+
+        assert list(iter_json_items(self.split(data, chunk_size))) == self.DOCUMENT['items']
+
+    @pytest.mark.parametrize('chunk_size', [1, 3, 64, 100000])
+    def test_path(self, chunk_size):
+        data = json.dumps(self.DOCUMENT)
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+        chunks = self.split(data, chunk_size)
+
+        assert list(iter_json_items(chunks, ['items'])) == self.DOCUMENT['items']
+        assert dict(iter_json_items(chunks, 'nodes')) == self.DOCUMENT['nodes']
+        assert list(iter_json_items(chunks, ['nodes', 'foo', 'roles'])) == ['master']
+        assert list(iter_json_items(chunks, ['missing'])) == []
+
+    def test_numbers_across_chunks(self):
+        assert list(iter_json_items(['[12', '34, 5', '.5]'])) == [1234, 5.5]
+
+    @pytest.mark.parametrize('chunk_size', [1, 2, 5])
+    def test_strings_across_chunks(self, chunk_size):
+        items = ['a\\"b', '[{', '\\', 'c"]}', {'"k\\': ['}', '\\"']}, -1.5e3, True, None]
+        data = json.dumps(items)
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+
+        assert list(iter_json_items(self.split(data, chunk_size))) == items
+
+    def test_large_value_decoded_once(self):
+        value = {
+            'name': 'foo "bar" \\ baz',
+            'values': [{'id': i, 'tags': ['a:{}'.format(i), '[]{}']} for i in range(50000)],
+        }
+        data = json.dumps({'items': {'large': value, 'small': 1}})
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+
+        decoded_sizes = []
+        raw_decode = JSONDecoder.raw_decode
+
+        def record_raw_decode(decoder, text, *args):
+            decoded_sizes.append(len(text))
+            return raw_decode(decoder, text, *args)
+
+        # The value is decoded once it is complete rather than every time a chunk arrives
+        with mock.patch.object(JSONDecoder, 'raw_decode', record_raw_decode):
+            assert list(iter_json_items(self.split(data, 1024), 'items')) == [('large', value), ('small', 1)]
+
+        assert len(data) > 1000000
+        assert sum(decoded_sizes) < len(data)
+
+    def test_empty(self):
+        assert list(iter_json_items(['[ ]'])) == []
+        assert list(iter_json_items(['{}'], 'items')) == []
+
+    @pytest.mark.parametrize('data', ['[1, 2', '[1, {"a": }]', '"foo"', '["foo', '[1, ]', '[1 2]', '[{"a": 1}}'])
+    def test_invalid(self, data):
+        with pytest.raises(ValueError):
+            list(iter_json_items([data]))
@@ -12,6 +12,16 @@ from datadog_checks.mongo.metrics import CASE_SENSITIVE_METRIC_NAME_SUFFIXES
 if PY3:
     long = int
 
+CASE_SENSITIVE_METRIC_NAME_PATTERNS = [
+    (re.compile(pattern), repl) for pattern, repl in iteritems(CASE_SENSITIVE_METRIC_NAME_SUFFIXES)
+]
+
+# This is because https://datadoghq.atlassian.net/browse/AGENT-9001
+# Delete this when the metrics are definitely deprecated
+DEPRECATED_RATE_METRICS = frozenset(
+    ('opLatencies.reads.latency', 'opLatencies.writes.latency', 'opLatencies.commands.latency')
+)
+
 
 class MongoCollector(object):
     """The base collector object, can be considered abstract.
@@ -28,6 +38,8 @@ class MongoCollector(object):
         self.gauge = self.check.gauge
         self.base_tags = tags
         self.metrics_to_collect = self.check.metrics_to_collect
+        # The minimum number of seconds between two collections, collectors without one run on every check run
+        self.collection_interval = None
 
     def collect(self, api):
         """The main method exposed by the collector classes, needs to be implemented by every subclass.
@@ -38,16 +50,37 @@ class MongoCollector(object):
         """Whether or not this specific collector is compatible with this specific deployment type."""
         raise NotImplementedError()
 
+    def get_telemetry_tags(self):
+        """The tags identifying this collector in the telemetry of the check."""
+        tags = ['collector:{}'.format(type(self).__name__)]
+        db_name = getattr(self, 'db_name', None)
+        if db_name is not None:
+            tags.append('db:{}'.format(db_name))
+
+        return tags
+
     def _normalize(self, metric_name, submit_method, prefix=None):
         """Replace case-sensitive metric name characters, normalize the metric name,
         prefix and suffix according to its type.
+
+        Names are resolved once per check and cached, as collectors are created again on every run.
         """
+        key = (metric_name, submit_method, prefix)
+        normalized_metric_name = self.check.metric_names.get(key)
+        if normalized_metric_name is None:
+            normalized_metric_name = self.check.metric_names[key] = self._resolve_metric_name(
+                metric_name, submit_method, prefix
+            )
+
+        return normalized_metric_name
+
+    def _resolve_metric_name(self, metric_name, submit_method, prefix=None):
         metric_prefix = "mongodb." if not prefix else "mongodb.{0}.".format(prefix)
         metric_suffix = "ps" if submit_method == AgentCheck.rate else ""
 
         # Replace case-sensitive metric name characters
-        for pattern, repl in iteritems(CASE_SENSITIVE_METRIC_NAME_SUFFIXES):
-            metric_name = re.compile(pattern).sub(repl, metric_name)
+        for pattern, repl in CASE_SENSITIVE_METRIC_NAME_PATTERNS:
+            metric_name = pattern.sub(repl, metric_name)
 
         # Normalize, and wrap
         return u"{metric_prefix}{normalized_metric_name}{metric_suffix}".format(
@@ -56,6 +89,60 @@ class MongoCollector(object):
             metric_suffix=metric_suffix,
         )
 
+    def _get_submission_plan(self, metrics_to_collect, prefix):
+        """Return the submission plan of `metrics_to_collect`, which is only built the first time it is submitted
+        by any collector of the check."""
+        key = (id(metrics_to_collect), prefix)
+        cached = self.check.submission_plans.get(key)
+        # Keep a reference to the metrics so that their id cannot be reused by another mapping
+        if cached is None or cached[0] is not metrics_to_collect:
+            cached = self.check.submission_plans[key] = (
+                metrics_to_collect,
+                self._build_submission_plan(metrics_to_collect, prefix),
+            )
+
+        return cached[1]
+
+    def _build_submission_plan(self, metrics_to_collect, prefix):
+        """Arrange the metrics in a tree following the keys leading to their value in the payload.
+
+        Every node maps a key to a pair of the metric found at that key, if any, and the nodes nested under it.
+        Metrics are tuples of the metric name, the submission method, the resolved name, the resolved name of
+        the deprecated rate, if any, and the legacy gauge name, if any.
+        """
+        plan = {}
+        for metric_name, submission in iteritems(metrics_to_collect):
+            if isinstance(submission, tuple):
+                submit_method, metric_name_alias = submission[0], submission[1]
+            else:
+                submit_method, metric_name_alias = submission, metric_name
+
+            deprecated_metric_name_alias = None
+            if metric_name_alias in DEPRECATED_RATE_METRICS:
+                deprecated_metric_name_alias = self._normalize(metric_name_alias, AgentCheck.rate, prefix)
+
+            normalized_metric_name = self._normalize(metric_name_alias, submit_method, prefix)
+
+            # Keep old incorrect metric name (only 'top' metrics are affected)
+            legacy_metric_name = normalized_metric_name[:-2] if normalized_metric_name.endswith("countps") else None
+
+            # each metric is of the form: x.y.z with z optional
+            # and can be found at status[x][y][z]
+            keys = metric_name.split(".")
+            node = plan
+            for key in keys[:-1]:
+                node = node.setdefault(key, [None, {}])[1]
+
+            node.setdefault(keys[-1], [None, {}])[0] = (
+                metric_name,
+                submit_method,
+                normalized_metric_name,
+                deprecated_metric_name_alias,
+                legacy_metric_name,
+            )
+
+        return plan
+
     def _submit_payload(self, payload, additional_tags=None, metrics_to_collect=None, prefix=""):
         """Common utility method used to submit a pre-formatted payload to Datadog. The format is standard throughout
         this integration, each numerical value in the payload comes from nested dictionary keys. The corresponding
@@ -80,50 +167,35 @@ class MongoCollector(object):
         if metrics_to_collect is None:
             metrics_to_collect = self.metrics_to_collect
         tags = self.base_tags + (additional_tags or [])
-        # Go through the metrics and save the values
-        for metric_name in metrics_to_collect:
-            # each metric is of the form: x.y.z with z optional
-            # and can be found at status[x][y][z]
-            value = payload
 
+        self._submit_plan(self._get_submission_plan(metrics_to_collect, prefix), payload, tags)
+
+    def _submit_plan(self, plan, payload, tags):
+        # Sections missing from the payload are skipped along with all the metrics they contain
+        for key, (metric, nested_plan) in iteritems(plan):
             try:
-                for c in metric_name.split("."):
-                    value = value[c]
+                value = payload[key]
             except KeyError:
                 continue
 
-            # value is now status[x][y][z]
-            if not isinstance(value, (int, long, float)):
-                raise TypeError(
-                    u"{0} value is a {1}, it should be an int, a float or a long instead.".format(
-                        metric_name, type(value)
-                    )
-                )
-
-            # Submit the metric
-            submit_method = (
-                metrics_to_collect[metric_name][0]
-                if isinstance(metrics_to_collect[metric_name], tuple)
-                else metrics_to_collect[metric_name]
-            )
-            metric_name_alias = (
-                metrics_to_collect[metric_name][1]
-                if isinstance(metrics_to_collect[metric_name], tuple)
-                else metric_name
+            if metric is not None:
+                self._submit_metric(metric, value, tags)
+
+            if nested_plan:
+                self._submit_plan(nested_plan, value, tags)
+
+    def _submit_metric(self, metric, value, tags):
+        metric_name, submit_method, normalized_metric_name, deprecated_metric_name_alias, legacy_metric_name = metric
+
+        # value is now status[x][y][z]
+        if not isinstance(value, (int, long, float)):
+            raise TypeError(
+                u"{0} value is a {1}, it should be an int, a float or a long instead.".format(metric_name, type(value))
             )
 
-            # This is because https://datadoghq.atlassian.net/browse/AGENT-9001
-            # Delete this code when the metrics are definitely deprecated
-            if metric_name_alias in (
-                'opLatencies.reads.latency',
-                'opLatencies.writes.latency',
-                'opLatencies.commands.latency',
-            ):
-                deprecated_metric_name_alias = self._normalize(metric_name_alias, AgentCheck.rate, prefix)
-                AgentCheck.rate(self.check, deprecated_metric_name_alias, value, tags=tags)
+        if deprecated_metric_name_alias is not None:
+            AgentCheck.rate(self.check, deprecated_metric_name_alias, value, tags=tags)
 
-            metric_name_alias = self._normalize(metric_name_alias, submit_method, prefix)
-            submit_method(self.check, metric_name_alias, value, tags=tags)
-            if metric_name_alias.endswith("countps"):
-                # Keep old incorrect metric name (only 'top' metrics are affected)
-                self.gauge(metric_name_alias[:-2], value, tags=tags)
+        submit_method(self.check, normalized_metric_name, value, tags=tags)
+        if legacy_metric_name is not None:
+            self.gauge(legacy_metric_name, value, tags=tags)
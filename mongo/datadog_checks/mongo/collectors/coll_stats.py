@@ -21,6 +21,7 @@ class CollStatsCollector(MongoCollector):
         super(CollStatsCollector, self).__init__(check, tags)
         self.coll_names = coll_names
         self.db_name = db_name
+        self.collection_interval = check._config.coll_stats_interval
 
     def compatible_with(self, deployment):
         # Can only be run once per cluster.
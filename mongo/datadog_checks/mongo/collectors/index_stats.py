@@ -12,6 +12,7 @@ class IndexStatsCollector(MongoCollector):
         super(IndexStatsCollector, self).__init__(check, tags)
         self.coll_names = coll_names
         self.db_name = db_name
+        self.collection_interval = check._config.index_stats_interval
 
     def compatible_with(self, deployment):
         # Can only be run once per cluster.
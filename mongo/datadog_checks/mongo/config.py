@@ -88,6 +88,13 @@ class MongoConfig(object):
         self.coll_names = instance.get('collections', [])
         self.custom_queries = instance.get("custom_queries", [])
 
+        self.collector_workers = int(instance.get('collector_workers', 1))
+        if self.collector_workers < 1:
+            raise ConfigurationError('`collector_workers` must be a positive integer')
+        self.collector_timeout = float(instance.get('collector_timeout', 0))
+        self.coll_stats_interval = float(instance.get('coll_stats_interval', 0))
+        self.index_stats_interval = float(instance.get('index_stats_interval', 0))
+
         self._base_tags = list(set(instance.get('tags', [])))
         self.service_check_tags = self._compute_service_check_tags()
         self.metric_tags = self._compute_metric_tags()
@@ -18,6 +18,10 @@ def instance_additional_metrics(field, value):
     return get_default_field_value(field, value)
 
 
+def instance_coll_stats_interval(field, value):
+    return 0
+
+
 def instance_collections(field, value):
     return get_default_field_value(field, value)
 
@@ -26,6 +30,14 @@ def instance_collections_indexes_stats(field, value):
     return False
 
 
+def instance_collector_timeout(field, value):
+    return 0
+
+
+def instance_collector_workers(field, value):
+    return 1
+
+
 def instance_connection_scheme(field, value):
     return 'mongodb'
 
@@ -54,6 +66,10 @@ def instance_hosts(field, value):
     return get_default_field_value(field, value)
 
 
+def instance_index_stats_interval(field, value):
+    return 0
+
+
 def instance_metric_patterns(field, value):
     return get_default_field_value(field, value)
 
@@ -52,8 +52,11 @@ class InstanceConfig(BaseModel):
         allow_mutation = False
 
     additional_metrics: Optional[Sequence[str]]
+    coll_stats_interval: Optional[float]
     collections: Optional[Sequence[str]]
     collections_indexes_stats: Optional[bool]
+    collector_timeout: Optional[float]
+    collector_workers: Optional[int]
     connection_scheme: Optional[str]
     custom_queries: Optional[Sequence[CustomQuery]]
     database: Optional[str]
@@ -61,6 +64,7 @@ class InstanceConfig(BaseModel):
     disable_generic_tags: Optional[bool]
     empty_default_hostname: Optional[bool]
     hosts: Optional[Union[str, Sequence[str]]]
+    index_stats_interval: Optional[float]
     metric_patterns: Optional[MetricPatterns]
     min_collection_interval: Optional[float]
     options: Optional[Mapping[str, Any]]
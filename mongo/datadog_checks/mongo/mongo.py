@@ -3,11 +3,13 @@
 # Licensed under a 3-clause BSD style license (see LICENSE)
 from __future__ import division
 
+from concurrent.futures import ThreadPoolExecutor, wait
 from copy import deepcopy
 
 from packaging.version import Version
 
 from datadog_checks.base import AgentCheck, is_affirmative
+from datadog_checks.base.utils.time import get_precise_time, get_timestamp
 from datadog_checks.mongo.api import MongoApi
 from datadog_checks.mongo.collectors import (
     CollStatsCollector,
@@ -74,6 +76,16 @@ class MongoDb(AgentCheck):
         self.collectors = []
         self.last_states_by_server = {}
 
+        # Resolved metric names and payload submission plans, shared by the collectors of every run
+        self.metric_names = {}
+        self.submission_plans = {}
+
+        # The last time every collector running on its own interval was started, keyed by its telemetry tags
+        self._last_collection_times = {}
+        # Collectors that are still running, possibly from a previous check run after they timed out
+        self._running_collectors = set()
+        self._collector_executor = None
+
         self._api_client = None
         self._mongo_version = None
 
@@ -209,13 +221,81 @@ class MongoDb(AgentCheck):
 
         dbnames = self._get_db_names(self.api_client, deployment, tags)
         self.refresh_collectors(deployment, dbnames, tags)
+        self._run_collectors(self._get_due_collectors())
+
+    def _get_due_collectors(self):
+        now = get_timestamp()
+        collectors = []
         for collector in self.collectors:
-            try:
-                collector.collect(self.api_client)
-            except Exception:
-                self.log.info(
-                    "Unable to collect logs from collector %s. Some metrics will be missing.", collector, exc_info=True
+            key = tuple(collector.get_telemetry_tags())
+            if key in self._running_collectors:
+                self.log.debug("Collector %s is still running from a previous check run, skipping it", collector)
+                continue
+
+            if collector.collection_interval:
+                last_collection_time = self._last_collection_times.get(key)
+                if last_collection_time is not None and now - last_collection_time < collector.collection_interval:
+                    continue
+
+                self._last_collection_times[key] = now
+
+            collectors.append(collector)
+
+        return collectors
+
+    def _run_collectors(self, collectors):
+        workers = self._config.collector_workers
+        timeout = self._config.collector_timeout
+        if workers == 1 and not timeout:
+            for collector in collectors:
+                self._run_collector(collector)
+            return
+
+        if self._collector_executor is None:
+            self._collector_executor = ThreadPoolExecutor(max_workers=workers)
+
+        futures = {self._collector_executor.submit(self._run_collector, c): c for c in collectors}
+        # A single deadline bounds the whole run, however long collectors wait for a worker
+        _, pending = wait(futures, timeout=timeout or None)
+        for future in pending:
+            collector = futures[future]
+            if future.cancel():
+                self.log.warning(
+                    "Collector %s did not start within %s seconds, skipping it until the next check run",
+                    collector,
+                    timeout,
                 )
+                self._last_collection_times.pop(tuple(collector.get_telemetry_tags()), None)
+            else:
+                self.log.warning(
+                    "Collector %s did not finish within %s seconds, its metrics may be missing or late",
+                    collector,
+                    timeout,
+                )
+
+    def _run_collector(self, collector):
+        key = tuple(collector.get_telemetry_tags())
+        self._running_collectors.add(key)
+        start_time = get_precise_time()
+
+        try:
+            collector.collect(self.api_client)
+        except Exception:
+            self.log.info(
+                "Unable to collect logs from collector %s. Some metrics will be missing.", collector, exc_info=True
+            )
+        finally:
+            self._running_collectors.discard(key)
+            self.gauge(
+                'datadog.mongodb.collector.time',
+                get_precise_time() - start_time,
+                tags=self._config.metric_tags + list(key),
+            )
+
+    def cancel(self):
+        if self._collector_executor is not None:
+            self._collector_executor.shutdown(wait=False)
+            self._collector_executor = None
 
     def _get_db_names(self, api, deployment, tags):
         if isinstance(deployment, ReplicaSetDeployment) and deployment.is_arbiter:
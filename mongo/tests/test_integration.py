@@ -17,6 +17,8 @@ from .conftest import mock_pymongo
 def _assert_metrics(aggregator, metrics_categories, additional_tags=None):
     if additional_tags is None:
         additional_tags = []
+    # Every collector reports how long it took
+    aggregator.assert_metric('datadog.mongodb.collector.time')
     for cat in metrics_categories:
         with open(os.path.join(HERE, "results", "metrics-{}.json".format(cat)), 'r') as f:
             for metric in json.load(f):
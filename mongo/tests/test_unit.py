@@ -3,6 +3,8 @@
 # Licensed under a 3-clause BSD style license (see LICENSE)
 import copy
 import logging
+import threading
+import time
 from urllib.parse import quote_plus
 
 import mock
@@ -13,7 +15,7 @@ from six import iteritems
 from datadog_checks.base import ConfigurationError
 from datadog_checks.mongo import MongoDb, metrics
 from datadog_checks.mongo.api import MongoApi
-from datadog_checks.mongo.collectors import MongoCollector
+from datadog_checks.mongo.collectors import CollStatsCollector, MongoCollector
 from datadog_checks.mongo.common import MongosDeployment, ReplicaSetDeployment, get_state_name
 from datadog_checks.mongo.config import MongoConfig
 from datadog_checks.mongo.utils import parse_mongo_uri
@@ -462,6 +464,135 @@ def test_collector_submit_payload(check, aggregator):
     aggregator.assert_all_metrics_covered()
 
 
+def test_collector_submission_plan_is_reused(check, aggregator):
+    check = check(common.INSTANCE_BASIC)
+    metrics_to_collect = {
+        'foo.bar1': GAUGE,
+        'foo.x.count': RATE,
+        'opLatencies.reads.latency': GAUGE,
+        'missing.baz': GAUGE,
+    }
+    payload = {'foo': {'bar1': 1, 'x': {'count': 2}}, 'opLatencies': {'reads': {'latency': 3}}}
+
+    with mock.patch.object(
+        MongoCollector, '_build_submission_plan', autospec=True, side_effect=MongoCollector._build_submission_plan
+    ) as build_submission_plan:
+        for _ in range(2):
+            collector = MongoCollector(check, ['foo:1'])
+            collector._submit_payload(payload, metrics_to_collect=metrics_to_collect, prefix='usage')
+
+    assert build_submission_plan.call_count == 1
+
+    tags = ['foo:1']
+    aggregator.assert_metric('mongodb.usage.foo.bar1', 1, tags, metric_type=aggregator.GAUGE, count=2)
+    aggregator.assert_metric('mongodb.usage.foo.x.countps', 2, tags, metric_type=aggregator.RATE, count=2)
+    aggregator.assert_metric('mongodb.usage.foo.x.count', 2, tags, metric_type=aggregator.GAUGE, count=2)
+    aggregator.assert_metric('mongodb.usage.oplatencies.reads.latency', 3, tags, metric_type=aggregator.GAUGE, count=2)
+    aggregator.assert_metric('mongodb.usage.oplatencies.reads.latencyps', 3, tags, metric_type=aggregator.RATE, count=2)
+    aggregator.assert_all_metrics_covered()
+
+
+def test_collector_submit_payload_invalid_value(check):
+    check = check(common.INSTANCE_BASIC)
+    collector = MongoCollector(check, [])
+
+    with pytest.raises(TypeError, match='^foo.bar value is a'):
+        collector._submit_payload({'foo': {'bar': 'baz'}}, metrics_to_collect={'foo.bar': GAUGE})
+
+
+class SlowCollector(MongoCollector):
+    def __init__(self, check, db_name, delay=0, event=None):
+        super(SlowCollector, self).__init__(check, [])
+        self.db_name = db_name
+        self.delay = delay
+        self.event = event
+
+    def collect(self, api):
+        if self.event is not None:
+            self.event.wait()
+        time.sleep(self.delay)
+        self.gauge('mongodb.foo', 1, tags=['db:{}'.format(self.db_name)])
+
+
+def test_collectors_run_concurrently(check, instance, aggregator):
+    instance['collector_workers'] = 4
+    check = check(instance)
+    collectors = [SlowCollector(check, 'db{}'.format(i), delay=0.2) for i in range(4)]
+
+    start = time.time()
+    check._run_collectors(collectors)
+
+    assert time.time() - start < 0.6
+    for i in range(4):
+        aggregator.assert_metric('mongodb.foo', 1, tags=['db:db{}'.format(i)])
+        aggregator.assert_metric(
+            'datadog.mongodb.collector.time',
+            tags=check._config.metric_tags + ['collector:SlowCollector', 'db:db{}'.format(i)],
+        )
+
+
+def test_collector_timeout(check, instance, aggregator):
+    instance['collector_workers'] = 2
+    instance['collector_timeout'] = 0.2
+    check = check(instance)
+    event = threading.Event()
+    check.collectors = [SlowCollector(check, 'slow', event=event), SlowCollector(check, 'fast')]
+
+    try:
+        start = time.time()
+        check._run_collectors(check._get_due_collectors())
+
+        assert time.time() - start < 1
+        aggregator.assert_metric('mongodb.foo', tags=['db:fast'])
+        aggregator.assert_metric('mongodb.foo', count=0, tags=['db:slow'])
+
+        # The collector that timed out is not started again while it is still running
+        assert [collector.db_name for collector in check._get_due_collectors()] == ['fast']
+    finally:
+        event.set()
+        check.cancel()
+
+
+def test_collector_timeout_saturated_workers(check, instance, aggregator):
+    instance['collector_workers'] = 1
+    instance['collector_timeout'] = 0.2
+    check = check(instance)
+    event = threading.Event()
+    slow = SlowCollector(check, 'slow', event=event)
+    queued = SlowCollector(check, 'queued')
+    queued.collection_interval = 60
+    check.collectors = [slow, queued]
+
+    try:
+        start = time.time()
+        check._run_collectors(check._get_due_collectors())
+
+        # The run is bounded by the timeout even though the queued collector never got a worker
+        assert time.time() - start < 1
+        aggregator.assert_metric('mongodb.foo', count=0)
+
+        # The queued collector was skipped, so it is due again despite its collection interval
+        assert [collector.db_name for collector in check._get_due_collectors()] == ['queued']
+    finally:
+        event.set()
+        check.cancel()
+    aggregator.assert_metric('mongodb.foo', count=0, tags=['db:queued'])
+
+
+def test_collection_interval(check, instance):
+    instance['coll_stats_interval'] = 60
+    check = check(instance)
+
+    def get_due_collectors(timestamp):
+        check.collectors = [CollStatsCollector(check, 'test', [], coll_names=['foo']), SlowCollector(check, 'db')]
+        with mock.patch('datadog_checks.mongo.mongo.get_timestamp', return_value=timestamp):
+            return [type(collector) for collector in check._get_due_collectors()]
+
+    assert get_due_collectors(1000) == [CollStatsCollector, SlowCollector]
+    assert get_due_collectors(1030) == [SlowCollector]
+    assert get_due_collectors(1060) == [CollStatsCollector, SlowCollector]
+
+
 def test_api_alibaba_mongos(aggregator):
     log = mock.MagicMock()
     config = MongoConfig(common.INSTANCE_BASIC, log)
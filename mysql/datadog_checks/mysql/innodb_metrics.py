@@ -18,10 +18,205 @@ if PY3:
     long = int
 
 
+# The headers of the sections of InnoDB STATUS, such as:
+# ----------
+# SEMAPHORES
+# ----------
+SECTION_HEADER = re.compile(r'^-{3,}[ \t\r]*\n([A-Z][A-Z/ ]*[A-Z])[ \t\r]*\n-{3,}[ \t\r]*$', re.M)
+
+NUMBER = re.compile(r'\d+')
+
+# The lines with metrics of every section, by name. The numbers of a line are assigned in order to its metrics,
+# skipping the ones without a metric. Lines with no metrics listed are handled by `InnoDBMetrics._parse_section`.
+TRANSACTIONS_LINES = [
+    # Trx id counter 0 1170664159
+    # Trx id counter 861B144C
+    ('trx_id_counter', r'Trx id counter', None),
+    # History list length 132
+    ('history_list_length', r'History list length \d+', ('Innodb_history_list_length',)),
+    ('transaction', r'---TRANSACTION.*', None),
+    ('tables_in_use', r'mysql tables in use \d+, locked \d+', None),
+    ('lock_structs', r'(?:LOCK WAIT |ROLLING BACK )?\d+ lock struct\(s\)', None),
+]
+SECTION_LINES = {
+    'SEMAPHORES': [
+        # Mutex spin waits 79626940, rounds 157459864, OS waits 698719
+        # Mutex spin waits 0, rounds 247280272495, OS waits 316513438
+        (
+            'mutex_spin_waits',
+            r'Mutex spin waits \d+, rounds \d+, OS waits \d+',
+            ('Innodb_mutex_spin_waits', 'Innodb_mutex_spin_rounds', 'Innodb_mutex_os_waits'),
+        ),
+        # RW-shared spins 3859028, OS waits 2100750; RW-excl spins 4641946, OS waits 1530310
+        (
+            'rw_lock_spin_waits',
+            r'RW-shared spins \d+, OS waits \d+; RW-excl spins \d+, OS waits \d+',
+            (
+                'Innodb_s_lock_spin_waits',
+                'Innodb_s_lock_os_waits',
+                'Innodb_x_lock_spin_waits',
+                'Innodb_x_lock_os_waits',
+            ),
+        ),
+        # Post 5.5.17 SHOW ENGINE INNODB STATUS syntax
+        # RW-shared spins 604733, rounds 8107431, OS waits 241268
+        # RW-excl spins 604733, rounds 8107431, OS waits 241268
+        (
+            's_lock_spin_waits',
+            r'RW-shared spins \d+, rounds \d+, OS waits \d+',
+            ('Innodb_s_lock_spin_waits', 'Innodb_s_lock_spin_rounds', 'Innodb_s_lock_os_waits'),
+        ),
+        (
+            'x_lock_spin_waits',
+            r'RW-excl spins \d+, rounds \d+, OS waits \d+',
+            ('Innodb_x_lock_spin_waits', 'Innodb_x_lock_spin_rounds', 'Innodb_x_lock_os_waits'),
+        ),
+        ('semaphore_wait', r'--Thread .* seconds the semaphore:', None),
+    ],
+    'LATEST FOREIGN KEY ERROR': TRANSACTIONS_LINES,
+    'LATEST DETECTED DEADLOCK': TRANSACTIONS_LINES,
+    'TRANSACTIONS': TRANSACTIONS_LINES,
+    'FILE I/O': [
+        # 8782182 OS file reads, 15635445 OS file writes, 947800 OS fsyncs
+        (
+            'os_file_io',
+            r'\d+ OS file reads, \d+ OS file writes, \d+ OS fsyncs',
+            ('Innodb_os_file_reads', 'Innodb_os_file_writes', 'Innodb_os_file_fsyncs'),
+        ),
+        ('pending_normal_aio', r'Pending normal aio reads:.*', None),
+        ('pending_ibuf_aio', r'ibuf aio reads.*', None),
+        # Pending flushes (fsync) log: 0; buffer pool: 0
+        (
+            'pending_flushes',
+            r'Pending flushes \(fsync\) log: \d+; buffer pool: \d+',
+            ('Innodb_pending_log_flushes', 'Innodb_pending_buffer_pool_flushes'),
+        ),
+    ],
+    'INSERT BUFFER AND ADAPTIVE HASH INDEX': [
+        # Older InnoDB code seemed to be ready for an ibuf per tablespace.  It
+        # had two lines in the output.  Newer has just one line, see below.
+        # Ibuf for space 0: size 1, free list len 887, seg size 889, is not empty
+        # Ibuf for space 0: size 1, free list len 887, seg size 889,
+        (
+            'ibuf_for_space',
+            r'Ibuf for space 0: size \d+, free list len \d+, seg size \d+',
+            (None, 'Innodb_ibuf_size', 'Innodb_ibuf_free_list', 'Innodb_ibuf_segment_size'),
+        ),
+        # Ibuf: size 1, free list len 4634, seg size 4636,
+        # Ibuf: size 1, free list len 0, seg size 2, 0 merges
+        (
+            'ibuf',
+            r'Ibuf: size \d+, free list len \d+, seg size \d+,(?: \d+ merges)?',
+            ('Innodb_ibuf_size', 'Innodb_ibuf_free_list', 'Innodb_ibuf_segment_size', 'Innodb_ibuf_merges'),
+        ),
+        ('ibuf_merged_operations', r'merged operations:[ \t\r]*\n[ \t]*insert \d+, delete mark \d+, delete \d+', None),
+        # 19817685 inserts, 19817684 merged recs, 3552620 merges
+        (
+            'ibuf_merged_recs',
+            r'\d+ inserts, \d+ merged recs, \d+ merges',
+            ('Innodb_ibuf_merged_inserts', 'Innodb_ibuf_merged', 'Innodb_ibuf_merges'),
+        ),
+        ('hash_table_size', r'Hash table size \d+(?:, used cells \d+)?', None),
+    ],
+    'LOG': [
+        # This number is NOT printed in hex in InnoDB plugin.
+        # Log sequence number 272588624
+        ('lsn_current', r'Log sequence number +\d+', ('Innodb_lsn_current',)),
+        # Log flushed up to   272588624
+        ('lsn_flushed', r'Log flushed up to +\d+', ('Innodb_lsn_flushed',)),
+        # Last checkpoint at  272588624
+        ('lsn_last_checkpoint', r'Last checkpoint at +\d+', ('Innodb_lsn_last_checkpoint',)),
+        # 0 pending log writes, 0 pending chkp writes
+        (
+            'pending_log_writes',
+            r'\d+ pending log writes, \d+ pending chkp writes',
+            ('Innodb_pending_log_writes', 'Innodb_pending_checkpoint_writes'),
+        ),
+        # 3430041 log i/o's done, 17.44 log i/o's/second
+        ('log_writes', r"\d+ log i/o's done, ", ('Innodb_log_writes',)),
+    ],
+    # Only aggregated buffer pool metrics are returned, the INDIVIDUAL BUFFER POOL INFO section is skipped
+    'BUFFER POOL AND MEMORY': [
+        # Total memory allocated 29642194944; in additional pool allocated 0
+        (
+            'mem_total',
+            r'Total memory allocated \d+; in additional pool allocated \d+',
+            ('Innodb_mem_total', 'Innodb_mem_additional_pool'),
+        ),
+        #   Adaptive hash index 1538240664     (186998824 + 1351241840)
+        ('mem_adaptive_hash', r'Adaptive hash index +\d+', ('Innodb_mem_adaptive_hash',)),
+        #   Page hash           11688584
+        ('mem_page_hash', r'Page hash +\d+', ('Innodb_mem_page_hash',)),
+        #   Dictionary cache    145525560      (140250984 + 5274576)
+        ('mem_dictionary', r'Dictionary cache +\d+', ('Innodb_mem_dictionary',)),
+        #   File system         313848         (82672 + 231176)
+        ('mem_file_system', r'File system +\d+', ('Innodb_mem_file_system',)),
+        #   Lock system         29232616       (29219368 + 13248)
+        ('mem_lock_system', r'Lock system +\d+', ('Innodb_mem_lock_system',)),
+        #   Recovery system     0      (0 + 0)
+        ('mem_recovery_system', r'Recovery system +\d+', ('Innodb_mem_recovery_system',)),
+        #   Threads             409336         (406936 + 2400)
+        ('mem_thread_hash', r'Threads +\d+', ('Innodb_mem_thread_hash',)),
+        # Buffer pool size        1769471
+        # Not to be confused with:
+        # Buffer pool size, bytes 28991012864
+        ('buffer_pool_pages_total', r'Buffer pool size +\d+', ('Innodb_buffer_pool_pages_total',)),
+        # Free buffers            0
+        ('buffer_pool_pages_free', r'Free buffers +\d+', ('Innodb_buffer_pool_pages_free',)),
+        # Database pages          1696503
+        ('buffer_pool_pages_data', r'Database pages +\d+', ('Innodb_buffer_pool_pages_data',)),
+        # Modified db pages       160602
+        ('buffer_pool_pages_dirty', r'Modified db pages +\d+', ('Innodb_buffer_pool_pages_dirty',)),
+        # Pages read 15240822, created 1770238, written 21705836
+        # Not to be confused with:
+        # Pages read ahead 0.00/s, evicted without access 0.06/s
+        (
+            'pages',
+            r'Pages read \d+, created \d+, written \d+',
+            ('Innodb_pages_read', 'Innodb_pages_created', 'Innodb_pages_written'),
+        ),
+    ],
+    'ROW OPERATIONS': [
+        # 0 queries inside InnoDB, 0 queries in queue
+        (
+            'queries',
+            r'\d+ queries inside InnoDB, \d+ queries in queue',
+            ('Innodb_queries_inside', 'Innodb_queries_queued'),
+        ),
+        # 1 read views open inside InnoDB
+        ('read_views', r'\d+ read views open inside InnoDB', ('Innodb_read_views',)),
+        # Number of rows inserted 50678311, updated 66425915, deleted 20605903, read 454561562
+        (
+            'rows',
+            r'Number of rows inserted \d+, updated \d+, deleted \d+, read \d+',
+            ('Innodb_rows_inserted', 'Innodb_rows_updated', 'Innodb_rows_deleted', 'Innodb_rows_read'),
+        ),
+    ],
+}
+
+
+def _compile_section(lines):
+    # A single pattern matching any line with metrics of a section, in a group named after the line
+    pattern = r'\n[ \t]*(?:{})'.format('|'.join('(?P<{}>{})'.format(name, line) for name, line, _ in lines))
+    return re.compile(pattern), {name: metrics for name, _, metrics in lines}
+
+
+SECTIONS = {title: _compile_section(lines) for title, lines in iteritems(SECTION_LINES)}
+
+
 def _are_values_numeric(array):
     return all(v.isdigit() for v in array)
 
 
+def _split_row(line):
+    row = re.split(" +", line.strip())
+    row = [item.strip(',') for item in row]
+    row = [item.strip(';') for item in row]
+    row = [item.strip('[') for item in row]
+    row = [item.strip(']') for item in row]
+    return row
+
+
 class InnoDBMetrics(object):
     def __init__(self):
         self.log = get_check_logger()
@@ -59,141 +254,82 @@ class InnoDBMetrics(object):
             return {}
 
         innodb_status = cursor.fetchone()
-        innodb_status_text = innodb_status[2]
+        return self.parse_innodb_status(innodb_status[2])
 
+    def parse_innodb_status(self, innodb_status_text):
         results = defaultdict(int)
 
-        # Here we now parse InnoDB STATUS one line at a time
+        # Only the sections with metrics are parsed, each in a single pass with the pattern of its lines.
         # This is heavily inspired by the Percona monitoring plugins work
+        headers = list(SECTION_HEADER.finditer(innodb_status_text))
+        for header, next_header in zip(headers, headers[1:] + [None]):
+            section = SECTIONS.get(header.group(1))
+            if section is not None:
+                end = next_header.start() if next_header is not None else len(innodb_status_text)
+                self._parse_section(innodb_status_text, header.end(), end, section, results)
+
+        # We need to calculate this metric separately
+        try:
+            results['Innodb_checkpoint_age'] = results['Innodb_lsn_current'] - results['Innodb_lsn_last_checkpoint']
+        except KeyError as e:
+            self.log.error("Not all InnoDB LSN metrics available, unable to compute: %s", e)
+
+        # Finally we change back the metrics values to string to make the values
+        # consistent with how they are reported by SHOW GLOBAL STATUS
+        for metric, value in list(iteritems(results)):
+            results[metric] = str(value)
+
+        return results
+
+    def _parse_section(self, text, start, end, section, results):
+        pattern, line_metrics = section
+        # The transactions of the latest deadlock and foreign key error are not preceded by `Trx id counter`,
+        # so they only add to the tables in use
         txn_seen = False
-        prev_line = ''
-        # Only return aggregated buffer pool metrics
-        buffer_id = -1
-        for line in innodb_status_text.splitlines():
-            line = line.strip()
-            row = re.split(" +", line)
-            row = [item.strip(',') for item in row]
-            row = [item.strip(';') for item in row]
-            row = [item.strip('[') for item in row]
-            row = [item.strip(']') for item in row]
-
-            if line.startswith('---BUFFER POOL'):
-                buffer_id = long(row[2])
-
-            # SEMAPHORES
-            if line.find('Mutex spin waits') == 0:
-                # Mutex spin waits 79626940, rounds 157459864, OS waits 698719
-                # Mutex spin waits 0, rounds 247280272495, OS waits 316513438
-                results['Innodb_mutex_spin_waits'] = long(row[3])
-                results['Innodb_mutex_spin_rounds'] = long(row[5])
-                results['Innodb_mutex_os_waits'] = long(row[8])
-            elif line.find('RW-shared spins') == 0 and line.find(';') > 0:
-                # RW-shared spins 3859028, OS waits 2100750; RW-excl spins
-                # 4641946, OS waits 1530310
-                results['Innodb_s_lock_spin_waits'] = long(row[2])
-                results['Innodb_x_lock_spin_waits'] = long(row[8])
-                results['Innodb_s_lock_os_waits'] = long(row[5])
-                results['Innodb_x_lock_os_waits'] = long(row[11])
-            elif line.find('RW-shared spins') == 0 and line.find('; RW-excl spins') == -1:
-                # Post 5.5.17 SHOW ENGINE INNODB STATUS syntax
-                # RW-shared spins 604733, rounds 8107431, OS waits 241268
-                results['Innodb_s_lock_spin_waits'] = long(row[2])
-                results['Innodb_s_lock_spin_rounds'] = long(row[4])
-                results['Innodb_s_lock_os_waits'] = long(row[7])
-            elif line.find('RW-excl spins') == 0:
-                # Post 5.5.17 SHOW ENGINE INNODB STATUS syntax
-                # RW-excl spins 604733, rounds 8107431, OS waits 241268
-                results['Innodb_x_lock_spin_waits'] = long(row[2])
-                results['Innodb_x_lock_spin_rounds'] = long(row[4])
-                results['Innodb_x_lock_os_waits'] = long(row[7])
-            elif line.find('seconds the semaphore:') > 0:
+
+        for match in pattern.finditer(text, start, end):
+            name = match.lastgroup
+            line = match.group(name)
+
+            metrics = line_metrics[name]
+            if metrics is not None:
+                for metric, value in zip(metrics, NUMBER.findall(line)):
+                    if metric is not None:
+                        results[metric] = long(value)
+
+            elif name == 'semaphore_wait':
                 # --Thread 907205 has waited at handler/ha_innodb.cc line 7156 for 1.00 seconds the semaphore:
                 results['Innodb_semaphore_waits'] += 1
-                results['Innodb_semaphore_wait_time'] += long(float(row[9])) * 1000
-
-            # TRANSACTIONS
-            elif line.find('Trx id counter') == 0:
+                results['Innodb_semaphore_wait_time'] += long(float(line.split()[-4])) * 1000
+            elif name == 'trx_id_counter':
                 # The beginning of the TRANSACTIONS section: start counting
                 # transactions
-                # Trx id counter 0 1170664159
-                # Trx id counter 861B144C
                 txn_seen = True
-            elif line.find('History list length') == 0:
-                # History list length 132
-                results['Innodb_history_list_length'] = long(row[3])
-            elif txn_seen and line.find('---TRANSACTION') == 0:
+            elif name == 'transaction':
                 # ---TRANSACTION 0, not started, process no 13510, OS thread id 1170446656
-                results['Innodb_current_transactions'] += 1
-                if line.find('ACTIVE') > 0:
-                    results['Innodb_active_transactions'] += 1
-            elif line.find('read views open inside InnoDB') > 0:
-                # 1 read views open inside InnoDB
-                results['Innodb_read_views'] = long(row[0])
-            elif line.find('mysql tables in use') == 0:
+                if txn_seen:
+                    results['Innodb_current_transactions'] += 1
+                    if line.find('ACTIVE') > 0:
+                        results['Innodb_active_transactions'] += 1
+            elif name == 'tables_in_use':
                 # mysql tables in use 2, locked 2
-                results['Innodb_tables_in_use'] += long(row[4])
-                results['Innodb_locked_tables'] += long(row[6])
-            elif txn_seen and line.find('lock struct(s)') > 0:
+                tables_in_use, locked_tables = NUMBER.findall(line)
+                results['Innodb_tables_in_use'] += long(tables_in_use)
+                results['Innodb_locked_tables'] += long(locked_tables)
+            elif name == 'lock_structs':
                 # 23 lock struct(s), heap size 3024, undo log entries 27
                 # LOCK WAIT 12 lock struct(s), heap size 3024, undo log entries 5
-                # LOCK WAIT 2 lock struct(s), heap size 368
-                if line.find('LOCK WAIT') == 0:
-                    results['Innodb_lock_structs'] += long(row[2])
-                    results['Innodb_locked_transactions'] += 1
-                elif line.find('ROLLING BACK') == 0:
-                    # ROLLING BACK 127539 lock struct(s), heap size 15201832,
-                    # 4411492 row lock(s), undo log entries 1042488
-                    results['Innodb_lock_structs'] += long(row[2])
-                else:
-                    results['Innodb_lock_structs'] += long(row[0])
-
-            # FILE I/O
-            elif line.find(' OS file reads, ') > 0:
-                # 8782182 OS file reads, 15635445 OS file writes, 947800 OS
-                # fsyncs
-                results['Innodb_os_file_reads'] = long(row[0])
-                results['Innodb_os_file_writes'] = long(row[4])
-                results['Innodb_os_file_fsyncs'] = long(row[8])
-            elif line.find('Pending normal aio reads:') == 0:
-                try:
-                    if len(row) == 8:
-                        # (len(row) == 8)  Pending normal aio reads: 0, aio writes: 0,
-                        results['Innodb_pending_normal_aio_reads'] = long(row[4])
-                        results['Innodb_pending_normal_aio_writes'] = long(row[7])
-                    elif len(row) == 14:
-                        # (len(row) == 14) Pending normal aio reads: 0 [0, 0] , aio writes: 0 [0, 0] ,
-                        results['Innodb_pending_normal_aio_reads'] = long(row[4])
-                        results['Innodb_pending_normal_aio_writes'] = long(row[10])
-                    elif len(row) == 16:
-                        # (len(row) == 16) Pending normal aio reads: [0, 0, 0, 0] , aio writes: [0, 0, 0, 0] ,
-                        if _are_values_numeric(row[4:8]) and _are_values_numeric(row[11:15]):
-                            results['Innodb_pending_normal_aio_reads'] = (
-                                long(row[4]) + long(row[5]) + long(row[6]) + long(row[7])
-                            )
-                            results['Innodb_pending_normal_aio_writes'] = (
-                                long(row[11]) + long(row[12]) + long(row[13]) + long(row[14])
-                            )
-
-                        # (len(row) == 16) Pending normal aio reads: 0 [0, 0, 0, 0] , aio writes: 0 [0, 0] ,
-                        elif _are_values_numeric(row[4:9]) and _are_values_numeric(row[12:15]):
-                            results['Innodb_pending_normal_aio_reads'] = long(row[4])
-                            results['Innodb_pending_normal_aio_writes'] = long(row[12])
-                        else:
-                            self.log.warning("Can't parse result line %s", line)
-                    elif len(row) == 18:
-                        # (len(row) == 18) Pending normal aio reads: 0 [0, 0, 0, 0] , aio writes: 0 [0, 0, 0, 0] ,
-                        results['Innodb_pending_normal_aio_reads'] = long(row[4])
-                        results['Innodb_pending_normal_aio_writes'] = long(row[12])
-                    elif len(row) == 22:
-                        # (len(row) == 22)
-                        # Pending normal aio reads: 0 [0, 0, 0, 0, 0, 0, 0, 0] , aio writes: 0 [0, 0, 0, 0] ,
-                        results['Innodb_pending_normal_aio_reads'] = long(row[4])
-                        results['Innodb_pending_normal_aio_writes'] = long(row[16])
-                except ValueError as e:
-                    self.log.warning("Can't parse result line %s: %s", line, e)
-            elif line.find('ibuf aio reads') == 0:
+                # ROLLING BACK 127539 lock struct(s), heap size 15201832,
+                if txn_seen:
+                    results['Innodb_lock_structs'] += long(NUMBER.search(line).group())
+                    if line.startswith('LOCK WAIT'):
+                        results['Innodb_locked_transactions'] += 1
+            elif name == 'pending_normal_aio':
+                self._parse_pending_normal_aio(line, results)
+            elif name == 'pending_ibuf_aio':
                 #  ibuf aio reads: 0, log i/o's: 0, sync i/o's: 0
                 #  or ibuf aio reads:, log i/o's:, sync i/o's:
+                row = _split_row(line)
                 if len(row) == 10:
                     results['Innodb_pending_ibuf_aio_reads'] = long(row[3])
                     results['Innodb_pending_aio_log_ios'] = long(row[6])
@@ -202,160 +338,64 @@ class InnoDBMetrics(object):
                     results['Innodb_pending_ibuf_aio_reads'] = 0
                     results['Innodb_pending_aio_log_ios'] = 0
                     results['Innodb_pending_aio_sync_ios'] = 0
-            elif line.find('Pending flushes (fsync)') == 0:
-                # Pending flushes (fsync) log: 0; buffer pool: 0
-                results['Innodb_pending_log_flushes'] = long(row[4])
-                results['Innodb_pending_buffer_pool_flushes'] = long(row[7])
-
-            # INSERT BUFFER AND ADAPTIVE HASH INDEX
-            elif line.find('Ibuf for space 0: size ') == 0:
-                # Older InnoDB code seemed to be ready for an ibuf per tablespace.  It
-                # had two lines in the output.  Newer has just one line, see below.
-                # Ibuf for space 0: size 1, free list len 887, seg size 889, is not empty
-                # Ibuf for space 0: size 1, free list len 887, seg size 889,
-                results['Innodb_ibuf_size'] = long(row[5])
-                results['Innodb_ibuf_free_list'] = long(row[9])
-                results['Innodb_ibuf_segment_size'] = long(row[12])
-            elif line.find('Ibuf: size ') == 0:
-                # Ibuf: size 1, free list len 4634, seg size 4636,
-                results['Innodb_ibuf_size'] = long(row[2])
-                results['Innodb_ibuf_free_list'] = long(row[6])
-                results['Innodb_ibuf_segment_size'] = long(row[9])
-
-                if line.find('merges') > -1:
-                    results['Innodb_ibuf_merges'] = long(row[10])
-            elif line.find(', delete mark ') > 0 and prev_line.find('merged operations:') == 0:
+            elif name == 'ibuf_merged_operations':
                 # Output of show engine innodb status has changed in 5.5
                 # merged operations:
                 # insert 593983, delete mark 387006, delete 73092
-                results['Innodb_ibuf_merged_inserts'] = long(row[1])
-                results['Innodb_ibuf_merged_delete_marks'] = long(row[4])
-                results['Innodb_ibuf_merged_deletes'] = long(row[6])
-                results['Innodb_ibuf_merged'] = (
-                    results['Innodb_ibuf_merged_inserts']
-                    + results['Innodb_ibuf_merged_delete_marks']
-                    + results['Innodb_ibuf_merged_deletes']
-                )
-            elif line.find(' merged recs, ') > 0:
-                # 19817685 inserts, 19817684 merged recs, 3552620 merges
-                results['Innodb_ibuf_merged_inserts'] = long(row[0])
-                results['Innodb_ibuf_merged'] = long(row[2])
-                results['Innodb_ibuf_merges'] = long(row[5])
-            elif line.find('Hash table size ') == 0:
+                inserts, delete_marks, deletes = (long(value) for value in NUMBER.findall(line))
+                results['Innodb_ibuf_merged_inserts'] = inserts
+                results['Innodb_ibuf_merged_delete_marks'] = delete_marks
+                results['Innodb_ibuf_merged_deletes'] = deletes
+                results['Innodb_ibuf_merged'] = inserts + delete_marks + deletes
+            elif name == 'hash_table_size':
                 # In some versions of InnoDB, the used cells is omitted.
                 # Hash table size 4425293, used cells 4229064, ....
                 # Hash table size 57374437, node heap has 72964 buffer(s) <--
                 # no used cells
-                results['Innodb_hash_index_cells_total'] = long(row[3])
-                results['Innodb_hash_index_cells_used'] = long(row[6]) if line.find('used cells') > 0 else 0
-
-            # LOG
-            elif line.find(" log i/o's done, ") > 0:
-                # 3430041 log i/o's done, 17.44 log i/o's/second
-                # 520835887 log i/o's done, 17.28 log i/o's/second, 518724686
-                # syncs, 2980893 checkpoints
-                results['Innodb_log_writes'] = long(row[0])
-            elif line.find(" pending log writes, ") > 0:
-                # 0 pending log writes, 0 pending chkp writes
-                results['Innodb_pending_log_writes'] = long(row[0])
-                results['Innodb_pending_checkpoint_writes'] = long(row[4])
-            elif line.find("Log sequence number") == 0:
-                # This number is NOT printed in hex in InnoDB plugin.
-                # Log sequence number 272588624
-                results['Innodb_lsn_current'] = long(row[3])
-            elif line.find("Log flushed up to") == 0:
-                # This number is NOT printed in hex in InnoDB plugin.
-                # Log flushed up to   272588624
-                results['Innodb_lsn_flushed'] = long(row[4])
-            elif line.find("Last checkpoint at") == 0:
-                # Last checkpoint at  272588624
-                results['Innodb_lsn_last_checkpoint'] = long(row[3])
-
-            # BUFFER POOL AND MEMORY
-            elif line.find("Total memory allocated") == 0 and line.find("in additional pool allocated") > 0:
-                # Total memory allocated 29642194944; in additional pool allocated 0
-                # Total memory allocated by read views 96
-                results['Innodb_mem_total'] = long(row[3])
-                results['Innodb_mem_additional_pool'] = long(row[8])
-            elif line.find('Adaptive hash index ') == 0:
-                #   Adaptive hash index 1538240664     (186998824 + 1351241840)
-                results['Innodb_mem_adaptive_hash'] = long(row[3])
-            elif line.find('Page hash           ') == 0:
-                #   Page hash           11688584
-                results['Innodb_mem_page_hash'] = long(row[2])
-            elif line.find('Dictionary cache    ') == 0:
-                #   Dictionary cache    145525560      (140250984 + 5274576)
-                results['Innodb_mem_dictionary'] = long(row[2])
-            elif line.find('File system         ') == 0:
-                #   File system         313848         (82672 + 231176)
-                results['Innodb_mem_file_system'] = long(row[2])
-            elif line.find('Lock system         ') == 0:
-                #   Lock system         29232616       (29219368 + 13248)
-                results['Innodb_mem_lock_system'] = long(row[2])
-            elif line.find('Recovery system     ') == 0:
-                #   Recovery system     0      (0 + 0)
-                results['Innodb_mem_recovery_system'] = long(row[2])
-            elif line.find('Threads             ') == 0:
-                #   Threads             409336         (406936 + 2400)
-                results['Innodb_mem_thread_hash'] = long(row[1])
-            elif line.find("Buffer pool size ") == 0:
-                # The " " after size is necessary to avoid matching the wrong line:
-                # Buffer pool size        1769471
-                # Buffer pool size, bytes 28991012864
-                if buffer_id == -1:
-                    results['Innodb_buffer_pool_pages_total'] = long(row[3])
-            elif line.find("Free buffers") == 0:
-                # Free buffers            0
-                if buffer_id == -1:
-                    results['Innodb_buffer_pool_pages_free'] = long(row[2])
-            elif line.find("Database pages") == 0:
-                # Database pages          1696503
-                if buffer_id == -1:
-                    results['Innodb_buffer_pool_pages_data'] = long(row[2])
-
-            elif line.find("Modified db pages") == 0:
-                # Modified db pages       160602
-                if buffer_id == -1:
-                    results['Innodb_buffer_pool_pages_dirty'] = long(row[3])
-            elif line.find("Pages read ahead") == 0:
-                # Must do this BEFORE the next test, otherwise it'll get fooled by this
-                # line from the new plugin:
-                # Pages read ahead 0.00/s, evicted without access 0.06/s
-                pass
-            elif line.find("Pages read") == 0:
-                # Pages read 15240822, created 1770238, written 21705836
-                if buffer_id == -1:
-                    results['Innodb_pages_read'] = long(row[2])
-                    results['Innodb_pages_created'] = long(row[4])
-                    results['Innodb_pages_written'] = long(row[6])
-
-            # ROW OPERATIONS
-            elif line.find('Number of rows inserted') == 0:
-                # Number of rows inserted 50678311, updated 66425915, deleted
-                # 20605903, read 454561562
-                results['Innodb_rows_inserted'] = long(row[4])
-                results['Innodb_rows_updated'] = long(row[6])
-                results['Innodb_rows_deleted'] = long(row[8])
-                results['Innodb_rows_read'] = long(row[10])
-            elif line.find(" queries inside InnoDB, ") > 0:
-                # 0 queries inside InnoDB, 0 queries in queue
-                results['Innodb_queries_inside'] = long(row[0])
-                results['Innodb_queries_queued'] = long(row[4])
-
-            prev_line = line
-
-        # We need to calculate this metric separately
+                values = NUMBER.findall(line)
+                results['Innodb_hash_index_cells_total'] = long(values[0])
+                results['Innodb_hash_index_cells_used'] = long(values[1]) if len(values) > 1 else 0
+
+    def _parse_pending_normal_aio(self, line, results):
+        # The pending requests of every I/O thread are listed by some versions, so the layouts of this line are
+        # told apart by their number of words
+        row = _split_row(line)
         try:
-            results['Innodb_checkpoint_age'] = results['Innodb_lsn_current'] - results['Innodb_lsn_last_checkpoint']
-        except KeyError as e:
-            self.log.error("Not all InnoDB LSN metrics available, unable to compute: %s", e)
-
-        # Finally we change back the metrics values to string to make the values
-        # consistent with how they are reported by SHOW GLOBAL STATUS
-        for metric, value in list(iteritems(results)):
-            results[metric] = str(value)
-
-        return results
+            if len(row) == 8:
+                # (len(row) == 8)  Pending normal aio reads: 0, aio writes: 0,
+                results['Innodb_pending_normal_aio_reads'] = long(row[4])
+                results['Innodb_pending_normal_aio_writes'] = long(row[7])
+            elif len(row) == 14:
+                # (len(row) == 14) Pending normal aio reads: 0 [0, 0] , aio writes: 0 [0, 0] ,
+                results['Innodb_pending_normal_aio_reads'] = long(row[4])
+                results['Innodb_pending_normal_aio_writes'] = long(row[10])
+            elif len(row) == 16:
+                # (len(row) == 16) Pending normal aio reads: [0, 0, 0, 0] , aio writes: [0, 0, 0, 0] ,
+                if _are_values_numeric(row[4:8]) and _are_values_numeric(row[11:15]):
+                    results['Innodb_pending_normal_aio_reads'] = (
+                        long(row[4]) + long(row[5]) + long(row[6]) + long(row[7])
+                    )
+                    results['Innodb_pending_normal_aio_writes'] = (
+                        long(row[11]) + long(row[12]) + long(row[13]) + long(row[14])
+                    )
+
+                # (len(row) == 16) Pending normal aio reads: 0 [0, 0, 0, 0] , aio writes: 0 [0, 0] ,
+                elif _are_values_numeric(row[4:9]) and _are_values_numeric(row[12:15]):
+                    results['Innodb_pending_normal_aio_reads'] = long(row[4])
+                    results['Innodb_pending_normal_aio_writes'] = long(row[12])
+                else:
+                    self.log.warning("Can't parse result line %s", line)
+            elif len(row) == 18:
+                # (len(row) == 18) Pending normal aio reads: 0 [0, 0, 0, 0] , aio writes: 0 [0, 0, 0, 0] ,
+                results['Innodb_pending_normal_aio_reads'] = long(row[4])
+                results['Innodb_pending_normal_aio_writes'] = long(row[12])
+            elif len(row) == 22:
+                # (len(row) == 22)
+                # Pending normal aio reads: 0 [0, 0, 0, 0, 0, 0, 0, 0] , aio writes: 0 [0, 0, 0, 0] ,
+                results['Innodb_pending_normal_aio_reads'] = long(row[4])
+                results['Innodb_pending_normal_aio_writes'] = long(row[16])
+        except ValueError as e:
+            self.log.warning("Can't parse result line %s: %s", line, e)
 
     def process_innodb_stats(self, results, options, metrics):
         innodb_keys = [
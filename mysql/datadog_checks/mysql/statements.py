@@ -12,9 +12,8 @@ from cachetools import TTLCache
 from datadog_checks.base import is_affirmative
 from datadog_checks.base.log import get_check_logger
 from datadog_checks.base.utils.common import to_native_string
-from datadog_checks.base.utils.db.sql import compute_sql_signature
 from datadog_checks.base.utils.db.statement_metrics import StatementMetrics
-from datadog_checks.base.utils.db.utils import DBMAsyncJob, default_json_event_encoding, obfuscate_sql_with_metadata
+from datadog_checks.base.utils.db.utils import DBMAsyncJob, ObfuscationCache, default_json_event_encoding
 from datadog_checks.base.utils.serialization import json
 from datadog_checks.base.utils.tracking import tracked_method
 
@@ -85,8 +84,9 @@ class MySQLStatementMetrics(DBMAsyncJob):
         self._db = None
         self._config = config
         self.log = get_check_logger()
-        self._state = StatementMetrics()
+        self._state = StatementMetrics(columnar=True)
         self._obfuscate_options = to_native_string(json.dumps(self._config.obfuscator_options))
+        self._obfuscation_cache = ObfuscationCache()
         # full_statement_text_cache: limit the ingestion rate of full statement text events per query_signature
         self._full_statement_text_cache = TTLCache(
             maxsize=self._config.full_statement_text_cache_max_size,
@@ -150,9 +150,9 @@ class MySQLStatementMetrics(DBMAsyncJob):
             'min_collection_interval': self._metric_collection_interval,
             'tags': self._tags,
             'cloud_metadata': self._config.cloud_metadata,
-            'mysql_rows': rows,
         }
-        self._check.database_monitoring_query_metrics(json.dumps(payload, default=default_json_event_encoding))
+        for raw_payload in self._serialize_payloads(payload, 'mysql_rows', rows):
+            self._check.database_monitoring_query_metrics(raw_payload)
         self._check.count(
             "dd.mysql.collect_per_statement_metrics.rows",
             len(rows),
@@ -164,6 +164,7 @@ class MySQLStatementMetrics(DBMAsyncJob):
         # type: () -> List[PyMysqlRow]
         monotonic_rows = self._query_summary_per_statement()
         monotonic_rows = self._normalize_queries(monotonic_rows)
+        self._submit_obfuscation_cache_metrics()
         rows = self._state.compute_derivative_rows(monotonic_rows, METRICS_COLUMNS, key=_row_key)
         return rows
 
@@ -204,18 +205,21 @@ class MySQLStatementMetrics(DBMAsyncJob):
         return rows
 
     def _normalize_queries(self, rows):
+        statements, errors = self._obfuscation_cache.obfuscate_queries(
+            [row['digest_text'] for row in rows], self._obfuscate_options
+        )
+
         normalized_rows = []
         for row in rows:
-            normalized_row = dict(copy.copy(row))
-            try:
-                statement = obfuscate_sql_with_metadata(row['digest_text'], self._obfuscate_options)
-                obfuscated_statement = statement['query'] if row['digest_text'] is not None else None
-            except Exception as e:
+            statement = statements.get(row['digest_text'])
+            if statement is None:
+                e = errors[row['digest_text']]
                 self.log.warning("Failed to obfuscate query=[%s] | err=[%s]", row['digest_text'], e)
                 continue
 
-            normalized_row['digest_text'] = obfuscated_statement
-            normalized_row['query_signature'] = compute_sql_signature(obfuscated_statement)
+            normalized_row = dict(copy.copy(row))
+            normalized_row['digest_text'] = statement['query'] if row['digest_text'] is not None else None
+            normalized_row['query_signature'] = statement['query_signature']
             metadata = statement['metadata']
             normalized_row['dd_tables'] = metadata.get('tables', None)
             normalized_row['dd_commands'] = metadata.get('commands', None)
@@ -223,6 +227,14 @@ class MySQLStatementMetrics(DBMAsyncJob):
 
         return normalized_rows
 
+    def _submit_obfuscation_cache_metrics(self):
+        self._obfuscation_cache.submit_metrics(
+            self._check,
+            'dd.mysql',
+            tags=self._tags + self._check._get_debug_tags(),
+            hostname=self._check.resolved_hostname,
+        )
+
     def _rows_to_fqt_events(self, rows):
         for row in rows:
             query_cache_key = _row_key(row)
@@ -0,0 +1,37 @@
+# (C) Datadog, Inc. 2023-present
+# All rights reserved
+# Licensed under a 3-clause BSD style license (see LICENSE)
+import pytest
+
+from datadog_checks.mysql.innodb_metrics import InnoDBMetrics
+
+from .test_innodb_metrics import INNODB_STATUS_FIXTURES, load_innodb_status
+
+pytestmark = pytest.mark.unit
+
+
+@pytest.mark.parametrize('name', INNODB_STATUS_FIXTURES)
+def test_parse_innodb_status(benchmark, name):
+    innodb_status_text = load_innodb_status(name)
+
+    benchmark(InnoDBMetrics().parse_innodb_status, innodb_status_text)
+
+
+def test_parse_innodb_status_many_transactions(benchmark):
+    # Thousands of transactions and dozens of buffer pools, as seen on busy servers
+    innodb_status_text = load_innodb_status('mysql-5.7')
+    transactions_start = innodb_status_text.index('---TRANSACTION')
+    transactions_end = innodb_status_text.index('--------\nFILE I/O')
+    buffer_pool_start = innodb_status_text.index('---BUFFER POOL 0')
+    buffer_pool_end = innodb_status_text.index('---BUFFER POOL 1')
+    innodb_status_text = (
+        innodb_status_text[:transactions_start]
+        + innodb_status_text[transactions_start:transactions_end] * 50
+        + innodb_status_text[transactions_end:buffer_pool_start]
+        + innodb_status_text[buffer_pool_start:buffer_pool_end] * 64
+        + innodb_status_text[innodb_status_text.index('--------------\nROW OPERATIONS') :]
+    )
+
+    results = benchmark(InnoDBMetrics().parse_innodb_status, innodb_status_text)
+
+    assert results['Innodb_current_transactions'] == '6000'
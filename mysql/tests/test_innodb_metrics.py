@@ -1,12 +1,22 @@
 # (C) Datadog, Inc. 2020-present
 # All rights reserved
 # Licensed under a 3-clause BSD style license (see LICENSE)
+import json
 import logging
+import os
 
 import pytest
 
 from datadog_checks.mysql.innodb_metrics import InnoDBMetrics
 
+INNODB_STATUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'innodb_status')
+INNODB_STATUS_FIXTURES = ['mysql-5.1', 'percona-5.5', 'mysql-5.7', 'mysql-8.0', 'mariadb-10.3']
+
+
+def load_innodb_status(name):
+    with open(os.path.join(INNODB_STATUS_DIR, '{}.txt'.format(name)), 'r') as f:
+        return f.read()
+
 
 @pytest.mark.unit
 def test_innodb_status_unicode_error(caplog):
@@ -25,3 +35,37 @@ def test_innodb_status_unicode_error(caplog):
     idb = InnoDBMetrics()
     assert idb.get_stats_from_innodb_status(MockDatabase()) == {}
     assert 'Unicode error while getting INNODB status' in caplog.text
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize('name', INNODB_STATUS_FIXTURES)
+def test_parse_innodb_status(name):
+    with open(os.path.join(INNODB_STATUS_DIR, '{}.json'.format(name)), 'r') as f:
+        expected = json.load(f)
+
+    idb = InnoDBMetrics()
+    assert idb.parse_innodb_status(load_innodb_status(name)) == expected
+    assert idb.parse_innodb_status(load_innodb_status(name).replace('\n', '\r\n')) == expected
+
+
+@pytest.mark.unit
+def test_parse_innodb_status_sections():
+    innodb_status_text = load_innodb_status('mysql-8.0')
+    # Queries of transactions are printed as is, they must not be taken for lines of other sections
+    innodb_status_text = innodb_status_text.replace(
+        'INSERT INTO events (kind, payload) SELECT kind, payload FROM events_staging',
+        'SELECT 1 FROM DUAL WHERE 1 = 1 OR\nLog sequence number 12\nPages read 1, created 2, written 3',
+    )
+    # Individual buffer pools are not reported
+    innodb_status_text = innodb_status_text.replace(
+        'ROW OPERATIONS',
+        'INDIVIDUAL BUFFER POOL INFO\n----------------------\n---BUFFER POOL 0\nBuffer pool size   4096\n'
+        'Free buffers       1024\n--------------\nROW OPERATIONS',
+    )
+
+    results = InnoDBMetrics().parse_innodb_status(innodb_status_text)
+
+    assert results['Innodb_lsn_current'] == '31036422'
+    assert results['Innodb_pages_read'] == '983'
+    assert results['Innodb_buffer_pool_pages_total'] == '8192'
+    assert results['Innodb_buffer_pool_pages_free'] == '7062'
@@ -12,9 +12,8 @@ from cachetools import TTLCache
 
 from datadog_checks.base import is_affirmative
 from datadog_checks.base.utils.common import to_native_string
-from datadog_checks.base.utils.db.sql import compute_sql_signature
 from datadog_checks.base.utils.db.statement_metrics import StatementMetrics
-from datadog_checks.base.utils.db.utils import DBMAsyncJob, default_json_event_encoding, obfuscate_sql_with_metadata
+from datadog_checks.base.utils.db.utils import DBMAsyncJob, ObfuscationCache, default_json_event_encoding
 from datadog_checks.base.utils.serialization import json
 from datadog_checks.base.utils.tracking import tracked_method
 
@@ -131,10 +130,11 @@ class PostgresStatementMetrics(DBMAsyncJob):
             'pg_stat_statements_max_warning_threshold', 10000
         )
         self._config = config
-        self._state = StatementMetrics()
+        self._state = StatementMetrics(columnar=True)
         self._stat_column_cache = []
         self._track_io_timing_cache = None
         self._obfuscate_options = to_native_string(json.dumps(self._config.obfuscator_options))
+        self._obfuscation_cache = ObfuscationCache()
         # full_statement_text_cache: limit the ingestion rate of full statement text events per query_signature
         self._full_statement_text_cache = TTLCache(
             maxsize=config.full_statement_text_cache_max_size,
@@ -199,12 +199,12 @@ class PostgresStatementMetrics(DBMAsyncJob):
                 'min_collection_interval': self._metrics_collection_interval,
                 'tags': self._tags_no_db,
                 'cloud_metadata': self._config.cloud_metadata,
-                'postgres_rows': rows,
                 'postgres_version': self._payload_pg_version(),
                 'ddagentversion': datadog_agent.get_version(),
                 "ddagenthostname": self._check.agent_hostname,
             }
-            self._check.database_monitoring_query_metrics(json.dumps(payload, default=default_json_event_encoding))
+            for raw_payload in self._serialize_payloads(payload, 'postgres_rows', rows):
+                self._check.database_monitoring_query_metrics(raw_payload)
         except Exception:
             self._log.exception('Unable to collect statement metrics due to an error')
             return []
@@ -377,6 +377,7 @@ class PostgresStatementMetrics(DBMAsyncJob):
         rows = self._load_pg_stat_statements()
 
         rows = self._normalize_queries(rows)
+        self._submit_obfuscation_cache_metrics()
         if not rows:
             return []
 
@@ -392,21 +393,24 @@ class PostgresStatementMetrics(DBMAsyncJob):
         return rows
 
     def _normalize_queries(self, rows):
+        statements, errors = self._obfuscation_cache.obfuscate_queries(
+            [row['query'] for row in rows], self._obfuscate_options
+        )
+
         normalized_rows = []
         for row in rows:
-            normalized_row = dict(copy.copy(row))
-            try:
-                statement = obfuscate_sql_with_metadata(row['query'], self._obfuscate_options)
-            except Exception as e:
+            statement = statements.get(row['query'])
+            if statement is None:
+                e = errors[row['query']]
                 if self._config.log_unobfuscated_queries:
                     self._log.warning("Failed to obfuscate query=[%s] | err=[%s]", row['query'], e)
                 else:
                     self._log.debug("Failed to obfuscate query | err=[%s]", e)
                 continue
 
-            obfuscated_query = statement['query']
-            normalized_row['query'] = obfuscated_query
-            normalized_row['query_signature'] = compute_sql_signature(obfuscated_query)
+            normalized_row = dict(copy.copy(row))
+            normalized_row['query'] = statement['query']
+            normalized_row['query_signature'] = statement['query_signature']
             metadata = statement['metadata']
             normalized_row['dd_tables'] = metadata.get('tables', None)
             normalized_row['dd_commands'] = metadata.get('commands', None)
@@ -414,6 +418,14 @@ class PostgresStatementMetrics(DBMAsyncJob):
 
         return normalized_rows
 
+    def _submit_obfuscation_cache_metrics(self):
+        self._obfuscation_cache.submit_metrics(
+            self._check,
+            'dd.postgres',
+            tags=self._tags + self._check._get_debug_tags(),
+            hostname=self._check.resolved_hostname,
+        )
+
     def _rows_to_fqt_events(self, rows):
         for row in rows:
             query_cache_key = _row_key(row)
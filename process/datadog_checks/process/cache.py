@@ -1,13 +1,136 @@
 # (C) Datadog, Inc. 2020-present
 # All rights reserved
 # Licensed under a 3-clause BSD style license (see LICENSE)
+import os
+import re
+import threading
 import time
+import weakref
+from collections import defaultdict
 
 import psutil
 
 from .lock import ReadWriteLock
 
 DEFAULT_SHARED_PROCESS_LIST_CACHE_DURATION = 120
+DEFAULT_SHARED_PROCESS_STATS_CACHE_DURATION = 10
+
+# Attributes of every process read once per refresh of the shared process list
+PROCESS_LIST_ATTRIBUTES = ['pid', 'name', 'cmdline', 'username', 'ppid']
+
+
+def normalize_search_string(string):
+    # Matching is case insensitive on Windows
+    if os.name == 'nt':
+        return string.lower()
+
+    return string
+
+
+class ProcessInfo(object):
+    """A process of the shared list, whose attributes are read at most once per refresh.
+
+    Errors are remembered as well, so that a process that disappeared or denied access is not
+    queried again by every instance."""
+
+    __slots__ = ('process', 'pid', '_values')
+
+    def __init__(self, process):
+        self.process = process
+        self.pid = process.pid
+        self._values = {}
+
+        # Attributes already fetched by `psutil.process_iter`, `None` meaning that they could not be read
+        info = getattr(process, 'info', None)
+        if isinstance(info, dict):
+            for attribute in PROCESS_LIST_ATTRIBUTES:
+                value = info.get(attribute)
+                if value is not None:
+                    self._values[attribute] = value
+
+    def _read(self, attribute):
+        try:
+            value = self._values[attribute]
+        except KeyError:
+            try:
+                value = getattr(self.process, attribute)()
+            except (psutil.NoSuchProcess, psutil.AccessDenied) as e:
+                value = e
+
+            self._values[attribute] = value
+
+        if isinstance(value, Exception):
+            raise value
+
+        return value
+
+    def name(self):
+        return self._read('name')
+
+    def cmdline(self):
+        return self._read('cmdline')
+
+    def username(self):
+        return self._read('username')
+
+    def ppid(self):
+        return self._read('ppid')
+
+    def command_line(self):
+        """The command line as matched by non exact `search_string` patterns."""
+        command_line = self._values.get('command_line')
+        if command_line is None:
+            command_line = self._values['command_line'] = normalize_search_string(' '.join(self.cmdline()))
+
+        return command_line
+
+    def forget_access_denied(self):
+        """Forget the attributes to which access was denied, so they are read again on next access."""
+        for attribute, value in list(self._values.items()):
+            if isinstance(value, psutil.AccessDenied):
+                del self._values[attribute]
+
+
+class ProcessMatcher(object):
+    """The `search_string` of an instance, compiled once."""
+
+    def __init__(self, search_string, exact_match):
+        self.key = (tuple(search_string), bool(exact_match))
+        self.exact_match = self.key[1]
+        # FIXME 8.x: All has been deprecated
+        # from the doc, should be removed
+        self.match_all = 'All' in search_string
+        self.names = frozenset(normalize_search_string(string) for string in search_string)
+        self.patterns = []
+        if not self.exact_match:
+            self.patterns = [re.compile(normalize_search_string(string)) for string in search_string]
+
+    def matches(self, process):
+        """Test a single process, psutil errors are raised to the caller."""
+        if self.match_all:
+            return True
+        elif self.exact_match:
+            return normalize_search_string(process.name()) in self.names
+
+        command_line = process.command_line()
+        return any(pattern.search(command_line) for pattern in self.patterns)
+
+
+def combine_patterns(patterns):
+    """Compile a pattern matching wherever any of `patterns` matches, if they can be safely combined.
+
+    Patterns with groups or inline flags would change meaning once combined, so none is returned for them."""
+    sources = []
+    for pattern in patterns:
+        if pattern.groups or '(?' in pattern.pattern:
+            return None
+
+        sources.append('(?:{})'.format(pattern.pattern))
+
+    try:
+        return re.compile('|'.join(sources))
+    except re.error:
+        return None
 
 
 class ProcessListCache(object):
@@ -18,6 +141,15 @@ class ProcessListCache(object):
     last_ts = 0
     cache_duration = DEFAULT_SHARED_PROCESS_LIST_CACHE_DURATION
 
+    def __init__(self):
+        # Matchers of all instances, so that a single pass over the process list serves all of them
+        self.matchers = weakref.WeakValueDictionary()
+        # Matcher key -> (set of matching pids, pids that denied access -> error) for the current process list
+        self.matches = {}
+        self.processes = {}
+        # Parent pid -> children pids, indexed on first use after a refresh
+        self.children = None
+
     def read_lock(self):
         return self.lock.read_lock()
 
@@ -37,7 +169,10 @@ class ProcessListCache(object):
         # threads getting a `yes` result at once
         with self.write_lock():
             if self._should_refresh():
-                self.elements = [proc for proc in psutil.process_iter(attrs=['pid', 'name'])]
+                self.elements = [ProcessInfo(proc) for proc in psutil.process_iter(attrs=PROCESS_LIST_ATTRIBUTES)]
+                self.processes = {proc.pid: proc for proc in self.elements}
+                self.matches = {}
+                self.children = None
                 self.last_ts = time.time()
                 return True
             else:
@@ -46,3 +181,156 @@ class ProcessListCache(object):
     def reset(self):
         """Resets the cache."""
         self.last_ts = 0
+
+    def get_descendants(self, pids):
+        """Returns the pids of all the children of `pids` in the process list, recursively."""
+        with self.write_lock():
+            if self.children is None:
+                self.children = defaultdict(list)
+                for proc in self.elements:
+                    try:
+                        self.children[proc.ppid()].append(proc.pid)
+                    except (psutil.NoSuchProcess, psutil.AccessDenied):
+                        pass
+
+            descendants = set()
+            parents = list(pids)
+            while parents:
+                for child in self.children.get(parents.pop(), ()):
+                    if child not in descendants:
+                        descendants.add(child)
+                        parents.append(child)
+
+        return descendants
+
+    def find_matches(self, matcher, retry_access_denied=False):
+        """Returns the pids of the process list matching `matcher`, along with the pids that denied access
+        mapped to their error.
+
+        The first instance to ask after a refresh tests every process once for the matchers of all instances.
+        With `retry_access_denied`, processes that previously denied access are tested again."""
+        with self.write_lock():
+            self.matchers[matcher.key] = matcher
+
+            if matcher.key not in self.matches:
+                self._match_pending()
+            elif retry_access_denied and self.matches[matcher.key][1]:
+                self._retry_access_denied(matcher)
+
+            matching_pids, access_denied = self.matches[matcher.key]
+            return set(matching_pids), dict(access_denied)
+
+    def _match_pending(self):
+        match_all = []
+        names = defaultdict(list)
+        name_matchers = []
+        pattern_matchers = []
+        for key, matcher in list(self.matchers.items()):
+            if key in self.matches:
+                continue
+
+            self.matches[key] = (set(), {})
+            if matcher.match_all:
+                match_all.append(key)
+            elif matcher.exact_match:
+                name_matchers.append(key)
+                for name in matcher.names:
+                    names[name].append(key)
+            else:
+                pattern_matchers.append(matcher)
+
+        # Only processes matching any pattern are tested against each instance
+        combined_pattern = combine_patterns([pattern for m in pattern_matchers for pattern in m.patterns])
+
+        for proc in self.elements:
+            for key in match_all:
+                self.matches[key][0].add(proc.pid)
+
+            if name_matchers:
+                try:
+                    name = normalize_search_string(proc.name())
+                except psutil.NoSuchProcess:
+                    pass
+                except psutil.AccessDenied as e:
+                    for key in name_matchers:
+                        self.matches[key][1][proc.pid] = e
+                else:
+                    for key in names.get(name, ()):
+                        self.matches[key][0].add(proc.pid)
+
+            if pattern_matchers:
+                try:
+                    command_line = proc.command_line()
+                except psutil.NoSuchProcess:
+                    pass
+                except psutil.AccessDenied as e:
+                    for matcher in pattern_matchers:
+                        self.matches[matcher.key][1][proc.pid] = e
+                else:
+                    if combined_pattern is not None and not combined_pattern.search(command_line):
+                        continue
+
+                    for matcher in pattern_matchers:
+                        if any(pattern.search(command_line) for pattern in matcher.patterns):
+                            self.matches[matcher.key][0].add(proc.pid)
+
+    def _retry_access_denied(self, matcher):
+        matching_pids, access_denied = self.matches[matcher.key]
+        for pid in list(access_denied):
+            proc = self.processes[pid]
+            proc.forget_access_denied()
+            try:
+                found = matcher.matches(proc)
+            except psutil.NoSuchProcess:
+                del access_denied[pid]
+            except psutil.AccessDenied as e:
+                access_denied[pid] = e
+            else:
+                del access_denied[pid]
+                if found:
+                    matching_pids.add(pid)
+
+
+class ProcessStatsCache(object):
+    """Per-process metrics to be shared among all instances.
+
+    Metrics are keyed by the PID along with the settings they depend on. Metrics collected by an instance
+    are reused by the other instances monitoring the same process with the same settings, but never twice
+    by the same instance so that each run still gets its own sample."""
+
+    cache_duration = DEFAULT_SHARED_PROCESS_STATS_CACHE_DURATION
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key -> (timestamp, stats, ids of the instances that used them)
+        self.stats = {}
+
+    def get(self, key, consumer):
+        with self.lock:
+            entry = self.stats.get(key)
+            if entry is None:
+                return None
+
+            timestamp, stats, consumers = entry
+            if consumer in consumers or time.time() - timestamp > self.cache_duration:
+                return None
+
+            consumers.add(consumer)
+            return stats
+
+    def set(self, key, consumer, stats):
+        with self.lock:
+            self.stats[key] = (time.time(), stats, {consumer})
+
+    def reset(self):
+        """Resets the cache."""
+        with self.lock:
+            self.stats = {}
+
+    def prune(self):
+        """Drops the metrics that can no longer be reused."""
+        now = time.time()
+        with self.lock:
+            for key, (timestamp, _, _) in list(self.stats.items()):
+                if now - timestamp > self.cache_duration:
+                    del self.stats[key]
@@ -3,8 +3,6 @@
 # Licensed under a 3-clause BSD style license (see LICENSE)
 from __future__ import division
 
-import os
-import re
 import subprocess
 import time
 from collections import defaultdict
@@ -15,7 +13,7 @@ from six import iteritems
 from datadog_checks.base import AgentCheck, is_affirmative
 from datadog_checks.base.utils.platform import Platform
 
-from .cache import DEFAULT_SHARED_PROCESS_LIST_CACHE_DURATION, ProcessListCache
+from .cache import DEFAULT_SHARED_PROCESS_LIST_CACHE_DURATION, ProcessListCache, ProcessMatcher, ProcessStatsCache
 
 try:
     import datadog_agent
@@ -63,6 +61,8 @@ ATTR_TO_METRIC_RATE = {
 class ProcessCheck(AgentCheck):
     # Shared process list
     process_list_cache = ProcessListCache()
+    # Shared per-PID metrics
+    process_stats_cache = ProcessStatsCache()
 
     def __init__(self, name, init_config, instances):
         super(ProcessCheck, self).__init__(name, init_config, instances)
@@ -94,6 +94,9 @@ class ProcessCheck(AgentCheck):
         self.pid_cache = {}
         self.pid_cache_duration = int(init_config.get('pid_cache_duration', DEFAULT_PID_CACHE_DURATION))
 
+        # Compiled `search_string`, shared with the other instances through the process list cache
+        self._matcher = None
+
         self._conflicting_procfs = False
         self._deprecated_init_procfs = False
         if Platform.is_linux():
@@ -135,8 +138,6 @@ class ProcessCheck(AgentCheck):
 
         refresh_ad_cache = self.should_refresh_ad_cache(name)
 
-        matching_pids = set()
-
         self.log.debug("Refreshing process list")
 
         # If refresh returns True, then the cache has been refreshed.
@@ -146,55 +147,28 @@ class ProcessCheck(AgentCheck):
         else:
             self.log.debug("Using process list cache")
 
-        with self.process_list_cache.read_lock():
-            for proc in self.process_list_cache.elements:
-                # Skip access denied processes
-                if not refresh_ad_cache and proc.pid in self.ad_cache:
-                    continue
-
-                found = False
-                for string in search_string:
-                    try:
-                        # FIXME 8.x: All has been deprecated
-                        # from the doc, should be removed
-                        if string == 'All':
-                            found = True
-                        if exact_match:
-                            if os.name == 'nt':
-                                if proc.name().lower() == string.lower():
-                                    found = True
-                            else:
-                                if proc.name() == string:
-                                    found = True
-
-                        else:
-                            cmdline = proc.cmdline()
-                            if os.name == 'nt':
-                                lstring = string.lower()
-                                if re.search(lstring, ' '.join(cmdline).lower()):
-                                    found = True
-                            else:
-                                if re.search(string, ' '.join(cmdline)):
-                                    found = True
-                    except psutil.NoSuchProcess:
-                        # As the process list isn't necessarily scanned right after it's created
-                        # (since we're using a shared cache), there can be cases where processes
-                        # in the list are dead when an instance of the check tries to scan them.
-                        self.log.debug('Process disappeared while scanning')
-                    except psutil.AccessDenied as e:
-                        ad_error_logger('Access denied to process with PID {}'.format(proc.pid))
-                        ad_error_logger('Error: {}'.format(e))
-                        if refresh_ad_cache:
-                            self.ad_cache.add(proc.pid)
-                        if not ignore_ad:
-                            raise
-                    else:
-                        if refresh_ad_cache:
-                            self.ad_cache.discard(proc.pid)
-                        if found:
-                            matching_pids.add(proc.pid)
-                            break
+        if self._matcher is None or self._matcher.key != (tuple(search_string), bool(exact_match)):
+            self._matcher = ProcessMatcher(search_string, exact_match)
+
+        matching_pids, access_denied = self.process_list_cache.find_matches(
+            self._matcher, retry_access_denied=refresh_ad_cache
+        )
+        if refresh_ad_cache:
+            self.ad_cache = set(access_denied)
+        else:
+            # Skip access denied processes
+            matching_pids -= self.ad_cache
 
+        for pid, error in iteritems(access_denied):
+            if not refresh_ad_cache and pid in self.ad_cache:
+                continue
+
+            ad_error_logger('Access denied to process with PID {}'.format(pid))
+            ad_error_logger('Error: {}'.format(error))
+            if not ignore_ad:
+                raise error
+
+        with self.process_list_cache.read_lock():
             if not matching_pids:
                 # Allow debug logging while preserving warning check state.
                 # Uncaught psutil exceptions trigger an Error state
@@ -273,45 +247,25 @@ class ProcessCheck(AgentCheck):
         for pid in pids_to_remove:
             del self.process_cache[name][pid]
 
+        # Another instance may already have collected the metrics of a process in this collection cycle.
+        # The CPU usage is always sampled by each instance since the previous sample it took itself.
+        self.process_stats_cache.prune()
         for pid in pids:
             st['pids'].append(pid)
 
-            new_process = False
-            # If the pid's process is not cached, retrieve it
-            if pid not in self.process_cache[name] or not self.process_cache[name][pid].is_running():
-                new_process = True
-                try:
-                    self.process_cache[name][pid] = psutil.Process(pid)
-                    self.log.debug('New process in cache: %s', pid)
-                # Skip processes dead in the meantime
-                except psutil.NoSuchProcess:
-                    self.log.debug('Process %s disappeared while scanning', pid)
-                    # reset the process caches now, something changed
-                    self.last_pid_cache_ts[name] = 0
-                    self.process_list_cache.reset()
-                    continue
-
-            p = self.process_cache[name][pid]
-
-            meminfo = self.psutil_wrapper(p, 'memory_info', ['rss', 'vms'])
-            st['rss'].append(meminfo.get('rss'))
-            st['vms'].append(meminfo.get('vms'))
-
-            mem_percent = self.psutil_wrapper(p, 'memory_percent')
-            st['mem_pct'].append(mem_percent)
-
-            # will fail on win32 and solaris
-            shared_mem = self.psutil_wrapper(p, 'memory_info', ['shared']).get('shared')
-            if shared_mem is not None and meminfo.get('rss') is not None:
-                st['real'].append(meminfo['rss'] - shared_mem)
-            else:
-                st['real'].append(None)
+            p, new_process = self._get_process(name, pid)
+            if p is None:
+                continue
 
-            ctxinfo = self.psutil_wrapper(p, 'num_ctx_switches', ['voluntary', 'involuntary'])
-            st['ctx_swtch_vol'].append(ctxinfo.get('voluntary'))
-            st['ctx_swtch_invol'].append(ctxinfo.get('involuntary'))
+            # The number of file descriptors depends on whether sudo is used to list them
+            key = (pid, self.try_sudo)
+            stats = self.process_stats_cache.get(key, id(self))
+            if stats is None:
+                stats = self._get_process_stats(p, pid)
+                self.process_stats_cache.set(key, id(self), stats)
 
-            st['thr'].append(self.psutil_wrapper(p, 'num_threads'))
+            for attr, value in iteritems(stats):
+                st[attr].append(value)
 
             cpu_percent = self.psutil_wrapper(p, 'cpu_percent')
             cpu_count = psutil.cpu_count()
@@ -324,37 +278,85 @@ class ProcessCheck(AgentCheck):
                     st['cpu_norm'].append(cpu_percent / cpu_count)
                 else:
                     self.log.debug('could not calculate the normalized cpu pct, cpu_count: %s', cpu_count)
-            st['open_fd'].append(self.psutil_wrapper(p, 'num_fds'))
-            st['open_handle'].append(self.psutil_wrapper(p, 'num_handles'))
-
-            ioinfo = self.psutil_wrapper(p, 'io_counters', ['read_count', 'write_count', 'read_bytes', 'write_bytes'])
-            st['r_count'].append(ioinfo.get('read_count'))
-            st['w_count'].append(ioinfo.get('write_count'))
-            st['r_bytes'].append(ioinfo.get('read_bytes'))
-            st['w_bytes'].append(ioinfo.get('write_bytes'))
-
-            pagefault_stats = self.get_pagefault_stats(pid)
-            if pagefault_stats is not None:
-                (minflt, cminflt, majflt, cmajflt) = pagefault_stats
-                st['minflt'].append(minflt)
-                st['cminflt'].append(cminflt)
-                st['majflt'].append(majflt)
-                st['cmajflt'].append(cmajflt)
-            else:
-                st['minflt'].append(None)
-                st['cminflt'].append(None)
-                st['majflt'].append(None)
-                st['cmajflt'].append(None)
-
-            # calculate process run time
-            create_time = self.psutil_wrapper(p, 'create_time')
-            if create_time is not None:
-                now = time.time()
-                run_time = now - create_time
-                st['run_time'].append(run_time)
 
         return st
 
+    def _get_process(self, name, pid):
+        """
+        Returns the cached `psutil.Process` of `pid` and whether it was just added to the cache,
+        or `(None, True)` if the process is gone.
+        """
+        new_process = False
+        # If the pid's process is not cached, retrieve it
+        if pid not in self.process_cache[name] or not self.process_cache[name][pid].is_running():
+            new_process = True
+            try:
+                self.process_cache[name][pid] = psutil.Process(pid)
+                self.log.debug('New process in cache: %s', pid)
+            # Skip processes dead in the meantime
+            except psutil.NoSuchProcess:
+                self.log.debug('Process %s disappeared while scanning', pid)
+                # reset the process caches now, something changed
+                self.last_pid_cache_ts[name] = 0
+                self.process_list_cache.reset()
+                return None, True
+
+        return self.process_cache[name][pid], new_process
+
+    def _get_process_stats(self, p, pid):
+        stats = {}
+
+        meminfo = self.psutil_wrapper(p, 'memory_info', ['rss', 'vms'])
+        stats['rss'] = meminfo.get('rss')
+        stats['vms'] = meminfo.get('vms')
+
+        mem_percent = self.psutil_wrapper(p, 'memory_percent')
+        stats['mem_pct'] = mem_percent
+
+        # will fail on win32 and solaris
+        shared_mem = self.psutil_wrapper(p, 'memory_info', ['shared']).get('shared')
+        if shared_mem is not None and meminfo.get('rss') is not None:
+            stats['real'] = meminfo['rss'] - shared_mem
+        else:
+            stats['real'] = None
+
+        ctxinfo = self.psutil_wrapper(p, 'num_ctx_switches', ['voluntary', 'involuntary'])
+        stats['ctx_swtch_vol'] = ctxinfo.get('voluntary')
+        stats['ctx_swtch_invol'] = ctxinfo.get('involuntary')
+
+        stats['thr'] = self.psutil_wrapper(p, 'num_threads')
+
+        stats['open_fd'] = self.psutil_wrapper(p, 'num_fds')
+        stats['open_handle'] = self.psutil_wrapper(p, 'num_handles')
+
+        ioinfo = self.psutil_wrapper(p, 'io_counters', ['read_count', 'write_count', 'read_bytes', 'write_bytes'])
+        stats['r_count'] = ioinfo.get('read_count')
+        stats['w_count'] = ioinfo.get('write_count')
+        stats['r_bytes'] = ioinfo.get('read_bytes')
+        stats['w_bytes'] = ioinfo.get('write_bytes')
+
+        pagefault_stats = self.get_pagefault_stats(pid)
+        if pagefault_stats is not None:
+            (minflt, cminflt, majflt, cmajflt) = pagefault_stats
+            stats['minflt'] = minflt
+            stats['cminflt'] = cminflt
+            stats['majflt'] = majflt
+            stats['cmajflt'] = cmajflt
+        else:
+            stats['minflt'] = None
+            stats['cminflt'] = None
+            stats['majflt'] = None
+            stats['cmajflt'] = None
+
+        # calculate process run time
+        create_time = self.psutil_wrapper(p, 'create_time')
+        if create_time is not None:
+            now = time.time()
+            run_time = now - create_time
+            stats['run_time'] = run_time
+
+        return stats
+
     def get_pagefault_stats(self, pid):
         if not Platform.is_linux():
             return None
@@ -434,7 +436,11 @@ class ProcessCheck(AgentCheck):
             raise ValueError('The "search_string" or "pid" options are required for process identification')
 
         if self.collect_children:
-            pids.update(self._get_child_processes(pids))
+            if self.search_string is not None:
+                # The children of processes found in the shared process list are looked up in the same list
+                pids.update(self.process_list_cache.get_descendants(pids))
+            else:
+                pids.update(self._get_child_processes(pids))
 
         if self.user:
             pids = self._filter_by_user(self.user, pids)
@@ -523,9 +529,11 @@ class ProcessCheck(AgentCheck):
         :return: set of filtered pids
         """
         filtered_pids = set()
+        # Users of processes found in the shared process list were already read along with it
+        processes = self.process_list_cache.processes if self.search_string is not None else {}
         for pid in pids:
             try:
-                proc = psutil.Process(pid)
+                proc = processes.get(pid) or psutil.Process(pid)
                 if proc.username() == user:
                     self.log.debug("Collecting pid %s belonging to %s", pid, user)
                     filtered_pids.add(pid)
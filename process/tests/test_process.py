@@ -33,6 +33,7 @@ except Exception:
 def reset_process_list_cache():
     # Force process list cache flush in the next test
     ProcessCheck.process_list_cache.reset()
+    ProcessCheck.process_stats_cache.reset()
 
 
 class MockProcess(object):
@@ -118,6 +119,97 @@ def test_process_list_cache(aggregator, dd_run_check, caplog):
     assert process2.process_list_cache.elements[0].name() == "Process 1"
 
 
+class CountingMockProcess(object):
+    def __init__(self, pid, name, cmdline, ppid=0):
+        self.pid = pid
+        self._name = name
+        self._cmdline = cmdline
+        self._ppid = ppid
+        self.calls = 0
+
+    def name(self):
+        self.calls += 1
+        return self._name
+
+    def cmdline(self):
+        self.calls += 1
+        return self._cmdline
+
+    def ppid(self):
+        self.calls += 1
+        return self._ppid
+
+
+def test_process_list_cache_shared_matching(aggregator):
+    processes = [
+        CountingMockProcess(1, 'init', ['/sbin/init']),
+        CountingMockProcess(2, 'python', ['python', 'app.py'], ppid=1),
+        CountingMockProcess(3, 'nginx', ['nginx', '-g', 'daemon off;'], ppid=1),
+        CountingMockProcess(4, 'python', ['python', 'worker.py'], ppid=2),
+    ]
+    instances = [
+        {'name': 'python', 'search_string': ['python']},
+        {'name': 'nginx', 'search_string': ['nginx', 'apache']},
+        {'name': 'app', 'search_string': [r'app\.py$', 'worker'], 'exact_match': False},
+        {'name': 'daemon', 'search_string': ['daemon (on|off)'], 'exact_match': False},
+    ]
+    checks = [ProcessCheck(common.CHECK_NAME, {}, [instance]) for instance in instances]
+
+    with patch('psutil.process_iter', return_value=processes):
+        for check in checks:
+            check.find_pids(check.name, check.search_string, check.exact_match)
+        # All instances are evaluated during the first lookup, which reads each process once
+        assert [proc.calls for proc in processes] == [2, 2, 2, 2]
+
+        results = [check.find_pids(check.name, check.search_string, check.exact_match) for check in checks]
+
+    assert results == [{2, 4}, {3}, {2, 4}, {3}]
+    assert [proc.calls for proc in processes] == [2, 2, 2, 2]
+    assert ProcessCheck.process_list_cache.get_descendants({1}) == {2, 3, 4}
+    assert ProcessCheck.process_list_cache.get_descendants({2}) == {4}
+
+
+def test_process_stats_cache(aggregator):
+    process1 = ProcessCheck(common.CHECK_NAME, {}, [{'name': 'foo', 'pid': os.getpid()}])
+    process2 = ProcessCheck(common.CHECK_NAME, {}, [{'name': 'bar', 'pid': os.getpid()}])
+    process3 = ProcessCheck(common.CHECK_NAME, {}, [{'name': 'baz', 'pid': os.getpid(), 'try_sudo': True}])
+
+    def shared_calls():
+        return [c for c in psutil_wrapper.call_args_list if c[0][1] != 'cpu_percent']
+
+    def cpu_calls():
+        return [c for c in psutil_wrapper.call_args_list if c[0][1] == 'cpu_percent']
+
+    with patch.object(
+        ProcessCheck,
+        'psutil_wrapper',
+        side_effect=lambda process, method, accessors=None: mock_psutil_wrapper(method, accessors),
+    ) as psutil_wrapper:
+        process1.get_process_state('foo', {os.getpid()})
+        calls = len(shared_calls())
+        assert calls > 0
+
+        # Metrics collected by another instance are reused
+        process2.get_process_state('bar', {os.getpid()})
+        assert len(shared_calls()) == calls
+
+        # But not twice by the same instance
+        process2.get_process_state('bar', {os.getpid()})
+        assert len(shared_calls()) == calls * 2
+
+        # Nor by an instance with settings affecting them
+        process3.get_process_state('baz', {os.getpid()})
+        assert len(shared_calls()) == calls * 3
+
+        # The CPU usage is sampled by each instance on its own process
+        assert [c[0][0] for c in cpu_calls()] == [
+            process1.process_cache['foo'][os.getpid()],
+            process2.process_cache['bar'][os.getpid()],
+            process2.process_cache['bar'][os.getpid()],
+            process3.process_cache['baz'][os.getpid()],
+        ]
+
+
 def test_ad_cache(aggregator, dd_run_check):
     config = {'instances': [{'name': 'python', 'search_string': ['python'], 'ignore_denied_access': 'false'}]}
     process = ProcessCheck(common.CHECK_NAME, {}, config['instances'])
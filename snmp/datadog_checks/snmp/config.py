@@ -39,6 +39,9 @@ class InstanceConfig:
     DEFAULT_ALLOWED_FAILURES = 3
     DEFAULT_BULK_THRESHOLD = 0
     DEFAULT_WORKERS = 5
+    DEFAULT_DISCOVERY_WORKERS = 5
+    DEFAULT_MAX_PENDING_REQUESTS_PER_DEVICE = 1
+    DEFAULT_MAX_PENDING_REQUESTS = 0  # `0` means that devices are checked by `workers` threads
     DEFAULT_REFRESH_OIDS_CACHE_INTERVAL = 0  # `0` means disabled
 
     AUTH_PROTOCOL_MAPPING = {
@@ -106,14 +109,19 @@ class InstanceConfig:
         self.failing_instances = defaultdict(int)  # type: DefaultDict[str, int]
         self.allowed_failures = int(instance.get('discovery_allowed_failures', self.DEFAULT_ALLOWED_FAILURES))
         self.workers = int(instance.get('workers', self.DEFAULT_WORKERS))
+        self.discovery_workers = int(instance.get('discovery_workers', self.DEFAULT_DISCOVERY_WORKERS))
+        self.max_pending_requests = int(instance.get('max_pending_requests', self.DEFAULT_MAX_PENDING_REQUESTS))
+        self.max_pending_requests_per_device = int(
+            instance.get('max_pending_requests_per_device', self.DEFAULT_MAX_PENDING_REQUESTS_PER_DEVICE)
+        )
 
         self.bulk_threshold = int(instance.get('bulk_threshold', self.DEFAULT_BULK_THRESHOLD))
 
         self._auth_data = self.get_auth_data(instance)
         self._context_data = ContextData(*self.get_context_data(instance))
 
-        timeout = int(instance.get('timeout', self.DEFAULT_TIMEOUT))
-        retries = int(instance.get('retries', self.DEFAULT_RETRIES))
+        self.timeout = timeout = int(instance.get('timeout', self.DEFAULT_TIMEOUT))
+        self.retries = retries = int(instance.get('retries', self.DEFAULT_RETRIES))
 
         ip_address = instance.get('ip_address')
         network_address = instance.get('network_address')
@@ -199,6 +207,25 @@ class InstanceConfig:
         self.parsed_metrics.extend(parsed_metrics)
         self.parsed_metric_tags.extend(parsed_metric_tags)
 
+    def set_device_timeout(self, timeout):
+        # type: (int) -> None
+        """
+        Send the next requests to the device with another `timeout`, e.g. to probe it during discovery.
+        """
+        if self.device is None:
+            raise RuntimeError('No device set')
+
+        target = register_device_target(
+            self.device.ip,
+            self.device.port,
+            timeout=timeout,
+            retries=self.retries,
+            engine=self._snmp_engine,
+            auth_data=self._auth_data,
+            context_data=self._context_data,
+        )
+        self.device = Device(ip=self.device.ip, port=self.device.port, target=target)
+
     def add_profile_tag(self, profile_name):
         # type: (str) -> None
         self.tags.append('snmp_profile:{}'.format(profile_name))
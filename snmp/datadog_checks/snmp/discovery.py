@@ -2,69 +2,305 @@
 # All rights reserved
 # Licensed under Simplified BSD License (see LICENSE)
 
+import ipaddress
 import json
+import math
 import time
 import weakref
-from typing import TYPE_CHECKING
+from concurrent import futures
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple  # noqa: F401
 
 from datadog_checks.base import ConfigurationError
 
-from .compat import write_persistent_cache
+from .compat import read_persistent_cache, write_persistent_cache
 from .config import InstanceConfig
 
 if TYPE_CHECKING:
     from .snmp import SnmpCheck
 
+# The number of devices recorded in the journal before it is compacted into the snapshot
+JOURNAL_COMPACTION_SIZE = 100
 
-def discover_instances(config, interval, check_ref):
-    # type: (InstanceConfig, float, weakref.ref[SnmpCheck]) -> None
+# The lowest timeout of the requests probing hosts, in seconds
+MIN_PROBE_TIMEOUT = 1
+
+
+class DiscoveryJournal(object):
+    """
+    The devices found by the discovery, with their sysObjectID and profile, saved in the persistent cache.
+
+    The cache entry of the check holds a snapshot of all devices, and devices found since the snapshot was
+    written are appended to a separate journal entry, so that recording a device does not rewrite all others.
+    The journal is compacted into the snapshot once it holds `compaction_size` devices, and after every sweep.
+
+    The snapshot maps hosts to their sysObjectID and profile. Snapshots holding a list of hosts, as written by
+    previous versions, are still loaded.
+    """
+
+    def __init__(self, key, compaction_size=JOURNAL_COMPACTION_SIZE):
+        # type: (str, int) -> None
+        self.key = key
+        self.journal_key = '{}_journal'.format(key)
+        self.compaction_size = compaction_size
+
+        self._devices = {}  # type: Dict[str, Tuple[Optional[str], Optional[str]]]
+        self._journal = []  # type: List[str]
+
+    def load(self):
+        # type: () -> Dict[str, Tuple[Optional[str], Optional[str]]]
+        """
+        Return the sysObjectID and profile of every device saved, by host.
+        """
+        devices = {}  # type: Dict[str, Tuple[Optional[str], Optional[str]]]
+        journal = [line for line in (read_persistent_cache(self.journal_key) or '').splitlines() if line]
+
+        try:
+            snapshot = json.loads(read_persistent_cache(self.key) or '{}')
+            if isinstance(snapshot, list):
+                snapshot = {host: [None, None] for host in snapshot}
+
+            entries = [(host, value) for host, value in snapshot.items()]
+            entries.extend((entry[0], entry[1:]) for entry in map(json.loads, journal))
+            for host, (sys_object_id, profile) in entries:
+                ipaddress.ip_address(host)
+                devices[host] = (sys_object_id, profile)
+        except (LookupError, TypeError, ValueError):
+            # Start over rather than probing hosts that are not in the network
+            self._devices = {}
+            self._journal = []
+            write_persistent_cache(self.key, json.dumps({}))
+            write_persistent_cache(self.journal_key, '')
+            return {}
+
+        self._devices = devices
+        self._journal = journal
+        return dict(devices)
+
+    def record(self, host, sys_object_id, profile):
+        # type: (str, Optional[str], Optional[str]) -> None
+        """
+        Append a device to the journal. Once the journal `needs_compaction`, it is only written by `compact`.
+        """
+        self._devices[host] = (sys_object_id, profile)
+        self._journal.append(json.dumps([host, sys_object_id, profile]))
+
+        if not self.needs_compaction:
+            write_persistent_cache(self.journal_key, '\n'.join(self._journal))
+
+    def compact(self, hosts):
+        # type: (List[str]) -> None
+        """
+        Write a snapshot of the devices of `hosts`, dropping all other devices, and empty the journal.
+        """
+        self._devices = {host: self._devices.get(host, (None, None)) for host in hosts}
+        write_persistent_cache(self.key, json.dumps({host: list(device) for host, device in self._devices.items()}))
+
+        if self._journal:
+            self._journal = []
+            write_persistent_cache(self.journal_key, '')
+
+    @property
+    def needs_compaction(self):
+        # type: () -> bool
+        return len(self._journal) >= self.compaction_size
+
+
+class ProbeTimeout(object):
+    """
+    The timeout of the requests probing hosts, estimated from the response times of the hosts that answered
+    like the retransmission timeout of TCP (RFC 6298), and kept between `MIN_PROBE_TIMEOUT` and `maximum`.
+
+    The estimate is only used for hosts that already answered, such as devices that did not match a profile,
+    since they are probed again on every sweep. Other hosts are probed with `maximum`, as they may be slower
+    than the hosts that answered so far.
+    """
+
+    def __init__(self, maximum):
+        # type: (float) -> None
+        self.maximum = maximum
+
+        self._srtt = None  # type: Optional[float]
+        self._rttvar = 0.0
+        self._answered = set()  # type: Set[str]
+
+    @property
+    def timeout(self):
+        # type: () -> int
+        if self._srtt is None:
+            return int(math.ceil(self.maximum))
+
+        # PySNMP only waits for whole numbers of seconds
+        return int(math.ceil(max(MIN_PROBE_TIMEOUT, min(self.maximum, self._srtt + 4 * self._rttvar))))
+
+    def get(self, host):
+        # type: (str) -> int
+        if host not in self._answered:
+            return int(math.ceil(self.maximum))
+        return self.timeout
+
+    def record(self, host, elapsed):
+        # type: (str, float) -> None
+        self._answered.add(host)
+        if self._srtt is None:
+            self._srtt = elapsed
+            self._rttvar = elapsed / 2
+        else:
+            self._rttvar = 0.75 * self._rttvar + 0.25 * abs(self._srtt - elapsed)
+            self._srtt = 0.875 * self._srtt + 0.125 * elapsed
+
+
+class DiscoveryProgress(object):
+    """
+    The progress of the current discovery sweep, updated by the discovery thread and reported by the check.
+    """
+
+    def __init__(self):
+        # type: () -> None
+        self.hosts_total = 0
+        self.hosts_scanned = 0
+        self.probe_timeout = 0
+        self._start_time = self._end_time = time.time()
+
+    def start(self, hosts_total):
+        # type: (int) -> None
+        self.hosts_total = hosts_total
+        self.hosts_scanned = 0
+        self._start_time = time.time()
+        self._end_time = None  # type: Optional[float]
+
+    def finish(self):
+        # type: () -> None
+        self._end_time = time.time()
+
+    @property
+    def percent(self):
+        # type: () -> float
+        if not self.hosts_total:
+            return 100.0
+        return min(100.0, 100.0 * self.hosts_scanned / self.hosts_total)
+
+    @property
+    def rate(self):
+        # type: () -> float
+        """The number of hosts probed per second during the current or last sweep."""
+        elapsed = (self._end_time or time.time()) - self._start_time
+        return self.hosts_scanned / elapsed if elapsed > 0 else 0.0
+
+
+def probe_host(check_ref, config, host, timeout):
+    # type: (weakref.ref[SnmpCheck], InstanceConfig, str, int) -> Optional[Tuple[InstanceConfig, str, float]]
+    """
+    Return the configuration of `host`, its sysObjectID and the time it took to respond, meant to run in a thread
+    of the sweep.
+    """
+    check = check_ref()
+    if check is None:
+        return None
+
+    host_config = check._build_autodiscovery_config(config.instance, host)
+    host_config.set_device_timeout(timeout)
+
+    start_time = time.time()
+    sys_object_oid = check.fetch_sysobject_oid(host_config)
+    elapsed = time.time() - start_time
+
+    host_config.set_device_timeout(host_config.timeout)
+    return host_config, sys_object_oid, elapsed
+
+
+def discover_instances(config, interval, check_ref, journal, progress):
+    # type: (InstanceConfig, float, weakref.ref[SnmpCheck], DiscoveryJournal, DiscoveryProgress) -> None
     """Function looping over a subnet to discover devices, meant to run in a thread.
 
     This is extracted from the check class to not keep a strong reference to
     the check instance. This way if the agent unschedules the check and deletes
     the reference to the instance, the check is garbage collected properly and
     that function can stop.
+
+    Up to `discovery_workers` hosts are probed at the same time. Once the check is stopped,
+    the hosts being probed are still recorded, but no other host is probed.
     """
+    probe_timeout = ProbeTimeout(config.timeout)
+    executor = futures.ThreadPoolExecutor(max_workers=config.discovery_workers)
+
+    try:
+        while True:
+            start_time = time.time()
+            progress.start(sum(1 for _ in config.network_hosts()))
+
+            hosts = config.network_hosts()
+            pending = {}  # type: Dict[Any, str]
+            running = True
+            while True:
+                check = check_ref()
+                running = running and check is not None and check._running
+                del check
+
+                if running:
+                    for host in hosts:
+                        progress.probe_timeout = probe_timeout.timeout
+                        timeout = probe_timeout.get(host)
+                        pending[executor.submit(probe_host, check_ref, config, host, timeout)] = host
+                        if len(pending) >= config.discovery_workers:
+                            break
+
+                if not pending:
+                    break
+
+                done, _ = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+                for future in done:
+                    host = pending.pop(future)
+                    progress.hosts_scanned += 1
+                    _record_host(config, check_ref, journal, probe_timeout, host, future)
+
+            if not running:
+                return
 
-    while True:
-        start_time = time.time()
-        for host in config.network_hosts():
             check = check_ref()
-            if check is None or not check._running:
+            if check is None:
                 return
+            # Compact at the end of the loop, in case some host have been removed since last
+            journal.compact(list(config.discovered_instances))
+            progress.finish()
+            del check
 
-            host_config = check._build_autodiscovery_config(config.instance, host)
+            time_elapsed = time.time() - start_time
+            if interval - time_elapsed > 0:
+                time.sleep(interval - time_elapsed)
+    finally:
+        executor.shutdown(wait=False)
 
-            try:
-                sys_object_oid = check.fetch_sysobject_oid(host_config)
-            except Exception as e:
-                check.log.debug("Error scanning host %s: %s", host, e)
-                del check
-                continue
-
-            try:
-                profile = check._profile_for_sysobject_oid(sys_object_oid)
-            except ConfigurationError:
-                if not host_config.oid_config.has_oids():
-                    check.log.warning("Host %s didn't match a profile for sysObjectID %s", host, sys_object_oid)
-                    del check
-                    continue
-            else:
-                host_config.refresh_with_profile(check.profiles[profile])
-                host_config.add_profile_tag(profile)
-
-            config.discovered_instances[host] = host_config
-
-            write_persistent_cache(check.check_id, json.dumps(list(config.discovered_instances)))
-            del check
 
-        check = check_ref()
-        if check is None:
+def _record_host(config, check_ref, journal, probe_timeout, host, future):
+    # type: (InstanceConfig, weakref.ref[SnmpCheck], DiscoveryJournal, ProbeTimeout, str, Any) -> None
+    check = check_ref()
+    if check is None:
+        return
+
+    try:
+        result = future.result()
+        if result is None:
             return
-        # Write again at the end of the loop, in case some host have been removed since last
-        write_persistent_cache(check.check_id, json.dumps(list(config.discovered_instances)))
-        del check
+        host_config, sys_object_oid, elapsed = result
+    except Exception as e:
+        check.log.debug("Error scanning host %s: %s", host, e)
+        return
+
+    probe_timeout.record(host, elapsed)
+
+    try:
+        profile = check._profile_for_sysobject_oid(sys_object_oid)  # type: Optional[str]
+    except ConfigurationError:
+        if not host_config.oid_config.has_oids():
+            check.log.warning("Host %s didn't match a profile for sysObjectID %s", host, sys_object_oid)
+            return
+        profile = None
+    else:
+        host_config.refresh_with_profile(check.profiles[profile])
+        host_config.add_profile_tag(profile)
+
+    config.discovered_instances[host] = host_config
 
-        time_elapsed = time.time() - start_time
-        if interval - time_elapsed > 0:
-            time.sleep(interval - time_elapsed)
+    journal.record(host, sys_object_oid, profile)
+    if journal.needs_compaction:
+        journal.compact(list(config.discovered_instances))
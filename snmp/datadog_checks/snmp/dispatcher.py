@@ -0,0 +1,338 @@
+# (C) Datadog, Inc. 2023-present
+# All rights reserved
+# Licensed under Simplified BSD License (see LICENSE)
+"""
+Send the SNMP requests of any number of devices concurrently from a single thread.
+
+Each device has its own SNMP engine, so instead of running the dispatcher of every engine in turn, the sockets of
+all engines are polled together and the timers of all engines are advanced after every poll. Timeouts and retries
+are handled by PySNMP for every PDU, according to the `timeout` and `retries` of each device.
+"""
+import time
+from asyncore import loop
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Set  # noqa: F401
+
+from pyasn1.type.univ import Null
+from pysnmp.entity.rfc3413 import cmdgen
+from pysnmp.hlapi.asyncore.cmdgen import vbProcessor
+from pysnmp.proto import errind
+from pysnmp.proto.rfc1905 import endOfMibView
+
+from datadog_checks.base.errors import CheckException
+
+from .config import InstanceConfig  # noqa: F401
+from .exceptions import PySnmpError
+
+# The maximum number of seconds to wait for a response before advancing the timers of the engines
+POLL_TIMEOUT = 0.5
+
+
+class SnmpRequest(object):
+    """
+    A GET, or a walk made of successive GETNEXT or GETBULK PDUs, sent to a single device.
+
+    At most one PDU of a request is in flight at any time. Once the request is done, `callback` is called
+    with the request, whose `var_binds` and `error` are set.
+    """
+
+    def __init__(self, config, oids, lookup_mib, callback):
+        # type: (InstanceConfig, list, bool, Callable[[SnmpRequest], None]) -> None
+        if config.device is None:
+            raise RuntimeError('No device set')  # pragma: no cover
+
+        self.config = config
+        self.oids = oids
+        self.lookup_mib = lookup_mib
+        self.callback = callback
+
+        self.var_binds = []  # type: List[Any]
+        self.error = None  # type: Optional[Exception]
+        self.done = False
+
+        self._dispatcher = None  # type: Optional[SnmpDispatcher]
+
+    def start(self, dispatcher):
+        # type: (SnmpDispatcher) -> None
+        self._dispatcher = dispatcher
+        try:
+            self._prepare()
+        except PySnmpError as e:
+            self._finish(e)
+        else:
+            self._send(self.oids)
+
+    def _prepare(self):
+        # type: () -> None
+        pass
+
+    def _send(self, var_binds):
+        # type: (list) -> None
+        raise NotImplementedError
+
+    def _process_response(self, snmp_engine, error_indication, var_binds):
+        # type: (Any, Any, list) -> bool
+        """
+        Process the response to a PDU and return whether or not the request is done.
+        """
+        raise NotImplementedError
+
+    def _send_var_binds(self, generator, var_binds, *args):
+        # type: (Any, list, *Any) -> None
+        try:
+            generator.sendVarBinds(
+                self.config._snmp_engine,
+                self.config.device.target,
+                self.config._context_data.contextEngineId,
+                self.config._context_data.contextName,
+                *(args + (vbProcessor.makeVarBinds(self.config._snmp_engine, var_binds), self._on_response, None))
+            )
+        except PySnmpError as e:
+            self._finish(e)
+
+    def _on_response(  # type: ignore
+        self, snmpEngine, sendRequestHandle, errorIndication, errorStatus, errorIndex, varBinds, cbCtx
+    ):
+        try:
+            done = self._process_response(snmpEngine, errorIndication, varBinds)
+        except Exception as e:
+            if self.done:
+                # The request is finished and the error comes from its callback, which is left to the caller of `run`
+                raise
+
+            # Errors must not escape to the poll loop, which is shared with the requests of other devices
+            done = False
+            self._finish(PySnmpError('Failed to process response: {}'.format(e)))
+
+        if done:
+            self._finish()
+
+    def _finish(self, error=None):
+        # type: (Optional[Exception]) -> None
+        # A request is only finished once, even if a late response or an error follows
+        if self.done:
+            return
+
+        if error is not None and not isinstance(error, (PySnmpError, CheckException)):
+            error = CheckException('{} for device {}'.format(error, self.config.device))
+
+        self.done = True
+        self.error = error
+        if self._dispatcher is not None:
+            self._dispatcher._finish(self)
+
+        self.callback(self)
+
+
+class GetRequest(SnmpRequest):
+    """Call SNMP GET on a list of oids, like `commands.snmp_get`."""
+
+    def _send(self, var_binds):
+        # type: (list) -> None
+        self._send_var_binds(cmdgen.GetCommandGenerator(), var_binds)
+
+    def _process_response(self, snmp_engine, error_indication, var_binds):
+        # type: (Any, Any, list) -> bool
+        if error_indication:
+            self._finish(error_indication)
+            return False
+
+        self.var_binds = vbProcessor.unmakeVarBinds(snmp_engine, var_binds, self.lookup_mib)
+        return True
+
+
+class GetNextRequest(SnmpRequest):
+    """
+    Call SNMP GETNEXT on a list of oids while the results are under the same prefix, like `commands.snmp_getnext`.
+    """
+
+    def __init__(self, config, oids, lookup_mib, callback, ignore_nonincreasing_oid=False):
+        # type: (InstanceConfig, list, bool, Callable[[SnmpRequest], None], bool) -> None
+        super(GetNextRequest, self).__init__(config, oids, lookup_mib, callback)
+        self.ignore_nonincreasing_oid = ignore_nonincreasing_oid
+
+        self._generator = cmdgen.NextCommandGenerator()
+        self._initial_vars = []  # type: List[Any]
+
+    def _prepare(self):
+        # type: () -> None
+        self._initial_vars = [x[0] for x in vbProcessor.makeVarBinds(self.config._snmp_engine, self.oids)]
+
+    def _send(self, var_binds):
+        # type: (list) -> None
+        self._send_var_binds(self._generator, var_binds)
+
+    def _process_response(self, snmp_engine, error_indication, var_bind_table):
+        # type: (Any, Any, list) -> bool
+        var_bind_table = [vbProcessor.unmakeVarBinds(snmp_engine, row, self.lookup_mib) for row in var_bind_table]
+        if self.ignore_nonincreasing_oid and isinstance(error_indication, errind.OidNotIncreasing):
+            error_indication = None
+
+        if error_indication:
+            # Like `commands.snmp_getnext`, nothing is returned when a walk fails
+            self.var_binds = []
+            self._finish(error_indication)
+            return False
+
+        var_binds = []
+        initial_vars = []
+        for col, var_bind in enumerate(var_bind_table[0] if var_bind_table else []):
+            name, val = var_bind
+            if not isinstance(val, Null) and self._initial_vars[col].isPrefixOf(name):
+                var_binds.append(var_bind)
+                initial_vars.append(self._initial_vars[col])
+
+        if not var_binds:
+            return True
+
+        self.var_binds.extend(var_binds)
+        self._initial_vars = initial_vars
+        self._send(var_binds)
+        return False
+
+
+class GetBulkRequest(SnmpRequest):
+    """
+    Call SNMP GETBULK on an oid while the results are under the same prefix, like `commands.snmp_bulk`.
+
+    The results of the walk so far are kept when it fails.
+    """
+
+    def __init__(
+        self,
+        config,  # type: InstanceConfig
+        oid,  # type: Any
+        non_repeaters,  # type: int
+        max_repetitions,  # type: int
+        lookup_mib,  # type: bool
+        callback,  # type: Callable[[SnmpRequest], None]
+        ignore_nonincreasing_oid=False,  # type: bool
+    ):
+        # type: (...) -> None
+        super(GetBulkRequest, self).__init__(config, [oid], lookup_mib, callback)
+        self.non_repeaters = non_repeaters
+        self.max_repetitions = max_repetitions
+        self.ignore_nonincreasing_oid = ignore_nonincreasing_oid
+
+        self._generator = cmdgen.BulkCommandGenerator()
+        self._initial_var = None  # type: Any
+
+    def _prepare(self):
+        # type: () -> None
+        self._initial_var = vbProcessor.makeVarBinds(self.config._snmp_engine, self.oids)[0][0]
+
+    def _send(self, var_binds):
+        # type: (list) -> None
+        self._send_var_binds(self._generator, var_binds, self.non_repeaters, self.max_repetitions)
+
+    def _process_response(self, snmp_engine, error_indication, var_bind_table):
+        # type: (Any, Any, list) -> bool
+        var_bind_table = [vbProcessor.unmakeVarBinds(snmp_engine, row, self.lookup_mib) for row in var_bind_table]
+        if self.ignore_nonincreasing_oid and isinstance(error_indication, errind.OidNotIncreasing):
+            error_indication = None
+
+        if error_indication:
+            self._finish(error_indication)
+            return False
+
+        if not var_bind_table:
+            return True
+
+        for var_binds in var_bind_table:
+            name, value = var_binds[0]
+            if endOfMibView.isSameTypeWith(value) or not self._initial_var.isPrefixOf(name):
+                return True
+
+            self.var_binds.append(var_binds[0])
+
+        self._send(var_bind_table[-1])
+        return False
+
+
+class SnmpDispatcher(object):
+    """
+    Send SNMP requests with at most `max_pending_requests_per_device` of them in flight for every device,
+    and at most `max_pending_requests` of them in flight overall when set.
+
+    Requests are started in the order they are submitted, taking turns between devices. `run` returns once
+    every request, including the ones submitted by callbacks, is done.
+    """
+
+    def __init__(self, max_pending_requests_per_device=1, max_pending_requests=None):
+        # type: (int, Optional[int]) -> None
+        self.max_pending_requests_per_device = max_pending_requests_per_device
+        self.max_pending_requests = max_pending_requests or float('inf')
+
+        # Requests that are not started yet, by device
+        self._queued_requests = {}  # type: Dict[int, Deque[SnmpRequest]]
+        # Devices that have queued requests and can start one
+        self._ready_devices = deque()  # type: Deque[int]
+        self._ready_device_ids = set()  # type: Set[int]
+
+        self._pending_requests = {}  # type: Dict[int, int]
+        self._pending_requests_count = 0
+
+        # The sockets of the engines of all devices, which are polled together
+        self._engine_ids = set()  # type: Set[int]
+        self._engines = []  # type: List[Any]
+        self._socket_map = {}  # type: Dict[int, Any]
+
+    def submit(self, request):
+        # type: (SnmpRequest) -> None
+        device_id = id(request.config)
+        self._queued_requests.setdefault(device_id, deque()).append(request)
+        self._set_ready(device_id)
+
+    def run(self):
+        # type: () -> None
+        self._start_requests()
+
+        while self._pending_requests_count > 0:
+            loop(POLL_TIMEOUT, use_poll=True, map=self._socket_map, count=1)
+
+            now = time.time()
+            for engine in self._engines:
+                engine.transportDispatcher.handleTimerTick(now)
+
+            self._start_requests()
+
+    def _set_ready(self, device_id):
+        # type: (int) -> None
+        if (
+            device_id not in self._ready_device_ids
+            and self._queued_requests.get(device_id)
+            and self._pending_requests.get(device_id, 0) < self.max_pending_requests_per_device
+        ):
+            self._ready_devices.append(device_id)
+            self._ready_device_ids.add(device_id)
+
+    def _start_requests(self):
+        # type: () -> None
+        while self._ready_devices and self._pending_requests_count < self.max_pending_requests:
+            device_id = self._ready_devices.popleft()
+            self._ready_device_ids.discard(device_id)
+
+            request = self._queued_requests[device_id].popleft()
+            self._pending_requests[device_id] = self._pending_requests.get(device_id, 0) + 1
+            self._pending_requests_count += 1
+            self._add_engine(request.config._snmp_engine)
+
+            # Let the next device start a request before this one starts another
+            self._set_ready(device_id)
+            request.start(self)
+
+    def _add_engine(self, engine):
+        # type: (Any) -> None
+        if id(engine) in self._engine_ids:
+            return
+
+        self._engine_ids.add(id(engine))
+        self._engines.append(engine)
+        self._socket_map.update(engine.transportDispatcher.getSocketMap())
+
+    def _finish(self, request):
+        # type: (SnmpRequest) -> None
+        device_id = id(request.config)
+        self._pending_requests[device_id] -= 1
+        self._pending_requests_count -= 1
+        self._set_ready(device_id)
@@ -105,6 +105,16 @@ class Device:
         self._port = port
         self._target = target
 
+    @property
+    def ip(self):
+        # type: () -> str
+        return self._ip
+
+    @property
+    def port(self):
+        # type: () -> int
+        return self._port
+
     @property
     def target(self):
         # type: () -> str
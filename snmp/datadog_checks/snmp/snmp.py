@@ -4,8 +4,6 @@
 import copy
 import fnmatch
 import functools
-import ipaddress
-import json
 import re
 import threading
 import time
@@ -18,12 +16,13 @@ from six import iteritems
 
 from datadog_checks.base import AgentCheck, ConfigurationError, is_affirmative
 from datadog_checks.base.errors import CheckException
+from datadog_checks.base.utils.containers import freeze
 from datadog_checks.snmp.utils import extract_value
 
 from .commands import snmp_bulk, snmp_get, snmp_getnext
-from .compat import read_persistent_cache, write_persistent_cache
 from .config import InstanceConfig
-from .discovery import discover_instances
+from .discovery import DiscoveryJournal, DiscoveryProgress, discover_instances
+from .dispatcher import GetBulkRequest, GetNextRequest, GetRequest, SnmpDispatcher
 from .exceptions import PySnmpError
 from .metrics import as_metric_with_forced_type, as_metric_with_inferred_type, try_varbind_value_to_float
 from .mibs import MIBLoader
@@ -31,10 +30,12 @@ from .models import OID
 from .parsing import ColumnTag, IndexTag, ParsedMetric, ParsedTableMetric, SymbolTag
 from .pysnmp_types import ObjectIdentity, ObjectType, noSuchInstance, noSuchObject
 from .utils import (
+    PROFILES_REFRESH_INTERVAL,
     OIDPrinter,
     batches,
     get_default_profiles,
     get_profile_definition,
+    get_profile_sysobjectids,
     oid_pattern_specificity,
     recursively_expand_base_profiles,
     transform_index,
@@ -57,10 +58,16 @@ class SnmpCheck(AgentCheck):
     _running = True
     _thread = None
     _executor = None
+    _discovery_progress = None  # type: Optional[DiscoveryProgress]
     _NON_REPEATERS = 0
     _MAX_REPETITIONS = 25
     _thread_factory = threading.Thread  # Store as an attribute for easier mocking.
 
+    # The profiles and their mapping from sysObjectID along with the time they were loaded, shared by the instances
+    # with the same `profiles` in `init_config`, by frozen configuration or `None` for the default profiles
+    _profiles_cache = {}  # type: Dict[Any, Tuple[float, Dict[str, Dict[str, Any]], Dict[str, str]]]
+    _profiles_cache_lock = threading.Lock()
+
     def __init__(self, *args, **kwargs):
         # type: (*Any, **Any) -> None
         super(SnmpCheck, self).__init__(*args, **kwargs)
@@ -78,8 +85,7 @@ class SnmpCheck(AgentCheck):
             self.init_config.get('refresh_oids_cache_interval', InstanceConfig.DEFAULT_REFRESH_OIDS_CACHE_INTERVAL)
         )
 
-        self.profiles = self._load_profiles()
-        self.profiles_by_oid = self._get_profiles_mapping()
+        self.profiles, self.profiles_by_oid = self._get_profiles()
 
         self._config = self._build_config(self.instance)
 
@@ -87,6 +93,9 @@ class SnmpCheck(AgentCheck):
 
         self._submitted_metrics = 0
 
+        # Normalized metric names, by symbol name and metric suffix
+        self._metric_names = {}  # type: Dict[Tuple[str, Optional[str]], str]
+
     def _get_next_fetch_id(self):
         # type: () -> str
         """
@@ -102,6 +111,35 @@ class SnmpCheck(AgentCheck):
         # Include check ID to avoid conflicts between concurrent instances of the check.
         return '{}-{}'.format(self.check_id, self._last_fetch_number)
 
+    def _get_profiles(self):
+        # type: () -> Tuple[Dict[str, Dict[str, Any]], Dict[str, str]]
+        """
+        Return the SNMP profiles and their mapping from sysObjectID, loaded once for all instances with the same
+        profiles. Configured profiles are loaded again at most once every `PROFILES_REFRESH_INTERVAL`.
+        """
+        configured_profiles = self.init_config.get('profiles')
+        key = None if configured_profiles is None else freeze(configured_profiles)
+
+        with self._profiles_cache_lock:
+            now = time.time()
+            cached = self._profiles_cache.get(key)
+            if cached is not None:
+                timestamp, profiles, profiles_by_oid = cached
+                if key is None:
+                    # The default profiles are only loaded again when their files change
+                    up_to_date = profiles is get_default_profiles()
+                else:
+                    up_to_date = now - timestamp < PROFILES_REFRESH_INTERVAL
+
+                if up_to_date:
+                    return profiles, profiles_by_oid
+
+            self.profiles = self._load_profiles()
+            self.profiles_by_oid = self._get_profiles_mapping()
+            self._profiles_cache[key] = (now, self.profiles, self.profiles_by_oid)
+
+            return self.profiles, self.profiles_by_oid
+
     def _load_profiles(self):
         # type: () -> Dict[str, Dict[str, Any]]
         """
@@ -136,7 +174,7 @@ class SnmpCheck(AgentCheck):
         """
         profiles_by_oid = {}  # type: Dict[str, str]
         for name, profile in self.profiles.items():
-            sys_object_oids = profile['definition'].get('sysobjectid')
+            sys_object_oids = get_profile_sysobjectids(profile)
             if sys_object_oids is None:
                 continue
             if isinstance(sys_object_oids, str):
@@ -205,7 +243,12 @@ class SnmpCheck(AgentCheck):
         dict[oid/metric_name][row index] = value
         In case of scalar objects, the row index is just 0
         """
-        results = defaultdict(dict)  # type: DefaultDict[str, Dict[Tuple[str, ...], Any]]
+        if config.max_pending_requests_per_device > 1:
+            dispatcher = SnmpDispatcher(config.max_pending_requests_per_device)
+            get_results = self.submit_fetch(dispatcher, config)
+            dispatcher.run()
+            return get_results()
+
         enforce_constraints = config.enforce_constraints
         fetch_id = self._get_next_fetch_id()
 
@@ -239,6 +282,108 @@ class SnmpCheck(AgentCheck):
                     error = message
                 self.warning(message)
 
+        results, scalar_oids = self._build_results(config, all_binds, fetch_id)
+        return results, scalar_oids, error
+
+    def submit_fetch(self, dispatcher, config):
+        # type: (SnmpDispatcher, InstanceConfig) -> Any
+        """
+        Submit the requests fetching the OIDs of the device configured in `config` to `dispatcher`, and return
+        a function returning the same as `fetch_results` once the dispatcher has run.
+        """
+        enforce_constraints = config.enforce_constraints
+        fetch_id = self._get_next_fetch_id()
+        # The binds are returned in the order the requests were submitted
+        requests = []  # type: List[Any]
+        errors = []  # type: List[str]
+
+        def submit(request):
+            # type: (Any) -> None
+            requests.append(request)
+            dispatcher.submit(request)
+
+        def submit_getnext(oids):
+            # type: (List[Any]) -> None
+            for oids_batch in batches(oids, size=self.oid_batch_size):
+                self.log.debug(
+                    '[%s] Running SNMP command getNext on OIDS: %s', fetch_id, OIDPrinter(oids_batch, with_values=False)
+                )
+                submit(
+                    GetNextRequest(
+                        config,
+                        oids_batch,
+                        enforce_constraints,
+                        on_done,
+                        ignore_nonincreasing_oid=self.ignore_nonincreasing_oid,
+                    )
+                )
+
+        def on_done(request):
+            # type: (Any) -> None
+            if request.error is not None:
+                message = '[{}] Failed to collect some metrics: {}'.format(fetch_id, request.error)
+                errors.append(message)
+                self.warning(message)
+                if not isinstance(request, GetBulkRequest):
+                    request.var_binds = []
+                return
+
+            self.log.debug('[%s] Returned vars: %s', fetch_id, OIDPrinter(request.var_binds, with_values=True))
+            if isinstance(request, GetRequest):
+                var_binds = []
+                missing_results = []
+                for var in request.var_binds:
+                    result_oid, value = var
+                    if reply_invalid(value):
+                        missing_results.append(ObjectType(ObjectIdentity(result_oid.asTuple())))
+                    else:
+                        var_binds.append(var)
+
+                request.var_binds = var_binds
+                if missing_results:
+                    # If we didn't catch the metric using snmpget, try snmpnext
+                    submit_getnext(missing_results)
+
+        for oids_batch in batches(
+            [oid.as_object_type() for oid in config.oid_config.scalar_oids], size=self.oid_batch_size
+        ):
+            self.log.debug(
+                '[%s] Running SNMP command get on OIDS: %s', fetch_id, OIDPrinter(oids_batch, with_values=False)
+            )
+            submit(GetRequest(config, oids_batch, enforce_constraints, on_done))
+
+        submit_getnext([oid.as_object_type() for oid in config.oid_config.next_oids])
+
+        for oid in config.oid_config.bulk_oids:
+            oid_object_type = oid.as_object_type()
+            self.log.debug(
+                '[%s] Running SNMP command getBulk on OID %s',
+                fetch_id,
+                OIDPrinter((oid_object_type,), with_values=False),
+            )
+            submit(
+                GetBulkRequest(
+                    config,
+                    oid_object_type,
+                    self._NON_REPEATERS,
+                    self._MAX_REPETITIONS,
+                    enforce_constraints,
+                    on_done,
+                    ignore_nonincreasing_oid=self.ignore_nonincreasing_oid,
+                )
+            )
+
+        def get_results():
+            # type: () -> Tuple[Dict[str, Dict[Tuple[str, ...], Any]], List[OID], Optional[str]]
+            all_binds = [var_bind for request in requests for var_bind in request.var_binds]
+            results, scalar_oids = self._build_results(config, all_binds, fetch_id)
+            return results, scalar_oids, errors[0] if errors else None
+
+        return get_results
+
+    def _build_results(self, config, all_binds, fetch_id):
+        # type: (InstanceConfig, List[Any], str) -> Tuple[Dict[str, Dict[Tuple[str, ...], Any]], List[OID]]
+        results = defaultdict(dict)  # type: DefaultDict[str, Dict[Tuple[str, ...], Any]]
         scalar_oids = []
         for result_oid, value in all_binds:
             oid = OID(result_oid)
@@ -248,7 +393,7 @@ class SnmpCheck(AgentCheck):
         self.log.debug('[%s] Raw results: %s', fetch_id, OIDPrinter(results, with_values=False))
         # Freeze the result
         results.default_factory = None  # type: ignore
-        return results, scalar_oids, error
+        return results, scalar_oids
 
     def fetch_oids(self, config, scalar_oids, next_oids, enforce_constraints, fetch_id):
         # type: (InstanceConfig, List[OID], List[OID], bool, str) -> Tuple[List[Any], Optional[str]]
@@ -344,16 +489,21 @@ class SnmpCheck(AgentCheck):
 
     def _start_discovery(self):
         # type: () -> None
-        cache = read_persistent_cache(self.check_id)
-        if cache:
-            hosts = json.loads(cache)
-            for host in hosts:
+        journal = DiscoveryJournal(self.check_id)
+        for host, (sys_object_id, profile) in journal.load().items():
+            host_config = self._build_autodiscovery_config(self.instance, host)
+            if profile not in self.profiles and sys_object_id is not None:
                 try:
-                    ipaddress.ip_address(host)
-                except ValueError:
-                    write_persistent_cache(self.check_id, json.dumps([]))
-                    break
-                self._config.discovered_instances[host] = self._build_autodiscovery_config(self.instance, host)
+                    profile = self._profile_for_sysobject_oid(sys_object_id)
+                except ConfigurationError:
+                    profile = None
+
+            # Devices without a profile get one on their first check run
+            if profile in self.profiles:
+                host_config.refresh_with_profile(self.profiles[profile])
+                host_config.add_profile_tag(profile)
+
+            self._config.discovered_instances[host] = host_config
 
         raw_discovery_interval = self._config.instance.get('discovery_interval', 3600)
         try:
@@ -363,8 +513,11 @@ class SnmpCheck(AgentCheck):
             raise ConfigurationError(message)
 
         # Pass a weakref to the discovery function to not have a reference cycle
+        self._discovery_progress = progress = DiscoveryProgress()
         self._thread = self._thread_factory(
-            target=discover_instances, args=(self._config, discovery_interval, weakref.ref(self)), name=self.name
+            target=discover_instances,
+            args=(self._config, discovery_interval, weakref.ref(self), journal, progress),
+            name=self.name,
         )
         self._thread.daemon = True
         self._thread.start()
@@ -384,22 +537,37 @@ class SnmpCheck(AgentCheck):
             if executor is None:
                 raise RuntimeError("Expected executor be set")
 
-            sent = []
-            for host, discovered in list(config.discovered_instances.items()):
-                future = executor.submit(self._check_device, discovered)  # type: Any
-                sent.append(future)
-                future.add_done_callback(functools.partial(self._on_check_device_done, host))
-            futures.wait(sent)
+            if config.max_pending_requests:
+                self._check_devices(list(config.discovered_instances.items()))
+            else:
+                sent = []
+                for host, discovered in list(config.discovered_instances.items()):
+                    future = executor.submit(self._check_device, discovered)  # type: Any
+                    sent.append(future)
+                    future.add_done_callback(functools.partial(self._on_check_device_done, host))
+                futures.wait(sent)
 
             tags = ['network:{}'.format(config.ip_network), 'autodiscovery_subnet:{}'.format(config.ip_network)]
             tags.extend(config.tags)
             self.gauge('snmp.discovered_devices_count', len(config.discovered_instances), tags=tags)
+            self.submit_discovery_metrics(tags)
         else:
             error, tags = self._check_device(config)
             # no need to handle error here since it's already handled inside `self._check_device`
 
         self.submit_telemetry_metrics(start_time, tags)
 
+    def submit_discovery_metrics(self, tags):
+        # type: (List[str]) -> None
+        progress = self._discovery_progress
+        if progress is None:
+            return
+
+        self.gauge('snmp.discovery.progress', progress.percent, tags=tags)
+        self.gauge('snmp.discovery.hosts_scanned', progress.hosts_scanned, tags=tags)
+        self.gauge('snmp.discovery.scan_rate', progress.rate, tags=tags)
+        self.gauge('snmp.discovery.probe_timeout', progress.probe_timeout, tags=tags)
+
     def submit_telemetry_metrics(self, start_time, tags):
         # type: (float, List[str]) -> None
         telemetry_tags = tags + [LOADER_TAG]
@@ -411,10 +579,41 @@ class SnmpCheck(AgentCheck):
         self.gauge('datadog.snmp.check_duration', check_duration, tags=telemetry_tags)
         self.gauge('datadog.snmp.submitted_metrics', self._submitted_metrics, tags=telemetry_tags)
 
+    def _check_devices(self, devices):
+        # type: (List[Tuple[str, InstanceConfig]]) -> None
+        """
+        Check all `devices` from the current thread, sending the requests of all devices concurrently.
+        """
+        config = self._config
+        dispatcher = SnmpDispatcher(config.max_pending_requests_per_device, config.max_pending_requests)
+
+        fetches = {}
+        for host, device_config in devices:
+            if device_config.oid_config.should_reset():
+                device_config.oid_config.reset()
+
+            # Devices that do not have a profile yet are checked like any other device
+            if device_config.oid_config.has_oids():
+                device_config.add_uptime_metric()
+                try:
+                    fetches[host] = self.submit_fetch(dispatcher, device_config)
+                except Exception as e:
+                    self.log.debug('Unable to fetch results of %s concurrently: %s', host, e)
+
+        dispatcher.run()
+
+        for host, device_config in devices:
+            error, _ = self._check_device(device_config, fetches.get(host))
+            self._update_failing_instances(host, error)
+
     def _on_check_device_done(self, host, future):
         # type: (str, futures.Future) -> None
-        config = self._config
         error, _ = future.result()
+        self._update_failing_instances(host, error)
+
+    def _update_failing_instances(self, host, error):
+        # type: (str, Optional[str]) -> None
+        config = self._config
         if error:
             config.failing_instances[host] += 1
             if config.failing_instances[host] >= config.allowed_failures:
@@ -426,8 +625,8 @@ class SnmpCheck(AgentCheck):
             # Reset the counter if not's failing
             config.failing_instances.pop(host, None)
 
-    def _check_device(self, config):
-        # type: (InstanceConfig) -> Tuple[Optional[str], List[str]]
+    def _check_device(self, config, get_results=None):
+        # type: (InstanceConfig, Any) -> Tuple[Optional[str], List[str]]
         # Reset errors
         if config.device is None:
             raise RuntimeError('No device set')  # pragma: no cover
@@ -447,7 +646,7 @@ class SnmpCheck(AgentCheck):
             if config.oid_config.has_oids():
                 self.log.debug('Querying %s', config.device)
                 config.add_uptime_metric()
-                results, scalar_oids, error = self.fetch_results(config)
+                results, scalar_oids, error = self.fetch_results(config) if get_results is None else get_results()
                 config.oid_config.update_scalar_oids(scalar_oids)
                 tags = self.extract_metric_tags(config.parsed_metric_tags, results)
                 tags.extend(config.tags)
@@ -508,18 +707,33 @@ class SnmpCheck(AgentCheck):
 
         Submit the results to the aggregator.
         """
+        # The tags of every row are shared by all the symbols of the table, by table and index
+        tags_by_table = {}  # type: Dict[Tuple[int, int], Dict[Tuple[str, ...], List[str]]]
+        if_high_speeds = None  # type: Optional[Dict[Tuple[str, ...], float]]
+
         for metric in metrics:
             name = metric.name
             if name not in results:
                 self.log.debug('Ignoring metric %s', name)
                 continue
             if isinstance(metric, ParsedTableMetric):
+                # Symbols of the same table share the same lists of tags
+                table = (id(metric.index_tags), id(metric.column_tags))
+                tags_by_index = tags_by_table.setdefault(table, {})
                 for index, val in iteritems(results[name]):
-                    metric_tags = tags + self.get_index_tags(index, results, metric.index_tags, metric.column_tags)
+                    metric_tags = tags_by_index.get(index)
+                    if metric_tags is None:
+                        metric_tags = tags_by_index[index] = tags + self.get_index_tags(
+                            index, results, metric.index_tags, metric.column_tags
+                        )
                     self.submit_metric(
                         name, val, metric.forced_type, metric_tags, metric.options, metric.extract_value_pattern
                     )
-                    self.try_submit_bandwidth_usage_metric_if_bandwidth_metric(name, index, results, metric_tags)
+
+                if self.is_bandwidth_metric(name):
+                    if if_high_speeds is None:
+                        if_high_speeds = self.get_if_high_speeds(results)
+                    self.submit_bandwidth_usage_metrics(name, results[name], if_high_speeds, tags_by_index)
             else:
                 result = list(results[name].items())
                 if len(result) > 1:
@@ -543,37 +757,44 @@ class SnmpCheck(AgentCheck):
         # type: (str) -> bool
         return name in SnmpCheck.BANDWIDTH_METRIC_NAME_TO_BANDWIDTH_USAGE_METRIC_NAME_MAPPING
 
-    def try_submit_bandwidth_usage_metric_if_bandwidth_metric(
-        self,
-        name,  # type: str
-        index,  # type: Tuple[str, ...]
-        results,  # type: Dict[str, Dict[Tuple[str, ...], Any]]
-        tags,  # type: List[str]
-    ):
-        # type: (...) -> None
+    def get_if_high_speeds(self, results):
+        # type: (Dict[str, Dict[Tuple[str, ...], Any]]) -> Dict[Tuple[str, ...], float]
         """
-        Safely send bandwidth usage metrics if name is a bandwidth metric
+        Return the `ifHighSpeed` of every interface by index, skipping the interfaces whose bandwidth usage
+        cannot be computed.
         """
-        try:
-            self.submit_bandwidth_usage_metric_if_bandwidth_metric(name, index, results, tags)
-        except Exception as e:
-            msg = 'Unable submit bandwidth usage metric with name=`{}`, index=`{}`, tags=`{}`: {}'.format(
-                name, index, tags, e
-            )
-            self.log.warning(msg)
-            self.log.debug(msg, exc_info=True)
+        if 'ifHighSpeed' not in results:
+            self.log.debug('[SNMP Bandwidth usage] missing `ifHighSpeed` metric, skipping bandwidth usage metrics')
+            return {}
 
-    def submit_bandwidth_usage_metric_if_bandwidth_metric(
+        if_high_speeds = {}
+        for index, if_high_speed_val in iteritems(results['ifHighSpeed']):
+            if_high_speed = try_varbind_value_to_float(if_high_speed_val)
+            if if_high_speed is None:
+                self.log.debug(
+                    'Metric: %r has non float value: %r. Only float values can be submitted as metrics.',
+                    'ifHighSpeed',
+                    if_high_speed_val,
+                )
+            elif not if_high_speed:
+                self.log.debug('Zero value at ifHighSpeed, skipping this row. index=%s', index)
+            else:
+                if_high_speeds[index] = if_high_speed
+
+        return if_high_speeds
+
+    def submit_bandwidth_usage_metrics(
         self,
         name,  # type: str
-        index,  # type: Tuple[str, ...]
-        results,  # type: Dict[str, Dict[Tuple[str, ...], Any]]
-        tags,  # type: List[str]
+        octets,  # type: Dict[Tuple[str, ...], Any]
+        if_high_speeds,  # type: Dict[Tuple[str, ...], float]
+        tags_by_index,  # type: Dict[Tuple[str, ...], List[str]]
     ):
         # type: (...) -> None
         """
-        Evaluate and report input/output bandwidth usage. If any of `ifHCInOctets`, `ifHCOutOctets`  or `ifHighSpeed`
-        is missing then bandwidth will not be reported.
+        Report the bandwidth usage of all interfaces for the bandwidth metric `name`, given the `ifHighSpeed`
+        of the interfaces as returned by `get_if_high_speeds`. Interfaces missing any of `ifHCInOctets`,
+        `ifHCOutOctets` or `ifHighSpeed` are skipped.
 
         Bandwidth usage is:
 
@@ -589,52 +810,29 @@ class SnmpCheck(AgentCheck):
                        It is the total available bandwidth.
         Bandwidth usage is evaluated as: ifHC[In|Out]Octets/ifHighSpeed and reported as *rate*
         """
-        if not self.is_bandwidth_metric(name):
-            return
-
-        if 'ifHighSpeed' not in results:
-            self.log.debug('[SNMP Bandwidth usage] missing `ifHighSpeed` metric, skipping metric %s', name)
-            return
-
-        if name not in results:
-            self.log.debug('[SNMP Bandwidth usage] missing `%s` metric, skipping this row. index=%s', name, index)
-            return
-
-        octets_value = results[name][index]
-        try:
-            if_high_speed_val = results['ifHighSpeed'][index]
-        except KeyError:
-            self.log.debug('[SNMP Bandwidth usage] missing `ifHighSpeed` metric, skipping this row. ' 'index=%s', index)
-            return
-
-        if_high_speed = try_varbind_value_to_float(if_high_speed_val)
-        if if_high_speed is None:
-            err_msg = 'Metric: {} has non float value: {}. Only float values can be submitted as metrics.'.format(
-                repr(name), repr(if_high_speed_val)
-            )
-            self.log.debug(err_msg, exc_info=True)
-            return
-
-        bits_value = try_varbind_value_to_float(octets_value) * 8
-        if bits_value is None:
-            err_msg = 'Metric: {} has non float value: {}. Only float values can be submitted as metrics.'.format(
-                repr(name), repr(octets_value)
-            )
-            self.log.debug(err_msg, exc_info=True)
-            return
+        metric_name = "snmp.{}.rate".format(
+            SnmpCheck.BANDWIDTH_METRIC_NAME_TO_BANDWIDTH_USAGE_METRIC_NAME_MAPPING[name]
+        )
+        for index, octets_value in iteritems(octets):
+            if_high_speed = if_high_speeds.get(index)
+            if if_high_speed is None:
+                self.log.debug(
+                    '[SNMP Bandwidth usage] missing `ifHighSpeed` metric, skipping this row. index=%s', index
+                )
+                continue
 
-        try:
-            bandwidth_usage_value = (bits_value / (if_high_speed * (10**6))) * 100
-        except ZeroDivisionError:
-            self.log.debug('Zero value at ifHighSpeed, skipping this row. index=%s', index)
-            return
+            octets_float = try_varbind_value_to_float(octets_value)
+            if octets_float is None:
+                self.log.debug(
+                    'Metric: %r has non float value: %r. Only float values can be submitted as metrics.',
+                    name,
+                    octets_value,
+                )
+                continue
 
-        self.rate(
-            "snmp.{}.rate".format(SnmpCheck.BANDWIDTH_METRIC_NAME_TO_BANDWIDTH_USAGE_METRIC_NAME_MAPPING[name]),
-            bandwidth_usage_value,
-            tags,
-        )
-        self._submitted_metrics += 1
+            bandwidth_usage_value = (octets_float * 8 / (if_high_speed * (10**6))) * 100
+            self.rate(metric_name, bandwidth_usage_value, tags_by_index[index])
+            self._submitted_metrics += 1
 
     def get_index_tags(
         self,
@@ -724,10 +922,14 @@ class SnmpCheck(AgentCheck):
             self.log.warning('No such Mib available: %s', name)
             return
 
-        if 'metric_suffix' in options:
-            metric_name = self.normalize('{}.{}'.format(name, options['metric_suffix']), prefix='snmp')
-        else:
-            metric_name = self.normalize(name, prefix='snmp')
+        metric_suffix = options.get('metric_suffix')
+        metric_name = self._metric_names.get((name, metric_suffix))
+        if metric_name is None:
+            if metric_suffix is not None:
+                metric_name = self.normalize('{}.{}'.format(name, metric_suffix), prefix='snmp')
+            else:
+                metric_name = self.normalize(name, prefix='snmp')
+            self._metric_names[(name, metric_suffix)] = metric_name
 
         if extract_value_pattern:
             snmp_value = extract_value(extract_value_pattern, snmp_value.prettyPrint())
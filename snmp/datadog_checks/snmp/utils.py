@@ -1,12 +1,21 @@
 # (C) Datadog, Inc. 2020-present
 # All rights reserved
 # Licensed under Simplified BSD License (see LICENSE)
+import copy
 import logging
 import os
+import threading
+import time
 from typing import Any, Dict, Iterator, List, Mapping, Optional, Pattern, Sequence, Tuple, Union
 
 import yaml
 
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    # On source install C Extensions might have not been built
+    from yaml import SafeLoader  # type: ignore
+
 from .compat import get_config
 from .exceptions import CouldNotDecodeOID, SmiError, UnresolvedOID
 from .pysnmp_types import (
@@ -73,12 +82,26 @@ def _resolve_definition_file(definition_file):
     return os.path.join(_get_profiles_site_root(), definition_file)
 
 
+# Parsed profile files along with the modification time and size of the file they were parsed from, keyed by path.
+# Base profiles are extended by most profiles, so this ensures every file is only parsed once.
+_parsed_profile_definitions = {}  # type: Dict[str, Tuple[Tuple[float, int], Dict[str, Any]]]
+
+
 def _read_profile_definition(definition_file):
     # type: (str) -> Dict[str, Any]
     definition_file = _resolve_definition_file(definition_file)
 
-    with open(definition_file) as f:
-        return yaml.safe_load(f)
+    stat = os.stat(definition_file)
+    file_version = (stat.st_mtime, stat.st_size)
+
+    cached = _parsed_profile_definitions.get(definition_file)
+    if cached is None or cached[0] != file_version:
+        with open(definition_file) as f:
+            cached = (file_version, yaml.load(f, Loader=SafeLoader))
+        _parsed_profile_definitions[definition_file] = cached
+
+    # Callers own the definition, which is updated in-place when its base profiles are expanded
+    return copy.deepcopy(cached[1])
 
 
 def recursively_expand_base_profiles(definition):
@@ -131,6 +154,66 @@ def _is_abstract_profile(name):
     return name.startswith('_')
 
 
+class LazyProfile(dict):
+    """
+    A profile installed on the system, that behaves like `{'definition': definition}` except that its base profiles
+    are only expanded the first time it is accessed, as most profiles never match any device.
+    """
+
+    def __init__(self, path, definition):
+        # type: (str, Dict[str, Any]) -> None
+        super(LazyProfile, self).__init__(definition=definition)
+        self.path = path
+        self._expanded = not definition.get('extends')
+        self._lock = threading.Lock()
+
+    @property
+    def sysobjectid(self):
+        # type: () -> Union[str, List[str], None]
+        # Base profiles never define a sysObjectID, so the profile does not need to be expanded.
+        return super(LazyProfile, self).__getitem__('definition').get('sysobjectid')
+
+    def _expand(self):
+        # type: () -> None
+        with self._lock:
+            if self._expanded:
+                return
+
+            # Expand a copy so that a failure leaves the profile untouched
+            definition = dict(super(LazyProfile, self).__getitem__('definition'))
+            definition['metric_tags'] = list(definition.get('metric_tags', []))
+            try:
+                recursively_expand_base_profiles(definition)
+            except Exception:
+                logger.error("Could not expand base profile %s", self.path)
+                raise
+
+            self['definition'] = definition
+            self._expanded = True
+
+    def __getitem__(self, key):
+        # type: (str) -> Any
+        if not self._expanded:
+            self._expand()
+
+        return super(LazyProfile, self).__getitem__(key)
+
+    def get(self, key, default=None):
+        # type: (str, Any) -> Any
+        if not self._expanded:
+            self._expand()
+
+        return super(LazyProfile, self).get(key, default)
+
+
+def get_profile_sysobjectids(profile):
+    # type: (Dict[str, Any]) -> Union[str, List[str], None]
+    if isinstance(profile, LazyProfile):
+        return profile.sysobjectid
+
+    return profile['definition'].get('sysobjectid')
+
+
 def _load_default_profiles():
     # type: () -> Dict[str, Any]
     """Load all the profiles installed on the system."""
@@ -142,24 +225,49 @@ def _load_default_profiles():
         if _is_abstract_profile(name):
             continue
 
-        definition = _read_profile_definition(path)
-        try:
-            recursively_expand_base_profiles(definition)
-        except Exception:
-            logger.error("Could not expand base profile %s", path)
-            raise
-        profiles[name] = {'definition': definition}
+        profiles[name] = LazyProfile(path, _read_profile_definition(path))
 
     return profiles
 
 
-_default_profiles = _load_default_profiles()
+def _get_default_profiles_fingerprint():
+    # type: () -> Tuple[Tuple[str, float, int], ...]
+    fingerprint = []
+    for path in _iter_default_profile_file_paths():
+        stat = os.stat(path)
+        fingerprint.append((path, stat.st_mtime, stat.st_size))
+
+    return tuple(fingerprint)
+
+
+# The minimum number of seconds between two checks of whether the profiles changed
+PROFILES_REFRESH_INTERVAL = 60
+
+# The profiles installed on the system, only loaded once they are needed and shared by all instances. They are
+# loaded again when any profile file changes, which is checked at most once every `PROFILES_REFRESH_INTERVAL`.
+_default_profiles = None  # type: Optional[Dict[str, Any]]
+_default_profiles_fingerprint = None  # type: Optional[Tuple[Tuple[str, float, int], ...]]
+_default_profiles_last_refresh = 0.0
+_default_profiles_lock = threading.Lock()
 
 
 def get_default_profiles():
     # type: () -> Dict[str, Any]
     """Return all the profiles installed on the system."""
-    return _default_profiles
+    global _default_profiles, _default_profiles_fingerprint, _default_profiles_last_refresh
+
+    with _default_profiles_lock:
+        now = time.time()
+        if _default_profiles is not None and now - _default_profiles_last_refresh < PROFILES_REFRESH_INTERVAL:
+            return _default_profiles
+
+        fingerprint = _get_default_profiles_fingerprint()
+        if _default_profiles is None or fingerprint != _default_profiles_fingerprint:
+            _default_profiles = _load_default_profiles()
+            _default_profiles_fingerprint = fingerprint
+
+        _default_profiles_last_refresh = now
+        return _default_profiles
 
 
 def parse_as_oid_tuple(value):
@@ -0,0 +1,27 @@
+# (C) Datadog, Inc. 2023-present
+# All rights reserved
+# Licensed under Simplified BSD License (see LICENSE)
+import pytest
+
+from datadog_checks.snmp import SnmpCheck
+
+from . import common
+
+pytestmark = [pytest.mark.usefixtures("dd_environment"), common.snmp_integration_only]
+
+
+@pytest.mark.parametrize('max_pending_requests_per_device', [1, 8])
+@pytest.mark.parametrize('profile', ['cisco-nexus', 'f5-big-ip'])
+def test_fetch_results(benchmark, profile, max_pending_requests_per_device):
+    instance = common.generate_instance_config([])
+    instance['community_string'] = profile
+    instance['profile'] = profile
+    instance['max_pending_requests_per_device'] = max_pending_requests_per_device
+    check = SnmpCheck('snmp', {}, [instance])
+    config = check._config
+    config.add_uptime_metric()
+
+    # Run once to get any initialization out of the way.
+    check.fetch_results(config)
+
+    benchmark(check.fetch_results, config)
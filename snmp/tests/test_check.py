@@ -896,6 +896,14 @@ def test_profile_sys_object_no_metrics():
         SnmpCheck('snmp', {'profiles': {}}, [instance])
 
 
+DISCOVERY_METRICS = [
+    'snmp.discovery.hosts_scanned',
+    'snmp.discovery.probe_timeout',
+    'snmp.discovery.progress',
+    'snmp.discovery.scan_rate',
+]
+
+
 def test_discovery(aggregator):
     host = socket.gethostbyname(common.HOST)
     network = ipaddress.ip_network(u'{}/29'.format(host), strict=False).with_prefixlen
@@ -938,15 +946,17 @@ def test_discovery(aggregator):
 
     aggregator.assert_metric('snmp.sysUpTimeInstance')
     aggregator.assert_metric('snmp.discovered_devices_count', tags=network_tags)
+    for metric in DISCOVERY_METRICS:
+        aggregator.assert_metric(metric, tags=network_tags)
 
     common.assert_common_device_metrics(aggregator, tags=check_tags)
     common.assert_common_check_run_metrics(aggregator, network_tags)
     aggregator.assert_all_metrics_covered()
 
 
-@mock.patch("datadog_checks.snmp.snmp.read_persistent_cache")
+@mock.patch("datadog_checks.snmp.discovery.read_persistent_cache")
 def test_discovery_devices_monitored_count(read_mock, aggregator):
-    read_mock.return_value = '["192.168.0.1","192.168.0.2"]'
+    read_mock.side_effect = {'': '["192.168.0.1","192.168.0.2"]'}.get
 
     host = socket.gethostbyname(common.HOST)
     network = ipaddress.ip_network(u'{}/29'.format(host), strict=False).with_prefixlen
@@ -973,6 +983,8 @@ def test_discovery_devices_monitored_count(read_mock, aggregator):
     check._running = False
 
     aggregator.assert_metric('snmp.discovered_devices_count', tags=network_tags)
+    for metric in DISCOVERY_METRICS:
+        aggregator.assert_metric(metric, tags=network_tags)
 
     for device_ip in ['192.168.0.1', '192.168.0.2']:
         tags = check_tags + ['snmp_device:{}'.format(device_ip)]
@@ -1360,3 +1372,94 @@ def test_oids_cache_command_calls(refresh_interval, getnext_call_counts, getnext
         check._config.oid_config._last_ts = 0
         check.check(instance)
         assert snmp_getnext.call_count == getnext_call_count_after_reset
+
+
+@pytest.mark.parametrize('profile', ['cisco-nexus', 'f5-big-ip', 'palo-alto'])
+def test_max_pending_requests_per_device(profile):
+    """
+    Sending the requests of a device concurrently returns the same results as sending them one at a time.
+    """
+    instance = common.generate_instance_config([])
+    instance['community_string'] = profile
+    instance['profile'] = profile
+    instance['bulk_threshold'] = 5
+
+    def fetch_results(**options):
+        check = SnmpCheck('snmp', {}, [dict(instance, **options)])
+        check._config.add_uptime_metric()
+        results, scalar_oids, error = check.fetch_results(check._config)
+        return (
+            {symbol: {index: str(value) for index, value in values.items()} for symbol, values in results.items()},
+            sorted(str(oid) for oid in scalar_oids),
+            error,
+        )
+
+    expected = fetch_results()
+    assert expected[0] and expected[2] is None
+    assert fetch_results(max_pending_requests_per_device=8) == expected
+
+
+def test_max_pending_requests_per_device_timeout(aggregator):
+    instance = common.generate_instance_config(common.SUPPORTED_METRIC_TYPES)
+    instance['max_pending_requests_per_device'] = 4
+    instance['port'] = 1162  # Nothing listens there
+    instance['timeout'] = 1
+    instance['retries'] = 0
+    check = SnmpCheck('snmp', {}, [instance])
+
+    start = time.time()
+    check.check(instance)
+
+    # Timeouts of requests in flight at the same time overlap
+    assert time.time() - start < 2 * len(common.SUPPORTED_METRIC_TYPES)
+    aggregator.assert_service_check("snmp.can_check", status=SnmpCheck.CRITICAL, at_least=1)
+
+
+def test_discovery_max_pending_requests(aggregator):
+    host = socket.gethostbyname(common.HOST)
+    network = ipaddress.ip_network(u'{}/29'.format(host), strict=False).with_prefixlen
+    check_tags = [
+        'snmp_device:{}'.format(host),
+        'snmp_profile:profile1',
+        'autodiscovery_subnet:{}'.format(to_native_string(network)),
+    ]
+
+    instance = {
+        'name': 'snmp_conf',
+        'network_address': to_native_string(network),
+        'port': common.PORT,
+        'community_string': 'public',
+        'retries': 0,
+        'discovery_interval': 0,
+        'max_pending_requests': 10,
+        'max_pending_requests_per_device': 4,
+    }
+    init_config = {
+        'profiles': {
+            'profile1': {'definition': {'metrics': common.SUPPORTED_METRIC_TYPES, 'sysobjectid': '1.3.6.1.4.1.8072.*'}}
+        }
+    }
+    check = SnmpCheck('snmp', init_config, [instance])
+    try:
+        for _ in range(30):
+            check.check(instance)
+            if 'snmp.IAmAGauge32' in aggregator.metric_names:
+                break
+            time.sleep(1)
+            aggregator.reset()
+
+        # The profile is known from the first run, so metrics are fetched through the dispatcher
+        aggregator.reset()
+        with mock.patch('datadog_checks.snmp.snmp.snmp_get') as snmp_get:
+            check.check(instance)
+            assert snmp_get.call_count == 0
+    finally:
+        check._running = False
+        del check  # This is what the Agent would do when unscheduling the check.
+
+    for metric in common.SUPPORTED_METRIC_TYPES:
+        metric_name = "snmp." + metric['name']
+        aggregator.assert_metric(metric_name, tags=check_tags, count=1)
+
+    aggregator.assert_metric('snmp.sysUpTimeInstance')
+    common.assert_common_device_metrics(aggregator, tags=check_tags)
@@ -3,6 +3,7 @@
 # Licensed under Simplified BSD License (see LICENSE)
 
 import copy
+import json
 import logging
 import os
 import time
@@ -13,17 +14,21 @@ from typing import Any, List
 import mock
 import pytest
 import yaml
+from pysnmp.proto.rfc1902 import Gauge32
 
 from datadog_checks.base import ConfigurationError
 from datadog_checks.dev import temp_dir
-from datadog_checks.snmp import SnmpCheck
+from datadog_checks.snmp import SnmpCheck, utils
 from datadog_checks.snmp.config import InstanceConfig
-from datadog_checks.snmp.discovery import discover_instances
+from datadog_checks.snmp.discovery import DiscoveryJournal, DiscoveryProgress, ProbeTimeout, discover_instances
+from datadog_checks.snmp.dispatcher import SnmpDispatcher, SnmpRequest
 from datadog_checks.snmp.parsing import ParsedSymbolMetric, ParsedTableMetric
+from datadog_checks.snmp.pysnmp_types import OctetString
 from datadog_checks.snmp.resolver import OIDTrie
 from datadog_checks.snmp.utils import (
     _load_default_profiles,
     batches,
+    get_default_profiles,
     oid_pattern_specificity,
     recursively_expand_base_profiles,
 )
@@ -343,13 +348,13 @@ def test_invalid_discovery_interval():
         check.check(instance)
 
 
-@mock.patch("datadog_checks.snmp.snmp.read_persistent_cache")
+@mock.patch("datadog_checks.snmp.discovery.read_persistent_cache")
 def test_cache_discovered_host(read_mock):
     instance = common.generate_instance_config(common.SUPPORTED_METRIC_TYPES)
     instance.pop('ip_address')
     instance['network_address'] = '192.168.0.0/24'
 
-    read_mock.return_value = '["192.168.0.1"]'
+    read_mock.side_effect = {'': '["192.168.0.1"]'}.get
     check = SnmpCheck('snmp', {}, [instance])
     check._thread_factory = lambda **kwargs: mock.Mock()
     check.check(instance)
@@ -357,29 +362,30 @@ def test_cache_discovered_host(read_mock):
     assert '192.168.0.1' in check._config.discovered_instances
 
 
-@mock.patch("datadog_checks.snmp.snmp.read_persistent_cache")
-@mock.patch("datadog_checks.snmp.snmp.write_persistent_cache")
+@mock.patch("datadog_checks.snmp.discovery.read_persistent_cache")
+@mock.patch("datadog_checks.snmp.discovery.write_persistent_cache")
 def test_cache_corrupted(write_mock, read_mock):
     instance = common.generate_instance_config(common.SUPPORTED_METRIC_TYPES)
     instance.pop('ip_address')
     instance['network_address'] = '192.168.0.0/24'
-    read_mock.return_value = '["192.168.0."]'
+    read_mock.side_effect = {'': '["192.168.0.1", "192.168.0."]'}.get
     check = SnmpCheck('snmp', {}, [instance])
     check._thread_factory = lambda **kwargs: mock.Mock()
     check.check(instance)
 
     assert not check._config.discovered_instances
-    write_mock.assert_called_once_with('', '[]')
+    write_mock.assert_any_call('', '{}')
+    write_mock.assert_any_call('_journal', '')
 
 
-@mock.patch("datadog_checks.snmp.snmp.read_persistent_cache")
+@mock.patch("datadog_checks.snmp.discovery.read_persistent_cache")
 @mock.patch("datadog_checks.snmp.discovery.write_persistent_cache")
 def test_cache_building(write_mock, read_mock):
     instance = common.generate_instance_config(common.SUPPORTED_METRIC_TYPES)
     instance['timeout'] = 1
     instance.pop('ip_address')
 
-    read_mock.return_value = '[]'
+    read_mock.side_effect = {'': '[]'}.get
 
     discovered_instance = instance.copy()
     discovered_instance['ip_address'] = '192.168.0.1'
@@ -399,7 +405,7 @@ def test_cache_building(write_mock, read_mock):
     finally:
         check._running = False
 
-    write_mock.assert_called_once_with('', '["192.168.0.1"]')
+    write_mock.assert_called_once_with('', '{"192.168.0.1": [null, null]}')
 
 
 def test_trie():
@@ -499,6 +505,94 @@ def test_profile_override():
             assert profiles['generic-router'] == {'definition': profile}
 
 
+def test_default_profiles_are_expanded_lazily():
+    base_profile = {'metrics': [{'MIB': 'UDP-MIB', 'symbol': 'udpHCInDatagrams', 'forced_type': 'monotonic_count'}]}
+    profile = {
+        'extends': ['_base-profile.yaml'],
+        'sysobjectid': '1.3.6.1.4.1.8072.*',
+        'metrics': [{'MIB': 'TCP-MIB', 'symbol': 'tcpPassiveOpens', 'forced_type': 'monotonic_count'}],
+    }
+
+    with temp_dir() as tmp:
+        with mock_profiles_confd_root(tmp):
+            for name, definition in (('_base-profile', base_profile), ('profile', profile), ('other', profile)):
+                with open(os.path.join(tmp, '{}.yaml'.format(name)), 'wb') as f:
+                    f.write(yaml.safe_dump(definition))
+
+            with mock.patch('yaml.load', wraps=yaml.load) as load:
+                profiles = _load_default_profiles()
+
+                # The sysObjectID is available without reading the base profile
+                assert profiles['profile'].sysobjectid == '1.3.6.1.4.1.8072.*'
+                assert load.call_count == 2
+
+                definition = profiles['profile']['definition']
+                assert definition['metrics'] == base_profile['metrics'] + profile['metrics']
+                assert definition['metric_tags'] == []
+                assert load.call_count == 3
+
+                # The base profile is only parsed once
+                assert profiles['other']['definition'] == definition
+                assert load.call_count == 3
+
+
+def test_default_profiles_are_reloaded_on_change():
+    profile = {'metrics': [{'MIB': 'TCP-MIB', 'symbol': 'tcpPassiveOpens', 'forced_type': 'monotonic_count'}]}
+
+    with temp_dir() as tmp:
+        with mock_profiles_confd_root(tmp), mock.patch.object(utils, '_default_profiles', None):
+            profile_file = os.path.join(tmp, 'profile.yaml')
+            with open(profile_file, 'wb') as f:
+                f.write(yaml.safe_dump(profile))
+
+            profiles = get_default_profiles()
+            assert profiles['profile'] == {'definition': profile}
+
+            # Profile files are not checked again until the refresh interval elapses
+            with mock.patch('os.stat', wraps=os.stat) as stat:
+                assert get_default_profiles() is profiles
+                assert stat.call_count == 0
+
+            with mock.patch.object(utils, 'PROFILES_REFRESH_INTERVAL', 0):
+                assert get_default_profiles() is profiles
+
+                profile['sysobjectid'] = '1.3.6.1.4.1.8072.*'
+                with open(profile_file, 'wb') as f:
+                    f.write(yaml.safe_dump(profile))
+
+                assert get_default_profiles()['profile'] == {'definition': profile}
+
+
+def test_profiles_are_shared():
+    profile = {'sysobjectid': '1.3.6.1.4.1.30932.*'}
+    instance = common.generate_instance_config([])
+    init_config = {'profiles': {'profile1': {'definition': profile}}}
+
+    check1 = SnmpCheck('snmp', copy.deepcopy(init_config), [instance])
+    with mock.patch.object(SnmpCheck, '_load_profiles') as load_profiles:
+        check2 = SnmpCheck('snmp', copy.deepcopy(init_config), [instance])
+        assert load_profiles.call_count == 0
+
+    assert check2.profiles is check1.profiles
+    assert check2.profiles_by_oid is check1.profiles_by_oid
+
+    # Instances with other profiles do not share them
+    init_config['profiles']['profile1']['definition']['sysobjectid'] = '1.3.6.2.4.1.30932.*'
+    check3 = SnmpCheck('snmp', init_config, [instance])
+    assert check3.profiles_by_oid == {'1.3.6.2.4.1.30932.*': 'profile1'}
+
+    # Configured profiles are loaded again once the refresh interval elapses
+    with mock.patch('datadog_checks.snmp.snmp.PROFILES_REFRESH_INTERVAL', 0):
+        check4 = SnmpCheck('snmp', copy.deepcopy(init_config), [instance])
+        assert check4.profiles is not check3.profiles
+
+    # The default profiles are shared as long as they do not change
+    check5 = SnmpCheck('snmp', {}, [instance])
+    check6 = SnmpCheck('snmp', {}, [instance])
+    assert check6.profiles is check5.profiles
+    assert check6.profiles_by_oid is check5.profiles_by_oid
+
+
 def test_discovery_tags():
     """When specifying a tag on discovery, it doesn't make tags leaks between instances."""
     instance = common.generate_instance_config(common.SUPPORTED_METRIC_TYPES)
@@ -509,17 +603,17 @@ def test_discovery_tags():
 
     check = SnmpCheck('snmp', {}, [instance])
 
-    oids = ['1.3.6.1.4.5', '1.3.6.1.4.5']
+    oids = {'192.168.0.1': '1.3.6.1.4.5', '192.168.0.2': '1.3.6.1.4.5'}
 
     def mock_fetch(cfg):
-        if oids:
-            return oids.pop(0)
+        if cfg.instance['ip_address'] in oids:
+            return oids[cfg.instance['ip_address']]
         check._running = False
         raise RuntimeError("Not snmp")
 
     check.fetch_sysobject_oid = mock_fetch
 
-    discover_instances(check._config, 0, weakref.ref(check))
+    discover_instances(check._config, 0, weakref.ref(check), DiscoveryJournal(check.check_id), DiscoveryProgress())
 
     config = check._config.discovered_instances['192.168.0.2']
     assert set(config.tags) == {
@@ -530,11 +624,11 @@ def test_discovery_tags():
     }
 
 
-@mock.patch("datadog_checks.snmp.snmp.read_persistent_cache")
+@mock.patch("datadog_checks.snmp.discovery.read_persistent_cache")
 @mock.patch("threading.Thread")
 def test_cache_loading_tags(thread_mock, read_mock):
     """When loading discovered instances from cache, tags don't leak from one to the others."""
-    read_mock.return_value = '["192.168.0.1", "192.168.0.2"]'
+    read_mock.side_effect = {'': '["192.168.0.1", "192.168.0.2"]'}.get
     instance = common.generate_instance_config(common.SUPPORTED_METRIC_TYPES)
     instance.pop('ip_address')
 
@@ -549,6 +643,145 @@ def test_cache_loading_tags(thread_mock, read_mock):
     assert set(config.tags) == {'autodiscovery_subnet:192.168.0.0/29', 'test:check', 'snmp_device:192.168.0.2'}
 
 
+@mock.patch("datadog_checks.snmp.discovery.read_persistent_cache")
+@mock.patch("threading.Thread")
+def test_cache_loading_profiles(thread_mock, read_mock):
+    """Devices loaded from the cache get the profile they matched without being probed again."""
+    read_mock.side_effect = {
+        '': json.dumps({'192.168.0.1': ['1.3.6.1.4.1.8072.3.2.10', 'profile1'], '192.168.0.2': [None, None]}),
+        '_journal': json.dumps(['192.168.0.3', '1.3.6.1.4.1.8072.3.2.10', 'removed-profile']),
+    }.get
+    instance = common.generate_instance_config([])
+    instance.pop('ip_address')
+    instance['network_address'] = '192.168.0.0/29'
+    init_config = {
+        'profiles': {
+            'profile1': {'definition': {'metrics': common.SUPPORTED_METRIC_TYPES, 'sysobjectid': '1.3.6.1.4.1.8072.*'}}
+        }
+    }
+
+    check = SnmpCheck('snmp', init_config, [instance])
+    check._start_discovery()
+
+    instances = check._config.discovered_instances
+    assert sorted(instances) == ['192.168.0.1', '192.168.0.2', '192.168.0.3']
+    for host in ['192.168.0.1', '192.168.0.3']:
+        assert 'snmp_profile:profile1' in instances[host].tags
+        assert instances[host].oid_config.has_oids()
+    assert not instances['192.168.0.2'].oid_config.has_oids()
+
+
+@mock.patch("datadog_checks.snmp.discovery.read_persistent_cache")
+@mock.patch("datadog_checks.snmp.discovery.write_persistent_cache")
+def test_discovery_journal(write_mock, read_mock):
+    read_mock.side_effect = {'key': '{"192.168.0.1": ["1.2", "a"]}'}.get
+    journal = DiscoveryJournal('key', compaction_size=2)
+    assert journal.load() == {'192.168.0.1': ('1.2', 'a')}
+
+    journal.record('192.168.0.2', '1.3', 'b')
+    write_mock.assert_called_once_with('key_journal', '["192.168.0.2", "1.3", "b"]')
+    assert not journal.needs_compaction
+
+    # Devices are only written by the compaction once it is needed
+    write_mock.reset_mock()
+    journal.record('192.168.0.3', '1.4', None)
+    assert journal.needs_compaction
+    assert not write_mock.called
+
+    journal.compact(['192.168.0.1', '192.168.0.3', '192.168.0.4'])
+    assert write_mock.call_args_list == [
+        mock.call('key', '{"192.168.0.1": ["1.2", "a"], "192.168.0.3": ["1.4", null], "192.168.0.4": [null, null]}'),
+        mock.call('key_journal', ''),
+    ]
+    assert not journal.needs_compaction
+
+
+def test_probe_timeout():
+    probe_timeout = ProbeTimeout(5)
+    assert probe_timeout.timeout == 5
+    assert probe_timeout.get('192.168.0.1') == 5
+
+    probe_timeout.record('192.168.0.1', 0.01)
+    assert probe_timeout.timeout == 1
+    assert probe_timeout.get('192.168.0.1') == 1
+    # Hosts that never answered are still probed with the maximum
+    assert probe_timeout.get('192.168.0.2') == 5
+
+    for _ in range(10):
+        probe_timeout.record('192.168.0.1', 1.5)
+    assert 1 < probe_timeout.timeout < 5
+
+    for _ in range(10):
+        probe_timeout.record('192.168.0.1', 30)
+    assert probe_timeout.timeout == 5
+
+
+def test_discovery_slow_new_host():
+    """Hosts that never answered are probed with the configured timeout, however fast other hosts answered."""
+    instance = common.generate_instance_config(common.SUPPORTED_METRIC_TYPES)
+    instance.pop('ip_address')
+    instance['network_address'] = '192.168.0.0/29'
+    instance['discovery_workers'] = 1
+    instance['timeout'] = 5
+
+    check = SnmpCheck('snmp', {}, [instance])
+    timeouts = {}
+    set_device_timeout = InstanceConfig.set_device_timeout
+
+    def mock_set_device_timeout(cfg, timeout):
+        timeouts.setdefault(cfg.instance['ip_address'], timeout)
+        set_device_timeout(cfg, timeout)
+
+    def mock_fetch(cfg):
+        host = cfg.instance['ip_address']
+        if host == '192.168.0.1':
+            return '1.3.6.1.4.5'
+        # Slower than the first host, but within the configured timeout
+        if host == '192.168.0.2' and timeouts[host] >= 3:
+            return '1.3.6.1.4.5'
+        if host == '192.168.0.6':
+            check._running = False
+        raise RuntimeError("No SNMP response received before timeout")
+
+    check.fetch_sysobject_oid = mock_fetch
+
+    with mock.patch.object(InstanceConfig, 'set_device_timeout', mock_set_device_timeout), mock.patch(
+        "datadog_checks.snmp.discovery.write_persistent_cache"
+    ):
+        discover_instances(check._config, 0, weakref.ref(check), DiscoveryJournal(check.check_id), DiscoveryProgress())
+
+    assert timeouts['192.168.0.2'] == 5
+    assert sorted(check._config.discovered_instances) == ['192.168.0.1', '192.168.0.2']
+
+
+def test_discovery_concurrent():
+    instance = common.generate_instance_config(common.SUPPORTED_METRIC_TYPES)
+    instance.pop('ip_address')
+    instance['network_address'] = '192.168.0.0/29'
+    instance['discovery_workers'] = 6
+
+    check = SnmpCheck('snmp', {}, [instance])
+
+    def mock_fetch(cfg):
+        time.sleep(0.5)
+        if cfg.instance['ip_address'] == '192.168.0.6':
+            check._running = False
+            raise RuntimeError("Not snmp")
+        return '1.3.6.1.4.5'
+
+    check.fetch_sysobject_oid = mock_fetch
+    progress = DiscoveryProgress()
+
+    start = time.time()
+    with mock.patch("datadog_checks.snmp.discovery.write_persistent_cache"):
+        discover_instances(check._config, 0, weakref.ref(check), DiscoveryJournal(check.check_id), progress)
+
+    assert time.time() - start < 0.5 * 3
+    assert sorted(check._config.discovered_instances) == ['192.168.0.{}'.format(i) for i in range(1, 6)]
+    assert progress.hosts_total == progress.hosts_scanned == 6
+    assert progress.percent == 100
+
+
 def test_failed_to_collect_metrics():
     config = InstanceConfig(
         {"ip_address": "127.0.0.123", "community_string": "public", "metrics": [{"OID": "1.2.3", "name": "foo"}]}
@@ -568,6 +801,35 @@ def test_failed_to_collect_metrics():
     assert 'Failed to collect metrics for 127.0.0.123' in check.warnings[0]
 
 
+def test_dispatcher_request_callback_error():
+    # type: () -> None
+    class ErrorIndicationRequest(SnmpRequest):
+        def _send(self, var_binds):
+            self._on_response(None, None, "Request timed out", None, None, [], None)
+
+        def _process_response(self, snmp_engine, error_indication, var_binds):
+            self._finish(error_indication)
+            return False
+
+    callback = mock.Mock(side_effect=ValueError("callback failed"))
+    config = mock.MagicMock()
+    config._snmp_engine.transportDispatcher.getSocketMap.return_value = {}
+    dispatcher = SnmpDispatcher()
+    request = ErrorIndicationRequest(config, [], False, callback)
+    dispatcher.submit(request)
+
+    with pytest.raises(ValueError, match="callback failed"):
+        dispatcher.run()
+
+    callback.assert_called_once_with(request)
+    assert request.done
+    assert dispatcher._pending_requests_count == 0
+
+    # The dispatcher is left in a consistent state, so running it again returns right away
+    dispatcher.run()
+    callback.assert_called_once_with(request)
+
+
 @pytest.mark.parametrize(
     "items, size, output",
     [
@@ -588,7 +850,7 @@ def test_batches_size_must_be_strictly_positive(size):
         list(batches([1, 2, 3], size=size))
 
 
-def test_try_submit_bandwidth_usage_metric_if_bandwidth_metric():
+def test_submit_bandwidth_usage_metrics():
     instance = common.generate_instance_config([])
 
     check = SnmpCheck('snmp', {}, [instance])
@@ -607,39 +869,86 @@ def test_try_submit_bandwidth_usage_metric_if_bandwidth_metric():
         },
     }
 
+    if_high_speeds = check.get_if_high_speeds(results)
+    assert if_high_speeds == {index: 80.0}
+
     check.rate = mock.Mock()
-    check.try_submit_bandwidth_usage_metric_if_bandwidth_metric('ifHCInOctets', index, results, tags)
+    check.submit_bandwidth_usage_metrics('ifHCInOctets', results['ifHCInOctets'], if_high_speeds, {index: tags})
     # ((5000000 * 8) / (80 * 1000000)) * 100 = 50.0
     check.rate.assert_called_with('snmp.ifBandwidthInUsage.rate', 50.0, ['foo', 'bar'])
 
     check.rate = mock.Mock()
-    check.try_submit_bandwidth_usage_metric_if_bandwidth_metric('ifHCOutOctets', index, results, tags)
+    check.submit_bandwidth_usage_metrics('ifHCOutOctets', results['ifHCOutOctets'], if_high_speeds, {index: tags})
     # ((1000000 * 8) / (80 * 1000000)) * 100 = 10.0
     check.rate.assert_called_with('snmp.ifBandwidthOutUsage.rate', 10.0, ['foo', 'bar'])
 
 
+def test_report_metrics_table_tags_and_bandwidth(aggregator):
+    """The tags of every row are computed once for all the symbols of a table."""
+    metrics = [
+        {
+            'MIB': 'IF-MIB',
+            'table': {'OID': '1.3.6.1.2.1.31.1.1', 'name': 'ifXTable'},
+            'symbols': [
+                {'OID': '1.3.6.1.2.1.31.1.1.1.6', 'name': 'ifHCInOctets'},
+                {'OID': '1.3.6.1.2.1.31.1.1.1.10', 'name': 'ifHCOutOctets'},
+            ],
+            'metric_tags': [{'tag': 'interface', 'column': {'OID': '1.3.6.1.2.1.31.1.1.1.1', 'name': 'ifName'}}],
+        }
+    ]
+    instance = common.generate_instance_config(metrics)
+    check = SnmpCheck('snmp', {}, [instance])
+    results = {
+        'ifName': {('1',): OctetString('eth0'), ('2',): OctetString('eth1')},
+        'ifHCInOctets': {('1',): Gauge32(5000000), ('2',): Gauge32(5000000)},
+        'ifHCOutOctets': {('1',): Gauge32(1000000), ('2',): Gauge32(1000000)},
+        # No bandwidth usage is reported for interfaces with a zero speed
+        'ifHighSpeed': {('1',): 80, ('2',): 0},
+    }
+
+    with mock.patch.object(check, 'get_index_tags', wraps=check.get_index_tags) as get_index_tags:
+        check.report_metrics(check._config.parsed_metrics, results, ['foo:bar'])
+
+    assert get_index_tags.call_count == 2
+    for interface in ('eth0', 'eth1'):
+        tags = ['foo:bar', 'interface:{}'.format(interface)]
+        aggregator.assert_metric('snmp.ifHCInOctets', value=5000000, tags=tags, count=1)
+        aggregator.assert_metric('snmp.ifHCOutOctets', value=1000000, tags=tags, count=1)
+
+    tags = ['foo:bar', 'interface:eth0']
+    aggregator.assert_metric('snmp.ifBandwidthInUsage.rate', value=50.0, tags=tags, count=1)
+    aggregator.assert_metric('snmp.ifBandwidthOutUsage.rate', value=10.0, tags=tags, count=1)
+    aggregator.assert_all_metrics_covered()
+
+
 @pytest.mark.parametrize(
     "results, metric_name, error_messages",
     [
         pytest.param(
             {
                 'ifHighSpeed': {
-                    ('1', '2'): 80,
+                    ('1', '3'): 80,
+                },
+                'ifHCInOctets': {
+                    ('1', '2'): 5000000,
                 },
             },
             'ifHCInOctets',
-            ['missing `ifHCInOctets`'],
-            id="missing ifHCInOctets",
+            ['missing `ifHighSpeed` metric, skipping this row'],
+            id="missing ifHighSpeed row",
         ),
         pytest.param(
             {
                 'ifHighSpeed': {
                     ('1', '2'): 80,
                 },
+                'ifHCOutOctets': {
+                    ('1', '2'): 'foo',
+                },
             },
             'ifHCOutOctets',
-            ['missing `ifHCOutOctets`'],
-            id="missing ifHCOutOctets",
+            ["'ifHCOutOctets' has non float value"],
+            id="non float ifHCOutOctets",
         ),
         pytest.param(
             {
@@ -672,7 +981,7 @@ def test_try_submit_bandwidth_usage_metric_if_bandwidth_metric():
         ),
     ],
 )
-def test_try_submit_bandwidth_usage_metric_if_bandwidth_metric_errors(results, metric_name, error_messages, caplog):
+def test_submit_bandwidth_usage_metrics_errors(results, metric_name, error_messages, caplog):
     instance = common.generate_instance_config([])
     check = SnmpCheck('snmp', {}, [instance])
 
@@ -681,7 +990,8 @@ def test_try_submit_bandwidth_usage_metric_if_bandwidth_metric_errors(results, m
 
     check.rate = mock.Mock()
     with caplog.at_level(logging.DEBUG):
-        check.try_submit_bandwidth_usage_metric_if_bandwidth_metric(metric_name, index, results, tags)
+        if_high_speeds = check.get_if_high_speeds(results)
+        check.submit_bandwidth_usage_metrics(metric_name, results[metric_name], if_high_speeds, {index: tags})
 
     check.rate.assert_not_called()
     for msg in error_messages:
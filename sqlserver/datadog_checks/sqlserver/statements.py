@@ -11,10 +11,10 @@ from lxml import etree as ET
 
 from datadog_checks.base import is_affirmative
 from datadog_checks.base.utils.common import ensure_unicode, to_native_string
-from datadog_checks.base.utils.db.sql import compute_sql_signature
 from datadog_checks.base.utils.db.statement_metrics import StatementMetrics
 from datadog_checks.base.utils.db.utils import (
     DBMAsyncJob,
+    ObfuscationCache,
     RateLimitingTTLCache,
     default_json_event_encoding,
     obfuscate_sql_with_metadata,
@@ -213,6 +213,7 @@ class SqlserverStatementMetrics(DBMAsyncJob):
             check.statement_metrics_config.get('enforce_collection_interval_deadline', True)
         )
         self._state = StatementMetrics()
+        self._obfuscation_cache = ObfuscationCache()
         self._init_caches()
         self._conn_key_prefix = "dbm-"
         self._statement_metrics_query = None
@@ -284,14 +285,24 @@ class SqlserverStatementMetrics(DBMAsyncJob):
         return rows
 
     def _normalize_queries(self, rows):
-        normalized_rows = []
+        queries = []
+        procedure_names = []
         for row in rows:
+            row['is_proc'], procedure_name = is_statement_proc(row['text'])
+            procedure_names.append(procedure_name)
+            queries.append(row['statement_text'])
+            if row['is_proc']:
+                queries.append(row['text'])
+
+        statements, errors = self._obfuscation_cache.obfuscate_queries(queries, self.check.obfuscator_options)
+
+        normalized_rows = []
+        for row, procedure_name in zip(rows, procedure_names):
             try:
-                statement = obfuscate_sql_with_metadata(row['statement_text'], self.check.obfuscator_options)
+                statement = self._get_obfuscated_statement(statements, errors, row['statement_text'])
                 procedure_statement = None
-                row['is_proc'], procedure_name = is_statement_proc(row['text'])
                 if row['is_proc']:
-                    procedure_statement = obfuscate_sql_with_metadata(row['text'], self.check.obfuscator_options)
+                    procedure_statement = self._get_obfuscated_statement(statements, errors, row['text'])
             except Exception as e:
                 if self.check.log_unobfuscated_queries:
                     raw_query_text = row['text'] if row.get('is_proc', False) else row['statement_text']
@@ -309,10 +320,10 @@ class SqlserverStatementMetrics(DBMAsyncJob):
             row['text'] = obfuscated_statement
             if procedure_statement:
                 row['procedure_text'] = procedure_statement['query']
-                row['procedure_signature'] = compute_sql_signature(procedure_statement['query'])
+                row['procedure_signature'] = procedure_statement['query_signature']
             if procedure_name:
                 row['procedure_name'] = procedure_name
-            row['query_signature'] = compute_sql_signature(obfuscated_statement)
+            row['query_signature'] = statement['query_signature']
             row['query_hash'] = _hash_to_hex(row['query_hash'])
             row['query_plan_hash'] = _hash_to_hex(row['query_plan_hash'])
             row['plan_handle'] = _hash_to_hex(row['plan_handle'])
@@ -323,9 +334,20 @@ class SqlserverStatementMetrics(DBMAsyncJob):
             normalized_rows.append(row)
         return normalized_rows
 
+    @staticmethod
+    def _get_obfuscated_statement(statements, errors, query):
+        try:
+            return statements[query]
+        except KeyError:
+            raise errors[query]
+
+    def _submit_obfuscation_cache_metrics(self):
+        self._obfuscation_cache.submit_metrics(self.check, 'dd.sqlserver', **self.check.debug_stats_kwargs())
+
     def _collect_metrics_rows(self, cursor):
         rows = self._load_raw_query_metrics_rows(cursor)
         rows = self._normalize_queries(rows)
+        self._submit_obfuscation_cache_metrics()
         if not rows:
             return []
         metric_columns = [c for c in rows[0].keys() if c.startswith("total_") or c == 'execution_count']
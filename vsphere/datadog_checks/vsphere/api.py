@@ -4,7 +4,7 @@
 import datetime as dt
 import functools
 import ssl
-from typing import Any, Callable, List, TypeVar, cast
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, TypeVar, cast
 
 from pyVim import connect
 from pyVmomi import SoapAdapter, vim, vmodl
@@ -93,6 +93,12 @@ class VSphereAPI(object):
         self.log = log
 
         self._conn = cast(vim.ServiceInstance, None)
+
+        # State of the incremental collection of the infrastructure, see `get_infrastructure_updates`
+        self._infrastructure_collector = None  # type: Optional[vmodl.query.PropertyCollector]
+        self._infrastructure_version = None  # type: Optional[str]
+        self._infrastructure_data = {}  # type: InfrastructureData
+
         self.smart_connect()
 
     def smart_connect(self):
@@ -143,6 +149,8 @@ class VSphereAPI(object):
             connect.Disconnect(self._conn)
 
         self._conn = conn
+        # The property collector of the incremental collection belonged to the previous session
+        self._infrastructure_collector = None
         self.log.debug("Connected to %s", version_info.fullName)
 
     @smart_retry
@@ -165,13 +173,9 @@ class VSphereAPI(object):
         """
         return self._conn.content.perfManager.QueryPerfCounterByLevel(collection_level)
 
-    @smart_retry
-    def _get_raw_infrastructure(self):
-        # type: () -> List[vmodl.query.PropertyCollector.ObjectContent]
-        """Traverse the whole vSphere infrastructure and returns the list of raw pyvmomi MOR objects with
-        the required pre-fetched attributes."""
-        content = self._conn.content  # vim.ServiceInstanceContent reference from the connection
-
+    def _get_infrastructure_filter_spec(self, view_ref):
+        # type: (vim.view.ContainerView) -> vmodl.query.PropertyCollector.FilterSpec
+        """Build the filter spec selecting the required attributes of every resource from the given view."""
         property_specs = []
         # Specify which attributes we want to retrieve per object
         for resource in ALL_RESOURCES:
@@ -192,24 +196,33 @@ class VSphereAPI(object):
         traversal_spec.skip = False
         traversal_spec.type = vim.view.ContainerView
 
-        retr_opts = vmodl.query.PropertyCollector.RetrieveOptions()
-        # To limit the number of objects retrieved per call.
-        # If batch_collector_size is 0, collect maximum number of objects.
-        retr_opts.maxObjects = self.config.batch_collector_size
-
         # Specify the root object from where we collect the rest of the objects
         obj_spec = vmodl.query.PropertyCollector.ObjectSpec()
+        obj_spec.obj = view_ref
         obj_spec.skip = True
         obj_spec.selectSet = [traversal_spec]
 
         # Create our filter spec from the above specs
         filter_spec = vmodl.query.PropertyCollector.FilterSpec()
         filter_spec.propSet = property_specs
+        filter_spec.objectSet = [obj_spec]
+        return filter_spec
+
+    @smart_retry
+    def _get_raw_infrastructure(self):
+        # type: () -> List[vmodl.query.PropertyCollector.ObjectContent]
+        """Traverse the whole vSphere infrastructure and returns the list of raw pyvmomi MOR objects with
+        the required pre-fetched attributes."""
+        content = self._conn.content  # vim.ServiceInstanceContent reference from the connection
+
+        retr_opts = vmodl.query.PropertyCollector.RetrieveOptions()
+        # To limit the number of objects retrieved per call.
+        # If batch_collector_size is 0, collect maximum number of objects.
+        retr_opts.maxObjects = self.config.batch_collector_size
 
         view_ref = content.viewManager.CreateContainerView(content.rootFolder, ALL_RESOURCES, True)
         try:
-            obj_spec.obj = view_ref
-            filter_spec.objectSet = [obj_spec]
+            filter_spec = self._get_infrastructure_filter_spec(view_ref)
 
             # Collect the objects and their properties
             res = content.propertyCollector.RetrievePropertiesEx([filter_spec], retr_opts)
@@ -223,6 +236,54 @@ class VSphereAPI(object):
 
         return obj_content_list
 
+    @smart_retry
+    def _get_raw_infrastructure_updates(self):
+        # type: () -> Tuple[List[vmodl.query.PropertyCollector.ObjectUpdate], bool]
+        """Return the changes of the vSphere infrastructure since the last call, along with whether they describe
+        the whole infrastructure rather than the changes only.
+
+        A dedicated property collector is kept for the session with a filter selecting the same attributes as
+        `_get_raw_infrastructure`. Its versioned `WaitForUpdatesEx` reports every object the first time and
+        then only the objects that entered, left or were modified since the previous version.
+        """
+        content = self._conn.content
+        if self._infrastructure_collector is None:
+            self._infrastructure_version = None
+            view_ref = content.viewManager.CreateContainerView(content.rootFolder, ALL_RESOURCES, True)
+            collector = content.propertyCollector.CreatePropertyCollector()
+            # Modified properties are always reported with their whole value, e.g. all the `customValue`
+            collector.CreateFilter(self._get_infrastructure_filter_spec(view_ref), partialUpdates=False)
+            self._infrastructure_collector = collector
+
+        wait_options = vmodl.query.PropertyCollector.WaitOptions()
+        # Return immediately, with no update set if nothing changed
+        wait_options.maxWaitSeconds = 0
+        if self.config.batch_collector_size > 0:
+            wait_options.maxObjectUpdates = self.config.batch_collector_size
+
+        # An empty version requests the current state of every object
+        version = self._infrastructure_version or ''
+        is_full = not version
+        # Forget the version until all the updates are received, any failure then leads to a full collection
+        self._infrastructure_version = None
+
+        object_updates = []
+        while True:
+            update_set = self._infrastructure_collector.WaitForUpdatesEx(version, wait_options)
+            if update_set is None:
+                break
+
+            version = update_set.version
+            for filter_update in update_set.filterSet:
+                object_updates.extend(filter_update.objectSet)
+
+            # Updates can be paginated
+            if not update_set.truncated:
+                break
+
+        self._infrastructure_version = version
+        return object_updates, is_full
+
     @smart_retry
     def _fetch_all_attributes(self):
         # type: () -> List[vim.CustomFieldsManager.FieldDef]
@@ -262,23 +323,77 @@ class VSphereAPI(object):
         if self.config.should_collect_attributes:
             # Clean up attributes in infrastructure_data,
             # at this point they are custom pyvmomi objects and the attribute keys are not resolved.
+            self._resolve_attributes(itervalues(infrastructure_data))
+        return cast(InfrastructureData, infrastructure_data)
+
+    def get_infrastructure_updates(self, full=False):
+        # type: (bool) -> Tuple[InfrastructureData, Optional[Set[vim.ManagedEntity]]]
+        """Apply the changes of the vSphere infrastructure since the previous call to the data it returned.
+
+        :return: The same mapping of mors to their properties as `get_infrastructure` and the set of mors that
+            changed, were added or removed, or `None` if the whole infrastructure was collected again, which happens
+            the first time, on `full` refreshes and when a new session had to be opened.
+        """
+        if full:
+            self._infrastructure_version = None
+
+        object_updates, is_full = self._get_raw_infrastructure_updates()
+        if is_full:
+            # Add the root folder entity as it can't be fetched from the property collector.
+            root_folder = self._conn.content.rootFolder
+            self._infrastructure_data = {root_folder: {"name": root_folder.name, "parent": None}}
+
+        infrastructure_data = self._infrastructure_data
+        changed_mors = set()
+        unresolved_attributes = []
+        for object_update in object_updates:
+            mor = object_update.obj
+            if object_update.kind == 'leave':
+                infrastructure_data.pop(mor, None)
+                changed_mors.add(mor)
+                continue
 
-            attribute_keys = {x.key: x.name for x in self._fetch_all_attributes()}
-            for props in itervalues(infrastructure_data):
-                mor_attributes = []
-                if 'customValue' not in props:
+            if object_update.kind == 'enter':
+                if not object_update.changeSet:
                     continue
-                for attribute in props.pop('customValue'):
-                    # The attribute key is always unique
-                    attr_key_name = attribute_keys.get(attribute.key)
-                    if attr_key_name is None:
-                        self.log.debug("Unable to resolve attribute key with ID: %s", attribute.key)
-                        continue
-                    attr_value = attribute.value
-                    mor_attributes.append("{}{}:{}".format(self.config.attr_prefix, attr_key_name, attr_value))
-
-                props['attributes'] = mor_attributes
-        return cast(InfrastructureData, infrastructure_data)
+                props = infrastructure_data[mor] = {}
+            else:
+                props = infrastructure_data.setdefault(mor, {})
+
+            for change in object_update.changeSet:
+                if change.op in ('remove', 'indirectRemove'):
+                    props.pop(change.name, None)
+                else:
+                    props[change.name] = change.val
+
+            if 'customValue' in props:
+                unresolved_attributes.append(props)
+            changed_mors.add(mor)
+
+        if self.config.should_collect_attributes and unresolved_attributes:
+            self._resolve_attributes(unresolved_attributes)
+
+        self.log.debug("Received %s infrastructure updates", len(object_updates))
+        return cast(InfrastructureData, infrastructure_data), None if is_full else changed_mors
+
+    def _resolve_attributes(self, all_props):
+        # type: (Iterable[Dict[str, Any]]) -> None
+        """Replace the `customValue` of every resource by its list of `attributes` tags."""
+        attribute_keys = {x.key: x.name for x in self._fetch_all_attributes()}
+        for props in all_props:
+            mor_attributes = []
+            if 'customValue' not in props:
+                continue
+            for attribute in props.pop('customValue'):
+                # The attribute key is always unique
+                attr_key_name = attribute_keys.get(attribute.key)
+                if attr_key_name is None:
+                    self.log.debug("Unable to resolve attribute key with ID: %s", attribute.key)
+                    continue
+                attr_value = attribute.value
+                mor_attributes.append("{}{}:{}".format(self.config.attr_prefix, attr_key_name, attr_value))
+
+            props['attributes'] = mor_attributes
 
     @smart_retry
     def query_metrics(self, query_specs):
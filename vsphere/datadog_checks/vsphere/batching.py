@@ -0,0 +1,60 @@
+# (C) Datadog, Inc. 2023-present
+# All rights reserved
+# Licensed under a 3-clause BSD style license (see LICENSE)
+import threading
+
+from pyVmomi import vmodl
+
+# The factor by which the batch size grows when queries are fast enough
+BATCH_SIZE_GROWTH_FACTOR = 1.25
+
+
+class AdaptiveBatchSize(object):
+    """
+    The number of metrics to query at once for a resource type, sized from the latency of previous queries.
+
+    The batch size grows while full batches are queried in less than half of `target_time`, shrinks in
+    proportion when they take longer, and is halved when a query fails. It always stays between 1 and `maximum`,
+    and below the size of any batch that exceeded the `maxQueryMetrics` limit of vCenter.
+
+    Feedback is recorded from the threads running the queries, the batch size is read by the main thread.
+    """
+
+    def __init__(self, initial, maximum, target_time):
+        # type: (float, float, float) -> None
+        self.maximum = maximum
+        self.target_time = target_time
+
+        # The largest size accepted by vCenter, as learned from failed queries
+        self.limit = float('inf')
+        self._size = max(1, min(initial, maximum))
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        # type: () -> int
+        return int(self._size)
+
+    def record_success(self, batch_size, elapsed):
+        # type: (int, float) -> None
+        with self._lock:
+            if elapsed > self.target_time:
+                # Aim for the target time given the observed rate, dropping the size at most by half
+                self._size = max(1, min(self._size, max(batch_size * self.target_time / elapsed, batch_size / 2)))
+            elif elapsed < self.target_time / 2 and batch_size >= self.size:
+                # Only full batches tell whether larger ones would be fast enough
+                self._size = min(self.maximum, self.limit, max(self._size + 1, self._size * BATCH_SIZE_GROWTH_FACTOR))
+
+    def record_failure(self, batch_size, error):
+        # type: (int, Exception) -> None
+        if isinstance(error, vmodl.fault.InvalidArgument):
+            if error.invalidProperty != 'querySpec.size':
+                # The query is wrong or the resource has no values for a metric, fewer metrics would not help. See
+                # https://code.vmware.com/apis/704/vsphere/vmodl.fault.InvalidArgument.html
+                return
+
+            with self._lock:
+                self.limit = max(1, min(self.limit, batch_size - 1))
+
+        with self._lock:
+            self._size = max(1, min(self._size, batch_size / 2))
@@ -2,13 +2,16 @@
 # All rights reserved
 # Licensed under Simplified BSD License (see LICENSE)
 import time
+from collections import defaultdict
 from contextlib import contextmanager
-from typing import Any, Dict, Generator, Iterator, List, Type
+from typing import Any, Dict, Generator, Iterator, List, Set, Type
 
 from pyVmomi import vim
 from six import iterkeys
 
-from datadog_checks.vsphere.types import CounterId, MetricName, ResourceTags
+from datadog_checks.vsphere.config import VSphereConfig
+from datadog_checks.vsphere.types import CounterId, InfrastructureData, MetricName, ResourceTags
+from datadog_checks.vsphere.utils import filter_tags, get_entity_tags
 
 
 class VSphereCache(object):
@@ -148,3 +151,64 @@ class InfrastructureCache(VSphereCache):
         if mor_type not in self._mors:
             self._mors[mor_type] = {}
         self._mors[mor_type][mor] = mor_data
+
+    def remove_mor(self, mor):
+        # type: (vim.ManagedEntity) -> None
+        self._mors.get(type(mor), {}).pop(mor, None)
+
+
+class ParentTagsCache(object):
+    """Memoizes the tags of the parent chain of resources, i.e. their folders, clusters, datacenters... so that
+    the chain shared by many resources is only walked once.
+
+    The tags of a mor are only invalidated when the mor itself or one of its ancestors changes, along with the
+    memoized tags of everything below it. Resources may also register as dependents of their parent (and of
+    the host running them for VMs) to be reported when their tags need to be computed again.
+    """
+
+    def __init__(self):
+        # type: () -> None
+        self._tags = {}  # type: Dict[vim.ManagedEntity, List[str]]
+        # Maps every mor to the mors whose tags were computed from its own tags
+        self._dependents = defaultdict(set)  # type: Dict[vim.ManagedEntity, Set[vim.ManagedEntity]]
+
+    def get_tags(self, mor, infrastructure_data, config, include_only=None, dependent=None):
+        # type: (vim.ManagedEntity, InfrastructureData, VSphereConfig, List[str], vim.ManagedEntity) -> List[str]
+        """Same as `get_tags_recursively`, using the memoized tags of the mor and its ancestors if any."""
+        if dependent is not None:
+            self._dependents[mor].add(dependent)
+
+        tags = self._tags.get(mor)
+        if tags is None:
+            properties = infrastructure_data.get(mor, {})
+            tags = get_entity_tags(mor, properties, config)
+            parent = properties.get('parent')
+            if parent is not None:
+                tags.extend(self.get_tags(parent, infrastructure_data, config, dependent=mor))
+            self._tags[mor] = tags
+
+        # Like `get_tags_recursively`, the tags of resources at the top of the hierarchy are never filtered
+        if not include_only or infrastructure_data.get(mor, {}).get('parent') is None:
+            return list(tags)
+        return filter_tags(tags, include_only)
+
+    def invalidate(self, mor):
+        # type: (vim.ManagedEntity) -> Set[vim.ManagedEntity]
+        """Forget the tags of the mor and everything below it.
+        :return the set of mors that depended on the tags of the mor, directly or not."""
+        invalidated = set()
+        pending = [mor]
+        while pending:
+            current = pending.pop()
+            self._tags.pop(current, None)
+            for dependent in self._dependents.pop(current, ()):
+                if dependent not in invalidated:
+                    invalidated.add(dependent)
+                    pending.append(dependent)
+
+        return invalidated
+
+    def clear(self):
+        # type: () -> None
+        self._tags.clear()
+        self._dependents.clear()
@@ -17,6 +17,7 @@ from datadog_checks.vsphere.constants import (
     DEFAULT_BATCH_COLLECTOR_SIZE,
     DEFAULT_MAX_QUERY_METRICS,
     DEFAULT_METRICS_PER_QUERY,
+    DEFAULT_QUERY_METRICS_TARGET_TIME,
     DEFAULT_REFRESH_INFRASTRUCTURE_CACHE_INTERVAL,
     DEFAULT_REFRESH_METRICS_METADATA_CACHE_INTERVAL,
     DEFAULT_TAGS_COLLECTOR_SIZE,
@@ -65,6 +66,8 @@ class VSphereConfig(object):
         # Check option
         self.threads_count = instance.get("threads_count", DEFAULT_THREAD_COUNT)
         self.metrics_per_query = instance.get("metrics_per_query", DEFAULT_METRICS_PER_QUERY)
+        self.adaptive_metrics_per_query = is_affirmative(instance.get("adaptive_metrics_per_query", False))
+        self.query_metrics_target_time = instance.get("query_metrics_target_time", DEFAULT_QUERY_METRICS_TARGET_TIME)
         self.batch_collector_size = instance.get('batch_property_collector_size', DEFAULT_BATCH_COLLECTOR_SIZE)
         self.batch_tags_collector_size = instance.get('batch_tags_collector_size', DEFAULT_TAGS_COLLECTOR_SIZE)
         self.collect_events_only = is_affirmative(instance.get("collect_events_only", False))
@@ -79,6 +82,7 @@ class VSphereConfig(object):
         self.refresh_infrastructure_cache_interval = instance.get(
             'refresh_infrastructure_cache_interval', DEFAULT_REFRESH_INFRASTRUCTURE_CACHE_INTERVAL
         )
+        self.incremental_infrastructure_cache = is_affirmative(instance.get('incremental_infrastructure_cache', False))
         self.refresh_metrics_metadata_cache_interval = instance.get(
             'refresh_metrics_metadata_cache_interval', DEFAULT_REFRESH_METRICS_METADATA_CACHE_INTERVAL
         )
@@ -18,6 +18,10 @@ def shared_service(field, value):
     return get_default_field_value(field, value)
 
 
+def instance_adaptive_metrics_per_query(field, value):
+    return False
+
+
 def instance_attributes_prefix(field, value):
     return ''
 
@@ -74,6 +78,10 @@ def instance_include_datastore_cluster_folder_tag(field, value):
     return True
 
 
+def instance_incremental_infrastructure_cache(field, value):
+    return False
+
+
 def instance_max_historical_metrics(field, value):
     return 256
 
@@ -94,6 +102,10 @@ def instance_min_collection_interval(field, value):
     return 15
 
 
+def instance_query_metrics_target_time(field, value):
+    return 5
+
+
 def instance_refresh_infrastructure_cache_interval(field, value):
     return 300
 
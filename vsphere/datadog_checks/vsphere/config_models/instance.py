@@ -119,6 +119,7 @@ class InstanceConfig(BaseModel):
     class Config:
         allow_mutation = False
 
+    adaptive_metrics_per_query: Optional[bool]
     attributes_prefix: Optional[str]
     batch_property_collector_size: Optional[int]
     batch_tags_collector_size: Optional[int]
@@ -135,12 +136,14 @@ class InstanceConfig(BaseModel):
     excluded_host_tags: Optional[Sequence[str]]
     host: str
     include_datastore_cluster_folder_tag: Optional[bool]
+    incremental_infrastructure_cache: Optional[bool]
     max_historical_metrics: Optional[int]
     metric_filters: Optional[MetricFilters]
     metric_patterns: Optional[MetricPatterns]
     metrics_per_query: Optional[int]
     min_collection_interval: Optional[float]
     password: str
+    query_metrics_target_time: Optional[float]
     refresh_infrastructure_cache_interval: Optional[int]
     refresh_metrics_metadata_cache_interval: Optional[int]
     resource_filters: Optional[Sequence[ResourceFilter]]
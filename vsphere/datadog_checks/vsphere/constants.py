@@ -49,6 +49,9 @@ UNLIMITED_HIST_METRICS_PER_QUERY = float('inf')
 DEFAULT_MAX_QUERY_METRICS = 256  # type: float
 MAX_QUERY_METRICS_OPTION = "config.vpxd.stats.maxQueryMetrics"
 DEFAULT_THREAD_COUNT = 4
+# The number of metric queries that are scheduled or waiting for their results to be submitted, per thread
+MAX_PENDING_QUERIES_PER_THREAD = 2
+DEFAULT_QUERY_METRICS_TARGET_TIME = 5
 
 DEFAULT_REFRESH_METRICS_METADATA_CACHE_INTERVAL = 1800
 DEFAULT_REFRESH_INFRASTRUCTURE_CACHE_INTERVAL = 300
@@ -10,7 +10,7 @@ from datadog_checks.base import to_string
 from datadog_checks.vsphere.config import VSphereConfig
 from datadog_checks.vsphere.constants import MOR_TYPE_AS_STRING, REFERENCE_METRIC, SHORT_ROLLUP
 from datadog_checks.vsphere.resource_filters import ResourceFilter, match_any_regex
-from datadog_checks.vsphere.types import InfrastructureData, MetricFilters, MetricName
+from datadog_checks.vsphere.types import InfrastructureData, InfrastructureDataItem, MetricFilters, MetricName
 
 METRIC_TO_INSTANCE_TAG_MAPPING = {
     # Structure:
@@ -85,22 +85,10 @@ def is_metric_excluded_by_filters(metric_name, mor_type, metric_filters):
     return True
 
 
-def get_tags_recursively(mor, infrastructure_data, config, include_only=None):
-    # type: (vim.ManagedEntity, InfrastructureData, VSphereConfig, Optional[List[str]]) -> List[str]
-    """Go up the resources hierarchy from the given mor. Note that a host running a VM is not considered to be a
-    parent of that VM.
-
-    rootFolder(vim.Folder):
-      - vm(vim.Folder):
-          VM1-1
-          VM1-2
-      - host(vim.Folder):
-          HOST1
-          HOST2
-
-    """
+def get_entity_tags(mor, properties, config):
+    # type: (vim.ManagedEntity, InfrastructureDataItem, VSphereConfig) -> List[str]
+    """Return the tags describing the given mor itself, for the resources it is the ancestor of."""
     tags = []
-    properties = infrastructure_data.get(mor, {})
     entity_name = to_string(properties.get('name', 'unknown'))
     if isinstance(mor, vim.HostSystem):
         tags.append('vsphere_host:{}'.format(entity_name))
@@ -121,12 +109,11 @@ def get_tags_recursively(mor, infrastructure_data, config, include_only=None):
     elif isinstance(mor, vim.Datastore):
         tags.append('vsphere_datastore:{}'.format(entity_name))
 
-    parent = infrastructure_data.get(mor, {}).get('parent')
-    if parent is None:
-        return tags
-    tags.extend(get_tags_recursively(parent, infrastructure_data, config))
-    if not include_only:
-        return tags
+    return tags
+
+
+def filter_tags(tags, include_only):
+    # type: (List[str], List[str]) -> List[str]
     filtered_tags = []
     for tag in tags:
         for prefix in include_only:
@@ -136,6 +123,31 @@ def get_tags_recursively(mor, infrastructure_data, config, include_only=None):
     return filtered_tags
 
 
+def get_tags_recursively(mor, infrastructure_data, config, include_only=None):
+    # type: (vim.ManagedEntity, InfrastructureData, VSphereConfig, Optional[List[str]]) -> List[str]
+    """Go up the resources hierarchy from the given mor. Note that a host running a VM is not considered to be a
+    parent of that VM.
+
+    rootFolder(vim.Folder):
+      - vm(vim.Folder):
+          VM1-1
+          VM1-2
+      - host(vim.Folder):
+          HOST1
+          HOST2
+
+    """
+    tags = get_entity_tags(mor, infrastructure_data.get(mor, {}), config)
+
+    parent = infrastructure_data.get(mor, {}).get('parent')
+    if parent is None:
+        return tags
+    tags.extend(get_tags_recursively(parent, infrastructure_data, config))
+    if not include_only:
+        return tags
+    return filter_tags(tags, include_only)
+
+
 def should_collect_per_instance_values(config, metric_name, resource_type):
     # type: (VSphereConfig, str, Type[vim.ManagedEntity]) -> bool
     filters = config.collect_per_instance_filters.get(MOR_TYPE_AS_STRING[resource_type], [])
@@ -6,9 +6,9 @@ from __future__ import division
 import datetime as dt
 import logging
 from collections import defaultdict
-from concurrent.futures import as_completed
+from concurrent.futures import FIRST_COMPLETED, wait
 from concurrent.futures.thread import ThreadPoolExecutor
-from typing import Any, Dict, Generator, Iterable, List, Set, Type, cast
+from typing import Any, Dict, Generator, Iterable, List, Optional, Set, Type, cast
 
 from pyVmomi import vim, vmodl
 from six import iteritems
@@ -18,11 +18,14 @@ from datadog_checks.base.checks.libs.timer import Timer
 from datadog_checks.base.utils.time import get_current_datetime, get_timestamp
 from datadog_checks.vsphere.api import APIConnectionError, VSphereAPI
 from datadog_checks.vsphere.api_rest import VSphereRestAPI
-from datadog_checks.vsphere.cache import InfrastructureCache, MetricsMetadataCache
+from datadog_checks.vsphere.batching import AdaptiveBatchSize
+from datadog_checks.vsphere.cache import InfrastructureCache, MetricsMetadataCache, ParentTagsCache
 from datadog_checks.vsphere.config import VSphereConfig
 from datadog_checks.vsphere.constants import (
     DEFAULT_MAX_QUERY_METRICS,
+    DEFAULT_METRICS_PER_QUERY,
     HISTORICAL_RESOURCES,
+    MAX_PENDING_QUERIES_PER_THREAD,
     MAX_QUERY_METRICS_OPTION,
     REALTIME_METRICS_INTERVAL_ID,
     REALTIME_RESOURCES,
@@ -43,7 +46,6 @@ from datadog_checks.vsphere.utils import (
     MOR_TYPE_AS_STRING,
     format_metric_name,
     get_mapped_instance_tag,
-    get_tags_recursively,
     is_metric_excluded_by_filters,
     is_resource_collected_by_filters,
     should_collect_per_instance_values,
@@ -80,6 +82,7 @@ class VSphereCheck(AgentCheck):
 
         self.latest_event_query = get_current_datetime()
         self.infrastructure_cache = InfrastructureCache(interval_sec=self._config.refresh_infrastructure_cache_interval)
+        self.parent_tags_cache = ParentTagsCache()
         self.metrics_metadata_cache = MetricsMetadataCache(
             interval_sec=self._config.refresh_metrics_metadata_cache_interval
         )
@@ -88,6 +91,7 @@ class VSphereCheck(AgentCheck):
         # Do not override `AgentCheck.hostname`
         self._hostname = None
         self.thread_pool = ThreadPoolExecutor(max_workers=self._config.threads_count)
+        self.adaptive_batch_sizes = {}  # type: Dict[Type[vim.ManagedEntity], AdaptiveBatchSize]
         self.check_initializations.append(self.initiate_api_connection)
 
         self.last_connection_time = get_timestamp()
@@ -206,7 +210,10 @@ class VSphereCheck(AgentCheck):
         metrics for this mor."""
         self.log.debug("Refreshing the infrastructure cache...")
         t0 = Timer()
-        infrastructure_data = self.api.get_infrastructure()
+        if self._config.incremental_infrastructure_cache:
+            infrastructure_data, _ = self.api.get_infrastructure_updates(full=True)
+        else:
+            infrastructure_data = self.api.get_infrastructure()
         self.gauge(
             "datadog.vsphere.refresh_infrastructure_cache.time",
             t0.total(),
@@ -216,85 +223,144 @@ class VSphereCheck(AgentCheck):
         )
         self.log.debug("Infrastructure cache refreshed in %.3f seconds.", t0.total())
         self.log.debug("Infrastructure cache: %s", infrastructure_data)
+        self.set_infrastructure(infrastructure_data)
+
+    def update_infrastructure_cache(self):
+        # type: () -> bool
+        """Only apply the changes of the infrastructure since the last refresh or update to the infrastructure_cache.
+        A resource is updated when it changed or when one of its ancestors did, every other resource is left as is.
+
+        vSphere tags are not reported by the property collector, those of new resources are only collected by the next
+        full refresh.
+
+        :return True if any resource changed."""
+        t0 = Timer()
+        infrastructure_data, changed_mors = self.api.get_infrastructure_updates()
+        self.gauge(
+            "datadog.vsphere.update_infrastructure_cache.time",
+            t0.total(),
+            tags=self._config.base_tags,
+            raw=True,
+            hostname=self._hostname,
+        )
+
+        if changed_mors is None:
+            # The whole infrastructure was collected again, e.g. after a reconnection
+            self.log.debug("Infrastructure cache fully updated in %.3f seconds.", t0.total())
+            with self.infrastructure_cache.update():
+                self.set_infrastructure(infrastructure_data)
+            return True
+
+        self.log.debug("Infrastructure cache updated in %.3f seconds: %s", t0.total(), changed_mors)
+        updated_mors = set(changed_mors)
+        for mor in changed_mors:
+            updated_mors.update(self.parent_tags_cache.invalidate(mor))
+
+        for mor in updated_mors:
+            if not isinstance(mor, tuple(self._config.collected_resource_types)):
+                continue
+
+            mor_payload = None
+            if mor in infrastructure_data:
+                mor_payload = self.get_mor_payload(mor, infrastructure_data)
+
+            if mor_payload is None:
+                self.infrastructure_cache.remove_mor(mor)
+            else:
+                self.infrastructure_cache.set_mor_props(mor, mor_payload)
 
+        return bool(changed_mors)
+
+    def set_infrastructure(self, infrastructure_data):
+        # type: (InfrastructureData) -> None
+        """Store the tags and properties of all the resources of the infrastructure into the infrastructure_cache."""
         all_tags = {}
         if self._config.should_collect_tags:
             all_tags = self.collect_tags(infrastructure_data)
         self.infrastructure_cache.set_all_tags(all_tags)
 
-        for mor, properties in iteritems(infrastructure_data):
+        self.parent_tags_cache.clear()
+        for mor in infrastructure_data:
             if not isinstance(mor, tuple(self._config.collected_resource_types)):
                 # Do nothing for the resource types we do not collect
                 continue
 
-            mor_name = to_string(properties.get("name", "unknown"))
-            mor_type_str = MOR_TYPE_AS_STRING[type(mor)]
-            hostname = None
-            tags = []
-
-            if isinstance(mor, vim.VirtualMachine):
-                power_state = properties.get("runtime.powerState")
-                if power_state != vim.VirtualMachinePowerState.poweredOn:
-                    # Skipping because the VM is not powered on
-                    # TODO: Sometimes VM are "poweredOn" but "disconnected" and thus have no metrics
-                    self.log.debug("Skipping VM %s in state %s", mor_name, to_string(power_state))
-                    continue
-
-                # Hosts are not considered as parents of the VMs they run, we use the `runtime.host` property
-                # to get the name of the ESXi host
-                runtime_host = properties.get("runtime.host")
-                runtime_host_props = {}  # type: InfrastructureDataItem
-                if runtime_host:
-                    if runtime_host in infrastructure_data:
-                        runtime_host_props = infrastructure_data.get(runtime_host, {})
-                    else:
-                        self.log.debug("Missing runtime.host details for VM %s", mor_name)
-                runtime_hostname = to_string(runtime_host_props.get("name", "unknown"))
-                tags.append('vsphere_host:{}'.format(runtime_hostname))
-
-                if self._config.use_guest_hostname:
-                    hostname = properties.get("guest.hostName", mor_name)
+            mor_payload = self.get_mor_payload(mor, infrastructure_data)
+            if mor_payload is not None:
+                self.infrastructure_cache.set_mor_props(mor, mor_payload)
+
+    def get_mor_payload(self, mor, infrastructure_data):
+        # type: (vim.ManagedEntity, InfrastructureData) -> Optional[Dict[str, Any]]
+        """Compute the tags and `hostname` of a resource, or return None if it must not be collected."""
+        properties = infrastructure_data[mor]
+        mor_name = to_string(properties.get("name", "unknown"))
+        mor_type_str = MOR_TYPE_AS_STRING[type(mor)]
+        hostname = None
+        tags = []
+
+        if isinstance(mor, vim.VirtualMachine):
+            power_state = properties.get("runtime.powerState")
+            if power_state != vim.VirtualMachinePowerState.poweredOn:
+                # Skipping because the VM is not powered on
+                # TODO: Sometimes VM are "poweredOn" but "disconnected" and thus have no metrics
+                self.log.debug("Skipping VM %s in state %s", mor_name, to_string(power_state))
+                return None
+
+            # Hosts are not considered as parents of the VMs they run, we use the `runtime.host` property
+            # to get the name of the ESXi host
+            runtime_host = properties.get("runtime.host")
+            runtime_host_props = {}  # type: InfrastructureDataItem
+            if runtime_host:
+                if runtime_host in infrastructure_data:
+                    runtime_host_props = infrastructure_data.get(runtime_host, {})
                 else:
-                    hostname = mor_name
-            elif isinstance(mor, vim.HostSystem):
-                hostname = mor_name
+                    self.log.debug("Missing runtime.host details for VM %s", mor_name)
+            runtime_hostname = to_string(runtime_host_props.get("name", "unknown"))
+            tags.append('vsphere_host:{}'.format(runtime_hostname))
+
+            if self._config.use_guest_hostname:
+                hostname = properties.get("guest.hostName", mor_name)
             else:
-                tags.append('vsphere_{}:{}'.format(mor_type_str, mor_name))
-
-            parent = properties.get('parent')
-            runtime_host = properties.get('runtime.host')
-            if parent is not None:
-                tags.extend(get_tags_recursively(parent, infrastructure_data, self._config))
-            if runtime_host is not None:
-                tags.extend(
-                    get_tags_recursively(
-                        runtime_host, infrastructure_data, self._config, include_only=['vsphere_cluster']
-                    )
-                )
-            tags.append('vsphere_type:{}'.format(mor_type_str))
-
-            # Attach tags from fetched attributes.
-            tags.extend(properties.get('attributes', []))
-
-            resource_tags = self.infrastructure_cache.get_mor_tags(mor) + tags
-            if not is_resource_collected_by_filters(
-                mor,
-                infrastructure_data,
-                self._config.resource_filters,
-                resource_tags,
-            ):
-                # The resource does not match the specified whitelist/blacklist patterns.
-                self.log.debug(
-                    "Skipping resource not matched by filters. resource=`%s` tags=`%s`", mor_name, resource_tags
+                hostname = mor_name
+        elif isinstance(mor, vim.HostSystem):
+            hostname = mor_name
+        else:
+            tags.append('vsphere_{}:{}'.format(mor_type_str, mor_name))
+
+        # The tags of the ancestors are shared by many resources and memoized, the resource registers as a
+        # dependent of its parent and host to be updated when either changes.
+        parent = properties.get('parent')
+        runtime_host = properties.get('runtime.host')
+        if parent is not None:
+            tags.extend(self.parent_tags_cache.get_tags(parent, infrastructure_data, self._config, dependent=mor))
+        if runtime_host is not None:
+            tags.extend(
+                self.parent_tags_cache.get_tags(
+                    runtime_host, infrastructure_data, self._config, include_only=['vsphere_cluster'], dependent=mor
                 )
-                continue
+            )
+        tags.append('vsphere_type:{}'.format(mor_type_str))
+
+        # Attach tags from fetched attributes.
+        tags.extend(properties.get('attributes', []))
+
+        resource_tags = self.infrastructure_cache.get_mor_tags(mor) + tags
+        if not is_resource_collected_by_filters(
+            mor,
+            infrastructure_data,
+            self._config.resource_filters,
+            resource_tags,
+        ):
+            # The resource does not match the specified whitelist/blacklist patterns.
+            self.log.debug("Skipping resource not matched by filters. resource=`%s` tags=`%s`", mor_name, resource_tags)
+            return None
 
-            mor_payload = {"tags": tags}  # type: Dict[str, Any]
+        mor_payload = {"tags": tags}  # type: Dict[str, Any]
 
-            if hostname:
-                mor_payload['hostname'] = hostname
+        if hostname:
+            mor_payload['hostname'] = hostname
 
-            self.infrastructure_cache.set_mor_props(mor, mor_payload)
+        return mor_payload
 
     def submit_metrics_callback(self, query_results):
         # type: (List[vim.PerformanceManager.EntityMetricBase]) -> None
@@ -413,16 +479,34 @@ class VSphereCheck(AgentCheck):
         Warning: called in threads
         """
         t0 = Timer()
-        metrics_values = self.api.query_metrics(query_specs)
+        try:
+            metrics_values = self.api.query_metrics(query_specs)
+        except Exception as e:
+            adaptive_batch_size = self.get_query_adaptive_batch_size(query_specs)
+            if adaptive_batch_size is not None:
+                adaptive_batch_size.record_failure(sum(len(spec.metricId) for spec in query_specs), e)
+            raise
+
+        elapsed = t0.total()
         self.histogram(
             'datadog.vsphere.query_metrics.time',
-            t0.total(),
+            elapsed,
             tags=self._config.base_tags,
             raw=True,
             hostname=self._hostname,
         )
+
+        adaptive_batch_size = self.get_query_adaptive_batch_size(query_specs)
+        if adaptive_batch_size is not None:
+            adaptive_batch_size.record_success(sum(len(spec.metricId) for spec in query_specs), elapsed)
+
         return metrics_values
 
+    def get_query_adaptive_batch_size(self, query_specs):
+        # type: (List[vim.PerformanceManager.QuerySpec]) -> Optional[AdaptiveBatchSize]
+        # Batches only ever contain a single resource type
+        return self.adaptive_batch_sizes.get(type(query_specs[0].entity))
+
     def make_query_specs(self):
         # type: () -> Iterable[List[vim.PerformanceManager.QuerySpec]]
         """
@@ -465,16 +549,34 @@ class VSphereCheck(AgentCheck):
 
     def collect_metrics_async(self):
         # type: () -> None
-        """Run queries in multiple threads and wait for completion."""
-        tasks = []  # type: List[Any]
-        try:
-            for query_specs in self.make_query_specs():
-                tasks.append(self.thread_pool.submit(self.query_metrics_wrapper, query_specs))
-        except Exception as e:
-            self.log.warning("Unable to schedule all metric collection tasks: %s", e)
-        finally:
-            self.log.debug("Queued all %d tasks, waiting for completion.", len(tasks))
-            for future in as_completed(tasks):
+        """Run queries in multiple threads and submit their results as soon as they complete.
+        Only a bounded number of queries are pending at any time so that results do not pile up, and so that
+        adaptive batches are sized from the latency of the previous queries."""
+        max_pending_queries = self._config.threads_count * MAX_PENDING_QUERIES_PER_THREAD
+        all_query_specs = self.make_query_specs()
+        scheduling = True
+        pending = set()  # type: Set[Any]
+        tasks_count = 0
+
+        while True:
+            while scheduling and len(pending) < max_pending_queries:
+                try:
+                    query_specs = next(all_query_specs, None)
+                    if query_specs is None:
+                        scheduling = False
+                        self.log.debug("Queued all %d tasks, waiting for completion.", tasks_count)
+                        break
+                    pending.add(self.thread_pool.submit(self.query_metrics_wrapper, query_specs))
+                    tasks_count += 1
+                except Exception as e:
+                    scheduling = False
+                    self.log.warning("Unable to schedule all metric collection tasks: %s", e)
+
+            if not pending:
+                break
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
                 future_exc = future.exception()
                 if isinstance(future_exc, vmodl.fault.InvalidArgument):
                     # The query was invalid or the resource does not have values for this metric.
@@ -498,6 +600,15 @@ class VSphereCheck(AgentCheck):
                         e,
                     )
 
+        for resource_type, adaptive_batch_size in iteritems(self.adaptive_batch_sizes):
+            self.gauge(
+                'datadog.vsphere.query_metrics.batch_size',
+                adaptive_batch_size.size,
+                tags=self._config.base_tags + ['vsphere_type:{}'.format(MOR_TYPE_AS_STRING[resource_type])],
+                raw=True,
+                hostname=self._hostname,
+            )
+
     def make_batch(
         self,
         mors,  # type: Iterable[vim.ManagedEntity]
@@ -509,22 +620,31 @@ class VSphereCheck(AgentCheck):
         cluster metrics result in an unpredictable number of internal metric queries which all count towards
         max_query_metrics. Therefore often collecting a single cluster metric can make the whole call to fail. That's
         why we should never batch cluster metrics with anything else.
+
+        With `adaptive_metrics_per_query`, the number of metrics is read again before every batch since it is
+        adjusted as queries complete, the fixed number then being the upper bound.
         """
         # Safeguard, let's avoid collecting multiple resources in the same call
         mors_filtered = [m for m in mors if isinstance(m, resource_type)]  # type: List[vim.ManagedEntity]
 
+        adaptive_batch_size = None
         if resource_type == vim.ClusterComputeResource:
             # Cluster metrics are unpredictable and a single call can max out the limit. Always collect them one by one.
             max_batch_size = 1  # type: float
-        elif resource_type in REALTIME_RESOURCES or self._config.max_historical_metrics < 0:
-            # Queries are not limited by vCenter
-            max_batch_size = self._config.metrics_per_query
         else:
-            # Collection is limited by the value of `max_query_metrics`
-            if self._config.metrics_per_query < 0:
-                max_batch_size = self._config.max_historical_metrics
+            if resource_type in REALTIME_RESOURCES or self._config.max_historical_metrics < 0:
+                # Queries are not limited by vCenter
+                max_batch_size = self._config.metrics_per_query
             else:
-                max_batch_size = min(self._config.metrics_per_query, self._config.max_historical_metrics)
+                # Collection is limited by the value of `max_query_metrics`
+                if self._config.metrics_per_query < 0:
+                    max_batch_size = self._config.max_historical_metrics
+                else:
+                    max_batch_size = min(self._config.metrics_per_query, self._config.max_historical_metrics)
+
+            if self._config.adaptive_metrics_per_query:
+                adaptive_batch_size = self.get_adaptive_batch_size(resource_type, max_batch_size)
+                max_batch_size = adaptive_batch_size.size
 
         batch = defaultdict(list)  # type: MorBatch
         batch_size = 0
@@ -534,12 +654,34 @@ class VSphereCheck(AgentCheck):
                     yield batch
                     batch = defaultdict(list)
                     batch_size = 0
+                    if adaptive_batch_size is not None:
+                        max_batch_size = adaptive_batch_size.size
                 batch[m].append(metric_id)
                 batch_size += 1
         # Do not yield an empty batch
         if batch:
             yield batch
 
+    def get_adaptive_batch_size(self, resource_type, max_batch_size):
+        # type: (Type[vim.ManagedEntity], float) -> AdaptiveBatchSize
+        if max_batch_size <= 0:
+            # Unlimited queries are not adaptive, start from the default instead
+            initial_batch_size, max_batch_size = DEFAULT_METRICS_PER_QUERY, float('inf')
+        else:
+            initial_batch_size = max_batch_size
+
+        adaptive_batch_size = self.adaptive_batch_sizes.get(resource_type)
+        if adaptive_batch_size is None:
+            adaptive_batch_size = AdaptiveBatchSize(
+                initial_batch_size, max_batch_size, self._config.query_metrics_target_time
+            )
+            self.adaptive_batch_sizes[resource_type] = adaptive_batch_size
+        else:
+            # The limit of vCenter may have changed
+            adaptive_batch_size.maximum = max_batch_size
+
+        return adaptive_batch_size
+
     def submit_external_host_tags(self):
         # type: () -> None
         """Send external host tags to the Datadog backend. This is only useful for a REALTIME instance because
@@ -670,6 +812,9 @@ class VSphereCheck(AgentCheck):
                 self.refresh_infrastructure_cache()
             # Submit host tags as soon as we have fresh data
             self.submit_external_host_tags()
+        elif self._config.incremental_infrastructure_cache:
+            if self.update_infrastructure_cache():
+                self.submit_external_host_tags()
 
         # Submit the number of VMs that are monitored
         for resource_type in self._config.collected_resource_types:
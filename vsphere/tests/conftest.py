@@ -2,9 +2,10 @@
 # All rights reserved
 # Licensed under Simplified BSD License (see LICENSE)
 import os
+from concurrent.futures import Future
 
 import pytest
-from mock import MagicMock, Mock, patch
+from mock import Mock, patch
 
 from .common import LAB_INSTANCE, VSPHERE_VERSION
 from .mocked_api import MockedAPI, mock_http_rest_api_v6, mock_http_rest_api_v7
@@ -83,12 +84,17 @@ def mock_type():
 
 @pytest.fixture
 def mock_threadpool():
-    with patch('datadog_checks.vsphere.vsphere.ThreadPoolExecutor') as pool, patch(
-        'datadog_checks.vsphere.vsphere.as_completed', side_effect=lambda x: x
-    ):
-        pool.return_value.submit = lambda f, args: MagicMock(
-            done=MagicMock(return_value=True), result=MagicMock(return_value=f(args)), exception=lambda: None
-        )
+    def submit(f, args):
+        # Run the task synchronously
+        future = Future()
+        try:
+            future.set_result(f(args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    with patch('datadog_checks.vsphere.vsphere.ThreadPoolExecutor') as pool:
+        pool.return_value.submit = submit
         yield
 
 
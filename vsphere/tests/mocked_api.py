@@ -27,6 +27,8 @@ class MockedAPI(object):
     def __init__(self, config, _=None):
         self.config = config
         self.infrastructure_data = {}
+        # The mors changed by tests since the last call to `get_infrastructure_updates`, `None` before the first one
+        self.infrastructure_changes = None
         self.metrics_data = []
         self.mock_events = []
         self.server_time = dt.datetime.now()
@@ -90,6 +92,18 @@ class MockedAPI(object):
 
         return self.infrastructure_data
 
+    def get_infrastructure_updates(self, full=False):
+        infrastructure_data = self.get_infrastructure()
+        if full or self.infrastructure_changes is None:
+            self.infrastructure_changes = set()
+            return infrastructure_data, None
+
+        changes, self.infrastructure_changes = self.infrastructure_changes, set()
+        return infrastructure_data, changes
+
+    def get_mor(self, name):
+        return next(mor for mor, props in iteritems(self.infrastructure_data) if props['name'] == name)
+
     def query_metrics(self, query_specs):
         if not self.metrics_data:
             metrics_filename = 'metrics_{}.json'.format(self.config.collection_type)
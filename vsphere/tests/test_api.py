@@ -111,6 +111,110 @@ def test_get_infrastructure(realtime_instance):
         container_view.Destroy.assert_called_once()
 
 
+def test_get_infrastructure_updates(realtime_instance):
+    with patch('datadog_checks.vsphere.api.connect'):
+        config = VSphereConfig(realtime_instance, {}, MagicMock())
+        api = VSphereAPI(config, MagicMock())
+
+        container_view = api._conn.content.viewManager.CreateContainerView.return_value
+        container_view.__class__ = vim.ManagedObject
+
+        folder = vim.Folder(moId='folder')
+        vm = vim.VirtualMachine(moId='vm')
+        host = vim.HostSystem(moId='host')
+
+        def update_set(version, *object_updates, **kwargs):
+            return MagicMock(
+                version=version,
+                filterSet=[MagicMock(objectSet=list(object_updates))],
+                truncated=kwargs.get('truncated', False),
+            )
+
+        def object_update(kind, obj, **changes):
+            change_set = []
+            for name, val in changes.items():
+                change = MagicMock(op='remove' if val is None else 'assign', val=val)
+                change.name = name
+                change_set.append(change)
+            return MagicMock(kind=kind, obj=obj, changeSet=change_set)
+
+        collector = api._conn.content.propertyCollector.CreatePropertyCollector.return_value
+        root_folder = api._conn.content.rootFolder
+        root_folder.name = 'root-folder'
+
+        # The first call collects everything, possibly in several pages
+        collector.WaitForUpdatesEx.side_effect = [
+            update_set('1', object_update('enter', folder, name='folder', parent=root_folder), truncated=True),
+            update_set(
+                '2',
+                object_update('enter', vm, name='vm', parent=folder, **{'guest.hostName': 'guest'}),
+                object_update('enter', host, name='host', parent=folder),
+            ),
+        ]
+        infrastructure_data, changed_mors = api.get_infrastructure_updates()
+        assert changed_mors is None
+        assert infrastructure_data == {
+            root_folder: {'name': 'root-folder', 'parent': None},
+            folder: {'name': 'folder', 'parent': root_folder},
+            vm: {'name': 'vm', 'parent': folder, 'guest.hostName': 'guest'},
+            host: {'name': 'host', 'parent': folder},
+        }
+        assert [c.args[0] for c in collector.WaitForUpdatesEx.call_args_list] == ['', '1']
+        collector.CreateFilter.assert_called_once()
+
+        # Then only the changes since the last version
+        collector.WaitForUpdatesEx.side_effect = [
+            update_set(
+                '3', object_update('modify', vm, name='vm2', **{'guest.hostName': None}), object_update('leave', host)
+            )
+        ]
+        infrastructure_data, changed_mors = api.get_infrastructure_updates()
+        assert changed_mors == {vm, host}
+        assert infrastructure_data == {
+            root_folder: {'name': 'root-folder', 'parent': None},
+            folder: {'name': 'folder', 'parent': root_folder},
+            vm: {'name': 'vm2', 'parent': folder},
+        }
+        assert collector.WaitForUpdatesEx.call_args.args[0] == '2'
+
+        # No update set is returned when nothing changed
+        collector.WaitForUpdatesEx.side_effect = [None]
+        _, changed_mors = api.get_infrastructure_updates()
+        assert changed_mors == set()
+        assert collector.WaitForUpdatesEx.call_args.args[0] == '3'
+
+        # A full refresh collects everything again using the same filter
+        collector.WaitForUpdatesEx.side_effect = [update_set('4', object_update('enter', folder, name='folder'))]
+        infrastructure_data, changed_mors = api.get_infrastructure_updates(full=True)
+        assert changed_mors is None
+        assert infrastructure_data == {root_folder: {'name': 'root-folder', 'parent': None}, folder: {'name': 'folder'}}
+        assert collector.WaitForUpdatesEx.call_args.args[0] == ''
+        collector.CreateFilter.assert_called_once()
+
+
+def test_get_infrastructure_updates_reconnect(realtime_instance):
+    with patch('datadog_checks.vsphere.api.connect'):
+        config = VSphereConfig(realtime_instance, {}, MagicMock())
+        api = VSphereAPI(config, MagicMock())
+
+        container_view = api._conn.content.viewManager.CreateContainerView.return_value
+        container_view.__class__ = vim.ManagedObject
+
+        collector = api._conn.content.propertyCollector.CreatePropertyCollector.return_value
+        collector.WaitForUpdatesEx.side_effect = [MagicMock(version='1', filterSet=[], truncated=False)]
+        api.get_infrastructure_updates()
+
+        # The property collector is lost with the session, a new one collects everything again
+        collector.WaitForUpdatesEx.side_effect = [
+            Exception('session expired'),
+            MagicMock(version='1', filterSet=[], truncated=False),
+        ]
+        _, changed_mors = api.get_infrastructure_updates()
+        assert changed_mors is None
+        assert [c.args[0] for c in collector.WaitForUpdatesEx.call_args_list] == ['', '1', '']
+        assert collector.CreateFilter.call_count == 2
+
+
 @pytest.mark.parametrize(
     'exception, expected_calls',
     [
@@ -0,0 +1,77 @@
+# (C) Datadog, Inc. 2023-present
+# All rights reserved
+# Licensed under a 3-clause BSD style license (see LICENSE)
+from pyVmomi import vmodl
+
+from datadog_checks.vsphere.batching import AdaptiveBatchSize
+
+
+def test_adaptive_batch_size_grows():
+    batch_size = AdaptiveBatchSize(100, 200, 10)
+
+    # Batches that are not full are not taken into account
+    batch_size.record_success(50, 1)
+    assert batch_size.size == 100
+
+    batch_size.record_success(100, 1)
+    assert batch_size.size == 125
+
+    # Queries are fast, but not enough to grow
+    batch_size.record_success(125, 6)
+    assert batch_size.size == 125
+
+    for _ in range(10):
+        batch_size.record_success(batch_size.size, 1)
+    assert batch_size.size == 200
+
+
+def test_adaptive_batch_size_shrinks():
+    batch_size = AdaptiveBatchSize(100, 200, 10)
+
+    batch_size.record_success(100, 20)
+    assert batch_size.size == 50
+
+    # The size drops at most by half at once
+    batch_size.record_success(50, 1000)
+    assert batch_size.size == 25
+
+    # Slow batches shrink the size even when they were not full
+    batch_size.record_success(10, 11)
+    assert batch_size.size == 9
+
+
+def test_adaptive_batch_size_failures():
+    batch_size = AdaptiveBatchSize(300, 200, 10)
+    assert batch_size.size == 200
+
+    batch_size.record_failure(200, Exception('timeout'))
+    assert batch_size.size == 100
+
+    # Failures of previous batches that were larger do not shrink the size further
+    batch_size.record_failure(150, Exception('timeout'))
+    assert batch_size.size == 75
+
+    # The query itself is wrong
+    batch_size.record_failure(75, vmodl.fault.InvalidArgument())
+    assert batch_size.size == 75
+
+    for _ in range(10):
+        batch_size.record_failure(batch_size.size, Exception('timeout'))
+    assert batch_size.size == 1
+
+    # Transient failures do not prevent from growing back
+    for _ in range(30):
+        batch_size.record_success(batch_size.size, 1)
+    assert batch_size.size == 200
+
+
+def test_adaptive_batch_size_limit():
+    batch_size = AdaptiveBatchSize(100, 200, 10)
+
+    batch_size.record_failure(100, vmodl.fault.InvalidArgument(invalidProperty='querySpec.size'))
+    assert batch_size.size == 50
+    assert batch_size.limit == 99
+
+    for _ in range(10):
+        batch_size.record_success(batch_size.size, 1)
+    assert batch_size.size == 99
@@ -8,9 +8,10 @@ from mock import MagicMock, patch
 from pyVmomi import vim
 from six import iteritems
 
-from datadog_checks.vsphere.cache import InfrastructureCache, MetricsMetadataCache, VSphereCache
+from datadog_checks.vsphere.cache import InfrastructureCache, MetricsMetadataCache, ParentTagsCache, VSphereCache
 from datadog_checks.vsphere.config import VSphereConfig
 from datadog_checks.vsphere.constants import ALL_RESOURCES_WITH_METRICS
+from datadog_checks.vsphere.utils import get_entity_tags, get_tags_recursively
 
 from .common import build_rest_api_client
 
@@ -100,3 +101,44 @@ def test_infrastructure_cache(realtime_instance):
     assert cache.get_mor_tags(vm_mor) == ['my_cat_name_1:my_tag_name_1', 'my_cat_name_2:my_tag_name_2']
     assert cache.get_mor_tags(datastore) == ['my_cat_name_2:my_tag_name_2']
     assert cache.get_mor_tags(vm2_mor) == []
+
+
+def test_parent_tags_cache(realtime_instance):
+    config = VSphereConfig(realtime_instance, {}, logger)
+    cache = ParentTagsCache()
+
+    datacenter = vim.Datacenter(moId='datacenter')
+    folder = vim.Folder(moId='folder')
+    cluster = vim.ClusterComputeResource(moId='cluster')
+    host = vim.HostSystem(moId='host')
+    vm = vim.VirtualMachine(moId='vm')
+    infrastructure_data = {
+        datacenter: {'name': 'dc', 'parent': None},
+        folder: {'name': 'folder', 'parent': datacenter},
+        cluster: {'name': 'cluster', 'parent': datacenter},
+        host: {'name': 'host', 'parent': cluster},
+        vm: {'name': 'vm', 'parent': folder, 'runtime.host': host},
+    }
+
+    with patch('datadog_checks.vsphere.cache.get_entity_tags', wraps=get_entity_tags) as get_tags:
+        for _ in range(2):
+            assert cache.get_tags(folder, infrastructure_data, config, dependent=vm) == get_tags_recursively(
+                folder, infrastructure_data, config
+            )
+            assert cache.get_tags(
+                host, infrastructure_data, config, include_only=['vsphere_cluster'], dependent=vm
+            ) == ['vsphere_cluster:cluster']
+        # The datacenter is only walked once even though it is shared
+        assert get_tags.call_count == 4
+
+    # Only the ancestors below a change are computed again
+    infrastructure_data[cluster]['name'] = 'cluster2'
+    assert cache.invalidate(cluster) == {host, vm}
+    assert cache.get_tags(folder, infrastructure_data, config) == ['vsphere_folder:folder', 'vsphere_datacenter:dc']
+    assert cache.get_tags(host, infrastructure_data, config) == [
+        'vsphere_host:host',
+        'vsphere_cluster:cluster2',
+        'vsphere_compute:cluster2',
+        'vsphere_datacenter:dc',
+    ]
+    assert cache.invalidate(datacenter) == {folder, cluster, host, vm}
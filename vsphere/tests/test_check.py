@@ -5,10 +5,12 @@ import datetime as dt
 import json
 import os
 import time
+from concurrent.futures import wait
 
 import mock
 import pytest
 from mock import MagicMock
+from pyVmomi import vim, vmodl
 from tests.legacy.utils import mock_alarm_event
 
 from datadog_checks.base import to_string
@@ -460,3 +462,101 @@ def test_connection_refresh(aggregator, dd_run_check, realtime_instance, test_ti
         same_object = True
 
     assert same_object == expected_result
+
+
+@pytest.mark.usefixtures('mock_type', 'mock_threadpool', 'mock_api')
+def test_incremental_infrastructure_cache(aggregator, dd_run_check, realtime_instance):
+    check = VSphereCheck('vsphere', {}, [realtime_instance])
+    dd_run_check(check)
+
+    realtime_instance['incremental_infrastructure_cache'] = True
+    incremental_check = VSphereCheck('vsphere', {}, [realtime_instance])
+    dd_run_check(incremental_check)
+
+    def get_cached_props(check):
+        return {
+            check.api.infrastructure_data[mor]['name']: props
+            for mors in check.infrastructure_cache._mors.values()
+            for mor, props in mors.items()
+        }
+
+    # The first run collects the whole infrastructure
+    assert get_cached_props(incremental_check) == get_cached_props(check)
+    aggregator.assert_metric('datadog.vsphere.update_infrastructure_cache.time', count=0)
+
+    api = incremental_check.api
+    folder = api.get_mor('Discovered virtual machine')
+    host = api.get_mor('10.0.0.103')
+    vm_in_folder = api.get_mor('VM4-2')
+    vm_on_host = api.get_mor('$VM5')
+    vm_powered_off = api.get_mor('VM4-1')
+
+    api.infrastructure_data[folder]['name'] = 'Renamed folder'
+    api.infrastructure_data[host]['name'] = 'renamed-host'
+    api.infrastructure_data[vm_powered_off]['runtime.powerState'] = vim.VirtualMachinePowerState.poweredOff
+    api.infrastructure_changes.update([folder, host, vm_powered_off])
+    dd_run_check(incremental_check)
+
+    aggregator.assert_metric('datadog.vsphere.update_infrastructure_cache.time', count=1)
+    cache = incremental_check.infrastructure_cache
+    assert 'vsphere_folder:Renamed folder' in cache.get_mor_props(vm_in_folder)['tags']
+    assert 'vsphere_host:10.0.0.104' in cache.get_mor_props(vm_in_folder)['tags']
+    assert 'vsphere_folder:vm' in cache.get_mor_props(vm_on_host)['tags']
+    assert 'vsphere_host:renamed-host' in cache.get_mor_props(vm_on_host)['tags']
+    assert cache.get_mor_props(host)['hostname'] == 'renamed-host'
+    assert cache.get_mor_props(vm_powered_off) is None
+
+    # A VM that left the infrastructure is removed, nothing else is computed again
+    vm_props = cache.get_mor_props(vm_on_host)
+    del api.infrastructure_data[vm_in_folder]
+    api.infrastructure_changes.add(vm_in_folder)
+    dd_run_check(incremental_check)
+
+    assert cache.get_mor_props(vm_in_folder) is None
+    assert cache.get_mor_props(vm_on_host) is vm_props
+
+
+@pytest.mark.usefixtures('mock_type', 'mock_threadpool', 'mock_api')
+def test_adaptive_metrics_per_query(aggregator, dd_run_check, realtime_instance):
+    realtime_instance['adaptive_metrics_per_query'] = True
+    realtime_instance['metrics_per_query'] = 20
+    check = VSphereCheck('vsphere', {}, [realtime_instance])
+
+    query_metrics = MockedAPI.query_metrics
+    vm_batch_sizes = []
+
+    def limited_query_metrics(api, query_specs):
+        batch_size = sum(len(spec.metricId) for spec in query_specs)
+        if isinstance(query_specs[0].entity, vim.VirtualMachine):
+            vm_batch_sizes.append(batch_size)
+        if batch_size > 5:
+            raise vmodl.fault.InvalidArgument(invalidProperty='querySpec.size')
+        return query_metrics(api, query_specs)
+
+    with mock.patch.object(MockedAPI, 'query_metrics', limited_query_metrics):
+        dd_run_check(check)
+
+    # Batches are sized from the previous queries of the same run, never exceeding the limit of vCenter again
+    assert vm_batch_sizes[:4] == [20, 10, 5, 6]
+    assert max(vm_batch_sizes[4:]) == 5
+    aggregator.assert_metric(
+        'datadog.vsphere.query_metrics.batch_size', 5, tags=['vcenter_server:FAKE', 'vsphere_type:vm'], count=1
+    )
+    aggregator.assert_metric(
+        'datadog.vsphere.query_metrics.batch_size', tags=['vcenter_server:FAKE', 'vsphere_type:host']
+    )
+
+
+@pytest.mark.usefixtures('mock_type', 'mock_api')
+def test_pending_queries_are_bounded(aggregator, dd_run_check, realtime_instance):
+    realtime_instance['metrics_per_query'] = 5
+    realtime_instance['threads_count'] = 1
+    check = VSphereCheck('vsphere', {}, [realtime_instance])
+
+    with mock.patch('datadog_checks.vsphere.vsphere.wait', wraps=wait) as wait_for_queries:
+        dd_run_check(check)
+
+    # Results are submitted as soon as a query completes, with at most 2 queries pending per thread
+    assert wait_for_queries.call_count > 2
+    assert all(len(call.args[0]) <= 2 for call in wait_for_queries.call_args_list)
+    aggregator.assert_metric('vsphere.cpu.costop.sum')